@@ -20,7 +20,59 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+# The constants and exceptions are cheap and always needed, so they are imported eagerly. Everything else is imported
+# on its first use (PEP 562), so i.e.: a serverless function that only verifies webhooks does not pay for the HTTP stack.
 from bancardconnectorpython.constants import *
-from bancardconnectorpython.util import *
 from bancardconnectorpython.exceptions import *
-from bancardconnectorpython.api import *
+
+# public name -> submodule that defines it
+_LAZY_ATTRIBUTES = dict()
+for _module_name, _attribute_names in (
+		("util", ("CURRENCIES_DECIMALS", "is_python_version_greater_igual_than_3x", "merge_dict", "CurrencyFormatter", "get_currency_formatter",
+					"to_minor_units", "format_bancard_amount", "currency_decimal_to_string")),
+		("api", ("BancardAPI", "connector", "set_config", "configure", "scoped_connector")),
+		("transport", ("BancardTransport",)),
+		("bulk", ("BulkResult", "run_bulk", "RollbackSummary", "is_transient_rollback_error", "with_retries")),
+		("cache", ("TTLCache",)),
+		("pending", ("PendingCharge", "PendingChargeIndex")),
+		("signer", ("SIGNER_OPERATION_SINGLE_BUY", "SIGNER_OPERATION_GET_CONFIRMATION", "SIGNER_OPERATION_ROLLBACK", "SIGNER_OPERATION_CONFIRM",
+					"SIGNER_OPERATION_TEMPLATES", "BancardTokenSigner")),
+		("resilience", ("RetryPolicy", "NO_RETRY_POLICY", "CallStats", "last_call_stats", "attempt_timeout", "CircuitBreaker", "LatencyTracker")),
+		("metrics", ("bancard_response_code", "MetricsSink", "Histogram", "InMemoryMetricsSink", "histograms_text")),
+		("registry", ("BancardAPIRegistry",)),
+		("ledger", ("LedgerCharge", "ChargeLedger")),
+		("results", ("BancardResult", "ChargeToken", "ChargeStatus", "RollbackResult", "WebhookResult")),
+		("validation", ("CHARGE_BATCH_FIELDS", "VALIDATION_MESSAGES", "VALIDATION_RULES", "is_valid_marketplace_charge_id", "is_valid_amount",
+					"is_valid_description", "is_valid_url", "is_valid_currency", "ChargeBatchReport", "validate_charge_batch")),
+		("webhooks", ("WebhookEvent", "WebhookDispatcher", "WebhookReceiver", "BancardWebhookWSGIApp", "BancardWebhookASGIApp")),
+		("outcomes", ("RESPONSE_CODE_DECLINES", "UNKNOWN_DECLINE", "APPROVED_RESPONSE_CODE", "ChargeOutcome")),
+		("reconcile", ("read_charges", "ReconcileCheckpoint", "reconcile_charges")),
+		("ratelimit", ("rate_limit_priority", "with_rate_limit_priority", "RateLimiter", "FileRateLimiter")),
+		("idempotency", ("IDEMPOTENCY_FIELDS", "IdempotencyRecord", "MemoryIdempotencyStore", "SQLiteIdempotencyStore")),
+		("codec", ("JSON_DOCUMENT_TYPES", "JSONCodec", "OrjsonCodec", "get_codec", "load_bancard_data", "DEFAULT_CODEC")),
+		("aio", ("AsyncBancardAPI", "AsyncBancardTransport", "run_bulk_async", "with_retries_async", "with_rate_limit_priority_async")),
+):
+	for _attribute_name in _attribute_names:
+		_LAZY_ATTRIBUTES[_attribute_name] = "bancardconnectorpython.%s" % _module_name
+del _module_name, _attribute_names, _attribute_name
+
+# the star import keeps the names of the original package (constants, exceptions, util and api), so it does not import
+# every submodule; the rest of the names are reachable only as attributes of the package
+_STAR_MODULES = ("bancardconnectorpython.util", "bancardconnectorpython.api")
+__all__ = sorted(set(name for name, value in globals().items() if not name.startswith("_") and not isinstance(value, type(constants))) |
+				set(name for name, module_name in _LAZY_ATTRIBUTES.items() if module_name in _STAR_MODULES))
+
+
+def __getattr__(name):
+	module_name = _LAZY_ATTRIBUTES.get(name)
+	if module_name is None:
+		raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+	import importlib
+	value = getattr(importlib.import_module(module_name), name)
+	globals()[name] = value  # the next accesses do not go through __getattr__
+	return value
+
+
+def __dir__():
+	return sorted(set(__all__) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,127 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import argparse
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+
+
+def _open_input(path):
+	"""
+		Returns the text stream of the input, standard input if the path is "-".
+	"""
+
+	if path == "-":
+		return sys.stdin
+	return open(path, "r", newline="")
+
+
+def _open_output(path, checkpoint):
+	"""
+		Returns the binary stream of the output, standard output if the path is "-". When a run is resumed the results written
+		after its last checkpoint are dropped, since their charges are checked again.
+	"""
+
+	if path == "-":
+		return sys.stdout.buffer
+	if checkpoint.finished == 0:
+		return open(path, "wb")
+	if checkpoint.output_offset is not None and os.path.exists(path):
+		output = open(path, "r+b")
+		output.seek(checkpoint.output_offset)
+		output.truncate()
+		return output
+	return open(path, "ab")
+
+
+def reconcile(args):
+	"""
+		Runs the reconcile command. The BancardAPI is created from the same OS environment variables as connector().
+
+		:return: the exit status: 0 if every charge has been checked, 1 if any of them could not be checked
+			:rtype int
+	"""
+
+	from bancardconnectorpython.api import _create_api_from_environment
+	from bancardconnectorpython.reconcile import ReconcileCheckpoint, read_charges, reconcile_charges
+
+	checkpoint = ReconcileCheckpoint(args.checkpoint)
+	bancard_api = _create_api_from_environment(outcome_mode=True, pool_maxsize=args.workers)
+	input_lines = _open_input(args.input)
+	output = _open_output(args.output, checkpoint)
+	try:
+		charges = read_charges(input_lines, args.format, args.currency)
+		counts = reconcile_charges(
+			bancard_api, charges, output, checkpoint, max_workers=args.workers, checkpoint_every=args.checkpoint_every, checkpoint_interval=args.checkpoint_interval)
+	finally:
+		if input_lines is not sys.stdin:
+			input_lines.close()
+		if args.output != "-":
+			output.close()
+		bancard_api.close()
+
+	sys.stderr.write("reconciled %d charges (%s), %d in total\n" % (
+		sum(counts.values()), ", ".join("%s: %d" % (status, count) for status, count in sorted(counts.items())), checkpoint.finished))
+	return 1 if counts.get(RECONCILE_STATUS_ERROR, 0) else 0
+
+
+def main(argv=None):
+	"""
+		Command line tools of the SDK, i.e.: python -m bancardconnectorpython reconcile charges.csv --output results.ndjson --checkpoint reconcile.checkpoint
+	"""
+
+	parser = argparse.ArgumentParser(prog="python -m bancardconnectorpython", description="Command line tools of the Bancard VPOS SDK.")
+	subparsers = parser.add_subparsers(dest="command")
+
+	reconcile_parser = subparsers.add_parser(
+		"reconcile", help="checks the status of many charges with the confirmations Bancard WebService",
+		description="Checks the status of the charges of a CSV or NDJSON input and writes one NDJSON result per charge as they complete. "
+		"The credentials are read from the BANCARD_ENVIRONMENT, BANCARD_PUBLIC_KEY and BANCARD_PRIVATE_KEY environment variables.")
+	reconcile_parser.add_argument("input", nargs="?", default="-", help="CSV or NDJSON file with the marketplace_charge_id, amount and currency of every charge (default: stdin)")
+	reconcile_parser.add_argument("--format", choices=(RECONCILE_FORMAT_CSV, RECONCILE_FORMAT_NDJSON), default=None, help="format of the input (default: detected)")
+	reconcile_parser.add_argument("--output", "-o", default="-", help="NDJSON file of the results (default: stdout)")
+	reconcile_parser.add_argument("--checkpoint", default=None, help="file where the progress is saved, so a crashed run resumes from it")
+	reconcile_parser.add_argument("--workers", type=int, default=DEFAULT_BULK_MAX_WORKERS, help="simultaneous calls to Bancard")
+	reconcile_parser.add_argument("--currency", default="PYG", help="currency of the charges without one")
+	reconcile_parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_RECONCILE_CHECKPOINT_EVERY, help="results between two checkpoints")
+	reconcile_parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_RECONCILE_CHECKPOINT_INTERVAL, help="maximum seconds between two checkpoints")
+	reconcile_parser.set_defaults(command_function=reconcile)
+
+	args = parser.parse_args(argv)
+	if args.command is None:
+		parser.print_help()
+		return 2
+
+	try:
+		return args.command_function(args)
+	except (BancardAPIException, IOError, OSError) as error:
+		sys.stderr.write("%s: %s\n" % (type(error).__name__, error))
+		return 2
+	except KeyboardInterrupt:
+		return 130  # the progress has been saved in the checkpoint, if any
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,505 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import asyncio
+from collections import deque
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.api import BancardAPI
+from bancardconnectorpython.metrics import bancard_response_code
+from bancardconnectorpython.results import ChargeToken, ChargeStatus, RollbackResult
+from bancardconnectorpython.resilience import attempt_timeout
+from bancardconnectorpython.ratelimit import rate_limit_priority
+from bancardconnectorpython.bulk import BulkResult, RollbackSummary, is_transient_rollback_error, _prepare_request, _deadline_exception
+
+try:
+	import aiohttp
+except ImportError:
+	aiohttp = None  # the AsyncBancardAPI is an optional feature that requires: pip install aiohttp
+
+
+async def _call_bulk_item_async(coroutine_function, index, request):
+	"""
+		Awaits coroutine_function(*request) and wraps its return value or its exception in a BulkResult.
+	"""
+
+	try:
+		return BulkResult(index, request, result=await coroutine_function(*request))
+	except Exception as error:
+		return BulkResult(index, request, exception=error)
+
+
+async def run_bulk_async(coroutine_function, requests, max_workers=DEFAULT_BULK_MAX_WORKERS, ordered=True, deadline=None):
+	"""
+		asyncio version of run_bulk: awaits coroutine_function(*request) for every request with at most max_workers
+		simultaneous calls, and yields one BulkResult per request.
+
+		:return: an async generator of BulkResult
+			:rtype async_generator
+	"""
+
+	if type(max_workers) is not int or max_workers < 1:
+		raise BancardAPIInvalidParameterException("The max_workers must be an integer greater than zero.")
+
+	loop = asyncio.get_running_loop()
+	expires_at = loop.time() + deadline if deadline is not None else None
+	requests = enumerate(requests)
+	pending = deque()  # (index, request, task) in input order
+	try:
+		exhausted = False
+		while True:
+			while not exhausted and len(pending) < max_workers:
+				try:
+					index, request = next(requests)
+				except StopIteration:
+					exhausted = True
+					break
+				request, failed_result = _prepare_request(index, request)
+				if failed_result is None:
+					task = asyncio.ensure_future(_call_bulk_item_async(coroutine_function, index, request))
+				else:
+					# an invalid item fails alone, in its place of the results
+					task = loop.create_future()
+					task.set_result(failed_result)
+				pending.append((index, request, task))
+
+			if not pending:
+				return
+
+			timeout = max(expires_at - loop.time(), 0) if expires_at is not None else None
+			if ordered:
+				done, _ = await asyncio.wait([pending[0][2]], timeout=timeout)
+			else:
+				done, _ = await asyncio.wait([task for _, _, task in pending], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+			if not done:
+				break  # the deadline expired
+
+			for item in list(pending):
+				if item[2].done():
+					pending.remove(item)
+					yield item[2].result()
+				elif ordered:
+					break
+
+		# the deadline expired: report every unfinished or not yet started item as timed out
+		while pending:
+			index, request, task = pending.popleft()
+			if task.done():
+				yield task.result()
+			else:
+				task.cancel()
+				yield BulkResult(index, request, exception=_deadline_exception(deadline))
+		for index, request in requests:
+			yield BulkResult(index, _prepare_request(index, request)[0], exception=_deadline_exception(deadline))
+	finally:
+		for _, _, task in pending:
+			task.cancel()
+
+
+def with_retries_async(coroutine_function, retries, backoff):
+	"""
+		asyncio version of bulk.with_retries.
+	"""
+
+	async def call_with_retries(*args):
+		attempt = 0
+		while True:
+			try:
+				return await coroutine_function(*args)
+			except Exception as error:
+				if attempt >= retries or not is_transient_rollback_error(error):
+					raise
+				await asyncio.sleep(backoff * (2 ** attempt))
+				attempt += 1
+
+	return call_with_retries
+
+
+def with_rate_limit_priority_async(coroutine_function, priority):
+	"""
+		asyncio version of ratelimit.with_rate_limit_priority.
+	"""
+
+	async def call_with_priority(*args):
+		with rate_limit_priority(priority):
+			return await coroutine_function(*args)
+
+	return call_with_priority
+
+
+class AsyncBancardTransport(object):
+
+	def __init__(self, pool_limit=DEFAULT_ASYNC_POOL_LIMIT, pool_maxsize=None):
+		"""
+			Constructor of the AsyncBancardTransport class, an asyncio keep-alive HTTP connection pool to the Bancard WebServices.
+
+			:param pool_limit: maximum number of simultaneous connections of the pool
+				:type pool_limit: int
+			:param pool_maxsize: maximum number of simultaneous connections per host. By default it is bounded only by pool_limit.
+				:type pool_maxsize: int
+			:raises BancardAPIConfigurationException: if the aiohttp library is not installed
+		"""
+
+		if aiohttp is None:
+			raise BancardAPIConfigurationException("The AsyncBancardAPI requires the aiohttp library: pip install aiohttp")
+
+		self.pool_limit = pool_limit
+		self.pool_maxsize = pool_maxsize or 0  # 0 means no per-host limit for aiohttp
+		self.closed = False
+		self._session = None
+
+	@property
+	def session(self):
+		"""
+			Returns the aiohttp session of this transport, creating it on the first use within the running event loop.
+
+			:return: the HTTP session that keeps the connections alive between calls
+				:rtype aiohttp.ClientSession
+			:raises BancardAPIConfigurationException: if the transport has already been closed
+		"""
+
+		if self.closed:
+			raise BancardAPIConfigurationException("The Bancard transport has already been closed.")
+		if self._session is None:
+			connector = aiohttp.TCPConnector(limit=self.pool_limit, limit_per_host=self.pool_maxsize)
+			self._session = aiohttp.ClientSession(connector=connector)
+		return self._session
+
+	async def post(self, url, data, headers, timeout=None):
+		"""
+			Sends a POST request through one of the pooled connections.
+
+			:param url: URL of the Bancard WebService
+				:type url: str
+			:param data: the already serialized body of the request
+				:type data: str or bytes
+			:param headers: the HTTP headers of the request
+				:type headers: dict
+			:param timeout: the (connect, read) timeouts in seconds. By default the request never times out.
+				:type timeout: tuple
+			:return: the raw body of the HTTP response
+				:rtype bytes
+			:raises BancardAPITimeoutException: if Bancard did not accept the connection or did not answer within the timeouts
+			:raises BancardAPIUnavailableException: if Bancard answered that the WebService is temporarily unavailable
+			:raises BancardAPIConnectionException: if the request could not be sent or its response could not be received
+		"""
+
+		client_timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1]) if timeout is not None else aiohttp.ClientTimeout(total=None)
+		try:
+			async with self.session.post(url, data=data, headers=headers, timeout=client_timeout) as response:
+				if response.status in BANCARD_UNAVAILABLE_STATUS_CODES:
+					raise BancardAPIUnavailableException("The Bancard WebService is temporarily unavailable (HTTP %s)." % response.status)
+				return await response.read()
+		except asyncio.TimeoutError as error:
+			raise BancardAPITimeoutException("The Bancard WebService did not answer in time: %s" % error)
+		except aiohttp.ClientError as error:
+			raise BancardAPIConnectionException("Could not connect to the Bancard WebService: %s" % error)
+
+	async def close(self):
+		"""
+			Closes every pooled connection. Any later call through this transport will raise an exception.
+		"""
+
+		self.closed = True
+		session, self._session = self._session, None
+		if session is not None:
+			await session.close()
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+		return False
+
+
+class AsyncBancardAPI(BancardAPI):
+	"""
+		asyncio version of the BancardAPI: every public method is a coroutine, and all of them share one async connection pool.
+		The parameters validation, the tokens and the handling of the Bancard responses are the same ones of the BancardAPI.
+
+		Besides the BancardAPI options, it accepts:
+		* pool_limit: maximum number of simultaneous connections. The default value is: DEFAULT_ASYNC_POOL_LIMIT.
+		* pool_maxsize: maximum number of simultaneous connections per host. By default it is bounded only by pool_limit.
+		* transport: an already created AsyncBancardTransport to share its connection pool with other AsyncBancardAPI instances.
+	"""
+
+	def _create_transport(self):
+		"""
+			Creates the async connection pool owned by this AsyncBancardAPI.
+
+			:return: the transport used to call the Bancard WebServices
+				:rtype AsyncBancardTransport
+		"""
+		pool_maxsize = self.options.get("pool_maxsize")
+		return AsyncBancardTransport(
+			pool_limit=int(self.options.get("pool_limit", DEFAULT_ASYNC_POOL_LIMIT)),
+			pool_maxsize=int(pool_maxsize) if pool_maxsize is not None else None)
+
+	async def close(self):
+		"""
+			Closes the keep-alive connections of this AsyncBancardAPI. The instance can not be used after calling this method.
+			A transport received through the "transport" option is shared, so it is left open for its owner to close.
+		"""
+		if self.owns_transport:
+			await self.transport.close()
+
+	def __enter__(self):
+		raise BancardAPIConfigurationException("The AsyncBancardAPI must be used with 'async with'.")
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+		return False
+
+	async def __call_bancard_webservice(self, params, endpoint):
+		"""
+			Sends the JSON params object to the given Bancard WebService and returns the JSON parsed response.
+			The calls that fail due to a connection problem are retried as defined by the retry policy of the endpoint.
+			:param params: values to send to the Bancard API
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
+			:return the JSON object obtained after parsing the Bancard response
+			:raises BancardAPIConnectionException: if the call failed even after the retries, with its retries and elapsed attributes
+		"""
+		bancard_body_request = self._encode_bancard_request(params)
+		retry_policy = self._retry_policy_of(endpoint)
+		started_at = time.time()
+		deadline_at = started_at + self.deadline if self.deadline is not None else None
+		retries = 0
+		while True:
+			try:
+				if self.rate_limiter is not None:
+					await self.rate_limiter.acquire_async(endpoint, deadline_at=deadline_at)
+				timeout = attempt_timeout(self.connect_timeout, self.read_timeout, deadline_at)
+				if self.metrics is None:
+					content = await self.__post_attempt(endpoint, bancard_body_request, timeout)
+				else:
+					content = await self.__post_measured(endpoint, bancard_body_request, timeout)
+				break
+			except BancardAPIConnectionException as error:
+				fail_fast = isinstance(error, (BancardAPICircuitOpenException, BancardAPIRateLimitedException))
+				delay = retry_policy.next_retry_delay(retries, deadline_at) if not fail_fast else None
+				if delay is None:
+					self._record_call_stats(endpoint, retries, started_at, error)
+					raise
+				await asyncio.sleep(delay)
+				retries += 1
+
+		self._record_call_stats(endpoint, retries, started_at)
+		bancard_response = self._decode_bancard_response(content)
+		if self.metrics is not None:
+			self.metrics.response_received(endpoint, bancard_response_code(bancard_response))
+		return bancard_response
+
+	async def __post_measured(self, endpoint, bancard_body_request, timeout):
+		"""
+			Sends one attempt of a call to the given Bancard WebService and reports its latency and sizes to the metrics sink.
+
+			:return: the raw body of the Bancard response
+				:rtype bytes
+		"""
+
+		self.metrics.request_started(endpoint)
+		attempt_started_at = time.time()
+		try:
+			content = await self.__post_attempt(endpoint, bancard_body_request, timeout)
+		except Exception as error:
+			self.metrics.request_finished(endpoint, time.time() - attempt_started_at, len(bancard_body_request), 0, exception=error)
+			raise
+		self.metrics.request_finished(endpoint, time.time() - attempt_started_at, len(bancard_body_request), len(content))
+		return content
+
+	async def __post_attempt(self, endpoint, bancard_body_request, timeout):
+		"""
+			Sends one attempt of a call to the given Bancard WebService through its circuit breaker, if any.
+			The confirmations requests are hedged if the hedge_delay option is set.
+
+			:return: the raw body of the Bancard response
+				:rtype bytes
+			:raises BancardAPICircuitOpenException: if the circuit breaker of the endpoint is open
+			:raises BancardAPIConnectionException: if the attempt failed due to a connection problem
+		"""
+
+		circuit_breaker = self.circuit_breakers.get(endpoint)
+		if circuit_breaker is not None:
+			circuit_breaker.before_call()
+
+		try:
+			if endpoint == CONFIRMATIONS_KEY and self.hedge_delay is not None:
+				content = await self.__post_hedged(self.urls[endpoint], bancard_body_request, timeout)
+			else:
+				content = await self.transport.post(self.urls[endpoint], bancard_body_request, BANCARD_REQUEST_HEADERS, timeout=timeout)
+		except Exception:
+			if circuit_breaker is not None:
+				circuit_breaker.record_failure()
+			raise
+
+		if circuit_breaker is not None:
+			circuit_breaker.record_success()
+		return content
+
+	async def __post_hedged(self, url, bancard_body_request, timeout):
+		"""
+			Sends a read-only request and, if it did not answer within the hedge delay, a second identical one.
+			The first successful response wins and the slower request is cancelled.
+
+			:return: the raw body of the first successful Bancard response
+				:rtype bytes
+			:raises BancardAPIConnectionException: if all the sent requests failed
+		"""
+
+		started_at = time.time()
+		pending = set()
+		error = None
+		try:
+			# the requests are cancelled if the caller is cancelled while any of them is in progress
+			pending.add(asyncio.ensure_future(self.transport.post(url, bancard_body_request, BANCARD_REQUEST_HEADERS, timeout=timeout)))
+			done, _ = await asyncio.wait(pending, timeout=self._hedge_delay_seconds())
+			if not done:
+				pending.add(asyncio.ensure_future(self.transport.post(url, bancard_body_request, BANCARD_REQUEST_HEADERS, timeout=timeout)))
+
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					try:
+						content = task.result()
+					except BancardAPIConnectionException as task_error:
+						error = task_error
+						continue
+					self.confirmations_latency.observe(time.time() - started_at)
+					return content
+		finally:
+			for task in pending:
+				task.cancel()
+		raise error
+
+	async def _call_store(self, store, function, *args):
+		"""
+			Calls a method that uses the given idempotency store or ledger. A store may block on its I/O (i.e.: SQLite writes),
+			so the method is called in the default executor of the event loop. Without a store it is called right away.
+		"""
+
+		if store is None:
+			return function(*args)
+		return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+	async def _record_ledger_event_async(self, event, marketplace_charge_id, bancard_response, amount=None, currency=None):
+		"""
+			Records an event of a charge in the ledger, if any, without blocking the event loop.
+		"""
+
+		await self._call_store(self.ledger, self._record_ledger_event, event, marketplace_charge_id, bancard_response, amount, currency)
+
+	async def generate_charge_token(self, marketplace_charge_id, amount, description, approved_url, cancelled_url, currency="PYG"):
+		"""
+			Awaitable version of BancardAPI.generate_charge_token. The idempotency store and the ledger are used from the default executor.
+		"""
+
+		bancard_body_request = self._build_charge_token_request(marketplace_charge_id, amount, description, approved_url, cancelled_url, currency)
+		charge_token = await self._call_store(self.idempotency_store, self._get_idempotent_charge_token, marketplace_charge_id, bancard_body_request)
+		if charge_token is not None:
+			return self._result(ChargeToken, charge_token)
+
+		bancard_response = await self.__call_bancard_webservice(bancard_body_request, CHARGE_TOKEN_GENERATOR_KEY)
+		charge_token = self._handle_charge_token_response(marketplace_charge_id, bancard_response)
+		await self._call_store(self.idempotency_store, self._remember_charge_token, marketplace_charge_id, bancard_body_request, charge_token)
+		self._index_pending_charge(marketplace_charge_id, amount, currency)
+		await self._record_ledger_event_async(LEDGER_EVENT_CREATED, marketplace_charge_id, bancard_response, amount, currency)
+		return self._result(ChargeToken, charge_token)
+
+	async def get_charge_status(self, marketplace_charge_id, amount, currency="PYG"):
+		"""
+			Awaitable version of BancardAPI.get_charge_status. The ledger is used from the default executor.
+		"""
+
+		bancard_body_request = self._build_charge_status_request(marketplace_charge_id, amount, currency)
+		bancard_response = self._get_cached_charge_status(marketplace_charge_id)
+		if bancard_response is None:
+			bancard_response = await self.__call_bancard_webservice(bancard_body_request, CONFIRMATIONS_KEY)
+			self._cache_charge_status(marketplace_charge_id, bancard_response)
+			await self._record_ledger_event_async(LEDGER_EVENT_CONFIRMATION, marketplace_charge_id, bancard_response)
+		return self._result(ChargeStatus, self._handle_charge_status_response(amount, currency, bancard_response))
+
+	async def get_charge_statuses(self, charges, max_workers=DEFAULT_BULK_MAX_WORKERS, ordered=True, deadline=None):
+		"""
+			asyncio version of BancardAPI.get_charge_statuses: an async generator of BulkResult.
+		"""
+
+		get_charge_status = with_rate_limit_priority_async(self.get_charge_status, RATE_LIMIT_PRIORITY_BATCH)
+		async for bulk_result in run_bulk_async(get_charge_status, charges, max_workers=max_workers, ordered=ordered, deadline=deadline):
+			yield bulk_result
+
+	async def rollback_charge(self, marketplace_charge_id):
+		"""
+			Awaitable version of BancardAPI.rollback_charge. The ledger is used from the default executor.
+		"""
+
+		bancard_body_request = self._build_rollback_request(marketplace_charge_id)
+		try:
+			bancard_response = await self.__call_bancard_webservice(bancard_body_request, ROLLBACK_KEY)
+		finally:
+			# the rollback changes the status of the charge, even if its response was lost
+			self.invalidate_charge_status(marketplace_charge_id)
+			if self.pending_index is not None:
+				self.pending_index.discard(marketplace_charge_id)
+		await self._record_ledger_event_async(LEDGER_EVENT_ROLLBACK, marketplace_charge_id, bancard_response)
+		return self._result(RollbackResult, self._handle_rollback_response(bancard_response))
+
+	async def rollback_charges(self, marketplace_charge_ids, max_workers=DEFAULT_BULK_MAX_WORKERS, retries=DEFAULT_BULK_ROLLBACK_RETRIES, backoff=DEFAULT_BULK_ROLLBACK_BACKOFF, deadline=None):
+		"""
+			Awaitable version of BancardAPI.rollback_charges.
+		"""
+
+		summary = RollbackSummary()
+		rollback_charge = with_retries_async(with_rate_limit_priority_async(self.rollback_charge, RATE_LIMIT_PRIORITY_BATCH), self._bulk_rollback_retries(retries), backoff)
+		requests = ((marketplace_charge_id,) for marketplace_charge_id in marketplace_charge_ids)
+		async for bulk_result in run_bulk_async(rollback_charge, requests, max_workers=max_workers, ordered=False, deadline=deadline):
+			summary.add(bulk_result)
+		return summary
+
+	async def process_vpos_webhook(self, bancard_data, original_marketplace_charge_id, original_amount, original_currency="PYG"):
+		"""
+			Awaitable version of BancardAPI.process_vpos_webhook. It does not perform any I/O, but the ledger writes, that are done from the default executor.
+		"""
+
+		process_vpos_webhook = super(AsyncBancardAPI, self).process_vpos_webhook
+		return await self._call_store(self.ledger, process_vpos_webhook, bancard_data, original_marketplace_charge_id, original_amount, original_currency)
+
+	async def verify_vpos_webhook(self, bancard_data, evict=True):
+		"""
+			Awaitable version of BancardAPI.verify_vpos_webhook. It does not perform any I/O, but the ledger writes, that are done from the default executor.
+		"""
+
+		return await self._call_store(self.ledger, super(AsyncBancardAPI, self).verify_vpos_webhook, bancard_data, evict)
+
+	@staticmethod
+	async def get_marketplace_charge_id_from_bancard_webhook(bancard_data):
+		"""
+			Awaitable version of BancardAPI.get_marketplace_charge_id_from_bancard_webhook. It does not perform any I/O.
+		"""
+
+		return BancardAPI.get_marketplace_charge_id_from_bancard_webhook(bancard_data)
@@ -22,12 +22,25 @@
 
 
 import os
-import json
-import hashlib
-import requests
+import hmac
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from bancardconnectorpython.constants import *
 from bancardconnectorpython.util import *
 from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.transport import BancardTransport
+from bancardconnectorpython.cache import TTLCache
+from bancardconnectorpython.pending import PendingChargeIndex
+from bancardconnectorpython.signer import BancardTokenSigner
+from bancardconnectorpython.metrics import bancard_response_code
+from bancardconnectorpython.codec import get_codec, load_bancard_data
+from bancardconnectorpython.idempotency import IdempotencyRecord
+from bancardconnectorpython.results import BancardResult, ChargeToken, ChargeStatus, RollbackResult, WebhookResult
+from bancardconnectorpython.outcomes import APPROVED_RESPONSE_CODE, ChargeOutcome
+from bancardconnectorpython.validation import VALIDATION_MESSAGES, is_valid_marketplace_charge_id, is_valid_amount, is_valid_description, is_valid_url, is_valid_currency
+from bancardconnectorpython.resilience import RetryPolicy, CallStats, CircuitBreaker, LatencyTracker, NO_RETRY_POLICY, attempt_timeout, last_call_stats
 
 
 class BancardAPI(object):
@@ -42,8 +55,43 @@ class BancardAPI(object):
 				The required key-value pairs are:
 				* public_key: the public key given by Bancard
 				* private_key: the private key given by Bancard
-				The optional key-value pair is:
+				The optional key-value pairs are:
 				* environment: one the following two string constants: "sandbox" or "production". The default value is: "sandbox".
+				* pool_connections: number of per-host keep-alive connection pools to cache. The default value is: DEFAULT_POOL_CONNECTIONS.
+				* pool_maxsize: maximum number of keep-alive connections per host. The default value is: DEFAULT_POOL_MAXSIZE.
+				* pool_block: if True, wait for a free pooled connection instead of opening an extra one. The default value is: False.
+				* transport: an already created BancardTransport to share its connection pool with other BancardAPI instances.
+				* signer: an already created BancardTokenSigner of the same private_key, to share it with other BancardAPI instances.
+				* charge_status_cache_size: maximum number of get_charge_status confirmations to cache. The default value is 0 (no cache).
+				* charge_status_pending_ttl: seconds to cache a not yet payed (PaymentNotFoundError) confirmation. The default value is: DEFAULT_CHARGE_STATUS_PENDING_TTL.
+				* pending_index_size: maximum number of created charges to remember for verify_vpos_webhook. The default value is: DEFAULT_PENDING_INDEX_SIZE. Use 0 to disable it.
+				* pending_index_max_age: seconds after which a created charge is forgotten by verify_vpos_webhook. The default value is: DEFAULT_PENDING_INDEX_MAX_AGE.
+				* connect_timeout: seconds to wait for a connection to Bancard. The default value is: DEFAULT_CONNECT_TIMEOUT.
+				* read_timeout: seconds to wait for the response of Bancard. The default value is: DEFAULT_READ_TIMEOUT.
+				* deadline: maximum seconds of a whole operation, including its retries. By default there is no deadline.
+				* max_retries, backoff_base, backoff_max: the RetryPolicy of the idempotent operations (get_charge_status and rollback_charge).
+				  The defaults are: DEFAULT_MAX_RETRIES, DEFAULT_BACKOFF_BASE, DEFAULT_BACKOFF_MAX. generate_charge_token is never retried.
+				* retry_policy: an already created RetryPolicy, instead of the max_retries, backoff_base and backoff_max options.
+				* circuit_breaker: if True every Bancard WebService gets its own CircuitBreaker. The default value is: False.
+				* circuit_failure_rate, circuit_minimum_calls, circuit_window_size, circuit_open_duration, circuit_half_open_calls: the
+				  parameters of the circuit breakers. The defaults are the DEFAULT_CIRCUIT_* constants.
+				* hedge_delay: seconds after which get_charge_status fires a second (hedged) confirmations request if the first one did not
+				  answer yet, or HEDGE_DELAY_P95 to use the observed p95 latency of the confirmations. By default there are no hedged requests.
+				* codec: the JSON codec of the requests, responses and webhooks: CODEC_JSON, CODEC_ORJSON or an object with dumps/loads methods.
+				  By default the fastest installed one (orjson if it is installed).
+				* idempotency_store: a MemoryIdempotencyStore or SQLiteIdempotencyStore that remembers the created charges, so a repeated
+				  generate_charge_token call returns the same result without calling Bancard. By default there is no idempotency store.
+				* ledger: a ChargeLedger that records the creation, confirmations, webhooks and rollbacks of the charges. By default there is no ledger.
+				* result_objects: if True the public methods return ChargeToken, ChargeStatus, RollbackResult and WebhookResult objects
+				  instead of tuples. They can be unpacked like the tuples. The default value is: False
+				* keep_bancard_response: if False the result objects do not keep the raw Bancard payload, to save memory. The default value is: False
+				* outcome_mode: if True get_charge_status, process_vpos_webhook and verify_vpos_webhook return a ChargeOutcome instead of raising
+				  a BancardAPIPaymentRejectecException for the ordinary declines. The default value is: False
+				* rate_limiter: a RateLimiter, or a FileRateLimiter shared by the processes of the host, that every request to Bancard
+				  takes a token from. The bulk operations are sent with RATE_LIMIT_PRIORITY_BATCH, so they never take the tokens reserved
+				  for the live requests. By default there is no rate limit.
+				* metrics: a MetricsSink (i.e.: an InMemoryMetricsSink) that receives the latency, sizes and outcomes of every request to Bancard.
+				  By default there are no metrics.
 				:type kwargs: dict
 			:raises BancardAPIConfigurationException: if the merge of options and kwargs does not contains the keys: environment public_key private_key
 		"""
@@ -54,23 +102,290 @@ class BancardAPI(object):
 			self.public_key = self.options["public_key"]  # mandatory, raise exception if missing
 			self.private_key = self.options["private_key"]  # mandatory, raise exception if missing
 			self.urls = BANCARD_URLS[self.environment]
+			self.signer = self.options.get("signer") or BancardTokenSigner(self.private_key)
+			self.owns_transport = self.options.get("transport") is None  # a shared transport is closed by its owner
+			self.transport = self.options.get("transport") or self._create_transport()
+			charge_status_cache_size = int(self.options.get("charge_status_cache_size", 0))
+			self.charge_status_cache = TTLCache(charge_status_cache_size) if charge_status_cache_size > 0 else None
+			self.charge_status_pending_ttl = float(self.options.get("charge_status_pending_ttl", DEFAULT_CHARGE_STATUS_PENDING_TTL))
+			pending_index_size = int(self.options.get("pending_index_size", DEFAULT_PENDING_INDEX_SIZE))
+			pending_index_max_age = float(self.options.get("pending_index_max_age", DEFAULT_PENDING_INDEX_MAX_AGE))
+			self.pending_index = PendingChargeIndex(pending_index_size, pending_index_max_age) if pending_index_size > 0 else None
+			self.connect_timeout = float(self.options.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT))
+			self.read_timeout = float(self.options.get("read_timeout", DEFAULT_READ_TIMEOUT))
+			self.deadline = float(self.options["deadline"]) if self.options.get("deadline") is not None else None
+			self.retry_policy = self.options.get("retry_policy") or RetryPolicy(
+				max_retries=int(self.options.get("max_retries", DEFAULT_MAX_RETRIES)),
+				backoff_base=float(self.options.get("backoff_base", DEFAULT_BACKOFF_BASE)),
+				backoff_max=float(self.options.get("backoff_max", DEFAULT_BACKOFF_MAX)))
+			self.circuit_breakers = dict()
+			if self.options.get("circuit_breaker", False):
+				for endpoint in (CHARGE_TOKEN_GENERATOR_KEY, CONFIRMATIONS_KEY, ROLLBACK_KEY):
+					self.circuit_breakers[endpoint] = CircuitBreaker(
+						failure_rate=float(self.options.get("circuit_failure_rate", DEFAULT_CIRCUIT_FAILURE_RATE)),
+						minimum_calls=int(self.options.get("circuit_minimum_calls", DEFAULT_CIRCUIT_MINIMUM_CALLS)),
+						window_size=int(self.options.get("circuit_window_size", DEFAULT_CIRCUIT_WINDOW_SIZE)),
+						open_duration=float(self.options.get("circuit_open_duration", DEFAULT_CIRCUIT_OPEN_DURATION)),
+						half_open_calls=int(self.options.get("circuit_half_open_calls", DEFAULT_CIRCUIT_HALF_OPEN_CALLS)))
+			hedge_delay = self.options.get("hedge_delay")
+			self.hedge_delay = hedge_delay if hedge_delay in (None, HEDGE_DELAY_P95) else float(hedge_delay)
+			self.confirmations_latency = LatencyTracker()
+			self.metrics = self.options.get("metrics")
+			self.codec = get_codec(self.options.get("codec"))
+			self.idempotency_store = self.options.get("idempotency_store")
+			self.ledger = self.options.get("ledger")
+			self.result_objects = bool(self.options.get("result_objects", False))
+			self.keep_bancard_response = bool(self.options.get("keep_bancard_response", False))
+			self.outcome_mode = bool(self.options.get("outcome_mode", False))
+			self.rate_limiter = self.options.get("rate_limiter")
+			self._hedge_executor = None
+			self._hedge_executor_lock = threading.Lock()
+			self._hedged_calls = 0  # hedged calls in progress
+			self._retired = False
 		except (KeyError, ValueError, TypeError):
 			raise BancardAPIConfigurationException("The configuration parameters for the BancardAPI are not valid.")
 
-	@staticmethod
-	def __call_bancard_webservice(params, wsurl):
+	def _create_transport(self):
+		"""
+			Creates the connection pool owned by this BancardAPI from the pool_* configuration options.
+
+			:return: the transport used to call the Bancard WebServices
+				:rtype BancardTransport
+		"""
+		return BancardTransport(
+			pool_connections=int(self.options.get("pool_connections", DEFAULT_POOL_CONNECTIONS)),
+			pool_maxsize=int(self.options.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)),
+			pool_block=bool(self.options.get("pool_block", False)))
+
+	def close(self):
+		"""
+			Closes the keep-alive connections of this BancardAPI. The instance can not be used after calling this method.
+			A transport received through the "transport" option is shared, so it is left open for its owner to close.
+		"""
+		if self._hedge_executor is not None:
+			self._hedge_executor.shutdown(wait=False)
+		if self.owns_transport:
+			self.transport.close()
+
+	def retire(self):
+		"""
+			Shuts down the hedge thread pool of a BancardAPI that is not going to be used anymore (i.e.: replaced by a BancardAPIRegistry)
+			as soon as its hedged calls in progress finish. Its transport is left open, since it is shared.
+		"""
+
+		with self._hedge_executor_lock:
+			self._retired = True
+			if self._hedged_calls == 0:
+				self._shutdown_hedge_executor()
+
+	def _shutdown_hedge_executor(self):
+		"""
+			Shuts down the hedge thread pool, if any. It must be called holding the hedge executor lock.
+		"""
+
+		if self._hedge_executor is not None:
+			self._hedge_executor.shutdown(wait=False)
+			self._hedge_executor = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
+
+	def _encode_bancard_request(self, params):
+		"""
+			Serializes the params object into the body of a Bancard WebService request
+			:param params: values to send to the Bancard API, or an already serialized body
+			:return the serialized body of the request
+			:raises BancardAPIInvalidParameterException: if the params are neither a JSON object nor an already serialized body
+		"""
+		if type(params) is dict:
+			return self.codec.dumps(params)
+		if type(params) is bytes:
+			return params
+		if type(params) is str:
+			return params.encode("utf-8")
+		raise BancardAPIInvalidParameterException("The body of a Bancard request must be a dict, not %s." % type(params).__name__)
+
+	def _decode_bancard_response(self, content):
+		"""
+			Parses the raw body of a Bancard WebService response, directly from its bytes
+			:param content: the raw bytes received from the Bancard WebService
+			:return the JSON object obtained after parsing the Bancard response
+		"""
+		return self.codec.loads(content) if content else dict()
+
+	@property
+	def last_call_stats(self):
+		"""
+			Returns the statistics (retries and elapsed seconds) of the last call to Bancard made from the current thread or asyncio task.
+
+			:rtype CallStats
+		"""
+		return last_call_stats.get()
+
+	def _retry_policy_of(self, endpoint):
+		"""
+			Returns the retry policy of the given Bancard WebService: only the idempotent ones are retried.
+
+			:rtype RetryPolicy
 		"""
-			Sends the JSON params object to the WSURL of Bancard and returns the JSON parsed response
+		return self.retry_policy if endpoint in BANCARD_IDEMPOTENT_ENDPOINTS else NO_RETRY_POLICY
+
+	def _record_call_stats(self, endpoint, retries, started_at, error=None):
+		"""
+			Records the statistics of a finished call, and attaches them to its exception if the call failed.
+
+			:rtype CallStats
+		"""
+		call_stats = CallStats(endpoint, retries, time.time() - started_at)
+		last_call_stats.set(call_stats)
+		if error is not None:
+			error.retries, error.elapsed = call_stats.retries, call_stats.elapsed
+		return call_stats
+
+	def __call_bancard_webservice(self, params, endpoint):
+		"""
+			Sends the JSON params object to the given Bancard WebService and returns the JSON parsed response.
+			The calls that fail due to a connection problem are retried as defined by the retry policy of the endpoint.
 			:param params: values to send to the Bancard API
-			:param wsurl: URL of the Bancard WebService
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
 			:return the JSON object obtained after parsing the Bancard response
+			:raises BancardAPIConnectionException: if the call failed even after the retries, with its retries and elapsed attributes
 		"""
-		bancard_body_request = json.dumps(params) if type(params) is dict else (params if type(params) is str else str(params))
-		headers = {"Content-Type": "application/json"}
-		response = requests.post(wsurl, data=bancard_body_request, headers=headers)
-		bancard_response = json.loads(response.content.decode("utf-8")) if response.content else dict()
+		bancard_body_request = self._encode_bancard_request(params)
+		retry_policy = self._retry_policy_of(endpoint)
+		started_at = time.time()
+		deadline_at = started_at + self.deadline if self.deadline is not None else None
+		retries = 0
+		while True:
+			try:
+				if self.rate_limiter is not None:
+					self.rate_limiter.acquire(endpoint, deadline_at=deadline_at)
+				timeout = attempt_timeout(self.connect_timeout, self.read_timeout, deadline_at)
+				if self.metrics is None:
+					content = self.__post_attempt(endpoint, bancard_body_request, timeout)
+				else:
+					content = self.__post_measured(endpoint, bancard_body_request, timeout)
+				break
+			except BancardAPIConnectionException as error:
+				fail_fast = isinstance(error, (BancardAPICircuitOpenException, BancardAPIRateLimitedException))
+				delay = retry_policy.next_retry_delay(retries, deadline_at) if not fail_fast else None
+				if delay is None:
+					self._record_call_stats(endpoint, retries, started_at, error)
+					raise
+				time.sleep(delay)
+				retries += 1
+
+		self._record_call_stats(endpoint, retries, started_at)
+		bancard_response = self._decode_bancard_response(content)
+		if self.metrics is not None:
+			self.metrics.response_received(endpoint, bancard_response_code(bancard_response))
 		return bancard_response
 
+	def __post_measured(self, endpoint, bancard_body_request, timeout):
+		"""
+			Sends one attempt of a call to the given Bancard WebService and reports its latency and sizes to the metrics sink.
+
+			:return: the raw body of the Bancard response
+				:rtype bytes
+		"""
+
+		self.metrics.request_started(endpoint)
+		attempt_started_at = time.time()
+		try:
+			content = self.__post_attempt(endpoint, bancard_body_request, timeout)
+		except Exception as error:
+			self.metrics.request_finished(endpoint, time.time() - attempt_started_at, len(bancard_body_request), 0, exception=error)
+			raise
+		self.metrics.request_finished(endpoint, time.time() - attempt_started_at, len(bancard_body_request), len(content))
+		return content
+
+	def __post_attempt(self, endpoint, bancard_body_request, timeout):
+		"""
+			Sends one attempt of a call to the given Bancard WebService through its circuit breaker, if any.
+			The confirmations requests are hedged if the hedge_delay option is set.
+
+			:return: the raw body of the Bancard response
+				:rtype bytes
+			:raises BancardAPICircuitOpenException: if the circuit breaker of the endpoint is open
+			:raises BancardAPIConnectionException: if the attempt failed due to a connection problem
+		"""
+
+		circuit_breaker = self.circuit_breakers.get(endpoint)
+		if circuit_breaker is not None:
+			circuit_breaker.before_call()
+
+		try:
+			if endpoint == CONFIRMATIONS_KEY and self.hedge_delay is not None:
+				content = self.__post_hedged(self.urls[endpoint], bancard_body_request, timeout)
+			else:
+				content = self.transport.post(self.urls[endpoint], bancard_body_request, BANCARD_REQUEST_HEADERS, timeout=timeout)
+		except Exception:
+			if circuit_breaker is not None:
+				circuit_breaker.record_failure()
+			raise
+
+		if circuit_breaker is not None:
+			circuit_breaker.record_success()
+		return content
+
+	def _hedge_delay_seconds(self):
+		"""
+			Returns the seconds to wait for the first confirmations request before firing the hedged one.
+
+			:rtype float
+		"""
+
+		if self.hedge_delay != HEDGE_DELAY_P95:
+			return self.hedge_delay
+		p95 = self.confirmations_latency.percentile(0.95, minimum_samples=DEFAULT_HEDGE_MINIMUM_SAMPLES)
+		return p95 if p95 is not None else DEFAULT_HEDGE_DELAY
+
+	def __post_hedged(self, url, bancard_body_request, timeout):
+		"""
+			Sends a read-only request and, if it did not answer within the hedge delay, a second identical one.
+			The first successful response wins; the slower request is left to finish in the background.
+
+			:return: the raw body of the first successful Bancard response
+				:rtype bytes
+			:raises BancardAPIConnectionException: if all the sent requests failed
+		"""
+
+		from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+		with self._hedge_executor_lock:
+			if self._hedge_executor is None:
+				self._hedge_executor = ThreadPoolExecutor(max_workers=2 * int(self.options.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)))
+			hedge_executor = self._hedge_executor
+			self._hedged_calls += 1
+
+		try:
+			started_at = time.time()
+			pending = set([hedge_executor.submit(self.transport.post, url, bancard_body_request, BANCARD_REQUEST_HEADERS, timeout=timeout)])
+			if not wait(pending, timeout=self._hedge_delay_seconds()).done:
+				pending.add(hedge_executor.submit(self.transport.post, url, bancard_body_request, BANCARD_REQUEST_HEADERS, timeout=timeout))
+
+			error = None
+			while pending:
+				done, pending = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					try:
+						content = future.result()
+					except BancardAPIConnectionException as future_error:
+						error = future_error
+						continue
+					self.confirmations_latency.observe(time.time() - started_at)
+					return content
+			raise error
+		finally:
+			with self._hedge_executor_lock:
+				self._hedged_calls -= 1
+				if self._retired and self._hedged_calls == 0:
+					self._shutdown_hedge_executor()
+
 	@staticmethod
 	def validate_marketplace_charge_id(marketplace_charge_id):
 		"""
@@ -79,10 +394,8 @@ class BancardAPI(object):
 			:raises BancardAPIInvalidParameterException: if the marketplace_charge_id does not contains a valid value
 		"""
 
-		try:
-			int(marketplace_charge_id)
-		except (TypeError, ValueError):
-			raise BancardAPIInvalidParameterException("The marketplace charge ID is required and must be a valid integer.")
+		if not is_valid_marketplace_charge_id(marketplace_charge_id):
+			raise BancardAPIInvalidParameterException(VALIDATION_MESSAGES["marketplace_charge_id"])
 
 	@staticmethod
 	def validate_currency(currency):
@@ -91,8 +404,8 @@ class BancardAPI(object):
 			:param currency: string that represents the currency to send to the Bancard API
 			:raises BancardAPIInvalidParameterException: if the currency does not contains a valid value
 		"""
-		if type(currency) is not str or currency not in BANCARD_ALLOWED_CURRENCIES:
-			raise BancardAPIInvalidParameterException("The currency must be any of the following strings: %s" % BANCARD_ALLOWED_CURRENCIES)
+		if not is_valid_currency(currency):
+			raise BancardAPIInvalidParameterException(VALIDATION_MESSAGES["currency"])
 
 	@staticmethod
 	def validate_amount(amount):
@@ -101,8 +414,8 @@ class BancardAPI(object):
 			:param amount: Decimal value that represents the amount to send to the Bancard API
 			:raises BancardAPIInvalidParameterException: if the amount does not contains a valid value
 		"""
-		if not isinstance(amount, Decimal) or amount <= Decimal(0):
-			raise BancardAPIInvalidParameterException("The amount must be a decimal greater than Decimal(0).")
+		if not is_valid_amount(amount):
+			raise BancardAPIInvalidParameterException(VALIDATION_MESSAGES["amount"])
 
 	@staticmethod
 	def validate_description(description):
@@ -111,8 +424,8 @@ class BancardAPI(object):
 			:param description: string value that represents the charge description to send to the Bancard API
 			:raises BancardAPIInvalidParameterException: if the description does not contains a valid value
 		"""
-		if type(description) is not str or not 0 <= len(description) <= 20:
-			raise BancardAPIInvalidParameterException("The description must be a string between [0,20] characters.")
+		if not is_valid_description(description):
+			raise BancardAPIInvalidParameterException(VALIDATION_MESSAGES["description"])
 
 	@staticmethod
 	def validate_approved_url(approved_url):
@@ -121,8 +434,8 @@ class BancardAPI(object):
 			:param approved_url: string that represents the charge approved URL to send to the Bancard API
 			:raises BancardAPIInvalidParameterException: if the approved_url does not contains a valid value
 		"""
-		if type(approved_url) is not str or not 1 <= len(approved_url) <= 255:
-			raise BancardAPIInvalidParameterException("The approved_url must be a valid URL string containing [1,255] characters.")
+		if not is_valid_url(approved_url):
+			raise BancardAPIInvalidParameterException(VALIDATION_MESSAGES["approved_url"])
 
 	@staticmethod
 	def validate_cancelled_url(cancelled_url):
@@ -131,8 +444,8 @@ class BancardAPI(object):
 			:param cancelled_url: string that represents the charge cancelled URL to send to the Bancard API
 			:raises BancardAPIInvalidParameterException: if the cancelled_url does not contains a valid value
 		"""
-		if type(cancelled_url) is not str or not 1 <= len(cancelled_url) <= 255:
-			raise BancardAPIInvalidParameterException("The cancelled_url must be a valid URL string containing [1,255] characters.")
+		if not is_valid_url(cancelled_url):
+			raise BancardAPIInvalidParameterException(VALIDATION_MESSAGES["cancelled_url"])
 
 	def generate_charge_token(self, marketplace_charge_id, amount, description, approved_url, cancelled_url, currency="PYG"):
 		"""
@@ -150,13 +463,74 @@ class BancardAPI(object):
 				:type cancelled_url: str
 			:param currency: The currency of the amount to charge in the format ISO-4217
 				:type currency: str
-			:return: a tuple of: bancard_process_id, payment_url, bancard_response
+			:return: a tuple of: bancard_process_id, payment_url, bancard_response (a ChargeToken if the result_objects option is enabled)
 				:rtype tuple (str, str, dict)
 			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
 			:raises BancardAPIMarketplaceChargeIDAlreadyExistsException: if there is already another charge request in Bancard with the same marketplace_charge_id
+			:raises BancardAPIIdempotencyMismatchException: if the idempotency store knows the marketplace_charge_id with another amount/currency or any other parameter
 			:raises BancardAPIChargeRejectedException: if Bancard rejected the process id generation request
 		"""
 
+		bancard_body_request = self._build_charge_token_request(marketplace_charge_id, amount, description, approved_url, cancelled_url, currency)
+		charge_token = self._get_idempotent_charge_token(marketplace_charge_id, bancard_body_request)
+		if charge_token is not None:
+			return self._result(ChargeToken, charge_token)
+
+		bancard_response = self.__call_bancard_webservice(bancard_body_request, CHARGE_TOKEN_GENERATOR_KEY)
+		charge_token = self._handle_charge_token_response(marketplace_charge_id, bancard_response)
+		self._remember_charge_token(marketplace_charge_id, bancard_body_request, charge_token)
+		self._index_pending_charge(marketplace_charge_id, amount, currency)
+		self._record_ledger_event(LEDGER_EVENT_CREATED, marketplace_charge_id, bancard_response, amount, currency)
+		return self._result(ChargeToken, charge_token)
+
+	def _result(self, result_class, result):
+		"""
+			Returns the tuple result of a public method, or its result object if the result_objects option is enabled.
+
+			:param result_class: any of the BancardResult classes
+				:type result_class: type
+			:param result: the tuple whose last item is the raw Bancard payload
+				:type result: tuple
+			:rtype tuple or BancardResult
+		"""
+
+		if not self.result_objects or isinstance(result, BancardResult):
+			return result
+		return result_class.from_tuple(result, self.keep_bancard_response)
+
+	def _get_idempotent_charge_token(self, marketplace_charge_id, bancard_body_request):
+		"""
+			Returns the result of an already created charge from the idempotency store, if any.
+
+			:return: a tuple of: bancard_process_id, payment_url, bancard_response; or None if the charge was not created yet
+				:rtype tuple (str, str, dict)
+			:raises BancardAPIIdempotencyMismatchException: if the charge was created with another amount/currency or any other parameter
+		"""
+
+		if self.idempotency_store is None:
+			return None
+		idempotency_record = self.idempotency_store.get(marketplace_charge_id)
+		return idempotency_record.charge_token(bancard_body_request["operation"]) if idempotency_record is not None else None
+
+	def _remember_charge_token(self, marketplace_charge_id, bancard_body_request, charge_token):
+		"""
+			Stores the result of a just created charge in the idempotency store, if any.
+		"""
+
+		if self.idempotency_store is not None:
+			bancard_process_id, payment_url, bancard_response = charge_token
+			self.idempotency_store.put(IdempotencyRecord(
+				str(marketplace_charge_id), IdempotencyRecord.request_of(bancard_body_request["operation"]), bancard_process_id, payment_url, bancard_response))
+
+	def _build_charge_token_request(self, marketplace_charge_id, amount, description, approved_url, cancelled_url, currency):
+		"""
+			Validates the parameters of generate_charge_token and builds the body of the single_buy request.
+
+			:return: the body of the request to send to the single_buy Bancard WebService
+				:rtype dict
+			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
+		"""
+
 		BancardAPI.validate_marketplace_charge_id(marketplace_charge_id)
 		BancardAPI.validate_amount(amount)
 		BancardAPI.validate_description(description)
@@ -164,16 +538,12 @@ class BancardAPI(object):
 		BancardAPI.validate_cancelled_url(cancelled_url)
 		BancardAPI.validate_currency(currency)
 
-		amount_str = "%s.00" % currency_decimal_to_string(currency, amount)
-
-		bancard_token = "%s%s%s%s" % (self.private_key, marketplace_charge_id, amount_str, currency)
-		if is_python_version_greater_igual_than_3x():
-			bancard_token = bytes(bancard_token, "UTF-8")
+		amount_str = format_bancard_amount(currency, amount)
 
-		bancard_body_request = {
+		return {
 			"public_key": self.public_key,
 			"operation": {
-				"token": hashlib.md5(bancard_token).hexdigest(),
+				"token": self.signer.single_buy(marketplace_charge_id, amount_str, currency),
 				"shop_process_id": str(marketplace_charge_id),
 				"currency": currency,
 				"amount": amount_str,
@@ -184,7 +554,47 @@ class BancardAPI(object):
 			}
 		}
 
-		bancard_response = BancardAPI.__call_bancard_webservice(bancard_body_request, self.urls[CHARGE_TOKEN_GENERATOR_KEY])
+	def _confirm_token(self, marketplace_charge_id, amount, currency):
+		"""
+			Returns the token that Bancard sends in the webhook of a charge, as defined by the Bancard docs.
+
+			:rtype str
+		"""
+
+		amount_str = format_bancard_amount(currency, amount)
+		return self.signer.confirm(marketplace_charge_id, amount_str, currency)
+
+	def _index_pending_charge(self, marketplace_charge_id, amount, currency):
+		"""
+			Remembers a just created charge and its precomputed confirm token, so verify_vpos_webhook can verify its webhook without any I/O.
+		"""
+
+		if self.pending_index is not None:
+			self.pending_index.add(marketplace_charge_id, self._confirm_token(marketplace_charge_id, amount, currency), amount, currency, self.signer)
+
+	def _record_ledger_event(self, event, marketplace_charge_id, bancard_response, amount=None, currency=None):
+		"""
+			Records an event of a charge in the ledger, if any. A failed write is logged instead of raised, since the Bancard
+			operation has already succeeded, and the ledger writes its events again on its next flush.
+		"""
+
+		if self.ledger is not None:
+			try:
+				self.ledger.record(event, marketplace_charge_id, bancard_response, amount, currency)
+			except Exception:
+				import logging
+				logging.getLogger("bancardconnectorpython").exception("The %s event of the charge %s could not be written to the ledger.", event, marketplace_charge_id)
+
+	def _handle_charge_token_response(self, marketplace_charge_id, bancard_response):
+		"""
+			Interprets the response of the single_buy Bancard WebService.
+
+			:return: a tuple of: bancard_process_id, payment_url, bancard_response
+				:rtype tuple (str, str, dict)
+			:raises BancardAPIMarketplaceChargeIDAlreadyExistsException: if there is already another charge request in Bancard with the same marketplace_charge_id
+			:raises BancardAPIChargeRejectedException: if Bancard rejected the process id generation request
+		"""
+
 		if bancard_response.get("status", None) == "success":
 			# build the payment URL that should be opener to the payer
 			bancard_process_id = str(bancard_response["process_id"])
@@ -219,7 +629,7 @@ class BancardAPI(object):
 				:type amount: Decimal
 			:param currency: The currency of the amount to charge in the format ISO-4217
 				:type currency: str
-			:return: a tuple of: already_payed, authorization_number, bancard_response
+			:return: a tuple of: already_payed, authorization_number, bancard_response (a ChargeStatus if the result_objects option is enabled, a ChargeOutcome that does not raise the declines in the outcome_mode)
 				:rtype tuple (bool, str, dict)
 			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
 			:raises BancardAPIChargeInconsistentValuesException: if the payment of marketplace_charge_id has been payed but does not match the currency/amount parameters
@@ -229,52 +639,146 @@ class BancardAPI(object):
 			:raises BancardAPIPaymentRejectecUnknownReasonException: if the payment has been rejected by Bancard due to an unhandled/unknown reason
 		"""
 
+		bancard_body_request = self._build_charge_status_request(marketplace_charge_id, amount, currency)
+		bancard_response = self._get_cached_charge_status(marketplace_charge_id)
+		if bancard_response is None:
+			bancard_response = self.__call_bancard_webservice(bancard_body_request, CONFIRMATIONS_KEY)
+			self._cache_charge_status(marketplace_charge_id, bancard_response)
+			self._record_ledger_event(LEDGER_EVENT_CONFIRMATION, marketplace_charge_id, bancard_response)
+		return self._result(ChargeStatus, self._handle_charge_status_response(amount, currency, bancard_response))
+
+	def _get_cached_charge_status(self, marketplace_charge_id):
+		"""
+			Returns the confirmations response cached for the marketplace_charge_id, or None if the cache is disabled or has no valid entry.
+
+			:return: the cached Bancard response, which must not be modified
+				:rtype dict
+		"""
+
+		if self.charge_status_cache is None:
+			return None
+		return self.charge_status_cache.get(str(marketplace_charge_id))
+
+	def _cache_charge_status(self, marketplace_charge_id, bancard_response):
+		"""
+			Caches the confirmations response of the marketplace_charge_id if the cache is enabled. The payed/rejected confirmations
+			are final so they are cached until evicted, the not yet payed ones (PaymentNotFoundError) only for charge_status_pending_ttl seconds.
+		"""
+
+		if self.charge_status_cache is None:
+			return
+
+		if bancard_response.get("status", None) == "success" and bancard_response.get("confirmation", dict()).get("response_code", None) is not None:
+			self.charge_status_cache.set(str(marketplace_charge_id), bancard_response)
+		elif (bancard_response.get("messages") or [dict()])[0].get("key", None) == "PaymentNotFoundError":
+			self.charge_status_cache.set(str(marketplace_charge_id), bancard_response, ttl=self.charge_status_pending_ttl)
+
+	def invalidate_charge_status(self, marketplace_charge_id):
+		"""
+			Forgets the cached confirmation of the marketplace_charge_id, so the next get_charge_status asks Bancard again.
+			It is automatically called by rollback_charge.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: int or str
+		"""
+
+		if self.charge_status_cache is not None:
+			self.charge_status_cache.invalidate(str(marketplace_charge_id))
+
+	def _build_charge_status_request(self, marketplace_charge_id, amount, currency):
+		"""
+			Validates the parameters of get_charge_status and builds the body of the confirmations request.
+
+			:return: the body of the request to send to the confirmations Bancard WebService
+				:rtype dict
+			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
+		"""
+
 		BancardAPI.validate_marketplace_charge_id(marketplace_charge_id)
 		BancardAPI.validate_amount(amount)
 		BancardAPI.validate_currency(currency)
 
-		amount_str = "%s.00" % currency_decimal_to_string(currency, amount)
-
-		bancard_token = "%s%s%s" % (self.private_key, marketplace_charge_id, "get_confirmation")
-		if is_python_version_greater_igual_than_3x():
-			bancard_token = bytes(bancard_token, "UTF-8")
-
-		bancard_body_request = {
+		return {
 			"public_key": self.public_key,
 			"operation": {
-				"token": hashlib.md5(bancard_token).hexdigest(),
+				"token": self.signer.get_confirmation(marketplace_charge_id),
 				"shop_process_id": marketplace_charge_id
 			}
 		}
 
-		bancard_response = BancardAPI.__call_bancard_webservice(bancard_body_request, self.urls[CONFIRMATIONS_KEY])
+	def _handle_charge_status_response(self, amount, currency, bancard_response):
+		"""
+			Interprets the response of the confirmations Bancard WebService.
+
+			:return: a tuple of: already_payed, authorization_number, bancard_response; or a ChargeOutcome in the outcome_mode
+				:rtype tuple (bool, str, dict)
+			:raises BancardAPIChargeInconsistentValuesException: if the payment has been payed but does not match the currency/amount parameters
+			:raises BancardAPIPaymentRejectecException: if the payment has been rejected by Bancard, except in the outcome_mode
+		"""
+
+		currency_formatter = get_currency_formatter(currency)
+		minor_units = currency_formatter.to_minor_units(amount)
+		kept_response = bancard_response if self.keep_bancard_response else None
+
 		if bancard_response.get("status", None) == "success":
 			confirmation = bancard_response.get("confirmation", dict())
 			response_code = confirmation.get("response_code", None)
-			if response_code == '00':
-				if Decimal(confirmation["amount"]) == Decimal(amount_str) and confirmation["currency"] == currency:
-					return True, confirmation.get("authorization_number", None), bancard_response
-				else:
-					# this marketplace charge id was found in Bancard but is has another amount/currency
-					raise BancardAPIChargeInconsistentValuesException("Duplicated charge ID %s in Bancard rejected due to inconsistency in amount/currency", bancard_response)
-			else:
-				# check if a specific error message has been received
-				if response_code in ['05', '15']:
-					raise BancardAPIPaymentMethodNotEnabledException("Bancard reported that the payer's payment method was not enabled for making payments.", bancard_response)
-				elif response_code == '12':
-					raise BancardAPIPaymentTransactionInvalidException("Bancard reported that the transaction is not valid.", bancard_response)
-				elif response_code == '51':
-					raise BancardAPIPaymentMethodNotEnoughFundsException("Bancard reported that your payment card does not have enough funds.", bancard_response)
-
-				raise BancardAPIPaymentRejectecUnknownReasonException("Bancard reported that the payment has been rejected.", bancard_response)
+			if response_code == APPROVED_RESPONSE_CODE and not (
+					currency_formatter.matches_bancard_amount(confirmation["amount"], minor_units) and confirmation["currency"] == currency):
+				# this marketplace charge id was found in Bancard but is has another amount/currency
+				raise BancardAPIChargeInconsistentValuesException("Duplicated charge ID %s in Bancard rejected due to inconsistency in amount/currency", bancard_response)
+			charge_outcome = ChargeOutcome.of_response_code(response_code, confirmation.get("authorization_number", None), kept_response)
+			return self._handle_charge_outcome(charge_outcome, bancard_response)
 
 		bancard_tx_messages = bancard_response.get('messages')[0]
 		if bancard_tx_messages.get("key", None) == 'PaymentNotFoundError':
 			# remember that you, as a marketplace, should rollback this transaction if the payer did not confirm this payment within 10 minutes
-			return False, None, bancard_response
+			return self._handle_charge_outcome(ChargeOutcome(OUTCOME_PENDING, bancard_response=kept_response), bancard_response)
 
 		# by default you can assume that the transaction has been rejected
-		raise BancardAPIPaymentRejectecUnknownReasonException("Bancard reported that the payment has been rejected: %s" % bancard_tx_messages.get("dsc", ""), bancard_response)
+		charge_outcome = ChargeOutcome.declined("Bancard reported that the payment has been rejected: %s" % bancard_tx_messages.get("dsc", ""), kept_response)
+		return self._handle_charge_outcome(charge_outcome, bancard_response)
+
+	def _handle_charge_outcome(self, charge_outcome, bancard_response):
+		"""
+			Returns the ChargeOutcome in the outcome_mode. Otherwise returns it as a tuple, or raises the exception of a declined payment.
+
+			:return: a tuple of: approved, authorization_number, bancard_response; or the ChargeOutcome in the outcome_mode
+				:rtype tuple (bool, str, dict)
+			:raises BancardAPIPaymentRejectecException: if the payment has been declined, except in the outcome_mode
+		"""
+
+		if self.outcome_mode:
+			return charge_outcome
+		if charge_outcome.is_declined:
+			raise charge_outcome.exception(bancard_response)
+		return charge_outcome.approved, charge_outcome.authorization_number, bancard_response
+
+	def get_charge_statuses(self, charges, max_workers=DEFAULT_BULK_MAX_WORKERS, ordered=True, deadline=None):
+		"""
+			Checks the status of many charges at once by calling get_charge_status with a bounded number of simultaneous calls.
+			A rejected charge (or any other error) does not stop the batch: it is reported in the result of its own item.
+
+			:param charges: iterable of tuples (marketplace_charge_id, amount) or (marketplace_charge_id, amount, currency). It is consumed lazily.
+				:type charges: iterable
+			:param max_workers: maximum number of simultaneous calls to the confirmations Bancard WebService.
+				Use a pool_maxsize of at least this value so every worker gets a keep-alive connection.
+				:type max_workers: int
+			:param ordered: if True the results are yielded in the input order, otherwise as soon as each one completes
+				:type ordered: bool
+			:param deadline: maximum number of seconds for the whole batch, the unfinished charges are reported with a BancardAPITimeoutException
+				:type deadline: float
+			:return: a generator of BulkResult whose result is the get_charge_status tuple (already_payed, authorization_number, bancard_response)
+				and whose exception is the one that get_charge_status raised, if any
+				:rtype generator
+			:raises BancardAPIInvalidParameterException: if max_workers is not valid
+		"""
+
+		from bancardconnectorpython.bulk import run_bulk  # the thread pools are imported only by the bulk operations
+		from bancardconnectorpython.ratelimit import with_rate_limit_priority
+
+		get_charge_status = with_rate_limit_priority(self.get_charge_status, RATE_LIMIT_PRIORITY_BATCH)
+		return run_bulk(get_charge_status, charges, max_workers=max_workers, ordered=ordered, deadline=deadline)
 
 	def rollback_charge(self, marketplace_charge_id):
 		"""
@@ -282,27 +786,50 @@ class BancardAPI(object):
 
 			:param marketplace_charge_id: The marketplace's custom ID of this charge request
 				:type marketplace_charge_id: int or str
-			:return: a tuple of: successfull_rollback, bancard_response
+			:return: a tuple of: successfull_rollback, bancard_response (a RollbackResult if the result_objects option is enabled)
 				:rtype tuple (bool, dict)
 			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
 			:raises BancardAPINotRolledBackException: if Bancard denied the rollback request for some reason (i.e.: already couponned)
 		"""
 
-		BancardAPI.validate_marketplace_charge_id(marketplace_charge_id)
+		bancard_body_request = self._build_rollback_request(marketplace_charge_id)
+		try:
+			bancard_response = self.__call_bancard_webservice(bancard_body_request, ROLLBACK_KEY)
+		finally:
+			# the rollback changes the status of the charge, even if its response was lost
+			self.invalidate_charge_status(marketplace_charge_id)
+			if self.pending_index is not None:
+				self.pending_index.discard(marketplace_charge_id)
+		self._record_ledger_event(LEDGER_EVENT_ROLLBACK, marketplace_charge_id, bancard_response)
+		return self._result(RollbackResult, self._handle_rollback_response(bancard_response))
+
+	def _build_rollback_request(self, marketplace_charge_id):
+		"""
+			Validates the parameters of rollback_charge and builds the body of the rollback request.
 
-		bancard_token = "%s%s%s%s" % (self.private_key, marketplace_charge_id, "rollback", "0.00")
-		if is_python_version_greater_igual_than_3x():
-			bancard_token = bytes(bancard_token, "UTF-8")
+			:return: the body of the request to send to the rollback Bancard WebService
+				:rtype dict
+			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
+		"""
+
+		BancardAPI.validate_marketplace_charge_id(marketplace_charge_id)
 
-		bancard_body_request = {
+		return {
 			"public_key": self.public_key,
 			"operation": {
-				"token": hashlib.md5(bancard_token).hexdigest(),
+				"token": self.signer.rollback(marketplace_charge_id),
 				"shop_process_id": marketplace_charge_id
 			}
 		}
 
-		bancard_response = BancardAPI.__call_bancard_webservice(bancard_body_request, self.urls[ROLLBACK_KEY])
+	def _handle_rollback_response(self, bancard_response):
+		"""
+			Interprets the response of the rollback Bancard WebService.
+
+			:return: a tuple of: successfull_rollback, bancard_response
+				:rtype tuple (bool, dict)
+			:raises BancardAPINotRolledBackException: if Bancard denied the rollback request for some reason (i.e.: already couponned)
+		"""
 
 		bancard_tx_status = bancard_response.get("status", "")
 		if bancard_tx_status == "success":
@@ -317,20 +844,60 @@ class BancardAPI(object):
 		# bancard was not able to roll-back the payment
 		raise BancardAPINotRolledBackException("Bancard was not able to roll-back the payment: %s" % bancard_tx_messages.get("dsc", ""), bancard_response)
 
+	def rollback_charges(self, marketplace_charge_ids, max_workers=DEFAULT_BULK_MAX_WORKERS, retries=DEFAULT_BULK_ROLLBACK_RETRIES, backoff=DEFAULT_BULK_ROLLBACK_BACKOFF, deadline=None):
+		"""
+			Rolls back many charges at once (i.e.: the ones that the payers did not confirm within 10 minutes) by calling rollback_charge
+			with a bounded number of simultaneous calls. If the retry policy of this BancardAPI does not retry the rollbacks, every rollback
+			that fails due to a connection error is retried with an exponential backoff. Any other error is classified as failed right away.
+
+			:param marketplace_charge_ids: iterable of the marketplace's custom IDs of the charges to roll back. It is consumed lazily.
+				:type marketplace_charge_ids: iterable
+			:param max_workers: maximum number of simultaneous calls to the rollback Bancard WebService
+				:type max_workers: int
+			:param retries: maximum number of retries of every rollback that failed due to a connection error, ignored if the retry policy already retries them
+				:type retries: int
+			:param backoff: seconds to wait before the first retry of a rollback, doubled on every retry
+				:type backoff: float
+			:param deadline: maximum number of seconds for the whole batch, the unfinished rollbacks are classified as failed with a BancardAPITimeoutException
+				:type deadline: float
+			:return: the classification of every rollback
+				:rtype RollbackSummary
+			:raises BancardAPIInvalidParameterException: if max_workers is not valid
+		"""
+
+		from bancardconnectorpython.bulk import run_bulk, with_retries, RollbackSummary  # the thread pools are imported only by the bulk operations
+		from bancardconnectorpython.ratelimit import with_rate_limit_priority
+
+		summary = RollbackSummary()
+		rollback_charge = with_retries(with_rate_limit_priority(self.rollback_charge, RATE_LIMIT_PRIORITY_BATCH), self._bulk_rollback_retries(retries), backoff)
+		requests = ((marketplace_charge_id,) for marketplace_charge_id in marketplace_charge_ids)
+		for bulk_result in run_bulk(rollback_charge, requests, max_workers=max_workers, ordered=False, deadline=deadline):
+			summary.add(bulk_result)
+		return summary
+
+	def _bulk_rollback_retries(self, retries):
+		"""
+			Returns the retries of every rollback of rollback_charges: none if the retry policy of the rollback WebService already retries them.
+
+			:rtype int
+		"""
+		return retries if self._retry_policy_of(ROLLBACK_KEY).max_retries == 0 else 0
+
 	def process_vpos_webhook(self, bancard_data, original_marketplace_charge_id, original_amount, original_currency="PYG"):
 		"""
-			Manage the webhook data received from the Bancard VPOS after a successfull/rejected payment from the end-user
+			Manage the webhook data received from the Bancard VPOS after a successfull/rejected payment from the end-user.
+			Once the webhook is verified, its charge is evicted from the pending charges index, if any.
 
 			:param bancard_data: The full content received in the Bancard wehbook
-				:type bancard_data: str or dict
+				:type bancard_data: str, bytes, memoryview or dict
 			:param original_marketplace_charge_id: The marketplace's custom ID of this charge request
 				:type original_marketplace_charge_id: int or str
 			:param original_amount: The amount that the payer should pay
 				:type original_amount: Decimal
 			:param original_currency: The currency of the amount to charge in the format ISO-4217
 				:type original_currency: str
-			:return: a tuple of: successfull_rollback, bancard_response
-				:rtype tuple (bool, dict)
+			:return: a tuple of: payment_approved, authorization_number, bancard_data (a WebhookResult if the result_objects option is enabled, a ChargeOutcome that does not raise the declines in the outcome_mode)
+				:rtype tuple (bool, str, dict)
 			:raises BancardAPIInvalidParameterException: if any of the input parameters is not valid
 			:raises BancardAPIInvalidWebhookDataException: if the webhook data is not how it is supposed to be (someone might be trying to hack you)
 			:raises BancardAPIInvalidWebhookTokenException: if the token generated as the specs is not equal to the one that Bancard sent (someone might be trying to hack you)
@@ -346,39 +913,99 @@ class BancardAPI(object):
 
 		try:
 			# parse the data received by Bancard
-			bancard_operation_data = json.loads(bancard_data) if type(bancard_data) is str else bancard_data
+			bancard_operation_data = load_bancard_data(bancard_data, self.codec)
 			bancard_operation = bancard_operation_data["operation"]
 			marketplace_charge_id = bancard_operation["shop_process_id"]
+			bancard_token = bancard_operation["token"]
+		except (KeyError, ValueError, TypeError):
+			raise BancardAPIInvalidWebhookDataException("Invalid Bancard webhook data.", bancard_data)
 
-			if str(marketplace_charge_id) != str(original_marketplace_charge_id):
-				raise BancardAPIInvalidWebhookDataException("Invalid Bancard webhook data.", bancard_data)
+		if "response_code" not in bancard_operation or str(marketplace_charge_id) != str(original_marketplace_charge_id):
+			raise BancardAPIInvalidWebhookDataException("Invalid Bancard webhook data.", bancard_data)
 
-			# validate the token received by bancard
-			amount_str = "%s.00" % currency_decimal_to_string(original_currency, original_amount)
+		# validate the token received by bancard
+		required_bancard_token = self._confirm_token(original_marketplace_charge_id, original_amount, original_currency)
+		if not BancardAPI._tokens_are_equal(bancard_token, required_bancard_token):
+			raise BancardAPIInvalidWebhookTokenException("The Bancard Webhook did not pass the token validation.", bancard_data)
 
-			required_bancard_token = "%s%s%s%s%s" % (self.private_key, original_marketplace_charge_id, "confirm", amount_str, original_currency)
-			if is_python_version_greater_igual_than_3x():
-				required_bancard_token = bytes(required_bancard_token, "UTF-8")
+		# the webhook is authentic, so this charge is not pending anymore
+		if self.pending_index is not None:
+			self.pending_index.discard(marketplace_charge_id)
+		self._record_ledger_event(LEDGER_EVENT_WEBHOOK, marketplace_charge_id, bancard_operation_data)
+		return self._result(WebhookResult, self._handle_webhook_operation(bancard_operation_data, bancard_data))
 
-			if bancard_operation["token"] != required_bancard_token:
-				raise BancardAPIInvalidWebhookTokenException("The Bancard Webhook did not pass the token validation: %s != %s" % (bancard_operation["token"], required_bancard_token))
+	def verify_vpos_webhook(self, bancard_data, evict=True):
+		"""
+			Manage the webhook data received from the Bancard VPOS by using only the charges that this BancardAPI created
+			with generate_charge_token, so there is no need to load the original charge (i.e.: from a DB) to verify the webhook.
+			Once the webhook is verified, its charge is evicted from the pending charges index.
 
-			# check the status of the Bancard transaction
-			if bancard_operation["response_code"] == '00':
-				return True, bancard_operation["authorization_number"], bancard_data
-			else:
-				# check if a specific error message has been received
-				if bancard_operation["response_code"] in ['05', '15']:
-					raise BancardAPIPaymentMethodNotEnabledException("Bancard reported that the payer's payment method was not enabled for making payments.", bancard_data)
-				elif bancard_operation["response_code"] == '12':
-					raise BancardAPIPaymentTransactionInvalidException("Bancard reported that the transaction is not valid.", bancard_data)
-				elif bancard_operation["response_code"] == '51':
-					raise BancardAPIPaymentMethodNotEnoughFundsException("Bancard reported that your payment card does not have enough funds.", bancard_data)
-
-			raise BancardAPIPaymentRejectecUnknownReasonException("Bancard reported that the payment has been rejected.", bancard_data)
-		except:
+			:param bancard_data: The full content received in the Bancard wehbook
+				:type bancard_data: str, bytes, memoryview or dict
+			:param evict: if False the charge is kept in the pending charges index, so the same webhook can be verified again
+				(i.e.: when it could not be queued and Bancard is asked to retry it). Then call pending_index.discard once it is handled.
+				:type evict: bool
+			:return: a tuple of: payment_approved, authorization_number, bancard_data (a WebhookResult if the result_objects option is enabled, a ChargeOutcome that does not raise the declines in the outcome_mode)
+				:rtype tuple (bool, str, dict)
+			:raises BancardAPIInvalidWebhookDataException: if the webhook data is not valid, or its charge is unknown/expired in the pending charges index
+			:raises BancardAPIInvalidWebhookTokenException: if the token generated as the specs is not equal to the one that Bancard sent (someone might be trying to hack you)
+			:raises BancardAPIPaymentRejectecException: if the payment has been rejected by Bancard
+		"""
+
+		try:
+			bancard_operation_data = load_bancard_data(bancard_data, self.codec)
+			bancard_operation = bancard_operation_data["operation"]
+			marketplace_charge_id = bancard_operation["shop_process_id"]
+			bancard_token = bancard_operation["token"]
+		except (KeyError, ValueError, TypeError):
 			raise BancardAPIInvalidWebhookDataException("Invalid Bancard webhook data.", bancard_data)
 
+		if "response_code" not in bancard_operation:
+			raise BancardAPIInvalidWebhookDataException("Invalid Bancard webhook data.", bancard_data)
+
+		pending_charge = self.pending_index.get(marketplace_charge_id) if self.pending_index is not None else None
+		if pending_charge is None:
+			raise BancardAPIInvalidWebhookDataException("The charge %s of the Bancard webhook is unknown or expired." % marketplace_charge_id, bancard_data)
+
+		confirm_token = pending_charge.confirm_token
+		if pending_charge.signer is not None and pending_charge.signer is not self.signer:
+			# the charge was indexed with another private key (i.e.: before a hot reload of the credentials), but Bancard signs its webhook with the current one
+			confirm_token = self._confirm_token(pending_charge.marketplace_charge_id, pending_charge.amount, pending_charge.currency)
+		if not BancardAPI._tokens_are_equal(bancard_token, confirm_token):
+			raise BancardAPIInvalidWebhookTokenException("The Bancard Webhook did not pass the token validation.", bancard_data)
+
+		# the webhook is authentic, so this charge is not pending anymore
+		if evict:
+			self.pending_index.discard(marketplace_charge_id)
+		self._record_ledger_event(LEDGER_EVENT_WEBHOOK, marketplace_charge_id, bancard_operation_data)
+		return self._result(WebhookResult, self._handle_webhook_operation(bancard_operation_data, bancard_data))
+
+	@staticmethod
+	def _tokens_are_equal(received_token, required_token):
+		"""
+			Compares the token received in a webhook with the required one in constant time, so its value can not be guessed by timing the comparisons.
+
+			:rtype bool
+		"""
+
+		if not isinstance(received_token, str):
+			return False
+		return hmac.compare_digest(received_token.encode("utf-8"), required_token.encode("utf-8"))
+
+	def _handle_webhook_operation(self, bancard_operation_data, bancard_data):
+		"""
+			Interprets the operation of an already verified Bancard webhook.
+
+			:return: a tuple of: payment_approved, authorization_number, bancard_data; or a ChargeOutcome in the outcome_mode
+				:rtype tuple (bool, str, dict)
+			:raises BancardAPIPaymentRejectecException: if the payment has been rejected by Bancard, except in the outcome_mode
+		"""
+
+		bancard_operation = bancard_operation_data["operation"]
+		charge_outcome = ChargeOutcome.of_response_code(
+			bancard_operation["response_code"], bancard_operation.get("authorization_number", None), bancard_operation_data if self.keep_bancard_response else None)
+		return self._handle_charge_outcome(charge_outcome, bancard_data)
+
 	@staticmethod
 	def get_marketplace_charge_id_from_bancard_webhook(bancard_data):
 		"""
@@ -386,7 +1013,7 @@ class BancardAPI(object):
 			This method could be useful to get your charge object from your DB
 
 			:param bancard_data: The json data received by the bancard webhook
-				:type bancard_data: str or dict
+				:type bancard_data: str, bytes, memoryview or dict
 			:return: the marketplace charge id
 				:rtype str
 			:raises BancardAPIInvalidWebhookDataException: if there was a problem while parsing the Bancard webhook data (someone might be trying to hack you)
@@ -394,7 +1021,7 @@ class BancardAPI(object):
 
 		try:
 			# parse the data received by Bancard
-			bancard_operation_data = json.loads(bancard_data) if type(bancard_data) is str else bancard_data
+			bancard_operation_data = load_bancard_data(bancard_data)
 			bancard_operation = bancard_operation_data["operation"]
 			marketplace_charge_id = bancard_operation["shop_process_id"]
 			return str(marketplace_charge_id)
@@ -403,38 +1030,72 @@ class BancardAPI(object):
 
 
 __api__ = None
+__api_lock__ = threading.Lock()  # serializes the creation and replacement of __api__, its reads do not take it
+__scoped_api__ = ContextVar("bancard_scoped_api", default=None)  # the BancardAPI of a scoped_connector block
 
 
 def connector():
 	"""
-		Returns the global BancardAPI. If there is no API yet, create one by using the OS environment variables.
+		Returns the BancardAPI of the innermost scoped_connector block of the current thread or asyncio task, if any,
+		or the global BancardAPI. If there is no global API yet, create one by using the OS environment variables.
+		It is safe to call from many threads and asyncio tasks at once: the global API is created only once.
 		The OS environment variables that should be configured are:
-			BANCARD_ENVIRONMENT: "sandbox" or "production"
+			BANCARD_ENVIRONMENT: "sandbox", "production" or "simulator"
 			BANCARD_PUBLIC_KEY: your_bancard_marketplace_public_key
 			BANCARD_PRIVATE_KEY: your_bancard_marketplace_private_key
+			BANCARD_SIMULATOR_URL: the base URL of a BancardSimulator, only for the "simulator" environment (i.e.: http://127.0.0.1:8888)
 
-		:return: the marketplace charge id
-			:rtype str
+		:return: the BancardAPI to use
+			:rtype BancardAPI
 		:raises BancardAPIConfigurationException: if there was not a default api yet, and any of the required OS environment variables were missing
 	"""
 
-	global __api__
-	if __api__ is None:
-		try:
-			environment = os.environ.get("BANCARD_ENVIRONMENT", ENVIRONMENT_SANDBOX)  # possible values: ["sandbox", "production"], and by default "sandbox"
-			public_key = os.environ["BANCARD_PUBLIC_KEY"]
-			private_key = os.environ["BANCARD_PRIVATE_KEY"]
-		except KeyError:
-			raise BancardAPIConfigurationException("The BancardAPI requires the following OS environment variables: BANCARD_ENVIRONMENT BANCARD_PUBLIC_KEY BANCARD_PRIVATE_KEY")
+	scoped_api = __scoped_api__.get()
+	if scoped_api is not None:
+		return scoped_api
+
+	bancard_api = __api__  # lock-free read, the reference is replaced atomically
+	if bancard_api is None:
+		with __api_lock__:
+			if __api__ is None:
+				_set_global_api(_create_api_from_environment())
+			bancard_api = __api__
+	return bancard_api
+
+
+def _create_api_from_environment(**options):
+	"""
+		Creates a BancardAPI from the OS environment variables described in connector.
+
+		:param options: any other option of the BancardAPI (i.e.: outcome_mode)
+		:rtype BancardAPI
+		:raises BancardAPIConfigurationException: if any of the required OS environment variables were missing
+	"""
 
-		# creates the BancardAPI reference to the global variable __api__
-		__api__ = BancardAPI(environment=environment, public_key=public_key, private_key=private_key)
-	return __api__
+	try:
+		environment = os.environ.get("BANCARD_ENVIRONMENT", ENVIRONMENT_SANDBOX)  # possible values: ["sandbox", "production", "simulator"], and by default "sandbox"
+		public_key = os.environ["BANCARD_PUBLIC_KEY"]
+		private_key = os.environ["BANCARD_PRIVATE_KEY"]
+	except KeyError:
+		raise BancardAPIConfigurationException("The BancardAPI requires the following OS environment variables: BANCARD_ENVIRONMENT BANCARD_PUBLIC_KEY BANCARD_PRIVATE_KEY")
+
+	if environment == ENVIRONMENT_SIMULATOR and os.environ.get("BANCARD_SIMULATOR_URL"):
+		# points the simulator environment to a BancardSimulator running in another process
+		from bancardconnectorpython.simulator import use_simulator
+		use_simulator(os.environ["BANCARD_SIMULATOR_URL"])
+
+	return BancardAPI(environment=environment, public_key=public_key, private_key=private_key, **options)
+
+
+def _set_global_api(bancard_api):
+	global __api__
+	__api__ = bancard_api
 
 
 def set_config(options=None, **config):
 	"""
-		Create new BancardAPI object with the given configuration parameters.
+		Create new BancardAPI object with the given configuration parameters, and make it the global one.
+		The calls in progress with the previous global BancardAPI are not interrupted, and the scoped_connector blocks keep their own API.
 
 		:param options: Dictionary with configuration parameters for the API
 				:type options: dict
@@ -444,13 +1105,34 @@ def set_config(options=None, **config):
 			* private_key: the private key given by Bancard
 			:type config: dict
 		:return: the reference to the just created BancardAPI instance
-			:rtype str
+			:rtype BancardAPI
 		:raises BancardAPIConfigurationException: if the BancardAPI couldn't be created due to missing configuration parameters
 	"""
 
-	global __api__
-	__api__ = BancardAPI(options or dict(), **config)
-	return __api__
+	bancard_api = BancardAPI(options or dict(), **config)
+	with __api_lock__:
+		_set_global_api(bancard_api)
+	return bancard_api
 
 
 configure = set_config
+
+
+@contextmanager
+def scoped_connector(bancard_api):
+	"""
+		Makes connector() return the given BancardAPI within the block, only for the current thread or asyncio task (and the asyncio
+		tasks created inside the block, which inherit it). The threads started inside the block do not inherit it.
+
+			with scoped_connector(merchant_api):
+				process_payment()  # any connector() call in here gets merchant_api
+
+		:param bancard_api: the BancardAPI that connector() returns within the block
+			:type bancard_api: BancardAPI
+	"""
+
+	token = __scoped_api__.set(bancard_api)
+	try:
+		yield bancard_api
+	finally:
+		__scoped_api__.reset(token)
@@ -0,0 +1,277 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.results import RollbackResult
+
+
+class BulkResult(object):
+
+	def __init__(self, index, request, result=None, exception=None):
+		"""
+			Constructor of the BulkResult class, the outcome of one item of a bulk operation.
+
+			:param index: position of the item in the input iterable
+				:type index: int
+			:param request: the input item, i.e.: the tuple (marketplace_charge_id, amount, currency)
+				:type request: tuple
+			:param result: the value returned by the operation if it did not raise any exception
+				:type result: tuple
+			:param exception: the exception raised by the operation, if any
+				:type exception: Exception
+		"""
+		self.index = index
+		self.request = request
+		self.result = result
+		self.exception = exception
+
+	@property
+	def ok(self):
+		"""
+			Returns True if the operation of this item did not raise any exception.
+
+			:rtype bool
+		"""
+		return self.exception is None
+
+	def __repr__(self):
+		return "BulkResult(index=%r, request=%r, result=%r, exception=%r)" % (self.index, self.request, self.result, self.exception)
+
+
+def _call_bulk_item(function, index, request):
+	"""
+		Calls function(*request) and wraps its return value or its exception in a BulkResult.
+	"""
+
+	try:
+		return BulkResult(index, request, result=function(*request))
+	except Exception as error:
+		return BulkResult(index, request, exception=error)
+
+
+def _prepare_request(index, request):
+	"""
+		Converts an item of a bulk operation to the tuple of positional arguments of its call.
+
+		:return: a tuple of: request, the failed BulkResult of the item if it is not iterable (otherwise None)
+			:rtype tuple (tuple, BulkResult)
+	"""
+
+	try:
+		return tuple(request), None
+	except TypeError:
+		error = BancardAPIInvalidParameterException("Every item of a bulk operation must be an iterable with the arguments of its call.")
+		return request, BulkResult(index, request, exception=error)
+
+
+def _deadline_exception(deadline):
+	"""
+		Returns the exception reported for the items that did not complete before the deadline of a bulk operation.
+	"""
+	return BancardAPITimeoutException("The bulk operation deadline of %s seconds expired." % deadline)
+
+
+def run_bulk(function, requests, max_workers=DEFAULT_BULK_MAX_WORKERS, ordered=True, deadline=None):
+	"""
+		Calls function(*request) for every request with at most max_workers simultaneous calls, and yields one BulkResult per request.
+		The requests iterable is consumed lazily, so it can be a generator of any size.
+
+		:param function: the operation to call for every request
+			:type function: callable
+		:param requests: iterable of tuples with the positional arguments of every call
+			:type requests: iterable
+		:param max_workers: maximum number of simultaneous calls
+			:type max_workers: int
+		:param ordered: if True the results are yielded in the input order, otherwise as soon as they complete
+			:type ordered: bool
+		:param deadline: maximum number of seconds for the whole batch. The items that did not complete in time
+			are yielded with a BancardAPITimeoutException. By default there is no deadline.
+			:type deadline: float
+		:return: a generator of BulkResult
+			:rtype generator
+	"""
+
+	if type(max_workers) is not int or max_workers < 1:
+		raise BancardAPIInvalidParameterException("The max_workers must be an integer greater than zero.")
+
+	return _run_bulk(function, requests, max_workers, ordered, deadline)
+
+
+def _run_bulk(function, requests, max_workers, ordered, deadline):
+	"""
+		Generator that implements run_bulk once its parameters have been validated.
+	"""
+
+	expires_at = time.time() + deadline if deadline is not None else None
+	requests = enumerate(requests)
+	pending = deque()  # (index, request, future) in input order
+	executor = ThreadPoolExecutor(max_workers=max_workers)
+	try:
+		exhausted = False
+		while True:
+			# keep a bounded window of submitted calls so huge iterables are never materialized
+			while not exhausted and len(pending) < 2 * max_workers:
+				try:
+					index, request = next(requests)
+				except StopIteration:
+					exhausted = True
+					break
+				request, failed_result = _prepare_request(index, request)
+				if failed_result is None:
+					future = executor.submit(_call_bulk_item, function, index, request)
+				else:
+					# an invalid item fails alone, in its place of the results
+					future = Future()
+					future.set_result(failed_result)
+				pending.append((index, request, future))
+
+			if not pending:
+				return
+
+			timeout = max(expires_at - time.time(), 0) if expires_at is not None else None
+			if ordered:
+				done = wait([pending[0][2]], timeout=timeout).done
+			else:
+				done = wait([future for _, _, future in pending], timeout=timeout, return_when=FIRST_COMPLETED).done
+
+			if not done:
+				break  # the deadline expired
+
+			for item in list(pending):
+				if item[2].done():
+					pending.remove(item)
+					yield item[2].result()
+				elif ordered:
+					break
+
+		# the deadline expired: report every unfinished or not yet started item as timed out
+		while pending:
+			index, request, future = pending.popleft()
+			if future.done():
+				yield future.result()
+			else:
+				future.cancel()
+				yield BulkResult(index, request, exception=_deadline_exception(deadline))
+		for index, request in requests:
+			yield BulkResult(index, _prepare_request(index, request)[0], exception=_deadline_exception(deadline))
+	finally:
+		for _, _, future in pending:
+			future.cancel()
+		executor.shutdown(wait=False)
+
+
+class RollbackSummary(object):
+
+	def __init__(self):
+		"""
+			Constructor of the RollbackSummary class, the classification of the results of BancardAPI.rollback_charges.
+
+			* rolled_back: list of marketplace_charge_ids that Bancard rolled back
+			* not_found: list of marketplace_charge_ids that Bancard did not find (PaymentNotFoundError), so there was nothing to roll back
+			* not_rolled_back: list of (marketplace_charge_id, BancardAPINotRolledBackException) that Bancard refused to roll back (i.e.: already couponned)
+			* failed: list of (marketplace_charge_id, exception) that could not be rolled back due to any other error, even after the retries
+		"""
+		self.rolled_back = list()
+		self.not_found = list()
+		self.not_rolled_back = list()
+		self.failed = list()
+
+	@property
+	def total(self):
+		"""
+			Returns the number of classified rollbacks.
+
+			:rtype int
+		"""
+		return len(self.rolled_back) + len(self.not_found) + len(self.not_rolled_back) + len(self.failed)
+
+	def add(self, bulk_result):
+		"""
+			Classifies the BulkResult of one rollback_charge call.
+
+			:param bulk_result: the outcome of one rollback, whose request is the tuple (marketplace_charge_id,)
+				:type bulk_result: BulkResult
+		"""
+
+		marketplace_charge_id = bulk_result.request[0]
+		if bulk_result.ok:
+			rollback_result = bulk_result.result
+			if not isinstance(rollback_result, RollbackResult):
+				rollback_result = RollbackResult.from_tuple(rollback_result)
+			if rollback_result.payment_not_found:
+				self.not_found.append(marketplace_charge_id)
+			else:
+				self.rolled_back.append(marketplace_charge_id)
+		elif isinstance(bulk_result.exception, BancardAPINotRolledBackException):
+			self.not_rolled_back.append((marketplace_charge_id, bulk_result.exception))
+		else:
+			self.failed.append((marketplace_charge_id, bulk_result.exception))
+
+	def __repr__(self):
+		return "RollbackSummary(rolled_back=%d, not_found=%d, not_rolled_back=%d, failed=%d)" % (
+			len(self.rolled_back), len(self.not_found), len(self.not_rolled_back), len(self.failed))
+
+
+def is_transient_rollback_error(error):
+	"""
+		Returns True if the rollback that raised the given error might succeed if it is retried: only the connection errors are transient.
+		The open circuit breakers and the exhausted rate limits fail fast, as they do in the retries of BancardAPI.
+
+		:param error: the exception raised by rollback_charge
+			:type error: Exception
+		:rtype bool
+	"""
+	return isinstance(error, BancardAPIConnectionException) and not isinstance(error, (BancardAPICircuitOpenException, BancardAPIRateLimitedException))
+
+
+def with_retries(function, retries, backoff):
+	"""
+		Wraps function so that it is called again, with an exponential backoff, when it raises a transient error
+		(see is_transient_rollback_error). Any other error is raised right away.
+
+		:param function: the function to wrap
+			:type function: callable
+		:param retries: maximum number of extra calls
+			:type retries: int
+		:param backoff: seconds to wait before the first retry, doubled on every retry
+			:type backoff: float
+		:return: the wrapped function
+			:rtype callable
+	"""
+
+	def call_with_retries(*args):
+		attempt = 0
+		while True:
+			try:
+				return function(*args)
+			except Exception as error:
+				if attempt >= retries or not is_transient_rollback_error(error):
+					raise
+				time.sleep(backoff * (2 ** attempt))
+				attempt += 1
+
+	return call_with_retries
@@ -0,0 +1,105 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache(object):
+
+	def __init__(self, maxsize, clock=time.time):
+		"""
+			Constructor of the TTLCache class, a thread-safe LRU cache whose entries can also expire after a time-to-live.
+
+			:param maxsize: maximum number of entries, the least recently used entry is evicted when it is exceeded
+				:type maxsize: int
+			:param clock: function that returns the current time in seconds
+				:type clock: callable
+		"""
+		self.maxsize = maxsize
+		self.clock = clock
+		self.hits = 0
+		self.misses = 0
+		self._entries = OrderedDict()  # key -> (value, expires_at or None)
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		"""
+			Returns the value cached for the key, or None if there is no value or it has already expired.
+
+			:param key: the key of the entry
+			:return: the cached value or None
+		"""
+
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry[1] is not None and entry[1] <= self.clock():
+				del self._entries[key]
+				entry = None
+
+			if entry is None:
+				self.misses += 1
+				return None
+
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return entry[0]
+
+	def set(self, key, value, ttl=None):
+		"""
+			Caches the value for the key.
+
+			:param key: the key of the entry
+			:param value: the value to cache
+			:param ttl: seconds after which the entry expires. By default it expires only when it is evicted by the LRU policy.
+				:type ttl: float
+		"""
+
+		with self._lock:
+			self._entries[key] = (value, self.clock() + ttl if ttl is not None else None)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last=False)
+
+	def invalidate(self, key):
+		"""
+			Removes the entry of the key, if any.
+
+			:param key: the key of the entry
+		"""
+
+		with self._lock:
+			self._entries.pop(key, None)
+
+	def clear(self):
+		"""
+			Removes every entry and resets the hits/misses counters.
+		"""
+
+		with self._lock:
+			self._entries.clear()
+			self.hits = self.misses = 0
+
+	def __len__(self):
+		return len(self._entries)
@@ -0,0 +1,129 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+
+try:
+	import orjson
+except ImportError:
+	orjson = None  # the OrjsonCodec is an optional feature that requires: pip install orjson
+
+# the types of the raw JSON documents that the codecs can parse
+JSON_DOCUMENT_TYPES = (str, bytes, bytearray, memoryview)
+
+
+class JSONCodec(object):
+	"""
+		The JSON codec of the standard library, always available. It serializes to compact UTF-8 bytes and parses
+		str, bytes and bytearray directly (the json module detects their encoding); a memoryview is copied into bytes first.
+	"""
+
+	name = CODEC_JSON
+
+	def dumps(self, obj):
+		"""
+			Serializes a JSON object into the UTF-8 bytes of a Bancard request body.
+
+			:rtype bytes
+		"""
+		return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+	def loads(self, data):
+		"""
+			Parses a JSON document.
+
+			:param data: the raw JSON document
+				:type data: str, bytes, bytearray or memoryview
+			:return: the parsed JSON object
+			:raises ValueError: if the data is not a valid JSON document
+		"""
+		return json.loads(bytes(data) if type(data) is memoryview else data)
+
+
+class OrjsonCodec(object):
+	"""
+		The JSON codec of the orjson library, several times faster than the standard library one.
+		It parses str, bytes, bytearray and memoryview without any intermediate copy.
+	"""
+
+	name = CODEC_ORJSON
+
+	def __init__(self):
+		"""
+			Constructor of the OrjsonCodec class.
+
+			:raises BancardAPIConfigurationException: if the orjson library is not installed
+		"""
+		if orjson is None:
+			raise BancardAPIConfigurationException("The %s codec requires the orjson library: pip install orjson" % CODEC_ORJSON)
+
+	def dumps(self, obj):
+		return orjson.dumps(obj)
+
+	def loads(self, data):
+		return orjson.loads(data)
+
+
+def get_codec(codec=None):
+	"""
+		Returns the JSON codec to use by a BancardAPI.
+
+		:param codec: an object with the dumps/loads methods of the JSONCodec, the name of a codec (CODEC_JSON or CODEC_ORJSON),
+			or None to use the fastest installed one
+			:type codec: object or str
+		:rtype JSONCodec or OrjsonCodec
+		:raises BancardAPIConfigurationException: if the codec name is unknown, or its library is not installed
+	"""
+
+	if codec is None:
+		return DEFAULT_CODEC
+	if codec == CODEC_JSON:
+		return JSONCodec()
+	if codec == CODEC_ORJSON:
+		return OrjsonCodec()
+	if hasattr(codec, "dumps") and hasattr(codec, "loads"):
+		return codec
+	raise BancardAPIConfigurationException("Unknown JSON codec: %s" % codec)
+
+
+def load_bancard_data(bancard_data, codec=None):
+	"""
+		Returns the JSON object of a Bancard webhook, parsing it if it is still a raw document (i.e.: the bytes of the request body).
+
+		:param bancard_data: the data received in the Bancard webhook
+			:type bancard_data: str, bytes, bytearray, memoryview or dict
+		:param codec: the codec used to parse it. By default the DEFAULT_CODEC
+			:type codec: JSONCodec
+		:rtype dict
+		:raises ValueError: if the data is not a valid JSON document
+	"""
+
+	if isinstance(bancard_data, JSON_DOCUMENT_TYPES):
+		return (codec or DEFAULT_CODEC).loads(bancard_data)
+	return bancard_data
+
+
+# the fastest codec installed
+DEFAULT_CODEC = OrjsonCodec() if orjson is not None else JSONCodec()
@@ -24,13 +24,27 @@
 # possibles values for the BancardAPI environment class member
 ENVIRONMENT_SANDBOX = "sandbox"
 ENVIRONMENT_PRODUCTION = "production"
+ENVIRONMENT_SIMULATOR = "simulator"  # a local BancardSimulator, see bancardconnectorpython.simulator
 
 # Currencies that Bancard allows for charging
 BANCARD_ALLOWED_CURRENCIES = ["PYG"]
 
+# number of decimals of the amounts of the Bancard requests and tokens, i.e.: "1000.00"
+BANCARD_AMOUNT_DECIMALS = 2
+
+# lengths of the charge parameters allowed by Bancard
+BANCARD_DESCRIPTION_MAX_LENGTH = 20
+BANCARD_URL_MAX_LENGTH = 255
+
 BANCARD_BASE_URL_SANDBOX = "https://vpos.infonet.com.py:8888"
 BANCARD_BASE_URL_PRODUCTION = "https://vpos.infonet.com.py"
 
+# path of every Bancard WebService, relative to the base URL of the environment
+BANCARD_ROLLBACK_PATH = "/vpos/api/0.3/single_buy/rollback"
+BANCARD_CHARGE_TOKEN_GENERATOR_PATH = "/vpos/api/0.3/single_buy"
+BANCARD_PAYMENT_WEB_PATH = "/payment/single_buy?process_id="
+BANCARD_CONFIRMATIONS_PATH = "/vpos/api/0.3/single_buy/confirmations"
+
 # Keys for the SANDBOX_URLS / PRODUCTION_URLS dictionaries
 ROLLBACK_KEY = "rollback"
 CHARGE_TOKEN_GENERATOR_KEY = "single_buy"
@@ -39,18 +53,18 @@ CONFIRMATIONS_KEY = "confirmations"
 
 # Bancard WebService development (sandbox) environment endpoints
 BANCARD_SANDBOX_URLS = {
-	ROLLBACK_KEY: "%s/vpos/api/0.3/single_buy/rollback" % BANCARD_BASE_URL_SANDBOX,
-	CHARGE_TOKEN_GENERATOR_KEY: "%s/vpos/api/0.3/single_buy" % BANCARD_BASE_URL_SANDBOX,
-	PAYMENT_WEB_URL_KEY: "%s/payment/single_buy?process_id=" % BANCARD_BASE_URL_SANDBOX,
-	CONFIRMATIONS_KEY: "%s/vpos/api/0.3/single_buy/confirmations" % BANCARD_BASE_URL_SANDBOX,
+	ROLLBACK_KEY: "%s%s" % (BANCARD_BASE_URL_SANDBOX, BANCARD_ROLLBACK_PATH),
+	CHARGE_TOKEN_GENERATOR_KEY: "%s%s" % (BANCARD_BASE_URL_SANDBOX, BANCARD_CHARGE_TOKEN_GENERATOR_PATH),
+	PAYMENT_WEB_URL_KEY: "%s%s" % (BANCARD_BASE_URL_SANDBOX, BANCARD_PAYMENT_WEB_PATH),
+	CONFIRMATIONS_KEY: "%s%s" % (BANCARD_BASE_URL_SANDBOX, BANCARD_CONFIRMATIONS_PATH),
 }
 
 # Bancard WebService production environment endpoints
 BANCARD_PRODUCTION_URLS = {
-	ROLLBACK_KEY: "%s/vpos/api/0.3/single_buy/rollback" % BANCARD_BASE_URL_PRODUCTION,
-	CHARGE_TOKEN_GENERATOR_KEY: "%s/vpos/api/0.3/single_buy" % BANCARD_BASE_URL_PRODUCTION,
-	PAYMENT_WEB_URL_KEY: "%s/payment/single_buy?process_id=" % BANCARD_BASE_URL_PRODUCTION,
-	CONFIRMATIONS_KEY: "%s/vpos/api/0.3/single_buy/confirmations" % BANCARD_BASE_URL_PRODUCTION,
+	ROLLBACK_KEY: "%s%s" % (BANCARD_BASE_URL_PRODUCTION, BANCARD_ROLLBACK_PATH),
+	CHARGE_TOKEN_GENERATOR_KEY: "%s%s" % (BANCARD_BASE_URL_PRODUCTION, BANCARD_CHARGE_TOKEN_GENERATOR_PATH),
+	PAYMENT_WEB_URL_KEY: "%s%s" % (BANCARD_BASE_URL_PRODUCTION, BANCARD_PAYMENT_WEB_PATH),
+	CONFIRMATIONS_KEY: "%s%s" % (BANCARD_BASE_URL_PRODUCTION, BANCARD_CONFIRMATIONS_PATH),
 }
 
 # All the Bancard WebService endpoints for sandbox/production
@@ -58,3 +72,113 @@ BANCARD_URLS = {
 	ENVIRONMENT_SANDBOX: BANCARD_SANDBOX_URLS,
 	ENVIRONMENT_PRODUCTION: BANCARD_PRODUCTION_URLS
 }
+
+# HTTP headers sent in every request to the Bancard WebServices
+BANCARD_REQUEST_HEADERS = {"Content-Type": "application/json"}
+
+# default sizes of the keep-alive HTTP connection pool used by every BancardAPI
+DEFAULT_POOL_CONNECTIONS = 4  # number of per-host connection pools to keep cached
+DEFAULT_POOL_MAXSIZE = 10  # maximum number of keep-alive connections per host
+DEFAULT_ASYNC_POOL_LIMIT = 100  # maximum number of simultaneous connections of the AsyncBancardAPI
+
+# default number of simultaneous calls of the bulk operations (i.e.: BancardAPI.get_charge_statuses)
+DEFAULT_BULK_MAX_WORKERS = 8
+
+# default number of retries of every rollback of BancardAPI.rollback_charges, and the base delay in seconds between them
+DEFAULT_BULK_ROLLBACK_RETRIES = 2
+DEFAULT_BULK_ROLLBACK_BACKOFF = 0.5
+
+# default seconds that the optional charge status cache of the BancardAPI remembers a pending (PaymentNotFoundError) confirmation
+DEFAULT_CHARGE_STATUS_PENDING_TTL = 5
+
+# default size and maximum age in seconds of the index of charges waiting for their Bancard webhook
+DEFAULT_PENDING_INDEX_SIZE = 10000
+DEFAULT_PENDING_INDEX_MAX_AGE = 3600
+
+# Bancard WebServices that can be called again with the same request without side effects, so they can be retried
+BANCARD_IDEMPOTENT_ENDPOINTS = (CONFIRMATIONS_KEY, ROLLBACK_KEY)
+
+# HTTP status codes of the Bancard responses that mean a temporary unavailability of the WebService
+BANCARD_UNAVAILABLE_STATUS_CODES = (502, 503, 504)
+
+# default timeouts in seconds of every call to the Bancard WebServices
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+# default retry policy of the idempotent Bancard WebServices: maximum retries and the exponential backoff bounds in seconds
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_BASE = 0.2
+DEFAULT_BACKOFF_MAX = 2
+
+# states of the per-endpoint circuit breakers of the BancardAPI
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# default circuit breaker policy: it opens when the failure rate of the last calls exceeds the threshold,
+# fails fast while it is open and then lets a probe call through (half-open) to check whether Bancard recovered
+DEFAULT_CIRCUIT_FAILURE_RATE = 0.5
+DEFAULT_CIRCUIT_MINIMUM_CALLS = 20
+DEFAULT_CIRCUIT_WINDOW_SIZE = 50
+DEFAULT_CIRCUIT_OPEN_DURATION = 30
+DEFAULT_CIRCUIT_HALF_OPEN_CALLS = 1
+
+# value of the hedge_delay option that fires the hedged confirmations request after the observed p95 latency
+HEDGE_DELAY_P95 = "p95"
+DEFAULT_HEDGE_DELAY = 0.5  # seconds, used by HEDGE_DELAY_P95 until enough latencies have been observed
+DEFAULT_HEDGE_MINIMUM_SAMPLES = 20
+DEFAULT_LATENCY_WINDOW_SIZE = 200
+
+# buckets of the histograms of the InMemoryMetricsSink
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # seconds
+DEFAULT_SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)  # bytes
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# names of the JSON codecs of the BancardAPI (codec option)
+CODEC_JSON = "json"  # the standard library json module
+CODEC_ORJSON = "orjson"  # requires: pip install orjson
+
+# idempotency store of generate_charge_token
+DEFAULT_IDEMPOTENCY_STORE_SIZE = 10000  # charges remembered by the MemoryIdempotencyStore
+DEFAULT_IDEMPOTENCY_TABLE = "bancard_idempotency"  # table of the SQLiteIdempotencyStore
+
+# charge ledger
+LEDGER_EVENT_CREATED = "created"  # generate_charge_token
+LEDGER_EVENT_CONFIRMATION = "confirmation"  # get_charge_status
+LEDGER_EVENT_WEBHOOK = "webhook"  # process_vpos_webhook and verify_vpos_webhook
+LEDGER_EVENT_ROLLBACK = "rollback"  # rollback_charge
+LEDGER_STATUS_PENDING = "pending"
+LEDGER_STATUS_PAYED = "payed"
+LEDGER_STATUS_REJECTED = "rejected"
+LEDGER_STATUS_ROLLED_BACK = "rolled_back"
+DEFAULT_LEDGER_BATCH_SIZE = 1  # events buffered before they are written in a single transaction, by default every event is written immediately
+DEFAULT_LEDGER_FLUSH_INTERVAL = 1.0  # seconds, maximum age of a buffered event
+DEFAULT_LEDGER_MAX_BUFFERED_EVENTS = 10000  # events kept while the database can not be written, the oldest ones are dropped beyond it
+
+# webhook receiver
+DEFAULT_WEBHOOK_WORKERS = 4  # threads that run the webhook handler
+DEFAULT_WEBHOOK_QUEUE_SIZE = 1000  # verified webhooks waiting for a worker, the next ones are answered with a 503 so Bancard retries them
+DEFAULT_WEBHOOK_MAX_BODY_SIZE = 65536  # bytes
+WEBHOOK_ENDPOINT = "webhook"  # endpoint label of the metrics of the webhook receiver
+
+# outcomes of the charges (outcome_mode option)
+OUTCOME_APPROVED = "approved"
+OUTCOME_PENDING = "pending"  # not payed yet
+OUTCOME_DECLINED = "declined"
+DECLINE_PAYMENT_METHOD_NOT_ENABLED = "payment_method_not_enabled"
+DECLINE_TRANSACTION_INVALID = "transaction_invalid"
+DECLINE_NOT_ENOUGH_FUNDS = "not_enough_funds"
+DECLINE_UNKNOWN_REASON = "unknown_reason"
+
+# reconcile command line tool (python -m bancardconnectorpython reconcile)
+RECONCILE_FORMAT_CSV = "csv"
+RECONCILE_FORMAT_NDJSON = "ndjson"
+RECONCILE_STATUS_ERROR = "error"  # the confirmation could not be checked, i.e.: invalid row or network error
+DEFAULT_RECONCILE_CHECKPOINT_EVERY = 1000  # results written between two checkpoints
+DEFAULT_RECONCILE_CHECKPOINT_INTERVAL = 10.0  # maximum seconds between two checkpoints
+
+# client-side rate limiter of the Bancard WebServices (rate_limiter option)
+RATE_LIMIT_PRIORITY_LIVE = "live"  # i.e.: the checkouts of the payers
+RATE_LIMIT_PRIORITY_BATCH = "batch"  # i.e.: the bulk operations and the reconciliations
+DEFAULT_RATE_LIMIT_LIVE_RESERVE = 0.5  # fraction of the burst of every endpoint that the batch traffic never takes
+DEFAULT_RATE_LIMIT_MAX_WAIT = 5.0  # maximum seconds that a live request waits for a token
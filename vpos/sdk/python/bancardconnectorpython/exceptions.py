@@ -22,6 +22,9 @@
 
 
 class BancardAPIException(Exception):
+	retries = 0  # number of retries of the Bancard call that raised this exception
+	elapsed = None  # seconds spent in the Bancard call that raised this exception, including the retries
+
 	def __init__(self, msg="", data=None):
 		"""
 			Constructor of the BancardAPIException.
@@ -67,6 +70,27 @@ class BancardAPIConfigurationException(BancardAPIException):
 	pass
 
 
+# exceptions for the communication with the Bancard WebServices
+class BancardAPIConnectionException(BancardAPIException):
+	pass
+
+
+class BancardAPITimeoutException(BancardAPIConnectionException):
+	pass
+
+
+class BancardAPIUnavailableException(BancardAPIConnectionException):
+	pass
+
+
+class BancardAPICircuitOpenException(BancardAPIConnectionException):
+	pass
+
+
+class BancardAPIRateLimitedException(BancardAPIConnectionException):
+	pass
+
+
 # exceptions for the charge request operation
 class BancardAPIInvalidParameterException(BancardAPIException):
 	pass
@@ -76,6 +100,10 @@ class BancardAPIMarketplaceChargeIDAlreadyExistsException(BancardAPIException):
 	pass
 
 
+class BancardAPIIdempotencyMismatchException(BancardAPIMarketplaceChargeIDAlreadyExistsException):
+	pass
+
+
 class BancardAPIChargeRejectedException(BancardAPIException):
 	pass
 
@@ -119,5 +147,5 @@ class BancardAPIInvalidWebhookDataException(BancardAPIException):
 	pass
 
 
-class BancardAPIInvalidWebhookTokenException(BancardAPIException):
+class BancardAPIInvalidWebhookTokenException(BancardAPIInvalidWebhookDataException):
 	pass
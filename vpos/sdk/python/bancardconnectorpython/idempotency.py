@@ -0,0 +1,180 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import threading
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.cache import TTLCache
+
+# fields of the single_buy operation that must be identical for a repeated generate_charge_token call
+IDEMPOTENCY_FIELDS = ("amount", "currency", "description", "return_url", "cancel_url")
+
+
+class IdempotencyRecord(object):
+
+	__slots__ = ("marketplace_charge_id", "request", "bancard_process_id", "payment_url", "bancard_response", "created_at")
+
+	def __init__(self, marketplace_charge_id, request, bancard_process_id, payment_url, bancard_response, created_at=None):
+		"""
+			Constructor of the IdempotencyRecord class, the result of a successful generate_charge_token call.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: str
+			:param request: the IDEMPOTENCY_FIELDS of the single_buy operation, i.e.: {"amount": "1000.00", "currency": "PYG", ...}
+				:type request: dict
+			:param bancard_process_id: the process id returned by Bancard
+				:type bancard_process_id: str
+			:param payment_url: the URL of the payment page
+				:type payment_url: str
+			:param bancard_response: the full JSON response of Bancard
+				:type bancard_response: dict
+			:param created_at: time in seconds when the charge was created. By default the current time.
+				:type created_at: float
+		"""
+		self.marketplace_charge_id = marketplace_charge_id
+		self.request = request
+		self.bancard_process_id = bancard_process_id
+		self.payment_url = payment_url
+		self.bancard_response = bancard_response
+		self.created_at = created_at if created_at is not None else time.time()
+
+	@staticmethod
+	def request_of(bancard_operation):
+		"""
+			Returns the IDEMPOTENCY_FIELDS of a single_buy operation.
+
+			:rtype dict
+		"""
+		return dict((field, bancard_operation.get(field)) for field in IDEMPOTENCY_FIELDS)
+
+	def charge_token(self, bancard_operation):
+		"""
+			Returns the result of generate_charge_token for a repeated call with the given single_buy operation.
+
+			:return: a tuple of: bancard_process_id, payment_url, bancard_response
+				:rtype tuple (str, str, dict)
+			:raises BancardAPIIdempotencyMismatchException: if the repeated call has a different amount, currency or any other parameter
+		"""
+
+		request = IdempotencyRecord.request_of(bancard_operation)
+		if request != self.request:
+			different_fields = [field for field in IDEMPOTENCY_FIELDS if request[field] != self.request.get(field)]
+			raise BancardAPIIdempotencyMismatchException(
+				"The marketplace charge ID %s was already created with a different %s." % (self.marketplace_charge_id, ", ".join(different_fields)),
+				{"original": self.request, "repeated": request})
+		return self.bancard_process_id, self.payment_url, self.bancard_response
+
+
+class MemoryIdempotencyStore(object):
+
+	def __init__(self, maxsize=DEFAULT_IDEMPOTENCY_STORE_SIZE, ttl=None):
+		"""
+			Constructor of the MemoryIdempotencyStore class, a thread-safe in-memory LRU of the created charges, only valid for the current process.
+
+			:param maxsize: maximum number of charges, the least recently used one is forgotten when it is exceeded.
+				The default value is: DEFAULT_IDEMPOTENCY_STORE_SIZE
+				:type maxsize: int
+			:param ttl: seconds after which a charge is forgotten. By default the charges are only forgotten by the LRU policy.
+				:type ttl: float
+		"""
+		self.ttl = ttl
+		self._records = TTLCache(maxsize)
+
+	def get(self, marketplace_charge_id):
+		"""
+			Returns the IdempotencyRecord of a charge, or None if it is unknown.
+
+			:rtype IdempotencyRecord
+		"""
+		return self._records.get(str(marketplace_charge_id))
+
+	def put(self, record):
+		"""
+			Stores the IdempotencyRecord of a just created charge.
+		"""
+		self._records.set(record.marketplace_charge_id, record, ttl=self.ttl)
+
+	def discard(self, marketplace_charge_id):
+		"""
+			Forgets a charge, if it is known.
+		"""
+		self._records.invalidate(str(marketplace_charge_id))
+
+	def __len__(self):
+		return len(self._records)
+
+
+class SQLiteIdempotencyStore(object):
+
+	def __init__(self, path, table=DEFAULT_IDEMPOTENCY_TABLE):
+		"""
+			Constructor of the SQLiteIdempotencyStore class, a durable store of the created charges in a SQLite database,
+			which can be shared by the processes of the same host (i.e.: the workers of a WSGI server).
+
+			:param path: the path of the SQLite database file, it is created if it does not exist
+				:type path: str
+			:param table: the name of the table. The default value is: DEFAULT_IDEMPOTENCY_TABLE
+				:type table: str
+		"""
+		self.path = path
+		self.table = table
+		# sqlite3 is imported here to keep it out of the import of the api module
+		import sqlite3
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+		self._connection.execute(
+			"CREATE TABLE IF NOT EXISTS %s (shop_process_id TEXT PRIMARY KEY, request TEXT NOT NULL, process_id TEXT NOT NULL, "
+			"payment_url TEXT NOT NULL, bancard_response TEXT NOT NULL, created_at REAL NOT NULL)" % self.table)
+
+	def get(self, marketplace_charge_id):
+		with self._lock:
+			row = self._connection.execute(
+				"SELECT shop_process_id, request, process_id, payment_url, bancard_response, created_at FROM %s WHERE shop_process_id = ?" % self.table,
+				(str(marketplace_charge_id),)).fetchone()
+		if row is None:
+			return None
+		return IdempotencyRecord(row[0], json.loads(row[1]), row[2], row[3], json.loads(row[4]), row[5])
+
+	def put(self, record):
+		with self._lock:
+			self._connection.execute(
+				"INSERT OR REPLACE INTO %s (shop_process_id, request, process_id, payment_url, bancard_response, created_at) VALUES (?, ?, ?, ?, ?, ?)" % self.table,
+				(record.marketplace_charge_id, json.dumps(record.request), record.bancard_process_id, record.payment_url,
+				json.dumps(record.bancard_response), record.created_at))
+
+	def discard(self, marketplace_charge_id):
+		with self._lock:
+			self._connection.execute("DELETE FROM %s WHERE shop_process_id = ?" % self.table, (str(marketplace_charge_id),))
+
+	def __len__(self):
+		with self._lock:
+			return self._connection.execute("SELECT COUNT(*) FROM %s" % self.table).fetchone()[0]
+
+	def close(self):
+		"""
+			Closes the connection to the SQLite database.
+		"""
+		with self._lock:
+			self._connection.close()
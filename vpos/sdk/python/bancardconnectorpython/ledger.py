@@ -0,0 +1,358 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import threading
+from decimal import Decimal
+from bancardconnectorpython.constants import *
+
+
+class LedgerCharge(object):
+
+	__slots__ = ("marketplace_charge_id", "amount", "currency", "status", "bancard_process_id", "response_code", "created_at", "updated_at")
+
+	def __init__(self, marketplace_charge_id, amount, currency, status, bancard_process_id, response_code, created_at, updated_at):
+		"""
+			Constructor of the LedgerCharge class, the last known state of a charge in the ChargeLedger.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: str
+			:param amount: The amount that the payer should pay, None if the charge was not created by this ledger's BancardAPI
+				:type amount: Decimal
+			:param currency: The currency of the amount to charge in the format ISO-4217
+				:type currency: str
+			:param status: any of the LEDGER_STATUS_* constants
+				:type status: str
+			:param bancard_process_id: the process id returned by Bancard when the charge was created
+				:type bancard_process_id: str
+			:param response_code: the last response code of a Bancard confirmation/webhook of the charge
+				:type response_code: str
+			:param created_at: time in seconds of the first event of the charge
+				:type created_at: float
+			:param updated_at: time in seconds of the last event of the charge
+				:type updated_at: float
+		"""
+		self.marketplace_charge_id = marketplace_charge_id
+		self.amount = amount
+		self.currency = currency
+		self.status = status
+		self.bancard_process_id = bancard_process_id
+		self.response_code = response_code
+		self.created_at = created_at
+		self.updated_at = updated_at
+
+	def __repr__(self):
+		return "LedgerCharge(marketplace_charge_id=%r, status=%r, amount=%r, currency=%r)" % (self.marketplace_charge_id, self.status, self.amount, self.currency)
+
+
+class ChargeLedger(object):
+
+	_CHARGE_COLUMNS = "shop_process_id, amount, currency, status, process_id, response_code, created_at, updated_at"
+
+	def __init__(self, path, batch_size=DEFAULT_LEDGER_BATCH_SIZE, flush_interval=DEFAULT_LEDGER_FLUSH_INTERVAL, clock=time.time,
+					max_buffered_events=DEFAULT_LEDGER_MAX_BUFFERED_EVENTS):
+		"""
+			Constructor of the ChargeLedger class, a durable record of the lifecycle of the charges in a SQLite database in WAL mode.
+			Every creation, confirmation, webhook and rollback is stored as an event, and the last known state of each charge is kept
+			indexed by status and age, so the sweeps only call Bancard for the charges that actually need it.
+
+			By default every event is written immediately. With a batch_size greater than 1 the events are buffered and written in a single
+			transaction when batch_size events are buffered, flush_interval seconds after the oldest buffered one (by a background timer),
+			before any query, and on flush/close. The events of a failed write stay buffered and they are written again by the next flush,
+			up to max_buffered_events: beyond it the oldest buffered events are dropped (and counted in dropped_events) with a logged warning.
+
+			:param path: the path of the SQLite database file, it is created if it does not exist
+				:type path: str
+			:param batch_size: maximum number of buffered events. The default value is: DEFAULT_LEDGER_BATCH_SIZE
+				:type batch_size: int
+			:param flush_interval: maximum seconds that an event stays buffered. The default value is: DEFAULT_LEDGER_FLUSH_INTERVAL
+				:type flush_interval: float
+			:param clock: function that returns the current time in seconds
+				:type clock: callable
+			:param max_buffered_events: maximum number of events kept while the database can not be written. The default value is: DEFAULT_LEDGER_MAX_BUFFERED_EVENTS
+				:type max_buffered_events: int
+		"""
+		# sqlite3 is imported here to keep it out of the import of the api module
+		import sqlite3
+		self.path = path
+		self.batch_size = max(1, int(batch_size))
+		self.max_buffered_events = max(self.batch_size, int(max_buffered_events))
+		self.dropped_events = 0
+		self.flush_interval = flush_interval
+		self.clock = clock
+		self._buffer = list()
+		self._lock = threading.Lock()
+		self._timer = None  # writes the buffered events flush_interval seconds after the oldest one
+		self._closed = False
+		self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+		self._connection.execute("PRAGMA journal_mode=WAL")
+		self._connection.execute("PRAGMA synchronous=NORMAL")
+		self._connection.executescript("""
+			CREATE TABLE IF NOT EXISTS bancard_charges (
+				shop_process_id TEXT PRIMARY KEY, amount TEXT, currency TEXT, status TEXT NOT NULL, process_id TEXT,
+				response_code TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL);
+			CREATE INDEX IF NOT EXISTS bancard_charges_status ON bancard_charges (status, created_at);
+			CREATE TABLE IF NOT EXISTS bancard_charge_events (
+				id INTEGER PRIMARY KEY AUTOINCREMENT, shop_process_id TEXT NOT NULL, event TEXT NOT NULL, status TEXT,
+				bancard_response TEXT, recorded_at REAL NOT NULL);
+			CREATE INDEX IF NOT EXISTS bancard_charge_events_charge ON bancard_charge_events (shop_process_id, recorded_at);
+		""")
+
+	@staticmethod
+	def status_of(event, bancard_response):
+		"""
+			Returns the status of a charge after one of its events.
+
+			:param event: any of the LEDGER_EVENT_* constants
+				:type event: str
+			:param bancard_response: the response of Bancard (or the data of the webhook) of the event
+				:type bancard_response: dict
+			:return: any of the LEDGER_STATUS_* constants, or None if the event does not change the status of the charge (i.e.: an unexpected error of Bancard)
+				:rtype str
+		"""
+
+		bancard_response = bancard_response or dict()
+		if event == LEDGER_EVENT_CREATED:
+			return LEDGER_STATUS_PENDING
+		if event == LEDGER_EVENT_WEBHOOK:
+			response_code = bancard_response.get("operation", dict()).get("response_code", None)
+		elif bancard_response.get("status", None) == "success":
+			if event == LEDGER_EVENT_ROLLBACK:
+				return LEDGER_STATUS_ROLLED_BACK
+			response_code = bancard_response.get("confirmation", dict()).get("response_code", None)
+		else:
+			messages = bancard_response.get("messages") or [dict()]
+			if messages[0].get("key", None) != "PaymentNotFoundError":
+				return None
+			# a charge that has never been payed is rolled back successfully too
+			return LEDGER_STATUS_ROLLED_BACK if event == LEDGER_EVENT_ROLLBACK else LEDGER_STATUS_PENDING
+		if response_code is None:
+			return None
+		return LEDGER_STATUS_PAYED if response_code == "00" else LEDGER_STATUS_REJECTED
+
+	@staticmethod
+	def _response_code_of(event, bancard_response):
+		if event == LEDGER_EVENT_WEBHOOK:
+			return bancard_response.get("operation", dict()).get("response_code", None)
+		if event == LEDGER_EVENT_CONFIRMATION:
+			return bancard_response.get("confirmation", dict()).get("response_code", None)
+		return None
+
+	def record(self, event, marketplace_charge_id, bancard_response=None, amount=None, currency=None):
+		"""
+			Records an event of a charge.
+
+			:param event: any of the LEDGER_EVENT_* constants
+				:type event: str
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: int or str
+			:param bancard_response: the response of Bancard (or the data of the webhook) of the event
+				:type bancard_response: dict
+			:param amount: The amount that the payer should pay, only required by LEDGER_EVENT_CREATED
+				:type amount: Decimal
+			:param currency: The currency of the amount to charge in the format ISO-4217, only required by LEDGER_EVENT_CREATED
+				:type currency: str
+		"""
+
+		bancard_response = bancard_response or dict()
+		recorded_at = self.clock()
+		process_id = bancard_response.get("process_id", None) if event == LEDGER_EVENT_CREATED else None
+		event_row = (
+			str(marketplace_charge_id), event, ChargeLedger.status_of(event, bancard_response), json.dumps(bancard_response, default=str), recorded_at,
+			str(amount) if amount is not None else None, currency, process_id, ChargeLedger._response_code_of(event, bancard_response))
+		with self._lock:
+			self._buffer.append(event_row)
+			if len(self._buffer) > self.max_buffered_events:
+				# the database has not been writable for a while, so the memory is bounded by dropping the oldest event
+				del self._buffer[0]
+				self.dropped_events += 1
+				import logging
+				logging.getLogger("bancardconnectorpython").warning(
+					"The ChargeLedger %s dropped its oldest buffered event, %d events dropped so far.", self.path, self.dropped_events)
+			if len(self._buffer) >= self.batch_size or recorded_at - self._buffer[0][4] >= self.flush_interval:
+				self._flush()
+			elif self._timer is None:
+				self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+				self._timer.daemon = True
+				self._timer.start()
+
+	def _flush_on_timer(self):
+		"""
+			Writes the buffered events from the background timer. A failed write is logged, and its events are written again by the next flush.
+		"""
+
+		with self._lock:
+			self._timer = None
+			if self._closed:
+				return
+			try:
+				self._flush()
+			except Exception:
+				import logging
+				logging.getLogger("bancardconnectorpython").exception("The buffered events could not be written to the ChargeLedger %s.", self.path)
+
+	def flush(self):
+		"""
+			Writes the buffered events.
+		"""
+
+		with self._lock:
+			self._flush()
+
+	def _flush(self):
+		"""
+			Writes the buffered events in a single transaction. It must be called holding the lock.
+		"""
+
+		if not self._buffer:
+			return
+		event_rows = list(self._buffer)
+		self._connection.execute("BEGIN IMMEDIATE")
+		try:
+			self._connection.executemany(
+				"INSERT INTO bancard_charge_events (shop_process_id, event, status, bancard_response, recorded_at) VALUES (?, ?, ?, ?, ?)",
+				[event_row[:5] for event_row in event_rows])
+			# a pending status never replaces a final one, i.e.: a late confirmation of a rolled back charge
+			self._connection.executemany(
+				"INSERT INTO bancard_charges (%s) VALUES (?, ?, ?, COALESCE(?, ?), ?, ?, ?, ?) "
+				"ON CONFLICT (shop_process_id) DO UPDATE SET "
+				"amount = COALESCE(excluded.amount, amount), currency = COALESCE(excluded.currency, currency), "
+				"status = CASE WHEN ?4 IS NULL OR (?4 = ?5 AND status != ?5) THEN status ELSE ?4 END, "
+				"process_id = COALESCE(excluded.process_id, process_id), response_code = COALESCE(excluded.response_code, response_code), "
+				"updated_at = excluded.updated_at" % ChargeLedger._CHARGE_COLUMNS,
+				[(shop_process_id, amount, currency, status, LEDGER_STATUS_PENDING, process_id, response_code, recorded_at, recorded_at)
+					for shop_process_id, event, status, bancard_response, recorded_at, amount, currency, process_id, response_code in event_rows])
+			self._connection.execute("COMMIT")
+		except:
+			self._connection.execute("ROLLBACK")
+			raise
+		# the events are dropped from the buffer only once they have been written
+		del self._buffer[:len(event_rows)]
+
+	def _query_charges(self, where, parameters, limit):
+		with self._lock:
+			self._flush()
+			sql = "SELECT %s FROM bancard_charges WHERE %s ORDER BY created_at" % (ChargeLedger._CHARGE_COLUMNS, where)
+			if limit is not None:
+				sql += " LIMIT %d" % int(limit)
+			rows = self._connection.execute(sql, parameters).fetchall()
+		return [LedgerCharge(row[0], Decimal(row[1]) if row[1] is not None else None, *row[2:]) for row in rows]
+
+	def get_charge(self, marketplace_charge_id):
+		"""
+			Returns the last known state of a charge, or None if it has no events.
+
+			:rtype LedgerCharge
+		"""
+
+		charges = self._query_charges("shop_process_id = ?", (str(marketplace_charge_id),), None)
+		return charges[0] if charges else None
+
+	def get_events(self, marketplace_charge_id):
+		"""
+			Returns the events of a charge, from the oldest to the newest one.
+
+			:return: a list of tuples: event, status, bancard_response, recorded_at
+				:rtype list
+		"""
+
+		with self._lock:
+			self._flush()
+			rows = self._connection.execute(
+				"SELECT event, status, bancard_response, recorded_at FROM bancard_charge_events WHERE shop_process_id = ? ORDER BY recorded_at, id",
+				(str(marketplace_charge_id),)).fetchall()
+		return [(event, status, json.loads(bancard_response), recorded_at) for event, status, bancard_response, recorded_at in rows]
+
+	def charges_by_status(self, status, older_than=0, limit=None):
+		"""
+			Returns the charges with a status, from the oldest to the newest one.
+
+			:param status: any of the LEDGER_STATUS_* constants
+				:type status: str
+			:param older_than: minimum age in seconds of the returned charges, since their creation
+				:type older_than: float
+			:param limit: maximum number of returned charges, by default all of them
+				:type limit: int
+			:rtype list of LedgerCharge
+		"""
+
+		return self._query_charges("status = ? AND created_at <= ?", (status, self.clock() - older_than), limit)
+
+	def pending_charges(self, older_than=0, limit=None):
+		"""
+			Returns the charges that are still pending, i.e.: to rollback the ones that the payers did not confirm within 10 minutes.
+
+			:param older_than: minimum age in seconds of the returned charges, since their creation
+				:type older_than: float
+			:param limit: maximum number of returned charges, by default all of them
+				:type limit: int
+			:rtype list of LedgerCharge
+		"""
+
+		return self.charges_by_status(LEDGER_STATUS_PENDING, older_than, limit)
+
+	def pending_sweep(self, older_than=0, limit=None):
+		"""
+			Returns the pending charges created by this ledger's BancardAPI, in the format of the charges of get_charge_statuses.
+
+			:param older_than: minimum age in seconds of the returned charges, since their creation
+				:type older_than: float
+			:param limit: maximum number of returned charges, by default all of them
+				:type limit: int
+			:return: a list of tuples: marketplace_charge_id, amount, currency
+				:rtype list
+		"""
+
+		return [(charge.marketplace_charge_id, charge.amount, charge.currency)
+			for charge in self.pending_charges(older_than, limit) if charge.amount is not None]
+
+	def count_by_status(self):
+		"""
+			Returns the number of charges of each status.
+
+			:rtype dict
+		"""
+
+		with self._lock:
+			self._flush()
+			return dict(self._connection.execute("SELECT status, COUNT(*) FROM bancard_charges GROUP BY status").fetchall())
+
+	def close(self):
+		"""
+			Writes the buffered events and closes the connection to the SQLite database.
+		"""
+
+		with self._lock:
+			if self._timer is not None:
+				self._timer.cancel()
+				self._timer = None
+			self._flush()
+			self._closed = True
+			self._connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -0,0 +1,257 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from bisect import bisect_left
+from bancardconnectorpython.constants import *
+
+
+def bancard_response_code(bancard_response):
+	"""
+		Returns the outcome of a parsed Bancard response: the response_code of a confirmation (i.e.: "00" or "51"),
+		the key of the first error message (i.e.: "PaymentNotFoundError"), or the status (i.e.: "success").
+
+		:param bancard_response: the JSON parsed response of a Bancard WebService
+			:type bancard_response: dict
+		:rtype str
+	"""
+
+	confirmation = bancard_response.get("confirmation")
+	if isinstance(confirmation, dict) and confirmation.get("response_code"):
+		return str(confirmation["response_code"])
+
+	bancard_tx_messages = bancard_response.get("messages")
+	if bancard_response.get("status") != "success" and isinstance(bancard_tx_messages, list) and bancard_tx_messages and isinstance(bancard_tx_messages[0], dict):
+		return str(bancard_tx_messages[0].get("key", "unknown"))
+
+	return str(bancard_response.get("status") or "unknown")
+
+
+class MetricsSink(object):
+	"""
+		Interface of the sinks that receive the metrics of the calls that a BancardAPI makes to the Bancard WebServices.
+		Every method is called from the thread (or asyncio task) that makes the call, so the sinks must be thread-safe and fast.
+		The metrics are disabled by default (the metrics option of the BancardAPI is None), which costs a single attribute check per call.
+	"""
+
+	def request_started(self, endpoint):
+		"""
+			Called right before every request (every retry and hedged group counts as one) is sent to the Bancard WebService.
+
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
+				:type endpoint: str
+		"""
+		pass
+
+	def request_finished(self, endpoint, elapsed, request_bytes, response_bytes, exception=None):
+		"""
+			Called when a request started with request_started finished, successfully or not.
+
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
+				:type endpoint: str
+			:param elapsed: seconds that the request took
+				:type elapsed: float
+			:param request_bytes: size of the body of the request
+				:type request_bytes: int
+			:param response_bytes: size of the body of the response, 0 if the request failed
+				:type response_bytes: int
+			:param exception: the exception that made the request fail, if any
+				:type exception: Exception
+		"""
+		pass
+
+	def response_received(self, endpoint, response_code):
+		"""
+			Called with the outcome of every Bancard response.
+
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
+				:type endpoint: str
+			:param response_code: the outcome as returned by bancard_response_code, i.e.: "00" or "PaymentNotFoundError"
+				:type response_code: str
+		"""
+		pass
+
+
+class Histogram(object):
+
+	__slots__ = ("buckets", "counts", "count", "sum")
+
+	def __init__(self, buckets):
+		"""
+			Constructor of the Histogram class, a cumulative histogram in the format of the Prometheus histograms.
+			It is not thread-safe by itself, the InMemoryMetricsSink serializes its updates.
+
+			:param buckets: the sorted upper bounds of the buckets, the +Inf bucket is implicit
+				:type buckets: tuple
+		"""
+		self.buckets = tuple(buckets)
+		self.counts = [0] * (len(self.buckets) + 1)
+		self.count = 0
+		self.sum = 0
+
+	def observe(self, value):
+		self.counts[bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.sum += value
+
+	def cumulative_counts(self):
+		"""
+			Returns the list of (upper_bound, cumulative_count) of every bucket, including the +Inf one.
+
+			:rtype list
+		"""
+
+		cumulative, total = list(), 0
+		for upper_bound, count in zip(self.buckets + (float("inf"),), self.counts):
+			total += count
+			cumulative.append((upper_bound, total))
+		return cumulative
+
+
+class InMemoryMetricsSink(MetricsSink):
+
+	def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS, size_buckets=DEFAULT_SIZE_BUCKETS):
+		"""
+			Constructor of the InMemoryMetricsSink class, a thread-safe MetricsSink that aggregates the metrics per endpoint in memory:
+				* latency: Histogram of the seconds of every request
+				* request_size / response_size: Histograms of the bytes of the bodies
+				* responses: counter of the responses by (endpoint, response_code)
+				* errors: counter of the failed requests by (endpoint, exception class name)
+				* in_flight: gauge of the requests in progress by endpoint
+			The metrics can be exported with prometheus_text.
+
+			:param latency_buckets: the upper bounds of the latency histograms, in seconds. The default value is: DEFAULT_LATENCY_BUCKETS
+				:type latency_buckets: tuple
+			:param size_buckets: the upper bounds of the size histograms, in bytes. The default value is: DEFAULT_SIZE_BUCKETS
+				:type size_buckets: tuple
+		"""
+		self.latency_buckets = tuple(latency_buckets)
+		self.size_buckets = tuple(size_buckets)
+		self.latency = dict()
+		self.request_size = dict()
+		self.response_size = dict()
+		self.responses = dict()
+		self.errors = dict()
+		self.in_flight = dict()
+		self._lock = threading.Lock()
+
+	def request_started(self, endpoint):
+		with self._lock:
+			self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+
+	def request_finished(self, endpoint, elapsed, request_bytes, response_bytes, exception=None):
+		with self._lock:
+			self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) - 1
+			if endpoint not in self.latency:
+				self.latency[endpoint] = Histogram(self.latency_buckets)
+				self.request_size[endpoint] = Histogram(self.size_buckets)
+				self.response_size[endpoint] = Histogram(self.size_buckets)
+			self.latency[endpoint].observe(elapsed)
+			self.request_size[endpoint].observe(request_bytes)
+			if exception is None:
+				self.response_size[endpoint].observe(response_bytes)
+			else:
+				key = (endpoint, exception.__class__.__name__)
+				self.errors[key] = self.errors.get(key, 0) + 1
+
+	def response_received(self, endpoint, response_code):
+		key = (endpoint, response_code)
+		with self._lock:
+			self.responses[key] = self.responses.get(key, 0) + 1
+
+	def reset(self):
+		"""
+			Removes every recorded metric, except the in-flight gauges.
+		"""
+
+		with self._lock:
+			self.latency.clear()
+			self.request_size.clear()
+			self.response_size.clear()
+			self.responses.clear()
+			self.errors.clear()
+
+	def prometheus_text(self, prefix="bancard"):
+		"""
+			Exports the metrics in the Prometheus text exposition format (served with the PROMETHEUS_CONTENT_TYPE content type).
+
+			:param prefix: the prefix of the metric names. The default value is: bancard
+				:type prefix: str
+			:rtype str
+		"""
+
+		lines = list()
+		with self._lock:
+			histograms_text(lines, "%s_request_duration_seconds" % prefix, "Seconds of the requests to the Bancard WebServices.", self.latency)
+			histograms_text(lines, "%s_request_size_bytes" % prefix, "Bytes of the bodies of the requests to the Bancard WebServices.", self.request_size)
+			histograms_text(lines, "%s_response_size_bytes" % prefix, "Bytes of the bodies of the responses of the Bancard WebServices.", self.response_size)
+
+			lines.append("# HELP %s_responses_total Responses of the Bancard WebServices by response code." % prefix)
+			lines.append("# TYPE %s_responses_total counter" % prefix)
+			for (endpoint, response_code), count in sorted(self.responses.items()):
+				lines.append('%s_responses_total{endpoint="%s",response_code="%s"} %d' % (prefix, _escape(endpoint), _escape(response_code), count))
+
+			lines.append("# HELP %s_request_errors_total Failed requests to the Bancard WebServices by exception." % prefix)
+			lines.append("# TYPE %s_request_errors_total counter" % prefix)
+			for (endpoint, exception_name), count in sorted(self.errors.items()):
+				lines.append('%s_request_errors_total{endpoint="%s",exception="%s"} %d' % (prefix, _escape(endpoint), _escape(exception_name), count))
+
+			lines.append("# HELP %s_requests_in_flight Requests to the Bancard WebServices in progress." % prefix)
+			lines.append("# TYPE %s_requests_in_flight gauge" % prefix)
+			for endpoint, count in sorted(self.in_flight.items()):
+				lines.append('%s_requests_in_flight{endpoint="%s"} %d' % (prefix, _escape(endpoint), count))
+		return "\n".join(lines) + "\n"
+
+
+def _escape(label_value):
+	return label_value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_number(value):
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if not float(value).is_integer() else "%d" % value
+
+
+def histograms_text(lines, name, help_text, histograms):
+	"""
+		Appends the Prometheus text exposition of a histogram metric, with one series per endpoint, to lines.
+
+		:param lines: the lines of the exposition
+			:type lines: list
+		:param name: the name of the metric
+			:type name: str
+		:param help_text: the description of the metric
+			:type help_text: str
+		:param histograms: the Histogram of every endpoint
+			:type histograms: dict
+	"""
+
+	lines.append("# HELP %s %s" % (name, help_text))
+	lines.append("# TYPE %s histogram" % name)
+	for endpoint, histogram in sorted(histograms.items()):
+		endpoint_label = _escape(endpoint)
+		for upper_bound, count in histogram.cumulative_counts():
+			lines.append('%s_bucket{endpoint="%s",le="%s"} %d' % (name, endpoint_label, _format_number(upper_bound), count))
+		lines.append('%s_sum{endpoint="%s"} %s' % (name, endpoint_label, _format_number(histogram.sum)))
+		lines.append('%s_count{endpoint="%s"} %d' % (name, endpoint_label, histogram.count))
@@ -0,0 +1,132 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.results import BancardResult
+
+# the decline of every response code of Bancard: (decline reason, exception, message). "00" is the approved one and the missing ones are unknown declines.
+RESPONSE_CODE_DECLINES = {
+	"05": (DECLINE_PAYMENT_METHOD_NOT_ENABLED, BancardAPIPaymentMethodNotEnabledException, "Bancard reported that the payer's payment method was not enabled for making payments."),
+	"15": (DECLINE_PAYMENT_METHOD_NOT_ENABLED, BancardAPIPaymentMethodNotEnabledException, "Bancard reported that the payer's payment method was not enabled for making payments."),
+	"12": (DECLINE_TRANSACTION_INVALID, BancardAPIPaymentTransactionInvalidException, "Bancard reported that the transaction is not valid."),
+	"51": (DECLINE_NOT_ENOUGH_FUNDS, BancardAPIPaymentMethodNotEnoughFundsException, "Bancard reported that your payment card does not have enough funds."),
+}
+UNKNOWN_DECLINE = (DECLINE_UNKNOWN_REASON, BancardAPIPaymentRejectecUnknownReasonException, "Bancard reported that the payment has been rejected.")
+APPROVED_RESPONSE_CODE = "00"
+
+
+class ChargeOutcome(BancardResult):
+
+	__slots__ = ("approved", "authorization_number", "bancard_response", "status", "response_code", "decline_reason", "message", "_exception_class")
+
+	_fields = ("approved", "authorization_number", "bancard_response")
+
+	def __init__(self, status, response_code=None, authorization_number=None, bancard_response=None, decline_reason=None, message=None, exception_class=None):
+		"""
+			Constructor of the ChargeOutcome class, the result of get_charge_status, process_vpos_webhook and verify_vpos_webhook
+			in the outcome_mode: an ordinary decline is returned instead of raised. Like the other result objects, it can be unpacked
+			as the tuple (approved, authorization_number, bancard_response).
+
+			:param status: any of OUTCOME_APPROVED, OUTCOME_PENDING or OUTCOME_DECLINED
+				:type status: str
+			:param response_code: the response code of Bancard, if any
+				:type response_code: str
+			:param authorization_number: the authorization number of the payment, if it has been approved
+				:type authorization_number: str
+			:param bancard_response: the full JSON response of Bancard (or the webhook data), only if the keep_bancard_response option is enabled
+				:type bancard_response: dict
+			:param decline_reason: any of the DECLINE_* constants, if the payment has been declined
+				:type decline_reason: str
+			:param message: the description of the decline
+				:type message: str
+			:param exception_class: the BancardAPIPaymentRejectecException that the decline raises out of the outcome_mode
+				:type exception_class: type
+		"""
+		self.approved = status == OUTCOME_APPROVED
+		self.authorization_number = authorization_number
+		self.bancard_response = bancard_response
+		self.status = status
+		self.response_code = response_code
+		self.decline_reason = decline_reason
+		self.message = message
+		self._exception_class = exception_class
+
+	@staticmethod
+	def of_response_code(response_code, authorization_number=None, bancard_response=None):
+		"""
+			Returns the outcome of a response code of Bancard, as defined by RESPONSE_CODE_DECLINES.
+
+			:rtype ChargeOutcome
+		"""
+
+		if response_code == APPROVED_RESPONSE_CODE:
+			return ChargeOutcome(OUTCOME_APPROVED, response_code, authorization_number, bancard_response)
+		decline_reason, exception_class, message = RESPONSE_CODE_DECLINES.get(response_code, UNKNOWN_DECLINE)
+		return ChargeOutcome(OUTCOME_DECLINED, response_code, None, bancard_response, decline_reason, message, exception_class)
+
+	@staticmethod
+	def declined(message, bancard_response=None):
+		"""
+			Returns the outcome of a payment that Bancard declined without a response code.
+
+			:rtype ChargeOutcome
+		"""
+
+		return ChargeOutcome(OUTCOME_DECLINED, None, None, bancard_response, DECLINE_UNKNOWN_REASON, message, UNKNOWN_DECLINE[1])
+
+	@property
+	def pending(self):
+		return self.status == OUTCOME_PENDING
+
+	@property
+	def is_declined(self):
+		return self.status == OUTCOME_DECLINED
+
+	def exception(self, data=None):
+		"""
+			Returns the exception of a declined payment, the one that is raised out of the outcome_mode.
+
+			:param data: the data of the exception. By default the bancard_response of the outcome
+				:type data: dict
+			:return: the exception, or None if the payment has not been declined
+				:rtype BancardAPIPaymentRejectecException
+		"""
+
+		if not self.is_declined:
+			return None
+		return self._exception_class(self.message, data if data is not None else self.bancard_response)
+
+	def raise_for_decline(self):
+		"""
+			Raises the exception of a declined payment, if it has been declined.
+
+			:raises BancardAPIPaymentRejectecException: if the payment has been declined
+		"""
+
+		if self.is_declined:
+			raise self.exception()
+
+	def __repr__(self):
+		return "ChargeOutcome(status=%r, response_code=%r, decline_reason=%r, authorization_number=%r)" % (
+			self.status, self.response_code, self.decline_reason, self.authorization_number)
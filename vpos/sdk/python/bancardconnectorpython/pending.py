@@ -0,0 +1,131 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class PendingCharge(object):
+
+	def __init__(self, marketplace_charge_id, confirm_token, amount, currency, created_at, signer=None):
+		"""
+			Constructor of the PendingCharge class, the data of a created charge that is required to verify its Bancard webhook.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: str
+			:param confirm_token: the token that Bancard must send in the webhook of this charge
+				:type confirm_token: str
+			:param amount: The amount that the payer should pay
+				:type amount: Decimal
+			:param currency: The currency of the amount to charge in the format ISO-4217
+				:type currency: str
+			:param created_at: time in seconds when the charge was indexed
+				:type created_at: float
+			:param signer: the signer that computed the confirm_token, if known
+				:type signer: BancardTokenSigner
+		"""
+		self.marketplace_charge_id = marketplace_charge_id
+		self.confirm_token = confirm_token
+		self.amount = amount
+		self.currency = currency
+		self.created_at = created_at
+		self.signer = signer
+
+	def __repr__(self):
+		return "PendingCharge(marketplace_charge_id=%r, amount=%r, currency=%r)" % (self.marketplace_charge_id, self.amount, self.currency)
+
+
+class PendingChargeIndex(object):
+
+	def __init__(self, maxsize, max_age, clock=time.time):
+		"""
+			Constructor of the PendingChargeIndex class, a thread-safe and size-bounded in-memory index of the charges that
+			are waiting for their Bancard webhook, keyed by marketplace_charge_id.
+
+			:param maxsize: maximum number of charges, the oldest charge is evicted when it is exceeded
+				:type maxsize: int
+			:param max_age: seconds after which a charge is evicted
+				:type max_age: float
+			:param clock: function that returns the current time in seconds
+				:type clock: callable
+		"""
+		self.maxsize = maxsize
+		self.max_age = max_age
+		self.clock = clock
+		self._charges = OrderedDict()  # sorted from the oldest to the newest charge
+		self._lock = threading.Lock()
+
+	def _evict_expired(self, now):
+		"""
+			Evicts the charges older than max_age. It must be called holding the lock.
+		"""
+		while self._charges:
+			oldest = next(iter(self._charges.values()))
+			if now - oldest.created_at < self.max_age:
+				break
+			self._charges.popitem(last=False)
+
+	def add(self, marketplace_charge_id, confirm_token, amount, currency, signer=None):
+		"""
+			Indexes a charge that is waiting for its Bancard webhook.
+
+			:return: the indexed charge
+				:rtype PendingCharge
+		"""
+
+		key = str(marketplace_charge_id)
+		with self._lock:
+			now = self.clock()
+			pending_charge = PendingCharge(key, confirm_token, amount, currency, now, signer)
+			self._charges.pop(key, None)
+			self._charges[key] = pending_charge
+			self._evict_expired(now)
+			while len(self._charges) > self.maxsize:
+				self._charges.popitem(last=False)
+		return pending_charge
+
+	def get(self, marketplace_charge_id):
+		"""
+			Returns the pending charge of the marketplace_charge_id, or None if it is unknown or expired.
+
+			:rtype PendingCharge
+		"""
+
+		with self._lock:
+			pending_charge = self._charges.get(str(marketplace_charge_id))
+			if pending_charge is not None and self.clock() - pending_charge.created_at >= self.max_age:
+				del self._charges[pending_charge.marketplace_charge_id]
+				return None
+			return pending_charge
+
+	def discard(self, marketplace_charge_id):
+		"""
+			Evicts the charge of the marketplace_charge_id, if any.
+		"""
+
+		with self._lock:
+			self._charges.pop(str(marketplace_charge_id), None)
+
+	def __len__(self):
+		return len(self._charges)
@@ -0,0 +1,311 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+
+# priority of the Bancard requests of the current thread or asyncio task
+_rate_limit_priority = ContextVar("bancard_rate_limit_priority", default=RATE_LIMIT_PRIORITY_LIVE)
+
+
+@contextmanager
+def rate_limit_priority(priority):
+	"""
+		Sends the Bancard requests of the with block with the given priority, i.e.: RATE_LIMIT_PRIORITY_BATCH for a reconciliation.
+		The requests are sent with RATE_LIMIT_PRIORITY_LIVE by default.
+
+		:param priority: RATE_LIMIT_PRIORITY_LIVE or RATE_LIMIT_PRIORITY_BATCH
+			:type priority: str
+	"""
+
+	token = _rate_limit_priority.set(priority)
+	try:
+		yield
+	finally:
+		_rate_limit_priority.reset(token)
+
+
+def with_rate_limit_priority(function, priority):
+	"""
+		Wraps function so that its Bancard requests are sent with the given priority, even when it is called by a worker thread.
+
+		:param function: the function to wrap
+			:type function: callable
+		:param priority: RATE_LIMIT_PRIORITY_LIVE or RATE_LIMIT_PRIORITY_BATCH
+			:type priority: str
+		:return: the wrapped function
+			:rtype callable
+	"""
+
+	def call_with_priority(*args):
+		with rate_limit_priority(priority):
+			return function(*args)
+
+	return call_with_priority
+
+
+class RateLimiter(object):
+
+	def __init__(self, rates, live_reserve=DEFAULT_RATE_LIMIT_LIVE_RESERVE, max_wait=DEFAULT_RATE_LIMIT_MAX_WAIT, batch_max_wait=None, clock=time.time, sleep=time.sleep):
+		"""
+			Constructor of the RateLimiter class, a token bucket per Bancard WebService shared by the threads of this process.
+			Every request to Bancard takes a token of its endpoint. The batch requests never take the last live_reserve tokens
+			of a bucket, so the live requests (i.e.: the checkouts) get through while a reconciliation is running.
+
+			:param rates: the requests per second of every endpoint key (i.e.: {CONFIRMATIONS_KEY: 10, ROLLBACK_KEY: 2}), or a tuple
+				(requests per second, burst). By default the burst is one second of requests. The missing endpoints are not limited.
+				:type rates: dict
+			:param live_reserve: fraction (between 0 and 1) of the burst of every endpoint that the batch requests never take
+				:type live_reserve: float
+			:param max_wait: maximum seconds that a live request waits for a token
+				:type max_wait: float
+			:param batch_max_wait: maximum seconds that a batch request waits for a token. By default it waits as long as needed.
+				:type batch_max_wait: float
+			:param clock: function that returns the current time in seconds, shared by every process (i.e.: time.time)
+				:type clock: callable
+			:param sleep: function that waits the given seconds
+				:type sleep: callable
+			:raises BancardAPIConfigurationException: if any of the rates or the live_reserve is not valid
+		"""
+		if not 0 <= live_reserve < 1:
+			raise BancardAPIConfigurationException("The live_reserve of the RateLimiter must be between 0 and 1.")
+
+		self.buckets = dict()  # endpoint -> (requests per second, burst, tokens reserved for the live requests)
+		for endpoint, rate in rates.items():
+			requests_per_second, burst = tuple(rate) if isinstance(rate, (tuple, list)) else (rate, max(float(rate), 1.0))
+			if requests_per_second <= 0 or burst < 1:
+				raise BancardAPIConfigurationException("The rate of %s must be greater than 0 requests per second, with a burst of at least 1." % endpoint)
+			self.buckets[endpoint] = (float(requests_per_second), float(burst), int(burst * live_reserve))
+		self.max_waits = {RATE_LIMIT_PRIORITY_LIVE: max_wait, RATE_LIMIT_PRIORITY_BATCH: batch_max_wait}
+		self.clock = clock
+		self.sleep = sleep
+		self._states = dict()  # endpoint -> (tokens, updated_at)
+		self._lock = threading.Lock()
+
+	def _refill(self, endpoint, state, now):
+		"""
+			Returns the tokens of the bucket state (tokens, updated_at) of the endpoint at the given time. A missing state is a full bucket.
+
+			:rtype float
+		"""
+
+		requests_per_second, burst, _ = self.buckets[endpoint]
+		if state is None:
+			return burst
+		return min(burst, state[0] + max(now - state[1], 0) * requests_per_second)
+
+	def _take_from(self, endpoint, state, priority, now):
+		"""
+			Refills the bucket state of the endpoint and takes one token of it, if there is one for the priority.
+
+			:return: the new state, and the seconds to wait for the token or 0 if it has been taken
+				:rtype tuple
+		"""
+
+		requests_per_second, _, live_reserve = self.buckets[endpoint]
+		tokens = self._refill(endpoint, state, now)
+		required = 1 + (live_reserve if priority == RATE_LIMIT_PRIORITY_BATCH else 0)
+		if tokens >= required:
+			return (tokens - 1, now), 0
+		return (tokens, now), (required - tokens) / requests_per_second
+
+	def _take(self, endpoint, priority):
+		"""
+			Takes one token of the bucket of the endpoint, if there is one for the priority.
+
+			:return: the seconds to wait for the token, or 0 if it has been taken
+				:rtype float
+		"""
+
+		with self._lock:
+			self._states[endpoint], wait = self._take_from(endpoint, self._states.get(endpoint), priority, self.clock())
+		return wait
+
+	def _next_wait(self, endpoint, priority, started_at, deadline_at):
+		"""
+			Takes one token or returns the seconds to wait before trying again.
+
+			:rtype float
+			:raises BancardAPIRateLimitedException: if the token would not be available within the maximum wait of the priority or the deadline
+		"""
+
+		wait = self._take(endpoint, priority)
+		if wait == 0:
+			return 0
+		now = self.clock()
+		max_wait = self.max_waits.get(priority)
+		if (max_wait is not None and now + wait - started_at > max_wait) or (deadline_at is not None and now + wait > deadline_at):
+			raise BancardAPIRateLimitedException("The client-side rate limit of the %s Bancard WebService has been exceeded." % endpoint)
+		return wait
+
+	def acquire(self, endpoint, priority=None, deadline_at=None):
+		"""
+			Waits until the endpoint has a token for the priority and takes it.
+
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
+				:type endpoint: str
+			:param priority: RATE_LIMIT_PRIORITY_LIVE or RATE_LIMIT_PRIORITY_BATCH. By default the one of rate_limit_priority.
+				:type priority: str
+			:param deadline_at: time at which the waiting must stop, i.e.: the deadline of the operation
+				:type deadline_at: float
+			:return: the seconds waited
+				:rtype float
+			:raises BancardAPIRateLimitedException: if the token would not be available within the maximum wait of the priority or the deadline
+		"""
+
+		if endpoint not in self.buckets:
+			return 0.0
+		priority = priority or _rate_limit_priority.get()
+		started_at = self.clock()
+		while True:
+			wait = self._next_wait(endpoint, priority, started_at, deadline_at)
+			if wait == 0:
+				return self.clock() - started_at
+			self.sleep(wait)
+
+	async def acquire_async(self, endpoint, priority=None, deadline_at=None):
+		"""
+			asyncio version of acquire: the waiting does not block the event loop.
+		"""
+
+		import asyncio
+
+		if endpoint not in self.buckets:
+			return 0.0
+		priority = priority or _rate_limit_priority.get()
+		started_at = self.clock()
+		while True:
+			wait = self._next_wait(endpoint, priority, started_at, deadline_at)
+			if wait == 0:
+				return self.clock() - started_at
+			await asyncio.sleep(wait)
+
+	def available(self, endpoint):
+		"""
+			Returns the tokens currently available in the bucket of the endpoint, for both priorities.
+
+			:rtype float
+		"""
+
+		return self._refill(endpoint, self._state_of(endpoint), self.clock())
+
+	def _state_of(self, endpoint):
+		with self._lock:
+			return self._states.get(endpoint)
+
+	def close(self):
+		pass
+
+
+class FileRateLimiter(RateLimiter):
+
+	def __init__(self, path, rates, live_reserve=DEFAULT_RATE_LIMIT_LIVE_RESERVE, max_wait=DEFAULT_RATE_LIMIT_MAX_WAIT, batch_max_wait=None, clock=time.time, sleep=time.sleep):
+		"""
+			Constructor of the FileRateLimiter class, a RateLimiter whose buckets are shared by every process of the host
+			(i.e.: the gunicorn workers) through a small state file locked with flock. It requires a POSIX operating system.
+
+			:param path: the state file, shared by every process with the same rates. It is created if it does not exist.
+				:type path: str
+			:param rates: as in RateLimiter
+				:type rates: dict
+			:raises BancardAPIConfigurationException: if flock is not available, or any of the rates or the live_reserve is not valid
+		"""
+		try:
+			import fcntl
+		except ImportError:
+			raise BancardAPIConfigurationException("The FileRateLimiter requires a POSIX operating system.")
+
+		RateLimiter.__init__(self, rates, live_reserve=live_reserve, max_wait=max_wait, batch_max_wait=batch_max_wait, clock=clock, sleep=sleep)
+		self.path = path
+		self._fcntl = fcntl
+		self._fd = None
+		self._pid = None
+
+	def _file(self):
+		"""
+			Returns the file descriptor of the state file, opened again after a fork: the flock of an inherited descriptor would be shared.
+		"""
+
+		if self._pid != os.getpid():
+			self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+			self._pid = os.getpid()
+		return self._fd
+
+	def _take(self, endpoint, priority):
+		with self._lock:
+			fd = self._file()
+			self._fcntl.flock(fd, self._fcntl.LOCK_EX)
+			try:
+				states = self._read_states(fd)
+				states[endpoint], wait = self._take_from(endpoint, states.get(endpoint), priority, self.clock())
+				content = json.dumps(states, separators=(",", ":")).encode("utf-8")
+				os.lseek(fd, 0, os.SEEK_SET)
+				os.write(fd, content)
+				os.ftruncate(fd, len(content))
+			finally:
+				self._fcntl.flock(fd, self._fcntl.LOCK_UN)
+		return wait
+
+	@staticmethod
+	def _read_states(fd):
+		"""
+			Returns the bucket states of the state file. An empty or corrupted file means full buckets.
+
+			:rtype dict
+		"""
+
+		os.lseek(fd, 0, os.SEEK_SET)
+		content = b""
+		while True:
+			chunk = os.read(fd, 65536)
+			if not chunk:
+				break
+			content += chunk
+		try:
+			return dict((endpoint, tuple(state)) for endpoint, state in json.loads(content.decode("utf-8")).items())
+		except (ValueError, TypeError, AttributeError):
+			return dict()
+
+	def _state_of(self, endpoint):
+		with self._lock:
+			fd = self._file()
+			self._fcntl.flock(fd, self._fcntl.LOCK_SH)
+			try:
+				return self._read_states(fd).get(endpoint)
+			finally:
+				self._fcntl.flock(fd, self._fcntl.LOCK_UN)
+
+	def close(self):
+		"""
+			Closes the state file of this process. The state file is left on the disk for the other processes.
+		"""
+		with self._lock:
+			if self._fd is not None and self._pid == os.getpid():
+				os.close(self._fd)
+			self._fd, self._pid = None, None
@@ -0,0 +1,297 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import csv
+import json
+import time
+import itertools
+from decimal import Decimal, InvalidOperation
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.outcomes import ChargeOutcome
+from bancardconnectorpython.ratelimit import rate_limit_priority
+
+
+def read_charges(lines, input_format=None, currency="PYG"):
+	"""
+		Streams the charges to reconcile from CSV or NDJSON lines without loading the whole input.
+		The CSV input requires a header with the columns marketplace_charge_id, amount and optionally currency.
+		The NDJSON input requires one object per line with the same keys.
+
+		:param lines: iterable of text lines, i.e.: an open file or sys.stdin
+			:type lines: iterable
+		:param input_format: RECONCILE_FORMAT_CSV or RECONCILE_FORMAT_NDJSON. By default it is detected from the first line.
+			:type input_format: str
+		:param currency: the currency of the charges without one
+			:type currency: str
+		:return: a generator of tuples (marketplace_charge_id, amount, currency). The invalid values are yielded as they are,
+			so get_charge_status reports them as an invalid parameter of their own row.
+			:rtype generator
+		:raises BancardAPIInvalidParameterException: if the input_format is not valid, or the input is not valid CSV/NDJSON
+	"""
+
+	lines = iter(lines)
+	if input_format is None:
+		for first_line in lines:
+			if first_line.strip():
+				input_format = RECONCILE_FORMAT_NDJSON if first_line.lstrip().startswith("{") else RECONCILE_FORMAT_CSV
+				lines = itertools.chain([first_line], lines)
+				break
+		else:
+			return iter(())
+
+	if input_format == RECONCILE_FORMAT_CSV:
+		return _read_csv_charges(lines, currency)
+	if input_format == RECONCILE_FORMAT_NDJSON:
+		return _read_ndjson_charges(lines, currency)
+	raise BancardAPIInvalidParameterException("The input format must be %s or %s." % (RECONCILE_FORMAT_CSV, RECONCILE_FORMAT_NDJSON))
+
+
+def _to_amount(amount):
+	"""
+		Returns the amount as a Decimal, or as it is if it is not a number.
+	"""
+
+	try:
+		return Decimal(amount) if isinstance(amount, (str, int)) and not isinstance(amount, bool) else amount
+	except InvalidOperation:
+		return amount
+
+
+def _read_csv_charges(lines, currency):
+	"""
+		Generator that implements read_charges for the CSV input.
+	"""
+
+	reader = csv.reader(lines)
+	header = next(reader, None)
+	if header is None:
+		return
+	columns = dict((name.strip(), position) for position, name in enumerate(header))
+	if "marketplace_charge_id" not in columns or "amount" not in columns:
+		raise BancardAPIInvalidParameterException("The CSV input requires the columns: marketplace_charge_id amount")
+
+	id_column, amount_column, currency_column = columns["marketplace_charge_id"], columns["amount"], columns.get("currency", None)
+	for row in reader:
+		if not row:
+			continue
+		row_currency = row[currency_column] if currency_column is not None and currency_column < len(row) else None
+		yield (row[id_column] if id_column < len(row) else None, _to_amount(row[amount_column]) if amount_column < len(row) else None, row_currency or currency)
+
+
+def _read_ndjson_charges(lines, currency):
+	"""
+		Generator that implements read_charges for the NDJSON input.
+	"""
+
+	for line_number, line in enumerate(lines, 1):
+		if not line.strip():
+			continue
+		try:
+			charge = json.loads(line, parse_float=Decimal)
+		except ValueError:
+			raise BancardAPIInvalidParameterException("The line %d of the NDJSON input is not valid JSON." % line_number)
+		if not isinstance(charge, dict):
+			raise BancardAPIInvalidParameterException("The line %d of the NDJSON input is not a JSON object." % line_number)
+		yield charge.get("marketplace_charge_id", None), _to_amount(charge.get("amount", None)), charge.get("currency", None) or currency
+
+
+class ReconcileCheckpoint(object):
+
+	def __init__(self, path=None):
+		"""
+			Constructor of the ReconcileCheckpoint class, the progress of a reconciliation so a crashed run resumes without
+			checking again the charges that are already in the output. Its size does not depend on the size of the input:
+			it keeps a watermark (every row before it is finished) and the few rows after it that finished out of order.
+
+			:param path: the JSON file where the checkpoint is saved. If it exists, the checkpoint is loaded from it.
+				By default the checkpoint is only kept in memory.
+				:type path: str
+			:raises BancardAPIInvalidParameterException: if the checkpoint file is not valid
+		"""
+		self.path = path
+		self.watermark = 0
+		self.completed = set()
+		self.output_offset = None  # bytes of the output when the checkpoint was saved, if the output is a file
+		if path is not None and os.path.exists(path):
+			self._load()
+
+	def _load(self):
+		try:
+			with open(self.path, "r") as checkpoint_file:
+				checkpoint = json.load(checkpoint_file)
+			self.watermark = int(checkpoint["watermark"])
+			self.completed = set(int(index) for index in checkpoint["completed"])
+			self.output_offset = checkpoint.get("output_offset", None)
+		except (KeyError, ValueError, TypeError):
+			raise BancardAPIInvalidParameterException("The reconcile checkpoint %s is not valid." % self.path)
+
+	@property
+	def finished(self):
+		"""
+			Returns the number of finished rows.
+
+			:rtype int
+		"""
+		return self.watermark + len(self.completed)
+
+	def is_finished(self, index):
+		"""
+			Returns True if the row of the input has already been written to the output.
+
+			:param index: position of the row in the input
+				:type index: int
+			:rtype bool
+		"""
+		return index < self.watermark or index in self.completed
+
+	def finish(self, index):
+		"""
+			Marks a row of the input as written to the output.
+
+			:param index: position of the row in the input
+				:type index: int
+		"""
+		self.completed.add(index)
+		while self.watermark in self.completed:
+			self.completed.remove(self.watermark)
+			self.watermark += 1
+
+	def save(self, output_offset=None):
+		"""
+			Atomically replaces the checkpoint file, if any. The output must have been flushed before.
+
+			:param output_offset: bytes written to the output file, so a resumed run can drop the results written after this checkpoint
+				:type output_offset: int
+		"""
+		self.output_offset = output_offset
+		if self.path is None:
+			return
+
+		temporary_path = "%s.tmp" % self.path
+		with open(temporary_path, "w") as checkpoint_file:
+			json.dump({"watermark": self.watermark, "completed": sorted(self.completed), "output_offset": output_offset}, checkpoint_file)
+			checkpoint_file.flush()
+			os.fsync(checkpoint_file.fileno())
+		os.replace(temporary_path, self.path)
+
+
+def _result_record(bulk_result):
+	"""
+		Returns the NDJSON record of the BulkResult of one get_charge_status call, whose request is (index, marketplace_charge_id, amount, currency).
+	"""
+
+	index, marketplace_charge_id, amount, currency = bulk_result.request
+	record = {
+		"index": index, "marketplace_charge_id": marketplace_charge_id, "amount": str(amount) if amount is not None else None, "currency": currency,
+		"status": None, "authorization_number": None, "response_code": None, "decline_reason": None, "error": None,
+	}
+
+	result = bulk_result.result
+	if not bulk_result.ok:
+		if isinstance(bulk_result.exception, BancardAPIPaymentRejectecException):
+			record["status"] = OUTCOME_DECLINED
+		else:
+			record["status"] = RECONCILE_STATUS_ERROR
+		record["error"] = "%s: %s" % (type(bulk_result.exception).__name__, bulk_result.exception)
+	elif isinstance(result, ChargeOutcome):
+		record.update(status=result.status, authorization_number=result.authorization_number, response_code=result.response_code,
+			decline_reason=result.decline_reason, error=result.message)
+	else:
+		already_payed, authorization_number = result[0], result[1]
+		record.update(status=OUTCOME_APPROVED if already_payed else OUTCOME_PENDING, authorization_number=authorization_number)
+	return record
+
+
+def _output_offset(output):
+	"""
+		Flushes the output to the disk and returns its size in bytes, or None if it is not a regular file (i.e.: a pipe).
+	"""
+
+	output.flush()
+	try:
+		os.fsync(output.fileno())
+	except (AttributeError, OSError, IOError, ValueError):
+		pass  # it is not a file on the disk
+	try:
+		return output.tell()
+	except (AttributeError, OSError, IOError, ValueError):
+		return None
+
+
+def reconcile_charges(bancard_api, charges, output, checkpoint=None, max_workers=DEFAULT_BULK_MAX_WORKERS,
+					checkpoint_every=DEFAULT_RECONCILE_CHECKPOINT_EVERY, checkpoint_interval=DEFAULT_RECONCILE_CHECKPOINT_INTERVAL, clock=time.time):
+	"""
+		Checks the status of every charge with get_charge_status with a bounded number of simultaneous calls, and writes one
+		NDJSON record per charge to the output as soon as it completes, with the keys: index, marketplace_charge_id, amount,
+		currency, status (OUTCOME_APPROVED, OUTCOME_PENDING, OUTCOME_DECLINED or RECONCILE_STATUS_ERROR), authorization_number,
+		response_code, decline_reason and error. The charges are consumed lazily, so the memory does not depend on the input size.
+
+		:param bancard_api: the BancardAPI that checks the charges, preferably with the outcome_mode option enabled
+			:type bancard_api: BancardAPI
+		:param charges: iterable of tuples (marketplace_charge_id, amount, currency), i.e.: the generator of read_charges
+			:type charges: iterable
+		:param output: binary file where the NDJSON records are written
+			:type output: file
+		:param checkpoint: the progress of a previous run. Its finished rows are skipped and it is saved periodically.
+			:type checkpoint: ReconcileCheckpoint
+		:param max_workers: maximum number of simultaneous calls to the confirmations Bancard WebService
+			:type max_workers: int
+		:param checkpoint_every: results written between two checkpoints
+			:type checkpoint_every: int
+		:param checkpoint_interval: maximum seconds between two checkpoints
+			:type checkpoint_interval: float
+		:param clock: function that returns the current time in seconds
+			:type clock: callable
+		:return: the number of written records of every status
+			:rtype dict
+		:raises BancardAPIInvalidParameterException: if max_workers is not valid, or the input is not valid
+	"""
+
+	from bancardconnectorpython.bulk import run_bulk  # the thread pools are imported only by the bulk operations
+
+	checkpoint = checkpoint if checkpoint is not None else ReconcileCheckpoint()
+	counts = dict()
+
+	def get_charge_status(index, marketplace_charge_id, amount, currency):
+		with rate_limit_priority(RATE_LIMIT_PRIORITY_BATCH):
+			return bancard_api.get_charge_status(marketplace_charge_id, amount, currency)
+
+	requests = ((index,) + tuple(charge) for index, charge in enumerate(charges) if not checkpoint.is_finished(index))
+	unsaved, saved_at = 0, clock()
+	try:
+		for bulk_result in run_bulk(get_charge_status, requests, max_workers=max_workers, ordered=False):
+			record = _result_record(bulk_result)
+			output.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+			checkpoint.finish(record["index"])
+			counts[record["status"]] = counts.get(record["status"], 0) + 1
+
+			unsaved += 1
+			if unsaved >= checkpoint_every or clock() - saved_at >= checkpoint_interval:
+				checkpoint.save(_output_offset(output))
+				unsaved, saved_at = 0, clock()
+	finally:
+		# the records written so far are always kept, even if the input was not valid or the run was interrupted
+		checkpoint.save(_output_offset(output))
+	return counts
@@ -0,0 +1,244 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.util import merge_dict
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.api import BancardAPI
+from bancardconnectorpython.signer import BancardTokenSigner
+from bancardconnectorpython.transport import BancardTransport
+
+
+class BancardAPIRegistry(object):
+
+	def __init__(self, options=None, loader=None, **kwargs):
+		"""
+			Constructor of the BancardAPIRegistry class, a thread-safe registry of the BancardAPI of many merchants (commerce accounts),
+			keyed by merchant id. The BancardAPI of every merchant is created on its first use, and all the merchants of the same
+			environment share one connection pool and the BancardTokenSigner of their private key.
+
+			:param options: the BancardAPI options shared by every merchant (i.e.: environment, pool_maxsize, read_timeout)
+				:type options: dict
+			:param loader: function that receives an unregistered merchant id and returns its BancardAPI options (at least public_key
+				and private_key), or None if the merchant does not exist. It is called without holding any lock (i.e.: it can query a DB).
+				:type loader: callable
+			:param kwargs: any extra option shared by every merchant
+				:type kwargs: dict
+		"""
+		self.options = merge_dict(options or {}, kwargs)
+		self.loader = loader
+		self._configurations = dict()  # merchant id -> options of the merchant
+		self._apis = dict()  # merchant id -> BancardAPI
+		self._transports = dict()  # environment -> shared BancardTransport
+		self._signers = dict()  # (environment, private_key) -> shared BancardTokenSigner
+		self._lock = threading.Lock()
+		self.closed = False
+
+	def _merchant_options(self, merchant_options):
+		return merge_dict(self.options, merchant_options)
+
+	@staticmethod
+	def _signer_key(options):
+		return options.get("environment", ENVIRONMENT_SANDBOX), options["private_key"]
+
+	def _prune_signers(self):
+		"""
+			Forgets the signers that no BancardAPI of the registry uses anymore. It must be called holding the lock.
+		"""
+
+		signer_keys = set(self._signer_key(self._merchant_options(self._configurations[merchant_id])) for merchant_id in self._apis)
+		for signer_key in list(self._signers):
+			if signer_key not in signer_keys:
+				del self._signers[signer_key]
+
+	def _create_api(self, merchant_options):
+		"""
+			Creates the BancardAPI of a merchant with the shared transport and signer of its environment. It must be called holding the lock.
+
+			:rtype BancardAPI
+			:raises BancardAPIConfigurationException: if the registry is closed or the options of the merchant are not valid
+		"""
+
+		if self.closed:
+			raise BancardAPIConfigurationException("The BancardAPIRegistry has already been closed.")
+
+		options = self._merchant_options(merchant_options)
+		environment = options.get("environment", ENVIRONMENT_SANDBOX)
+		if "public_key" not in options or "private_key" not in options:
+			raise BancardAPIConfigurationException("The configuration of a merchant requires the keys: public_key private_key")
+
+		transport = self._transports.get(environment)
+		if transport is None:
+			transport = self._transports[environment] = BancardTransport(
+				pool_connections=int(options.get("pool_connections", DEFAULT_POOL_CONNECTIONS)),
+				pool_maxsize=int(options.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)),
+				pool_block=bool(options.get("pool_block", False)))
+
+		signer_key = self._signer_key(options)
+		signer = self._signers.get(signer_key)
+		if signer is None:
+			signer = self._signers[signer_key] = BancardTokenSigner(options["private_key"])
+
+		return BancardAPI(options, transport=transport, signer=signer)
+
+	def register(self, merchant_id, public_key, private_key, **options):
+		"""
+			Registers the credentials (and any other BancardAPI option) of a merchant. If the merchant was already in use, its
+			BancardAPI is replaced right away (hot reload): the calls in progress finish with the previous credentials, and the
+			charges pending of their webhook (verified with the new private key) and the cached charge statuses are kept, unless
+			the environment changed.
+
+			:param merchant_id: the id of the merchant in your marketplace
+				:type merchant_id: hashable
+			:param public_key: the public key given by Bancard to the merchant
+				:type public_key: str
+			:param private_key: the private key given by Bancard to the merchant
+				:type private_key: str
+			:param options: any other BancardAPI option of this merchant, it overrides the shared ones
+				:type options: dict
+			:raises BancardAPIConfigurationException: if the options of the merchant are not valid
+		"""
+
+		merchant_options = merge_dict(options, {"public_key": public_key, "private_key": private_key})
+		with self._lock:
+			self._replace(merchant_id, merchant_options)
+
+	def _replace(self, merchant_id, merchant_options):
+		"""
+			Stores the options of a merchant and replaces its BancardAPI, if it was already created. It must be called holding the lock.
+		"""
+
+		previous_api = self._apis.get(merchant_id)
+		if previous_api is not None:
+			bancard_api = self._create_api(merchant_options)
+			# the state of the charges does not depend on the credentials, so it survives the reload (the pending charges indexed
+			# with the previous private key are signed again when their webhook is verified), but not a change of environment
+			if bancard_api.environment == previous_api.environment:
+				bancard_api.pending_index = previous_api.pending_index
+				bancard_api.charge_status_cache = previous_api.charge_status_cache
+			self._apis[merchant_id] = bancard_api
+			previous_api.retire()
+		self._configurations[merchant_id] = merchant_options
+		self._prune_signers()
+
+	def reload(self, merchant_id):
+		"""
+			Loads again the options of a merchant with the loader and replaces its BancardAPI, as register does.
+
+			:param merchant_id: the id of the merchant in your marketplace
+				:type merchant_id: hashable
+			:raises BancardAPIConfigurationException: if there is no loader, or the loader does not know the merchant anymore
+		"""
+
+		merchant_options = self._load(merchant_id)
+		with self._lock:
+			self._replace(merchant_id, merchant_options)
+
+	def _load(self, merchant_id):
+		if self.loader is None:
+			raise BancardAPIConfigurationException("The merchant %s is not registered in the BancardAPIRegistry." % merchant_id)
+		merchant_options = self.loader(merchant_id)
+		if merchant_options is None:
+			raise BancardAPIConfigurationException("The merchant %s is not registered in the BancardAPIRegistry." % merchant_id)
+		return merchant_options
+
+	def unregister(self, merchant_id):
+		"""
+			Forgets a merchant. The calls in progress with its BancardAPI are not interrupted.
+
+			:param merchant_id: the id of the merchant in your marketplace
+				:type merchant_id: hashable
+		"""
+
+		with self._lock:
+			bancard_api = self._apis.pop(merchant_id, None)
+			self._configurations.pop(merchant_id, None)
+			self._prune_signers()
+		if bancard_api is not None:
+			bancard_api.retire()
+
+	def get(self, merchant_id):
+		"""
+			Returns the BancardAPI of a merchant, creating it on its first use.
+
+			:param merchant_id: the id of the merchant in your marketplace
+				:type merchant_id: hashable
+			:rtype BancardAPI
+			:raises BancardAPIConfigurationException: if the merchant is not registered (nor known by the loader), or its options are not valid
+		"""
+
+		bancard_api = self._apis.get(merchant_id)
+		if bancard_api is not None:
+			return bancard_api
+
+		merchant_options = self._configurations.get(merchant_id)
+		if merchant_options is None:
+			merchant_options = self._load(merchant_id)  # outside of the lock, the loader may be slow
+
+		with self._lock:
+			bancard_api = self._apis.get(merchant_id)
+			if bancard_api is None:
+				merchant_options = self._configurations.setdefault(merchant_id, merchant_options)
+				bancard_api = self._apis[merchant_id] = self._create_api(merchant_options)
+			return bancard_api
+
+	def __getitem__(self, merchant_id):
+		return self.get(merchant_id)
+
+	def __contains__(self, merchant_id):
+		return merchant_id in self._configurations
+
+	def __len__(self):
+		return len(self._configurations)
+
+	def merchant_ids(self):
+		"""
+			Returns the ids of the registered (or already loaded) merchants.
+
+			:rtype list
+		"""
+		return list(self._configurations)
+
+	def close(self):
+		"""
+			Closes the shared connection pools. The registry and its BancardAPIs can not be used after calling this method.
+		"""
+
+		with self._lock:
+			self.closed = True
+			transports, self._transports = list(self._transports.values()), dict()
+			bancard_apis = list(self._apis.values())
+			self._apis.clear()
+			self._signers.clear()
+		for bancard_api in bancard_apis:
+			bancard_api.retire()
+		for transport in transports:
+			transport.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
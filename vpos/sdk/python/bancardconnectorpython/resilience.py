@@ -0,0 +1,267 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import random
+import threading
+from collections import deque
+from contextvars import ContextVar
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+
+
+class RetryPolicy(object):
+
+	def __init__(self, max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX, jitter=True):
+		"""
+			Constructor of the RetryPolicy class, the exponential backoff with jitter applied to the failed calls of the idempotent Bancard WebServices.
+
+			:param max_retries: maximum number of retries of a call
+				:type max_retries: int
+			:param backoff_base: seconds to wait before the first retry, doubled on every retry
+				:type backoff_base: float
+			:param backoff_max: maximum seconds to wait before any retry
+				:type backoff_max: float
+			:param jitter: if True every wait is a random value between zero and the exponential backoff ("full jitter"),
+				so the retries of many clients do not hit Bancard at the same time
+				:type jitter: bool
+		"""
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.jitter = jitter
+
+	def backoff(self, attempt):
+		"""
+			Returns the seconds to wait before the given retry.
+
+			:param attempt: the number of the retry, starting at 0
+				:type attempt: int
+			:rtype float
+		"""
+		backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+		return random.uniform(0, backoff) if self.jitter else backoff
+
+	def next_retry_delay(self, attempt, deadline_at=None):
+		"""
+			Returns the seconds to wait before retrying a failed call, or None if the call should not be retried anymore.
+
+			:param attempt: the number of retries already made
+				:type attempt: int
+			:param deadline_at: time (as returned by time.time) when the budget of the whole operation expires, if any
+				:type deadline_at: float
+			:rtype float
+		"""
+		if attempt >= self.max_retries:
+			return None
+		delay = self.backoff(attempt)
+		if deadline_at is not None and time.time() + delay >= deadline_at:
+			return None
+		return delay
+
+
+NO_RETRY_POLICY = RetryPolicy(max_retries=0)
+
+
+class CallStats(object):
+
+	def __init__(self, endpoint, retries, elapsed):
+		"""
+			Constructor of the CallStats class, the statistics of one call to a Bancard WebService.
+
+			:param endpoint: the key of the Bancard WebService, i.e.: CONFIRMATIONS_KEY
+				:type endpoint: str
+			:param retries: number of retries of the call
+				:type retries: int
+			:param elapsed: seconds spent in the call, including the retries
+				:type elapsed: float
+		"""
+		self.endpoint = endpoint
+		self.retries = retries
+		self.elapsed = elapsed
+
+	def __repr__(self):
+		return "CallStats(endpoint=%r, retries=%r, elapsed=%r)" % (self.endpoint, self.retries, self.elapsed)
+
+
+# statistics of the last Bancard call made from the current thread or asyncio task
+last_call_stats = ContextVar("bancard_last_call_stats", default=None)
+
+
+def attempt_timeout(connect_timeout, read_timeout, deadline_at):
+	"""
+		Returns the (connect, read) timeouts of one attempt, shortened so the attempt does not outlive the deadline of the operation.
+
+		:rtype tuple (float, float)
+		:raises BancardAPITimeoutException: if the deadline has already expired
+	"""
+
+	if deadline_at is None:
+		return connect_timeout, read_timeout
+
+	remaining = deadline_at - time.time()
+	if remaining <= 0:
+		raise BancardAPITimeoutException("The deadline of the Bancard operation expired.")
+	return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+
+class CircuitBreaker(object):
+
+	def __init__(self, failure_rate=DEFAULT_CIRCUIT_FAILURE_RATE, minimum_calls=DEFAULT_CIRCUIT_MINIMUM_CALLS, window_size=DEFAULT_CIRCUIT_WINDOW_SIZE,
+			open_duration=DEFAULT_CIRCUIT_OPEN_DURATION, half_open_calls=DEFAULT_CIRCUIT_HALF_OPEN_CALLS, clock=time.time):
+		"""
+			Constructor of the CircuitBreaker class, which stops calling a failing Bancard WebService for a while.
+
+			:param failure_rate: rate (between 0 and 1) of failed calls in the window that opens the circuit
+				:type failure_rate: float
+			:param minimum_calls: minimum number of calls in the window before the failure rate is evaluated
+				:type minimum_calls: int
+			:param window_size: number of most recent calls used to compute the failure rate
+				:type window_size: int
+			:param open_duration: seconds that the circuit stays open (failing fast) before letting probe calls through
+				:type open_duration: float
+			:param half_open_calls: number of simultaneous probe calls allowed while the circuit is half-open
+				:type half_open_calls: int
+			:param clock: function that returns the current time in seconds
+				:type clock: callable
+		"""
+		self.failure_rate = failure_rate
+		self.minimum_calls = minimum_calls
+		self.open_duration = open_duration
+		self.half_open_calls = half_open_calls
+		self.clock = clock
+		self._outcomes = deque(maxlen=window_size)  # True for every failed call
+		self._failures = 0
+		self._state = CIRCUIT_CLOSED
+		self._opened_at = None
+		self._probes = 0
+		self._lock = threading.Lock()
+
+	@property
+	def state(self):
+		"""
+			Returns the current state of the circuit: CIRCUIT_CLOSED, CIRCUIT_OPEN or CIRCUIT_HALF_OPEN.
+
+			:rtype str
+		"""
+		with self._lock:
+			if self._state == CIRCUIT_OPEN and self.clock() - self._opened_at >= self.open_duration:
+				return CIRCUIT_HALF_OPEN
+			return self._state
+
+	def before_call(self):
+		"""
+			Must be called before every call to the WebService.
+
+			:raises BancardAPICircuitOpenException: if the circuit is open, or it is half-open and its probe calls are already in flight
+		"""
+		with self._lock:
+			if self._state == CIRCUIT_OPEN:
+				if self.clock() - self._opened_at < self.open_duration:
+					raise BancardAPICircuitOpenException("The circuit breaker of the Bancard WebService is open.")
+				self._state, self._probes = CIRCUIT_HALF_OPEN, 0
+
+			if self._state == CIRCUIT_HALF_OPEN:
+				if self._probes >= self.half_open_calls:
+					raise BancardAPICircuitOpenException("The circuit breaker of the Bancard WebService is half-open and probing.")
+				self._probes += 1
+
+	def record_success(self):
+		"""
+			Must be called after every successful call to the WebService.
+		"""
+		with self._lock:
+			if self._state == CIRCUIT_HALF_OPEN:
+				# the probe succeeded: Bancard recovered
+				self._state = CIRCUIT_CLOSED
+				self._outcomes.clear()
+				self._failures = 0
+			else:
+				self._record(False)
+
+	def record_failure(self):
+		"""
+			Must be called after every call to the WebService that failed due to a connection problem.
+		"""
+		with self._lock:
+			if self._state == CIRCUIT_HALF_OPEN:
+				self._open()
+				return
+
+			self._record(True)
+			if len(self._outcomes) >= self.minimum_calls and self._failures >= self.failure_rate * len(self._outcomes):
+				self._open()
+
+	def _record(self, failed):
+		"""
+			Adds an outcome to the window. It must be called holding the lock.
+		"""
+		if len(self._outcomes) == self._outcomes.maxlen and self._outcomes[0]:
+			self._failures -= 1
+		self._outcomes.append(failed)
+		if failed:
+			self._failures += 1
+
+	def _open(self):
+		"""
+			Opens the circuit. It must be called holding the lock.
+		"""
+		self._state = CIRCUIT_OPEN
+		self._opened_at = self.clock()
+		self._outcomes.clear()
+		self._failures = 0
+
+
+class LatencyTracker(object):
+
+	def __init__(self, window_size=DEFAULT_LATENCY_WINDOW_SIZE):
+		"""
+			Constructor of the LatencyTracker class, which keeps the latencies of the most recent calls to compute their percentiles.
+
+			:param window_size: number of most recent latencies to keep
+				:type window_size: int
+		"""
+		self._latencies = deque(maxlen=window_size)
+		self._lock = threading.Lock()
+
+	def observe(self, latency):
+		"""
+			Adds the latency in seconds of a call.
+		"""
+		with self._lock:
+			self._latencies.append(latency)
+
+	def percentile(self, percentile, minimum_samples=1):
+		"""
+			Returns the given percentile (between 0 and 1) of the kept latencies, or None if there are less than minimum_samples latencies.
+
+			:rtype float
+		"""
+		with self._lock:
+			latencies = sorted(self._latencies)
+		if not latencies or len(latencies) < minimum_samples:
+			return None
+		return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+	def __len__(self):
+		return len(self._latencies)
@@ -0,0 +1,178 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+class BancardResult(object):
+	"""
+		Base class of the result objects of the BancardAPI (result_objects option). They only keep the parsed fields,
+		plus the raw Bancard payload if the keep_bancard_response option is enabled, and they behave like the tuples
+		that the BancardAPI returns by default: they can be unpacked, indexed and compared with them.
+	"""
+
+	__slots__ = ()
+
+	_fields = ()
+
+	@classmethod
+	def from_tuple(cls, result, keep_bancard_response=False):
+		"""
+			Builds the result object of a tuple returned by the BancardAPI, whose last item is the raw Bancard payload.
+
+			:param result: the tuple returned by the BancardAPI
+				:type result: tuple
+			:param keep_bancard_response: if False the raw Bancard payload is discarded
+				:type keep_bancard_response: bool
+			:rtype BancardResult
+		"""
+		values = tuple(result)
+		return cls(*(values[:-1] + (values[-1] if keep_bancard_response else None,)))
+
+	def as_tuple(self):
+		"""
+			Returns the result in the tuple format of the BancardAPI.
+
+			:rtype tuple
+		"""
+		return tuple(getattr(self, field) for field in self._fields)
+
+	def __iter__(self):
+		return iter(self.as_tuple())
+
+	def __getitem__(self, index):
+		return self.as_tuple()[index]
+
+	def __len__(self):
+		return len(self._fields)
+
+	def __eq__(self, other):
+		if isinstance(other, (BancardResult, tuple)):
+			return self.as_tuple() == tuple(other)
+		return NotImplemented
+
+	def __ne__(self, other):
+		equal = self.__eq__(other)
+		return equal if equal is NotImplemented else not equal
+
+	__hash__ = None
+
+	def __repr__(self):
+		return "%s(%s)" % (self.__class__.__name__, ", ".join("%s=%r" % (field, getattr(self, field)) for field in self._fields))
+
+
+class ChargeToken(BancardResult):
+
+	__slots__ = ("bancard_process_id", "payment_url", "bancard_response")
+
+	_fields = __slots__
+
+	def __init__(self, bancard_process_id, payment_url, bancard_response=None):
+		"""
+			Constructor of the ChargeToken class, the result of generate_charge_token.
+
+			:param bancard_process_id: the process id returned by Bancard
+				:type bancard_process_id: str
+			:param payment_url: the URL of the payment page
+				:type payment_url: str
+			:param bancard_response: the full JSON response of Bancard, only if the keep_bancard_response option is enabled
+				:type bancard_response: dict
+		"""
+		self.bancard_process_id = bancard_process_id
+		self.payment_url = payment_url
+		self.bancard_response = bancard_response
+
+
+class ChargeStatus(BancardResult):
+
+	__slots__ = ("already_payed", "authorization_number", "bancard_response")
+
+	_fields = __slots__
+
+	def __init__(self, already_payed, authorization_number, bancard_response=None):
+		"""
+			Constructor of the ChargeStatus class, the result of get_charge_status.
+
+			:param already_payed: True if the charge has been payed, False if it is still pending
+				:type already_payed: bool
+			:param authorization_number: the authorization number of the payment, if it has been payed
+				:type authorization_number: str
+			:param bancard_response: the full JSON response of Bancard, only if the keep_bancard_response option is enabled
+				:type bancard_response: dict
+		"""
+		self.already_payed = already_payed
+		self.authorization_number = authorization_number
+		self.bancard_response = bancard_response
+
+
+class RollbackResult(BancardResult):
+
+	__slots__ = ("successfull_rollback", "bancard_response", "payment_not_found")
+
+	_fields = ("successfull_rollback", "bancard_response")
+
+	def __init__(self, successfull_rollback, bancard_response=None, payment_not_found=None):
+		"""
+			Constructor of the RollbackResult class, the result of rollback_charge.
+
+			:param successfull_rollback: True if Bancard rolled back the charge
+				:type successfull_rollback: bool
+			:param bancard_response: the full JSON response of Bancard, only if the keep_bancard_response option is enabled
+				:type bancard_response: dict
+			:param payment_not_found: True if Bancard did not find the payment, i.e.: the payer never payed it. By default it is parsed from bancard_response.
+				:type payment_not_found: bool
+		"""
+		self.successfull_rollback = successfull_rollback
+		self.bancard_response = bancard_response
+		self.payment_not_found = RollbackResult._is_payment_not_found(bancard_response) if payment_not_found is None else payment_not_found
+
+	@classmethod
+	def from_tuple(cls, result, keep_bancard_response=False):
+		successfull_rollback, bancard_response = result
+		return cls(successfull_rollback, bancard_response if keep_bancard_response else None, RollbackResult._is_payment_not_found(bancard_response))
+
+	@staticmethod
+	def _is_payment_not_found(bancard_response):
+		if not bancard_response or bancard_response.get("status") == "success":
+			return False
+		bancard_tx_messages = bancard_response.get("messages") or [dict()]
+		return bancard_tx_messages[0].get("key") == "PaymentNotFoundError"
+
+
+class WebhookResult(BancardResult):
+
+	__slots__ = ("payment_approved", "authorization_number", "bancard_data")
+
+	_fields = __slots__
+
+	def __init__(self, payment_approved, authorization_number, bancard_data=None):
+		"""
+			Constructor of the WebhookResult class, the result of process_vpos_webhook and verify_vpos_webhook.
+
+			:param payment_approved: True if the payment has been approved
+				:type payment_approved: bool
+			:param authorization_number: the authorization number of the payment
+				:type authorization_number: str
+			:param bancard_data: the content received in the Bancard webhook, only if the keep_bancard_response option is enabled
+				:type bancard_data: str, bytes, memoryview or dict
+		"""
+		self.payment_approved = payment_approved
+		self.authorization_number = authorization_number
+		self.bancard_data = bancard_data
@@ -0,0 +1,120 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import hashlib
+
+# operations that can be signed by the BancardTokenSigner
+SIGNER_OPERATION_SINGLE_BUY = "single_buy"
+SIGNER_OPERATION_GET_CONFIRMATION = "get_confirmation"
+SIGNER_OPERATION_ROLLBACK = "rollback"
+SIGNER_OPERATION_CONFIRM = "confirm"
+
+# what is appended to the private key to build the token of every operation, as defined by the Bancard docs
+SIGNER_OPERATION_TEMPLATES = {
+	SIGNER_OPERATION_SINGLE_BUY: "%s%s%s",  # marketplace_charge_id, amount_str, currency
+	SIGNER_OPERATION_GET_CONFIRMATION: "%sget_confirmation",  # marketplace_charge_id
+	SIGNER_OPERATION_ROLLBACK: "%srollback0.00",  # marketplace_charge_id
+	SIGNER_OPERATION_CONFIRM: "%sconfirm%s%s",  # marketplace_charge_id, amount_str, currency
+}
+
+
+class BancardTokenSigner(object):
+
+	def __init__(self, private_key):
+		"""
+			Constructor of the BancardTokenSigner class. It computes the Bancard tokens of every operation from an MD5 state
+			that is primed only once with the private key, so the key is not encoded nor hashed again for every token.
+
+			:param private_key: the private key given by Bancard
+				:type private_key: str
+		"""
+		self._primed_md5 = hashlib.md5(private_key.encode("utf-8"))
+
+	def _sign(self, suffix):
+		"""
+			Returns the md5 hexdigest of the private key followed by the given suffix.
+		"""
+		md5 = self._primed_md5.copy()
+		md5.update(suffix.encode("utf-8"))
+		return md5.hexdigest()
+
+	def single_buy(self, marketplace_charge_id, amount_str, currency):
+		"""
+			Returns the token of a single_buy (charge token generation) request.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: int or str
+			:param amount_str: the amount formatted as it is sent to Bancard, i.e.: "1000.00"
+				:type amount_str: str
+			:param currency: The currency of the amount in the format ISO-4217
+				:type currency: str
+			:rtype str
+		"""
+		return self._sign(SIGNER_OPERATION_TEMPLATES[SIGNER_OPERATION_SINGLE_BUY] % (marketplace_charge_id, amount_str, currency))
+
+	def get_confirmation(self, marketplace_charge_id):
+		"""
+			Returns the token of a confirmations (charge status) request.
+
+			:rtype str
+		"""
+		return self._sign(SIGNER_OPERATION_TEMPLATES[SIGNER_OPERATION_GET_CONFIRMATION] % marketplace_charge_id)
+
+	def rollback(self, marketplace_charge_id):
+		"""
+			Returns the token of a rollback request.
+
+			:rtype str
+		"""
+		return self._sign(SIGNER_OPERATION_TEMPLATES[SIGNER_OPERATION_ROLLBACK] % marketplace_charge_id)
+
+	def confirm(self, marketplace_charge_id, amount_str, currency):
+		"""
+			Returns the token that Bancard sends in the webhook of a charge.
+
+			:rtype str
+		"""
+		return self._sign(SIGNER_OPERATION_TEMPLATES[SIGNER_OPERATION_CONFIRM] % (marketplace_charge_id, amount_str, currency))
+
+	def sign_batch(self, operations):
+		"""
+			Returns the tokens of many operations at once.
+
+			:param operations: iterable of tuples (operation, marketplace_charge_id, ...) where operation is any of the SIGNER_OPERATION_* constants
+				followed by the parameters of the method of that operation, i.e.: (SIGNER_OPERATION_CONFIRM, 123, "1000.00", "PYG")
+				:type operations: iterable
+			:return: the list of tokens in the same order of the operations
+				:rtype list
+			:raises KeyError: if any of the operations is unknown
+		"""
+
+		# the loop is inlined, with every lookup bound to a local name, because batches can have millions of operations
+		templates = SIGNER_OPERATION_TEMPLATES
+		primed_md5_copy = self._primed_md5.copy
+		tokens = list()
+		append = tokens.append
+		for operation in operations:
+			md5 = primed_md5_copy()
+			md5.update((templates[operation[0]] % operation[1:]).encode("utf-8"))
+			append(md5.hexdigest())
+		return tokens
@@ -0,0 +1,463 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.signer import BancardTokenSigner
+
+# outcome of a charge whose payer did not pay it yet: the confirmations WebService answers a PaymentNotFoundError
+SIMULATOR_PAYMENT_NOT_FOUND = "PaymentNotFoundError"
+
+# outcomes that the BancardSimulator can report for a charge
+SIMULATOR_OUTCOMES = ("00", "05", "12", "15", "51", SIMULATOR_PAYMENT_NOT_FOUND)
+
+# response descriptions of every response code, as shown by the VPOS
+SIMULATOR_RESPONSE_DESCRIPTIONS = {
+	"00": "Transaccion aprobada",
+	"05": "Tarjeta inhabilitada",
+	"12": "Transaccion invalida",
+	"15": "Tarjeta invalida",
+	"51": "Fondos insuficientes",
+}
+
+# default host of the BancardSimulator
+DEFAULT_SIMULATOR_HOST = "127.0.0.1"
+
+
+def build_bancard_urls(base_url):
+	"""
+		Builds the dictionary of the Bancard WebService endpoints (as BANCARD_SANDBOX_URLS) of the given base URL.
+
+		:param base_url: the base URL of a Bancard VPOS, i.e.: http://127.0.0.1:8888
+			:type base_url: str
+		:rtype dict
+	"""
+
+	base_url = base_url.rstrip("/")
+	return {
+		ROLLBACK_KEY: "%s%s" % (base_url, BANCARD_ROLLBACK_PATH),
+		CHARGE_TOKEN_GENERATOR_KEY: "%s%s" % (base_url, BANCARD_CHARGE_TOKEN_GENERATOR_PATH),
+		PAYMENT_WEB_URL_KEY: "%s%s" % (base_url, BANCARD_PAYMENT_WEB_PATH),
+		CONFIRMATIONS_KEY: "%s%s" % (base_url, BANCARD_CONFIRMATIONS_PATH),
+	}
+
+
+def use_simulator(base_url, environment=ENVIRONMENT_SIMULATOR):
+	"""
+		Points the BANCARD_URLS of the given environment to a BancardSimulator, so BancardAPI(environment=environment) calls to it.
+
+		:param base_url: the base URL of the BancardSimulator, i.e.: http://127.0.0.1:8888
+			:type base_url: str
+		:param environment: the environment name to register. The default value is: ENVIRONMENT_SIMULATOR
+			:type environment: str
+		:raises BancardAPIConfigurationException: if the environment is the sandbox or production one
+	"""
+
+	if environment in (ENVIRONMENT_SANDBOX, ENVIRONMENT_PRODUCTION):
+		raise BancardAPIConfigurationException("The %s environment can not be pointed to a BancardSimulator." % environment)
+	BANCARD_URLS[environment] = build_bancard_urls(base_url)
+
+
+class SimulatedCharge(object):
+
+	__slots__ = ("marketplace_charge_id", "amount", "currency", "process_id", "response_code", "rolled_back", "couponned")
+
+	def __init__(self, marketplace_charge_id, amount, currency, process_id):
+		"""
+			A charge created in the BancardSimulator by the single_buy WebService.
+		"""
+		self.marketplace_charge_id = marketplace_charge_id
+		self.amount = amount
+		self.currency = currency
+		self.process_id = process_id
+		self.response_code = None  # None until the payer pays it, or the default outcome of the simulator is used
+		self.rolled_back = False
+		self.couponned = False
+
+
+class _SimulatorHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+
+class _SimulatorRequestHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def do_POST(self):
+		body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+		status_code, bancard_response = self.server.simulator.handle(self.path, body)
+		content = json.dumps(bancard_response).encode("utf-8")
+		self.send_response(status_code)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(content)))
+		self.end_headers()
+		self.wfile.write(content)
+
+	def log_message(self, format, *args):
+		pass
+
+
+class SimulatorError(Exception):
+
+	def __init__(self, key, dsc):
+		"""
+			An error response of the BancardSimulator, in the format of the Bancard WebServices.
+		"""
+		super(SimulatorError, self).__init__(dsc)
+		self.response = {"status": "error", "messages": [{"key": key, "level": "error", "dsc": dsc}]}
+
+
+class BancardSimulator(object):
+
+	def __init__(self, public_key, private_key, host=DEFAULT_SIMULATOR_HOST, port=0, latency=0, error_rate=0, error_status=503,
+				default_response_code=SIMULATOR_PAYMENT_NOT_FOUND, seed=None):
+		"""
+			Constructor of the BancardSimulator class, a local HTTP server that implements the single_buy, confirmations and rollback
+			Bancard WebServices with the same token validation, so the BancardAPI can be tested and load-tested without the sandbox.
+
+			:param public_key: the public key that the requests must include
+				:type public_key: str
+			:param private_key: the private key used to validate the tokens of the requests
+				:type private_key: str
+			:param host: the address to listen to. The default value is: DEFAULT_SIMULATOR_HOST
+				:type host: str
+			:param port: the port to listen to. The default value (0) picks a free port
+				:type port: int
+			:param latency: seconds that every request waits before answering, or a tuple (min, max) of a uniformly distributed latency
+				:type latency: float or tuple
+			:param error_rate: fraction of the requests (0 to 1) that are answered with an HTTP error_status instead of the Bancard response
+				:type error_rate: float
+			:param error_status: the HTTP status of the injected errors. The default value is: 503
+				:type error_status: int
+			:param default_response_code: the outcome of the charges that have no outcome of their own: one of the SIMULATOR_OUTCOMES.
+				The default value is: SIMULATOR_PAYMENT_NOT_FOUND (the payers never pay)
+				:type default_response_code: str
+			:param seed: the seed of the latency and error injection random numbers
+				:type seed: int
+			:raises BancardAPIConfigurationException: if any of the parameters is not valid
+		"""
+
+		if default_response_code not in SIMULATOR_OUTCOMES:
+			raise BancardAPIConfigurationException("The default_response_code must be one of: %s" % ", ".join(SIMULATOR_OUTCOMES))
+		if not 0 <= error_rate <= 1:
+			raise BancardAPIConfigurationException("The error_rate must be between 0 and 1.")
+
+		self.public_key = public_key
+		self.signer = BancardTokenSigner(private_key)
+		self.host = host
+		self.port = port
+		self.latency = latency
+		self.error_rate = error_rate
+		self.error_status = error_status
+		self.default_response_code = default_response_code
+		self.charges = dict()
+		self.requests = dict()  # number of requests received by every endpoint
+		self._random = random.Random(seed)
+		self._lock = threading.Lock()
+		self._server = None
+		self._thread = None
+
+	@property
+	def base_url(self):
+		"""
+			The base URL of the running simulator, i.e.: http://127.0.0.1:8888
+		"""
+		return "http://%s:%s" % (self.host, self.port)
+
+	@property
+	def urls(self):
+		"""
+			The Bancard WebService endpoints of the running simulator, as BANCARD_SANDBOX_URLS.
+		"""
+		return build_bancard_urls(self.base_url)
+
+	def _bind(self):
+		self._server = _SimulatorHTTPServer((self.host, self.port), _SimulatorRequestHandler)
+		self._server.simulator = self
+		self.port = self._server.server_address[1]
+
+	def start(self, environment=ENVIRONMENT_SIMULATOR):
+		"""
+			Starts the simulator in a background thread and registers its URLs in BANCARD_URLS under the given environment.
+
+			:param environment: the environment name to register, or None to not register it. The default value is: ENVIRONMENT_SIMULATOR
+				:type environment: str
+			:return: this simulator
+				:rtype BancardSimulator
+		"""
+
+		self._bind()
+		self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, name="BancardSimulator")
+		self._thread.daemon = True
+		self._thread.start()
+		if environment is not None:
+			use_simulator(self.base_url, environment)
+		return self
+
+	def serve_forever(self, environment=None):
+		"""
+			Runs the simulator in the current thread until it is interrupted.
+
+			:param environment: the environment name to register in BANCARD_URLS, or None to not register it
+				:type environment: str
+		"""
+
+		if self._server is None:
+			self._bind()
+		if environment is not None:
+			use_simulator(self.base_url, environment)
+		try:
+			self._server.serve_forever(poll_interval=0.05)
+		finally:
+			self._server.server_close()
+			self._server = None
+
+	def stop(self):
+		"""
+			Stops the simulator started with start.
+		"""
+
+		if self._server is not None:
+			self._server.shutdown()
+			self._server.server_close()
+			self._server = None
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
+
+	def set_response_code(self, marketplace_charge_id, response_code, amount=None, currency="PYG"):
+		"""
+			Sets the outcome of a charge. If the charge was not created yet and an amount is given, it is created as if
+			the single_buy WebService was called, which is useful to load-test the confirmations WebService alone.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge
+				:type marketplace_charge_id: int or str
+			:param response_code: one of the SIMULATOR_OUTCOMES
+				:type response_code: str
+			:param amount: the amount of the charge to create, i.e.: "1000.00"
+				:type amount: str or Decimal
+			:param currency: the currency of the charge to create
+				:type currency: str
+			:raises BancardAPIConfigurationException: if the response code is not valid, or the charge does not exist and no amount was given
+		"""
+
+		if response_code not in SIMULATOR_OUTCOMES:
+			raise BancardAPIConfigurationException("The response_code must be one of: %s" % ", ".join(SIMULATOR_OUTCOMES))
+
+		with self._lock:
+			charge = self.charges.get(str(marketplace_charge_id))
+			if charge is None:
+				if amount is None:
+					raise BancardAPIConfigurationException("The charge %s does not exist in the BancardSimulator." % marketplace_charge_id)
+				charge = self._create_charge(str(marketplace_charge_id), str(Decimal(amount).quantize(Decimal("0.01"))), currency)
+			charge.response_code = response_code
+
+	def set_couponned(self, marketplace_charge_id, couponned=True):
+		"""
+			Marks a charge as couponned (settled), so the rollback WebService refuses to roll it back.
+
+			:raises BancardAPIConfigurationException: if the charge does not exist
+		"""
+
+		with self._lock:
+			charge = self.charges.get(str(marketplace_charge_id))
+			if charge is None:
+				raise BancardAPIConfigurationException("The charge %s does not exist in the BancardSimulator." % marketplace_charge_id)
+			charge.couponned = couponned
+
+	def pay(self, marketplace_charge_id, response_code="00"):
+		"""
+			Simulates that the payer paid a charge in the Bancard payment page, and returns the webhook that Bancard would send.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge
+				:type marketplace_charge_id: int or str
+			:param response_code: the response code of the payment, one of the SIMULATOR_OUTCOMES except SIMULATOR_PAYMENT_NOT_FOUND
+				:type response_code: str
+			:return: the JSON data of the Bancard webhook
+				:rtype dict
+			:raises BancardAPIConfigurationException: if the charge does not exist or the response code is not valid
+		"""
+
+		if response_code == SIMULATOR_PAYMENT_NOT_FOUND:
+			raise BancardAPIConfigurationException("A payment can not have the %s response code." % response_code)
+		self.set_response_code(marketplace_charge_id, response_code)
+		with self._lock:
+			charge = self.charges[str(marketplace_charge_id)]
+			return {"operation": self._operation(charge, response_code)}
+
+	def handle(self, path, body):
+		"""
+			Answers a request to a Bancard WebService as the real VPOS does.
+
+			:param path: the path of the requested URL
+				:type path: str
+			:param body: the body of the request
+				:type body: bytes
+			:return: a tuple of: http_status_code, bancard_response
+				:rtype tuple (int, dict)
+		"""
+
+		latency = self.latency
+		with self._lock:
+			self.requests[path] = self.requests.get(path, 0) + 1
+			if isinstance(latency, (tuple, list)):
+				latency = self._random.uniform(latency[0], latency[1])
+			inject_error = self.error_rate > 0 and self._random.random() < self.error_rate
+		if latency:
+			time.sleep(latency)
+		if inject_error:
+			return self.error_status, SimulatorError("ServiceUnavailableError", "Simulated unavailability").response
+
+		try:
+			bancard_request = json.loads(body.decode("utf-8"))
+			bancard_operation = bancard_request["operation"]
+			marketplace_charge_id = str(bancard_operation["shop_process_id"])
+			token = bancard_operation["token"]
+		except (KeyError, ValueError, TypeError):
+			return 400, SimulatorError("InvalidJsonError", "The request is not a valid JSON").response
+
+		if bancard_request.get("public_key") != self.public_key:
+			return 401, SimulatorError("InvalidPublicKeyError", "Invalid public key").response
+
+		handlers = {
+			BANCARD_CHARGE_TOKEN_GENERATOR_PATH: self._single_buy,
+			BANCARD_CONFIRMATIONS_PATH: self._confirmations,
+			BANCARD_ROLLBACK_PATH: self._rollback,
+		}
+		handler = handlers.get(path)
+		if handler is None:
+			return 404, SimulatorError("NotFoundError", "Unknown WebService %s" % path).response
+
+		try:
+			with self._lock:
+				return 200, handler(marketplace_charge_id, token, bancard_operation)
+		except SimulatorError as error:
+			return 200, error.response
+
+	def _create_charge(self, marketplace_charge_id, amount, currency):
+		charge = SimulatedCharge(marketplace_charge_id, amount, currency, "%016x" % self._random.getrandbits(64))
+		self.charges[marketplace_charge_id] = charge
+		return charge
+
+	def _response_code_of(self, charge):
+		return charge.response_code if charge.response_code is not None else self.default_response_code
+
+	def _operation(self, charge, response_code):
+		return {
+			"token": self.signer.confirm(charge.marketplace_charge_id, charge.amount, charge.currency),
+			"shop_process_id": charge.marketplace_charge_id,
+			"response": "S" if response_code == "00" else "N",
+			"response_details": SIMULATOR_RESPONSE_DESCRIPTIONS[response_code],
+			"amount": charge.amount,
+			"currency": charge.currency,
+			"authorization_number": "%06d" % (int(charge.process_id, 16) % 1000000) if response_code == "00" else None,
+			"ticket_number": "%010d" % (int(charge.process_id, 16) % 10000000000),
+			"response_code": response_code,
+			"response_description": SIMULATOR_RESPONSE_DESCRIPTIONS[response_code],
+			"extended_response_description": None,
+			"security_information": {"customer_ip": "127.0.0.1", "card_source": "L", "card_country": "PARAGUAY", "version": "0.3", "risk_index": 0},
+		}
+
+	def _single_buy(self, marketplace_charge_id, token, bancard_operation):
+		try:
+			amount, currency = bancard_operation["amount"], bancard_operation["currency"]
+		except KeyError:
+			raise SimulatorError("InvalidJsonError", "The amount and currency are required")
+		if token != self.signer.single_buy(marketplace_charge_id, amount, currency):
+			raise SimulatorError("InvalidTokenError", "Invalid token")
+		if marketplace_charge_id in self.charges:
+			raise SimulatorError("InvalidOperationError", "Shop process has already been taken")
+
+		charge = self._create_charge(marketplace_charge_id, amount, currency)
+		return {"status": "success", "process_id": charge.process_id}
+
+	def _confirmations(self, marketplace_charge_id, token, bancard_operation):
+		if token != self.signer.get_confirmation(marketplace_charge_id):
+			raise SimulatorError("InvalidTokenError", "Invalid token")
+
+		charge = self.charges.get(marketplace_charge_id)
+		if charge is None or charge.rolled_back or self._response_code_of(charge) == SIMULATOR_PAYMENT_NOT_FOUND:
+			raise SimulatorError(SIMULATOR_PAYMENT_NOT_FOUND, "Payment not found")
+		return {"status": "success", "confirmation": self._operation(charge, self._response_code_of(charge))}
+
+	def _rollback(self, marketplace_charge_id, token, bancard_operation):
+		if token != self.signer.rollback(marketplace_charge_id):
+			raise SimulatorError("InvalidTokenError", "Invalid token")
+
+		charge = self.charges.get(marketplace_charge_id)
+		if charge is None or charge.rolled_back:
+			raise SimulatorError(SIMULATOR_PAYMENT_NOT_FOUND, "Payment not found")
+		if charge.couponned:
+			raise SimulatorError("TransactionAlreadyConfirmed", "The payment has already been couponned")
+		charge.rolled_back = True
+		return {"status": "success", "messages": [{"key": "RollbackSuccessful", "level": "info", "dsc": "Rollback correcto."}]}
+
+
+def main(argv=None):
+	"""
+		Runs a BancardSimulator until it is interrupted, i.e.: python -m bancardconnectorpython.simulator --port 8888
+		Then point the clients to it with BANCARD_ENVIRONMENT=simulator and BANCARD_SIMULATOR_URL=http://127.0.0.1:8888
+	"""
+
+	parser = argparse.ArgumentParser(prog="python -m bancardconnectorpython.simulator", description="Local simulator of the Bancard VPOS WebServices.")
+	parser.add_argument("--host", default=DEFAULT_SIMULATOR_HOST)
+	parser.add_argument("--port", type=int, default=8888)
+	parser.add_argument("--public-key", default="public", help="the public key that the requests must include")
+	parser.add_argument("--private-key", default="private", help="the private key used to validate the tokens")
+	parser.add_argument("--latency", type=float, nargs="+", default=[0], help="seconds of latency, or the min and max of a uniform latency")
+	parser.add_argument("--error-rate", type=float, default=0, help="fraction of the requests answered with an HTTP error")
+	parser.add_argument("--error-status", type=int, default=503)
+	parser.add_argument("--default-response-code", choices=SIMULATOR_OUTCOMES, default=SIMULATOR_PAYMENT_NOT_FOUND)
+	parser.add_argument("--seed", type=int, default=None)
+	args = parser.parse_args(argv)
+
+	simulator = BancardSimulator(
+		args.public_key, args.private_key, host=args.host, port=args.port, latency=args.latency[0] if len(args.latency) == 1 else tuple(args.latency[:2]),
+		error_rate=args.error_rate, error_status=args.error_status, default_response_code=args.default_response_code, seed=args.seed)
+	simulator._bind()
+	print("BancardSimulator listening on %s" % simulator.base_url)
+	sys.stdout.flush()
+	try:
+		simulator.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,137 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+
+
+class BancardTransport(object):
+
+	def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False):
+		"""
+			Constructor of the BancardTransport class, a thread-safe keep-alive HTTP connection pool to the Bancard WebServices.
+
+			:param pool_connections: number of per-host connection pools to keep cached
+				:type pool_connections: int
+			:param pool_maxsize: maximum number of keep-alive connections to keep open per host
+				:type pool_maxsize: int
+			:param pool_block: if True, the callers will wait for a free connection instead of opening a throw-away one when the pool is exhausted
+				:type pool_block: bool
+		"""
+
+		self.pool_connections = pool_connections
+		self.pool_maxsize = pool_maxsize
+		self.pool_block = pool_block
+		self.closed = False
+		self._session = None
+		self._lock = threading.Lock()
+
+	def _create_session(self):
+		"""
+			Creates the requests.Session whose adapters hold the keep-alive connection pools.
+
+			:return: the new HTTP session
+				:rtype requests.Session
+		"""
+
+		# requests is imported on the first network call, so the import of this library stays cheap
+		import requests
+		from requests.adapters import HTTPAdapter
+
+		session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+		session.mount("https://", adapter)
+		session.mount("http://", adapter)
+		return session
+
+	@property
+	def session(self):
+		"""
+			Returns the HTTP session of this transport, creating it on the first use.
+
+			:return: the HTTP session that keeps the connections alive between calls
+				:rtype requests.Session
+			:raises BancardAPIConfigurationException: if the transport has already been closed
+		"""
+
+		session = self._session
+		if session is None:
+			with self._lock:
+				if self.closed:
+					raise BancardAPIConfigurationException("The Bancard transport has already been closed.")
+				if self._session is None:
+					self._session = self._create_session()
+				session = self._session
+		return session
+
+	def post(self, url, data, headers, timeout=None):
+		"""
+			Sends a POST request through one of the pooled connections.
+
+			:param url: URL of the Bancard WebService
+				:type url: str
+			:param data: the already serialized body of the request
+				:type data: str or bytes
+			:param headers: the HTTP headers of the request
+				:type headers: dict
+			:param timeout: the (connect, read) timeouts in seconds. By default the request never times out.
+				:type timeout: tuple
+			:return: the raw body of the HTTP response
+				:rtype bytes
+			:raises BancardAPITimeoutException: if Bancard did not accept the connection or did not answer within the timeouts
+			:raises BancardAPIUnavailableException: if Bancard answered that the WebService is temporarily unavailable
+			:raises BancardAPIConnectionException: if the request could not be sent or its response could not be received
+		"""
+
+		session = self.session
+		import requests  # already imported by the creation of the session
+
+		try:
+			response = session.post(url, data=data, headers=headers, timeout=timeout)
+		except requests.exceptions.Timeout as error:
+			raise BancardAPITimeoutException("The Bancard WebService did not answer in time: %s" % error)
+		except requests.exceptions.RequestException as error:
+			raise BancardAPIConnectionException("Could not connect to the Bancard WebService: %s" % error)
+
+		if response.status_code in BANCARD_UNAVAILABLE_STATUS_CODES:
+			raise BancardAPIUnavailableException("The Bancard WebService is temporarily unavailable (HTTP %s)." % response.status_code)
+		return response.content
+
+	def close(self):
+		"""
+			Closes every pooled connection. Any later call through this transport will raise an exception.
+		"""
+
+		with self._lock:
+			self.closed = True
+			session, self._session = self._session, None
+		if session is not None:
+			session.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
@@ -22,11 +22,15 @@
 
 
 import sys
-from decimal import Decimal
+from decimal import Decimal, Context, ROUND_HALF_EVEN, MAX_PREC, MAX_EMAX, MIN_EMIN
+from bancardconnectorpython.constants import BANCARD_AMOUNT_DECIMALS
 from bancardconnectorpython.exceptions import BancardAPIInvalidParameterException
 
 # number of decimals for an amount of a given currency
-CURRENCIES_DECIMALS = {"PYG": 0}
+CURRENCIES_DECIMALS = {"PYG": 0, "USD": 2}
+
+# unbounded precision, so the amounts are never rounded by the precision of the default context (28 digits)
+_EXACT_CONTEXT = Context(prec=MAX_PREC, rounding=ROUND_HALF_EVEN, Emax=MAX_EMAX, Emin=MIN_EMIN)
 
 
 def is_python_version_greater_igual_than_3x():
@@ -58,6 +62,164 @@ def merge_dict(first_dict, *next_dicts):
 	return result_dict
 
 
+class CurrencyFormatter(object):
+
+	__slots__ = ("currency", "decimals", "_minor_unit_scale", "_bancard_scale")
+
+	def __init__(self, currency, decimals):
+		"""
+			Constructor of the CurrencyFormatter class, the exact conversions of the amounts of a currency to integer minor units
+			(i.e.: cents) and to the strings that Bancard expects. It never converts an amount to float.
+
+			:param currency: the currency in the format ISO-4217
+				:type currency: str
+			:param decimals: the number of decimals of the currency, at most BANCARD_AMOUNT_DECIMALS
+				:type decimals: int
+			:raises BancardAPIInvalidParameterException: if the currency has more decimals than the Bancard amounts
+		"""
+		if not 0 <= decimals <= BANCARD_AMOUNT_DECIMALS:
+			raise BancardAPIInvalidParameterException("The currency %s can not have %s decimals." % (currency, decimals))
+		self.currency = currency
+		self.decimals = decimals
+		self._minor_unit_scale = 10 ** decimals  # minor units per unit
+		self._bancard_scale = 10 ** (BANCARD_AMOUNT_DECIMALS - decimals)  # Bancard hundredths per minor unit
+
+	def to_minor_units(self, amount):
+		"""
+			Returns the amount as an integer number of minor units of the currency, rounding half to even the extra decimals.
+
+			:param amount: the amount
+				:type amount: Decimal
+			:rtype int
+			:raises BancardAPIInvalidParameterException: if the amount is not a finite Decimal value
+		"""
+
+		if not isinstance(amount, Decimal):
+			raise BancardAPIInvalidParameterException("The amount is not a Decimal value.")
+		try:
+			numerator, denominator = amount.as_integer_ratio()
+		except (ValueError, OverflowError):  # NaN and Infinity
+			raise BancardAPIInvalidParameterException("The amount is not a Decimal value.")
+		if denominator == 1:
+			return numerator * self._minor_unit_scale
+		minor_units, remainder = divmod(numerator * self._minor_unit_scale, denominator)
+		if 2 * remainder > denominator or (2 * remainder == denominator and minor_units & 1):
+			minor_units += 1
+		return minor_units
+
+	def from_minor_units(self, minor_units):
+		"""
+			Returns the amount of an integer number of minor units of the currency.
+
+			:rtype Decimal
+		"""
+
+		return Decimal(minor_units).scaleb(-self.decimals, _EXACT_CONTEXT)
+
+	def format_minor_units(self, minor_units, decimals):
+		"""
+			Returns the string of an integer number of minor units of the currency with a given number of decimals (not less than the ones of the currency).
+
+			:rtype str
+		"""
+
+		units = minor_units * 10 ** (decimals - self.decimals)
+		sign = "-" if units < 0 else ""
+		if decimals == 0:
+			return "%s%d" % (sign, abs(units))
+		integer_part, decimal_part = divmod(abs(units), 10 ** decimals)
+		return "%s%d.%0*d" % (sign, integer_part, decimals, decimal_part)
+
+	def format(self, amount):
+		"""
+			Returns the amount with the number of decimals of the currency, i.e.: "1000" for PYG and "10.50" for USD.
+
+			:rtype str
+		"""
+
+		return self.format_minor_units(self.to_minor_units(amount), self.decimals)
+
+	def bancard_amount(self, amount):
+		"""
+			Returns the amount in the format of the Bancard requests and tokens, with BANCARD_AMOUNT_DECIMALS decimals, i.e.: "1000.00" for PYG.
+
+			:rtype str
+		"""
+
+		minor_units = self.to_minor_units(amount)
+		if self.decimals == 0:
+			return "%d.00" % minor_units
+		bancard_units = minor_units * self._bancard_scale
+		if bancard_units < 0:
+			return "-%d.%02d" % divmod(-bancard_units, 100)
+		return "%d.%02d" % divmod(bancard_units, 100)
+
+	def matches_bancard_amount(self, bancard_amount, minor_units):
+		"""
+			Returns True if an amount reported by Bancard (i.e.: "1000.00") is exactly an integer number of minor units of the currency.
+
+			:param bancard_amount: the amount reported by Bancard
+				:type bancard_amount: str
+			:param minor_units: the expected amount, as returned by to_minor_units
+				:type minor_units: int
+			:rtype bool
+		"""
+
+		try:
+			numerator, denominator = Decimal(bancard_amount).as_integer_ratio()
+		except (ArithmeticError, TypeError, ValueError):  # not a number, NaN and Infinity
+			return False
+		return numerator * 10 ** BANCARD_AMOUNT_DECIMALS == minor_units * self._bancard_scale * denominator
+
+	def __repr__(self):
+		return "CurrencyFormatter(currency=%r, decimals=%r)" % (self.currency, self.decimals)
+
+
+# the CurrencyFormatter of every currency of CURRENCIES_DECIMALS that has been used
+_CURRENCY_FORMATTERS = dict()
+
+
+def get_currency_formatter(currency):
+	"""
+		Returns the cached CurrencyFormatter of a currency of CURRENCIES_DECIMALS.
+
+		:param currency: the currency in the format ISO-4217
+			:type currency: str
+		:rtype CurrencyFormatter
+		:raises BancardAPIInvalidParameterException: if the currency is not in CURRENCIES_DECIMALS
+	"""
+
+	try:
+		return _CURRENCY_FORMATTERS[currency]
+	except (KeyError, TypeError):
+		if currency not in CURRENCIES_DECIMALS:
+			raise BancardAPIInvalidParameterException("The currency is not allowed.")
+		formatter = _CURRENCY_FORMATTERS[currency] = CurrencyFormatter(currency, CURRENCIES_DECIMALS[currency])
+		return formatter
+
+
+def to_minor_units(currency, amount):
+	"""
+		Returns the amount as an integer number of minor units of a currency (i.e.: cents for USD).
+
+		:rtype int
+		:raises BancardAPIInvalidParameterException: if the currency is not allowed or the amount is not a Decimal value
+	"""
+
+	return get_currency_formatter(currency).to_minor_units(amount)
+
+
+def format_bancard_amount(currency, amount):
+	"""
+		Returns the amount in the format of the Bancard requests and tokens, i.e.: "1000.00" for Decimal(1000) PYG.
+
+		:rtype str
+		:raises BancardAPIInvalidParameterException: if the currency is not allowed or the amount is not a Decimal value
+	"""
+
+	return get_currency_formatter(currency).bancard_amount(amount)
+
+
 def currency_decimal_to_string(currency, decimal_value):
 	"""
 		Returns the amount in a string format depending on the number of decimals of a given currency.
@@ -70,12 +232,4 @@ def currency_decimal_to_string(currency, decimal_value):
 			:rtype str
 	"""
 
-	if currency not in CURRENCIES_DECIMALS:
-		raise BancardAPIInvalidParameterException("The currency is not allowed.")
-
-	if not isinstance(decimal_value, Decimal):
-		raise BancardAPIInvalidParameterException("The amount is not a Decimal value.")
-
-	decimals = CURRENCIES_DECIMALS[currency] if currency in CURRENCIES_DECIMALS else 2
-	ret = ("%." + str(decimals) + "f") % decimal_value
-	return ret
+	return get_currency_formatter(currency).format(decimal_value)
@@ -0,0 +1,232 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from decimal import Decimal
+from itertools import compress, count
+from operator import not_
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import BancardAPIInvalidParameterException
+
+# the columns of a charge batch, in the order of the BancardAPI.generate_charge_token parameters
+CHARGE_BATCH_FIELDS = ("marketplace_charge_id", "amount", "description", "approved_url", "cancelled_url", "currency")
+
+# the messages of the exceptions raised by the BancardAPI validators, reported by validate_charge_batch too
+VALIDATION_MESSAGES = {
+	"marketplace_charge_id": "The marketplace charge ID is required and must be a valid integer.",
+	"amount": "The amount must be a decimal greater than Decimal(0).",
+	"description": "The description must be a string between [0,%d] characters." % BANCARD_DESCRIPTION_MAX_LENGTH,
+	"approved_url": "The approved_url must be a valid URL string containing [1,%d] characters." % BANCARD_URL_MAX_LENGTH,
+	"cancelled_url": "The cancelled_url must be a valid URL string containing [1,%d] characters." % BANCARD_URL_MAX_LENGTH,
+	"currency": "The currency must be any of the following strings: %s" % BANCARD_ALLOWED_CURRENCIES,
+}
+
+_ZERO = Decimal(0)
+_ALLOWED_CURRENCIES = frozenset(BANCARD_ALLOWED_CURRENCIES)
+_DISTINCT_SAMPLE_SIZE = 1000  # values sampled to choose how to check a column of a batch
+
+
+def is_valid_marketplace_charge_id(marketplace_charge_id):
+	"""
+		Returns True if the marketplace_charge_id can be converted to an integer value (as required by the Bancard docs)
+
+		:rtype bool
+	"""
+
+	try:
+		int(marketplace_charge_id)
+		return True
+	except (TypeError, ValueError):
+		return False
+
+
+def is_valid_amount(amount):
+	"""
+		Returns True if the amount is a finite Decimal object greater than zero (as required by the Bancard docs)
+
+		:rtype bool
+	"""
+
+	return isinstance(amount, Decimal) and amount.is_finite() and amount > _ZERO
+
+
+def is_valid_description(description):
+	"""
+		Returns True if the description is a string of at most BANCARD_DESCRIPTION_MAX_LENGTH characters (as required by the Bancard docs)
+
+		:rtype bool
+	"""
+
+	return type(description) is str and len(description) <= BANCARD_DESCRIPTION_MAX_LENGTH
+
+
+def is_valid_url(url):
+	"""
+		Returns True if the approved/cancelled URL is a non-empty string of at most BANCARD_URL_MAX_LENGTH characters (as required by the Bancard docs)
+
+		:rtype bool
+	"""
+
+	return type(url) is str and 1 <= len(url) <= BANCARD_URL_MAX_LENGTH
+
+
+def is_valid_currency(currency):
+	"""
+		Returns True if the currency belongs to the allowed ones by Bancard (as required by the Bancard docs)
+
+		:rtype bool
+	"""
+
+	return type(currency) is str and currency in _ALLOWED_CURRENCIES
+
+
+# the rule of every column of a charge batch
+VALIDATION_RULES = {
+	"marketplace_charge_id": is_valid_marketplace_charge_id,
+	"amount": is_valid_amount,
+	"description": is_valid_description,
+	"approved_url": is_valid_url,
+	"cancelled_url": is_valid_url,
+	"currency": is_valid_currency,
+}
+
+
+class ChargeBatchReport(object):
+
+	def __init__(self, rows, violations):
+		"""
+			Constructor of the ChargeBatchReport class, the result of validate_charge_batch.
+
+			:param rows: the number of rows of the batch
+				:type rows: int
+			:param violations: the tuples (row, field, message) of every invalid field, sorted by row and then by the order of CHARGE_BATCH_FIELDS
+				:type violations: list
+		"""
+		self.rows = rows
+		self.violations = violations
+
+	@property
+	def is_valid(self):
+		return not self.violations
+
+	@property
+	def invalid_rows(self):
+		"""
+			Returns the sorted indexes of the rows with at least one invalid field.
+
+			:rtype list of int
+		"""
+		invalid_rows = list()
+		for row, field, message in self.violations:
+			if not invalid_rows or invalid_rows[-1] != row:
+				invalid_rows.append(row)
+		return invalid_rows
+
+	def valid_rows(self):
+		"""
+			Returns the sorted indexes of the rows without any invalid field, i.e.: the ones ready for generate_charge_token.
+
+			:rtype list of int
+		"""
+		invalid_rows = set(self.invalid_rows)
+		return [row for row in range(self.rows) if row not in invalid_rows]
+
+	def errors_by_row(self):
+		"""
+			Returns the invalid fields of every invalid row.
+
+			:return: a dict of row index to the list of tuples (field, message)
+				:rtype dict
+		"""
+		errors = dict()
+		for row, field, message in self.violations:
+			errors.setdefault(row, list()).append((field, message))
+		return errors
+
+	def counts_by_field(self):
+		"""
+			Returns the number of invalid values of every column.
+
+			:rtype dict
+		"""
+		counts = dict()
+		for row, field, message in self.violations:
+			counts[field] = counts.get(field, 0) + 1
+		return counts
+
+	def __repr__(self):
+		return "ChargeBatchReport(rows=%d, invalid_rows=%d, violations=%d)" % (self.rows, len(self.invalid_rows), len(self.violations))
+
+
+def _invalid_rows(rule, column):
+	"""
+		Returns the indexes of the values of a column that do not pass a rule.
+		The columns with repeated values of a single type (i.e.: currencies, URLs, amounts) are checked once per distinct value.
+	"""
+
+	sample = column[:_DISTINCT_SAMPLE_SIZE]
+	try:
+		# equal values of different types may not pass the same rules, i.e.: True == 1 == Decimal(1), but only Decimal(1) is a valid amount
+		repeated_values = len(set(sample)) <= len(sample) // 2 and len(set(map(type, column))) == 1
+	except TypeError:  # unhashable values
+		repeated_values = False
+	if not repeated_values:
+		# map runs the rule over the whole column and only the invalid rows are materialized
+		return list(compress(count(), map(not_, map(rule, column))))
+
+	invalid_values = set(value for value in set(column) if not rule(value))
+	if not invalid_values:
+		return []
+	return list(compress(count(), map(invalid_values.__contains__, column)))
+
+
+def validate_charge_batch(columns):
+	"""
+		Validates a column-oriented batch of charges with the same rules as the BancardAPI validators, in one pass per column
+		and without raising on the invalid values, so every violation of every row can be reported.
+		The amounts must already be Decimal values, as required by generate_charge_token (i.e.: Decimal(row["amount"]) of a CSV file).
+
+		:param columns: a dict of any of the CHARGE_BATCH_FIELDS to the sequence of the values of every row.
+			The currency column is optional and it is "PYG" by default, as in generate_charge_token.
+			:type columns: dict
+		:return: the report of every invalid field of every row
+			:rtype ChargeBatchReport
+		:raises BancardAPIInvalidParameterException: if a column is missing, unknown, or does not have the same length as the other ones
+	"""
+
+	unknown_fields = set(columns) - set(CHARGE_BATCH_FIELDS)
+	if unknown_fields:
+		raise BancardAPIInvalidParameterException("Unknown charge batch columns: %s" % ", ".join(sorted(unknown_fields)))
+	missing_fields = [field for field in CHARGE_BATCH_FIELDS if field not in columns and field != "currency"]
+	if missing_fields:
+		raise BancardAPIInvalidParameterException("Missing charge batch columns: %s" % ", ".join(missing_fields))
+	rows = len(columns["marketplace_charge_id"])
+	if any(len(column) != rows for column in columns.values()):
+		raise BancardAPIInvalidParameterException("Every charge batch column must have %d rows." % rows)
+
+	violations = list()
+	for field_order, field in enumerate(CHARGE_BATCH_FIELDS):
+		if field in columns:
+			message = VALIDATION_MESSAGES[field]
+			violations.extend((row, field_order, field, message) for row in _invalid_rows(VALIDATION_RULES[field], columns[field]))
+	violations.sort()
+	return ChargeBatchReport(rows, [(row, field, message) for row, field_order, field, message in violations])
@@ -0,0 +1,422 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import threading
+from collections import deque
+from bancardconnectorpython.constants import *
+from bancardconnectorpython.exceptions import *
+from bancardconnectorpython.codec import load_bancard_data
+from bancardconnectorpython.outcomes import ChargeOutcome
+from bancardconnectorpython.metrics import Histogram, histograms_text
+
+_STOP = object()  # tells a worker of the WebhookDispatcher to exit
+
+_JSON_HEADERS = [("Content-Type", "application/json")]
+_ACK_BODY = b'{"status":"success"}'
+_ERROR_BODY = b'{"status":"error","messages":[{"key":"%s","dsc":"%s"}]}'
+
+
+class WebhookEvent(object):
+
+	__slots__ = ("marketplace_charge_id", "payment_approved", "authorization_number", "response_code", "bancard_data", "error", "received_at")
+
+	def __init__(self, marketplace_charge_id, payment_approved, authorization_number, response_code, bancard_data, error=None, received_at=None):
+		"""
+			Constructor of the WebhookEvent class, an authentic Bancard webhook waiting to be handled.
+
+			:param marketplace_charge_id: The marketplace's custom ID of the charge request
+				:type marketplace_charge_id: str
+			:param payment_approved: True if the payment has been approved
+				:type payment_approved: bool
+			:param authorization_number: the authorization number of the payment
+				:type authorization_number: str
+			:param response_code: the response code of the payment, "00" if it has been approved
+				:type response_code: str
+			:param bancard_data: the parsed data of the Bancard webhook
+				:type bancard_data: dict
+			:param error: the BancardAPIPaymentRejectecException of a rejected payment, None if the payment has been approved
+				:type error: BancardAPIPaymentRejectecException
+			:param received_at: time in seconds when the webhook was received. By default the current time.
+				:type received_at: float
+		"""
+		self.marketplace_charge_id = marketplace_charge_id
+		self.payment_approved = payment_approved
+		self.authorization_number = authorization_number
+		self.response_code = response_code
+		self.bancard_data = bancard_data
+		self.error = error
+		self.received_at = received_at if received_at is not None else time.time()
+
+	def __repr__(self):
+		return "WebhookEvent(marketplace_charge_id=%r, payment_approved=%r, response_code=%r)" % (self.marketplace_charge_id, self.payment_approved, self.response_code)
+
+
+class WebhookDispatcher(object):
+
+	def __init__(self, handler, workers=DEFAULT_WEBHOOK_WORKERS, queue_size=DEFAULT_WEBHOOK_QUEUE_SIZE, clock=time.time):
+		"""
+			Constructor of the WebhookDispatcher class, a bounded in-process queue of WebhookEvent handled by a pool of worker threads.
+			A full queue does not block: submit returns False, so the receiver can ask Bancard to retry the webhook later.
+
+			:param handler: function called with every WebhookEvent by a worker thread (i.e.: to update the charge in the DB).
+				If it raises, the event is counted as failed and the worker goes on with the next one.
+				:type handler: callable
+			:param workers: number of worker threads. The default value is: DEFAULT_WEBHOOK_WORKERS
+				:type workers: int
+			:param queue_size: maximum number of events waiting for a worker. The default value is: DEFAULT_WEBHOOK_QUEUE_SIZE
+				:type queue_size: int
+			:param clock: function that returns the current time in seconds
+				:type clock: callable
+			:raises BancardAPIInvalidParameterException: if workers or queue_size are not valid
+		"""
+		if int(workers) < 1 or int(queue_size) < 1:
+			raise BancardAPIInvalidParameterException("The workers and queue_size must be greater than 0.")
+		self.handler = handler
+		self.queue_size = int(queue_size)
+		self.clock = clock
+		self.accepted = 0
+		self.rejected = 0  # events not accepted because the queue was full or the dispatcher was closed
+		self.processed = 0
+		self.failed = 0
+		self.in_flight = 0
+		self.high_watermark = 0  # maximum number of events that have been waiting at the same time
+		self.last_error = None
+		self.queue_wait = Histogram(DEFAULT_LATENCY_BUCKETS)  # seconds between the reception and the start of the handling
+		self.handle_duration = Histogram(DEFAULT_LATENCY_BUCKETS)
+		self._events = deque()
+		self._lock = threading.Lock()
+		self._not_empty = threading.Condition(self._lock)
+		self._idle = threading.Condition(self._lock)
+		self._closed = False
+		self._workers = [threading.Thread(target=self._work, name="bancard-webhook-%d" % index) for index in range(int(workers))]
+		for worker in self._workers:
+			worker.daemon = True
+			worker.start()
+
+	@property
+	def queue_depth(self):
+		return len(self._events)
+
+	def submit(self, event):
+		"""
+			Queues an event for the workers without blocking.
+
+			:param event: the event to handle
+				:type event: WebhookEvent
+			:return: True if the event was queued, False if the queue is full or the dispatcher is closed
+				:rtype bool
+		"""
+
+		with self._lock:
+			if self._closed or len(self._events) >= self.queue_size:
+				self.rejected += 1
+				return False
+			self._events.append(event)
+			self.accepted += 1
+			self.high_watermark = max(self.high_watermark, len(self._events))
+			self._not_empty.notify()
+		return True
+
+	def _work(self):
+		while True:
+			with self._lock:
+				while not self._events and not self._closed:
+					self._not_empty.wait()
+				if not self._events:
+					return
+				event = self._events.popleft()
+				self.in_flight += 1
+				started_at = self.clock()
+				self.queue_wait.observe(max(0.0, started_at - event.received_at))
+			error = None
+			try:
+				self.handler(event)
+			except Exception as handler_error:
+				error = handler_error
+			with self._lock:
+				self.in_flight -= 1
+				self.handle_duration.observe(max(0.0, self.clock() - started_at))
+				if error is None:
+					self.processed += 1
+				else:
+					self.failed += 1
+					self.last_error = error
+				if not self._events and not self.in_flight:
+					self._idle.notify_all()
+
+	def join(self, timeout=None):
+		"""
+			Waits until every queued event has been handled.
+
+			:param timeout: maximum seconds to wait, by default there is no limit
+				:type timeout: float
+			:return: True if every event has been handled
+				:rtype bool
+		"""
+
+		deadline = None if timeout is None else time.monotonic() + timeout
+		with self._lock:
+			while self._events or self.in_flight:
+				remaining = None if deadline is None else deadline - time.monotonic()
+				if remaining is not None and remaining <= 0:
+					return False
+				self._idle.wait(remaining)
+		return True
+
+	def close(self, timeout=None):
+		"""
+			Stops accepting events, handles the queued ones and stops the workers.
+
+			:param timeout: maximum seconds to wait for every worker, by default there is no limit
+				:type timeout: float
+		"""
+
+		with self._lock:
+			self._closed = True
+			self._not_empty.notify_all()
+		for worker in self._workers:
+			worker.join(timeout)
+
+	def stats(self):
+		"""
+			Returns the backpressure metrics of the dispatcher.
+
+			:rtype dict
+		"""
+
+		with self._lock:
+			return {
+				"queue_depth": len(self._events), "queue_size": self.queue_size, "high_watermark": self.high_watermark, "in_flight": self.in_flight,
+				"workers": len(self._workers), "accepted": self.accepted, "rejected": self.rejected, "processed": self.processed, "failed": self.failed,
+			}
+
+	def prometheus_text(self, prefix="bancard"):
+		"""
+			Exports the backpressure metrics in the Prometheus text exposition format (served with the PROMETHEUS_CONTENT_TYPE content type).
+
+			:param prefix: the prefix of the metric names. The default value is: bancard
+				:type prefix: str
+			:rtype str
+		"""
+
+		stats = self.stats()
+		lines = list()
+		for name, metric_type, help_text in (
+				("queue_depth", "gauge", "Verified Bancard webhooks waiting for a worker."),
+				("queue_size", "gauge", "Maximum number of Bancard webhooks waiting for a worker."),
+				("high_watermark", "gauge", "Maximum number of Bancard webhooks that have been waiting at the same time."),
+				("in_flight", "gauge", "Bancard webhooks being handled."),
+				("accepted", "counter", "Verified Bancard webhooks queued."),
+				("rejected", "counter", "Verified Bancard webhooks rejected because the queue was full."),
+				("processed", "counter", "Bancard webhooks handled."),
+				("failed", "counter", "Bancard webhooks whose handler raised an exception.")):
+			metric_name = "%s_webhook_%s%s" % (prefix, name, "_total" if metric_type == "counter" else "")
+			lines.append("# HELP %s %s" % (metric_name, help_text))
+			lines.append("# TYPE %s %s" % (metric_name, metric_type))
+			lines.append("%s %d" % (metric_name, stats[name]))
+		with self._lock:
+			histograms_text(lines, "%s_webhook_queue_wait_seconds" % prefix, "Seconds that the Bancard webhooks waited for a worker.", {WEBHOOK_ENDPOINT: self.queue_wait})
+			histograms_text(lines, "%s_webhook_handle_duration_seconds" % prefix, "Seconds of the handler of the Bancard webhooks.", {WEBHOOK_ENDPOINT: self.handle_duration})
+		return "\n".join(lines) + "\n"
+
+
+class WebhookReceiver(object):
+
+	def __init__(self, bancard_api, handler=None, dispatcher=None, charge_loader=None, max_body_size=DEFAULT_WEBHOOK_MAX_BODY_SIZE, **dispatcher_options):
+		"""
+			Constructor of the WebhookReceiver class, the endpoint of the Bancard confirm callback: it parses the request body once,
+			verifies its token, queues the authentic webhook in a WebhookDispatcher and acknowledges it right away.
+			Use BancardWebhookWSGIApp or BancardWebhookASGIApp to serve it.
+
+			The responses are:
+				* 200 {"status": "success"}: the webhook is authentic and it was queued, even if its payment was rejected
+				* 400: the webhook is not valid, its token is wrong or its charge is unknown
+				* 405: the request is not a POST
+				* 413: the body is larger than max_body_size
+				* 503: the queue is full, so Bancard should retry the webhook later
+
+			:param bancard_api: the BancardAPI that verifies the webhooks
+				:type bancard_api: BancardAPI
+			:param handler: function called with every WebhookEvent by the worker threads. It is required if there is no dispatcher.
+				:type handler: callable
+			:param dispatcher: the WebhookDispatcher of the events. By default a new one with the handler and the dispatcher_options (workers, queue_size).
+				:type dispatcher: WebhookDispatcher
+			:param charge_loader: function that returns the tuple (amount, currency) of a marketplace_charge_id, or None if it is unknown.
+				If it is given the webhooks are verified with process_vpos_webhook (i.e.: when the charges are created by other processes),
+				otherwise with verify_vpos_webhook and the pending charges index of the bancard_api.
+				:type charge_loader: callable
+			:param max_body_size: maximum bytes of the request body. The default value is: DEFAULT_WEBHOOK_MAX_BODY_SIZE
+				:type max_body_size: int
+			:raises BancardAPIConfigurationException: if there is neither a handler nor a dispatcher
+		"""
+		if dispatcher is None:
+			if handler is None:
+				raise BancardAPIConfigurationException("A handler or a dispatcher is required by the WebhookReceiver.")
+			dispatcher = WebhookDispatcher(handler, **dispatcher_options)
+		self.bancard_api = bancard_api
+		self.dispatcher = dispatcher
+		self.charge_loader = charge_loader
+		self.max_body_size = max_body_size
+
+	def verify(self, body):
+		"""
+			Parses and verifies the body of a Bancard webhook.
+
+			:param body: the raw request body
+				:type body: bytes
+			:rtype WebhookEvent
+			:raises BancardAPIInvalidWebhookDataException: if the webhook data is not valid, or its charge is unknown or not valid
+			:raises BancardAPIInvalidWebhookTokenException: if the token of the webhook is wrong
+		"""
+
+		received_at = time.time()
+		try:
+			bancard_data = load_bancard_data(body, self.bancard_api.codec)
+			bancard_operation = bancard_data["operation"]
+			marketplace_charge_id = str(bancard_operation["shop_process_id"])
+			response_code = bancard_operation.get("response_code", None)
+		except (KeyError, ValueError, TypeError, AttributeError):
+			raise BancardAPIInvalidWebhookDataException("Invalid Bancard webhook data.", body)
+
+		try:
+			if self.charge_loader is None:
+				# the charge is evicted from the pending charges index by receive, once its event has been queued
+				webhook_result = self.bancard_api.verify_vpos_webhook(bancard_data, evict=False)
+			else:
+				charge = self.charge_loader(marketplace_charge_id)
+				if charge is None:
+					raise BancardAPIInvalidWebhookDataException("The charge %s of the Bancard webhook is unknown." % marketplace_charge_id, body)
+				webhook_result = self.bancard_api.process_vpos_webhook(bancard_data, marketplace_charge_id, *charge)
+		except BancardAPIInvalidParameterException:
+			# the loaded charge is not valid, so the webhook can never be verified: Bancard must not retry it
+			raise BancardAPIInvalidWebhookDataException("The charge %s of the Bancard webhook is not valid." % marketplace_charge_id, body)
+		except BancardAPIPaymentRejectecException as error:
+			# the webhook is authentic, but its payment has been rejected
+			return WebhookEvent(marketplace_charge_id, False, bancard_operation.get("authorization_number", None), response_code, bancard_data, error, received_at)
+
+		# in the outcome_mode the rejected payments are returned instead of raised
+		error = webhook_result.exception(bancard_data) if isinstance(webhook_result, ChargeOutcome) else None
+		payment_approved, authorization_number, _ = webhook_result
+		return WebhookEvent(marketplace_charge_id, payment_approved, authorization_number, response_code, bancard_data, error, received_at)
+
+	def receive(self, method, body):
+		"""
+			Handles a request to the webhook endpoint.
+
+			:param method: the HTTP method of the request
+				:type method: str
+			:param body: the raw request body, or None if it is larger than max_body_size
+				:type body: bytes
+			:return: a tuple of: HTTP status, headers, response body
+				:rtype tuple (str, list, bytes)
+		"""
+
+		if method != "POST":
+			return "405 Method Not Allowed", [("Allow", "POST")] + _JSON_HEADERS, _ERROR_BODY % (b"MethodNotAllowedError", b"Only POST is allowed")
+		if body is None:
+			return "413 Payload Too Large", _JSON_HEADERS, _ERROR_BODY % (b"PayloadTooLargeError", b"The body is too large")
+		try:
+			event = self.verify(body)
+		except (BancardAPIInvalidWebhookDataException, BancardAPIInvalidWebhookTokenException):
+			return "400 Bad Request", _JSON_HEADERS, _ERROR_BODY % (b"InvalidWebhookError", b"Invalid Bancard webhook")
+		if not self.dispatcher.submit(event):
+			# the charge is still pending, so the retry of Bancard is verified again
+			return "503 Service Unavailable", [("Retry-After", "1")] + _JSON_HEADERS, _ERROR_BODY % (b"BusyError", b"Try again later")
+		if self.charge_loader is None:
+			self.bancard_api.pending_index.discard(event.marketplace_charge_id)
+		return "200 OK", _JSON_HEADERS, _ACK_BODY
+
+	def close(self, timeout=None):
+		"""
+			Handles the queued webhooks and stops the workers of the dispatcher.
+		"""
+
+		self.dispatcher.close(timeout)
+
+
+class BancardWebhookWSGIApp(WebhookReceiver):
+	"""
+		WSGI application of the Bancard confirm callback, see WebhookReceiver. i.e.: with gunicorn or as a Django/Flask view:
+
+			application = BancardWebhookWSGIApp(bancard_api, handler=update_charge)
+	"""
+
+	def __call__(self, environ, start_response):
+		body = None
+		try:
+			content_length = int(environ.get("CONTENT_LENGTH") or 0)
+		except ValueError:
+			content_length = 0
+		if content_length <= self.max_body_size:
+			body = environ["wsgi.input"].read(content_length) if content_length > 0 else b""
+		status, headers, response_body = self.receive(environ.get("REQUEST_METHOD", "GET"), body)
+		start_response(status, headers + [("Content-Length", str(len(response_body)))])
+		return [response_body]
+
+
+class BancardWebhookASGIApp(WebhookReceiver):
+	"""
+		ASGI application of the Bancard confirm callback, see WebhookReceiver. i.e.: with uvicorn or mounted in Starlette/FastAPI:
+
+			app = BancardWebhookASGIApp(bancard_api, handler=update_charge)
+
+		The handler runs in the worker threads. The verification with the pending charges index does not perform any I/O, but the
+		charge_loader may (i.e.: a DB query), so if there is a charge_loader the request is verified in the default executor of the event loop.
+	"""
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] == "lifespan":
+			while True:
+				message = await receive()
+				if message["type"] == "lifespan.startup":
+					await send({"type": "lifespan.startup.complete"})
+				elif message["type"] == "lifespan.shutdown":
+					self.close()
+					await send({"type": "lifespan.shutdown.complete"})
+					return
+		if scope["type"] != "http":
+			return
+
+		chunks, size, more_body = list(), 0, True
+		while more_body:
+			message = await receive()
+			if message["type"] == "http.disconnect":
+				return
+			chunk = message.get("body", b"")
+			size += len(chunk)
+			if size <= self.max_body_size:
+				chunks.append(chunk)
+			more_body = message.get("more_body", False)
+		body = b"".join(chunks) if size <= self.max_body_size else None
+		if self.charge_loader is None:
+			status, headers, response_body = self.receive(scope.get("method", "GET"), body)
+		else:
+			import asyncio  # already imported by the ASGI server
+			status, headers, response_body = await asyncio.get_running_loop().run_in_executor(None, self.receive, scope.get("method", "GET"), body)
+		await send({
+			"type": "http.response.start",
+			"status": int(status.split(" ", 1)[0]),
+			"headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers + [("Content-Length", str(len(response_body)))]],
+		})
+		await send({"type": "http.response.body", "body": response_body})
@@ -0,0 +1,72 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Benchmark of the formatting of amounts for the Bancard requests and tokens: the previous float based formatting
+	("%s.00" % ("%.0f" % amount)) against the integer minor units of format_bancard_amount, and how many of the
+	amounts each one formats wrongly.
+
+	Usage: python benchmarks/bench_amounts.py [number_of_amounts]
+"""
+
+import sys
+import time
+import random
+from decimal import Decimal
+from bancardconnectorpython.util import format_bancard_amount, get_currency_formatter
+
+
+def legacy_bancard_amount(amount):
+	"""
+		The amount formatting that every BancardAPI operation did before format_bancard_amount.
+	"""
+	return "%s.00" % ("%.0f" % amount)
+
+
+def amounts_per_second(format_amount, amounts):
+	start = time.perf_counter()
+	formatted = [format_amount(amount) for amount in amounts]
+	return len(amounts) / (time.perf_counter() - start), formatted
+
+
+def main(count=2000000):
+	generator = random.Random(0)
+	# half of the amounts are usual PYG amounts and the other half are beyond the 53 bits of precision of a float
+	amounts = [Decimal(generator.randrange(1000, 10 ** 8)) if index % 2 else Decimal(generator.randrange(10 ** 16, 10 ** 24)) for index in range(count)]
+	expected = ["%d.00" % int(amount) for amount in amounts]
+
+	legacy, legacy_formatted = amounts_per_second(legacy_bancard_amount, amounts)
+	exact, exact_formatted = amounts_per_second(lambda amount: format_bancard_amount("PYG", amount), amounts)
+	formatter = get_currency_formatter("PYG")
+	cached, cached_formatted = amounts_per_second(formatter.bancard_amount, amounts)
+
+	print("amounts per variant:        %d" % count)
+	print("float formatting:           %10.0f amounts/sec, %d wrong amounts" % (legacy, sum(1 for got, want in zip(legacy_formatted, expected) if got != want)))
+	print("format_bancard_amount:      %10.0f amounts/sec, %d wrong amounts (%.2fx)" % (
+		exact, sum(1 for got, want in zip(exact_formatted, expected) if got != want), exact / legacy))
+	print("CurrencyFormatter (cached): %10.0f amounts/sec, %d wrong amounts (%.2fx)" % (
+		cached, sum(1 for got, want in zip(cached_formatted, expected) if got != want), cached / legacy))
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000)
@@ -0,0 +1,87 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Benchmark of the validation of a column-oriented charge batch with 1% of invalid rows: calling the BancardAPI validators
+	row by row (catching the first exception of every row) against validate_charge_batch (reporting every violation).
+
+	Usage: python benchmarks/bench_batch_validation.py [number_of_rows]
+"""
+
+import sys
+import time
+from decimal import Decimal
+from bancardconnectorpython.api import BancardAPI
+from bancardconnectorpython.exceptions import BancardAPIInvalidParameterException
+from bancardconnectorpython.validation import validate_charge_batch
+
+
+def build_columns(rows):
+	return {
+		"marketplace_charge_id": [str(row) if row % 100 else "charge-%d" % row for row in range(rows)],
+		"amount": [Decimal(1000 + row % 5000) if row % 150 else Decimal(0) for row in range(rows)],
+		"description": ["Charge %d" % (row % 1000) for row in range(rows)],
+		"approved_url": ["https://shop.example.com/approved"] * rows,
+		"cancelled_url": ["https://shop.example.com/cancelled"] * rows,
+		"currency": ["PYG"] * rows,
+	}
+
+
+def validate_row_by_row(columns):
+	"""
+		The validation that was possible before validate_charge_batch: only the first invalid field of every row is reported.
+	"""
+	errors = list()
+	for row, charge in enumerate(zip(columns["marketplace_charge_id"], columns["amount"], columns["description"], columns["approved_url"],
+			columns["cancelled_url"], columns["currency"])):
+		try:
+			BancardAPI.validate_marketplace_charge_id(charge[0])
+			BancardAPI.validate_amount(charge[1])
+			BancardAPI.validate_description(charge[2])
+			BancardAPI.validate_approved_url(charge[3])
+			BancardAPI.validate_cancelled_url(charge[4])
+			BancardAPI.validate_currency(charge[5])
+		except BancardAPIInvalidParameterException as error:
+			errors.append((row, str(error)))
+	return errors
+
+
+def rows_per_second(validate, columns, rows):
+	start = time.perf_counter()
+	result = validate(columns)
+	return rows / (time.perf_counter() - start), result
+
+
+def main(rows=1000000):
+	columns = build_columns(rows)
+	row_by_row, errors = rows_per_second(validate_row_by_row, columns, rows)
+	batch, report = rows_per_second(validate_charge_batch, columns, rows)
+
+	print("rows:                   %d" % rows)
+	print("row by row validators:  %10.0f rows/sec, %d invalid rows (first violation only)" % (row_by_row, len(errors)))
+	print("validate_charge_batch:  %10.0f rows/sec, %d invalid rows, %d violations (%.2fx)" % (
+		batch, len(report.invalid_rows), len(report.violations), batch / row_by_row))
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
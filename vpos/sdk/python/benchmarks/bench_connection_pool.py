@@ -0,0 +1,136 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Benchmark of the per-call latency saved by the keep-alive connection pool of the BancardAPI.
+
+	It starts a local HTTPS stub of the Bancard single_buy WebService (with a throw-away self-signed certificate
+	generated with the openssl command line tool) and compares one fresh connection per call (the previous behaviour,
+	a module-level requests.post) against the pooled BancardTransport.
+
+	Usage: python benchmarks/bench_connection_pool.py [number_of_calls]
+"""
+
+import os
+import ssl
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import requests
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from bancardconnectorpython.transport import BancardTransport
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class _BancardStubHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get("Content-Length", 0)))
+		body = json.dumps({"status": "success", "process_id": "stub-process-id"}).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+def start_https_stub(workdir):
+	"""
+		Starts the HTTPS stub server in a background thread.
+
+		:param workdir: directory where the self-signed certificate is written
+			:type workdir: str
+		:return: a tuple of: server, url, certificate_path
+			:rtype tuple (HTTPServer, str, str)
+	"""
+
+	cert_path, key_path = os.path.join(workdir, "cert.pem"), os.path.join(workdir, "key.pem")
+	subprocess.check_call(
+		["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+			"-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1", "-keyout", key_path, "-out", cert_path],
+		stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+	server = _ThreadingHTTPServer(("127.0.0.1", 0), _BancardStubHandler)
+	context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+	context.load_cert_chain(cert_path, key_path)
+	server.socket = context.wrap_socket(server.socket, server_side=True)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server, "https://127.0.0.1:%s/vpos/api/0.3/single_buy" % server.server_address[1], cert_path
+
+
+def measure(post, url, calls):
+	"""
+		Returns the mean latency in milliseconds of calling post(url) the given number of times.
+	"""
+
+	body, headers = json.dumps({"public_key": "public", "operation": {}}), {"Content-Type": "application/json"}
+	post(url, body, headers)  # warm-up
+	start = time.perf_counter()
+	for _ in range(calls):
+		post(url, body, headers)
+	return (time.perf_counter() - start) * 1000.0 / calls
+
+
+def main(calls=200):
+	if shutil.which("openssl") is None:
+		sys.exit("The openssl command line tool is required to generate the stub certificate.")
+
+	workdir = tempfile.mkdtemp()
+	try:
+		server, url, cert_path = start_https_stub(workdir)
+
+		def unpooled_post(wsurl, data, headers):
+			return requests.post(wsurl, data=data, headers=headers, verify=cert_path).content
+
+		transport = BancardTransport()
+		transport.session.verify = cert_path
+		transport.session.trust_env = False  # do not let a REQUESTS_CA_BUNDLE variable override the stub certificate
+
+		unpooled_ms = measure(unpooled_post, url, calls)
+		pooled_ms = measure(transport.post, url, calls)
+		transport.close()
+		server.shutdown()
+
+		print("calls per variant:           %d" % calls)
+		print("new connection per call:     %.3f ms/call" % unpooled_ms)
+		print("pooled keep-alive transport: %.3f ms/call" % pooled_ms)
+		print("latency saved per call:      %.3f ms (%.1fx faster)" % (unpooled_ms - pooled_ms, unpooled_ms / pooled_ms))
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
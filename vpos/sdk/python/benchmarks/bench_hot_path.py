@@ -0,0 +1,247 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Microbenchmark suite of the client-side CPU cost of every BancardAPI operation, with a stubbed transport so no time is spent in the network.
+
+	Every phase of generate_charge_token, get_charge_status, rollback_charge and process_vpos_webhook (validation, amount formatting,
+	token signing, JSON encoding of the request, JSON decoding of the response and the interpretation of the response) is measured
+	alone, and the whole operation end to end. For each one it reports the ops/sec (best of the repeats) and the peak bytes that
+	tracemalloc observed during a single call.
+	A fixed reference workload is measured next to every benchmark, and the baselines are compared by the speed relative to it.
+
+	The results can be stored as a baseline JSON file and compared against it later, so the slowdowns are caught when the library
+	changes. The baselines are only meaningful for the same Python version.
+
+	Usage: python benchmarks/bench_hot_path.py [--iterations N] [--repeat N] [--baseline PATH] [--save-baseline] [--tolerance FRACTION]
+	The exit status is 1 if any benchmark regressed beyond the tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from decimal import Decimal
+from bancardconnectorpython.api import BancardAPI
+from bancardconnectorpython.metrics import InMemoryMetricsSink
+from bancardconnectorpython.util import format_bancard_amount
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_path.json")
+
+MARKETPLACE_CHARGE_ID = 1234567
+AMOUNT = Decimal(150000)
+CURRENCY = "PYG"
+DESCRIPTION = "Hot path benchmark"
+APPROVED_URL = "https://example.com/approved"
+CANCELLED_URL = "https://example.com/cancelled"
+
+SINGLE_BUY_RESPONSE = json.dumps({"status": "success", "process_id": "i5fn*lx6niQel0QzWK1g"}).encode("utf-8")
+CONFIRMATIONS_RESPONSE = json.dumps({"status": "success", "confirmation": {
+	"token": "0123456789abcdef0123456789abcdef", "shop_process_id": MARKETPLACE_CHARGE_ID, "response": "S", "response_details": "Procesado Satisfactoriamente",
+	"amount": "150000.00", "currency": CURRENCY, "authorization_number": "123456", "ticket_number": "123456789123456", "response_code": "00",
+	"response_description": "Transaccion aprobada", "extended_response_description": None,
+	"security_information": {"customer_ip": "127.0.0.1", "card_source": "L", "card_country": "PARAGUAY", "version": "0.3", "risk_index": 0}}}).encode("utf-8")
+ROLLBACK_RESPONSE = json.dumps({"status": "success", "messages": [{"key": "RollbackSuccessful", "level": "info", "dsc": "Rollback correcto."}]}).encode("utf-8")
+
+
+class _StubTransport(object):
+	"""
+		Transport that answers every Bancard WebService with a canned response, without any I/O.
+	"""
+
+	def post(self, url, data, headers, timeout=None):
+		if url.endswith("/confirmations"):
+			return CONFIRMATIONS_RESPONSE
+		if url.endswith("/rollback"):
+			return ROLLBACK_RESPONSE
+		return SINGLE_BUY_RESPONSE
+
+
+def build_benchmarks(bancard_api):
+	"""
+		Returns the ordered list of (name, function) of every benchmark.
+	"""
+
+	charge_token_request = bancard_api._build_charge_token_request(MARKETPLACE_CHARGE_ID, AMOUNT, DESCRIPTION, APPROVED_URL, CANCELLED_URL, CURRENCY)
+	charge_status_request = bancard_api._build_charge_status_request(MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY)
+	rollback_request = bancard_api._build_rollback_request(MARKETPLACE_CHARGE_ID)
+	amount_str = format_bancard_amount(CURRENCY, AMOUNT)
+	measured_api = BancardAPI(public_key="public", private_key="private", transport=_StubTransport(), pending_index_size=0, metrics=InMemoryMetricsSink())
+	webhook_data = json.dumps({"operation": dict(json.loads(CONFIRMATIONS_RESPONSE.decode("utf-8"))["confirmation"],
+		token=bancard_api._confirm_token(MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY))})
+
+	def validate_charge_token():
+		BancardAPI.validate_marketplace_charge_id(MARKETPLACE_CHARGE_ID)
+		BancardAPI.validate_amount(AMOUNT)
+		BancardAPI.validate_description(DESCRIPTION)
+		BancardAPI.validate_approved_url(APPROVED_URL)
+		BancardAPI.validate_cancelled_url(CANCELLED_URL)
+		BancardAPI.validate_currency(CURRENCY)
+
+	return [
+		("generate_charge_token.validate", validate_charge_token),
+		("generate_charge_token.format_amount", lambda: format_bancard_amount(CURRENCY, AMOUNT)),
+		("generate_charge_token.sign", lambda: bancard_api.signer.single_buy(MARKETPLACE_CHARGE_ID, amount_str, CURRENCY)),
+		("generate_charge_token.build_request", lambda: bancard_api._build_charge_token_request(MARKETPLACE_CHARGE_ID, AMOUNT, DESCRIPTION, APPROVED_URL, CANCELLED_URL, CURRENCY)),
+		("generate_charge_token.encode", lambda: bancard_api._encode_bancard_request(charge_token_request)),
+		("generate_charge_token.decode", lambda: bancard_api._decode_bancard_response(SINGLE_BUY_RESPONSE)),
+		("generate_charge_token.handle", lambda: bancard_api._handle_charge_token_response(MARKETPLACE_CHARGE_ID, {"status": "success", "process_id": "i5fn*lx6niQel0QzWK1g"})),
+		("generate_charge_token", lambda: bancard_api.generate_charge_token(MARKETPLACE_CHARGE_ID, AMOUNT, DESCRIPTION, APPROVED_URL, CANCELLED_URL, CURRENCY)),
+		("get_charge_status.build_request", lambda: bancard_api._build_charge_status_request(MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY)),
+		("get_charge_status.encode", lambda: bancard_api._encode_bancard_request(charge_status_request)),
+		("get_charge_status.decode", lambda: bancard_api._decode_bancard_response(CONFIRMATIONS_RESPONSE)),
+		("get_charge_status.handle", lambda: bancard_api._handle_charge_status_response(AMOUNT, CURRENCY, json.loads(CONFIRMATIONS_RESPONSE.decode("utf-8")))),
+		("get_charge_status", lambda: bancard_api.get_charge_status(MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY)),
+		("get_charge_status.with_metrics", lambda: measured_api.get_charge_status(MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY)),
+		("rollback_charge.build_request", lambda: bancard_api._build_rollback_request(MARKETPLACE_CHARGE_ID)),
+		("rollback_charge.encode", lambda: bancard_api._encode_bancard_request(rollback_request)),
+		("rollback_charge.decode", lambda: bancard_api._decode_bancard_response(ROLLBACK_RESPONSE)),
+		("rollback_charge", lambda: bancard_api.rollback_charge(MARKETPLACE_CHARGE_ID)),
+		("process_vpos_webhook.confirm_token", lambda: bancard_api._confirm_token(MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY)),
+		("process_vpos_webhook", lambda: bancard_api.process_vpos_webhook(webhook_data, MARKETPLACE_CHARGE_ID, AMOUNT, CURRENCY)),
+	]
+
+
+def ops_per_second(function, iterations, repeat):
+	"""
+		Returns the best ops/sec of calling the function iterations times, out of repeat runs.
+	"""
+
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for _ in range(iterations):
+			function()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return iterations / best
+
+
+def _reference_workload():
+	"""
+		Fixed pure Python workload measured next to every benchmark, so the results can be normalized by the current speed of the machine.
+	"""
+	return "-".join(str(number) for number in range(10))
+
+
+def peak_bytes_per_call(function):
+	"""
+		Returns the peak bytes that tracemalloc observed during a single (already warmed up) call of the function.
+	"""
+
+	function()
+	tracemalloc.start()
+	try:
+		tracemalloc.clear_traces()
+		current, _ = tracemalloc.get_traced_memory()
+		if hasattr(tracemalloc, "reset_peak"):
+			tracemalloc.reset_peak()
+		function()
+		_, peak = tracemalloc.get_traced_memory()
+		return peak - current
+	finally:
+		tracemalloc.stop()
+
+
+def run(iterations, repeat):
+	"""
+		Runs every benchmark and returns a dict of: name -> {"ops_per_sec": float, "relative_speed": float, "peak_bytes": int}
+		The relative_speed is the ops/sec divided by the ones of the reference workload measured right before, which makes the
+		comparisons against a baseline much less sensitive to the CPU frequency scaling and to the noisy neighbours of the machine.
+	"""
+
+	bancard_api = BancardAPI(public_key="public", private_key="private", transport=_StubTransport(), pending_index_size=0)
+	results = dict()
+	for name, function in build_benchmarks(bancard_api):
+		reference_ops_per_sec = ops_per_second(_reference_workload, iterations, repeat)
+		function_ops_per_sec = ops_per_second(function, iterations, repeat)
+		results[name] = {
+			"ops_per_sec": round(function_ops_per_sec, 1),
+			"relative_speed": round(function_ops_per_sec / reference_ops_per_sec, 4),
+			"peak_bytes": peak_bytes_per_call(function),
+		}
+	return results
+
+
+def compare(results, baseline, tolerance):
+	"""
+		Returns the list of descriptions of the benchmarks that are slower, or allocate more, than the baseline beyond the tolerance.
+	"""
+
+	regressions = list()
+	for name, result in results.items():
+		expected = baseline.get(name)
+		if expected is None:
+			continue
+		if result["relative_speed"] < expected["relative_speed"] * (1 - tolerance):
+			regressions.append("%s: %.0f ops/sec, %.2fx slower than the baseline" % (name, result["ops_per_sec"], expected["relative_speed"] / result["relative_speed"]))
+		if result["peak_bytes"] > expected["peak_bytes"] * (1 + tolerance):
+			regressions.append("%s: %d peak bytes per call, baseline %d" % (name, result["peak_bytes"], expected["peak_bytes"]))
+	return regressions
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Microbenchmarks of the client-side CPU cost of the BancardAPI operations.")
+	parser.add_argument("--iterations", type=int, default=10000, help="calls per repeat of every benchmark")
+	parser.add_argument("--repeat", type=int, default=7, help="repeats of every benchmark, the best one is reported")
+	parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="path of the baseline JSON file")
+	parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+	parser.add_argument("--tolerance", type=float, default=0.3, help="fraction of slowdown (or extra bytes) reported as a regression")
+	args = parser.parse_args(argv)
+
+	results = run(args.iterations, args.repeat)
+	baseline = None
+	if os.path.exists(args.baseline):
+		with open(args.baseline) as baseline_file:
+			baseline = json.load(baseline_file)["results"]
+
+	print("%-40s %14s %12s %10s" % ("benchmark", "ops/sec", "peak bytes", "vs base"))
+	for name, result in results.items():
+		relative = ""
+		if baseline is not None and name in baseline:
+			relative = "%.2fx" % (result["relative_speed"] / baseline[name]["relative_speed"])
+		print("%-40s %14.0f %12d %10s" % (name, result["ops_per_sec"], result["peak_bytes"], relative))
+
+	if args.save_baseline:
+		directory = os.path.dirname(args.baseline)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory)
+		with open(args.baseline, "w") as baseline_file:
+			json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, baseline_file, indent=2, sort_keys=True)
+			baseline_file.write("\n")
+		print("baseline stored in %s" % args.baseline)
+		return 0
+
+	if baseline is not None:
+		regressions = compare(results, baseline, args.tolerance)
+		for regression in regressions:
+			print("REGRESSION %s" % regression)
+		return 1 if regressions else 0
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,80 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Benchmark of a reconciliation loop where most of the charges have been declined: the default mode, that raises an
+	exception for every decline, against the outcome_mode, that returns a ChargeOutcome.
+
+	Usage: python benchmarks/bench_outcomes.py [number_of_charges]
+"""
+
+import sys
+import time
+from decimal import Decimal
+from bancardconnectorpython.api import BancardAPI
+from bancardconnectorpython.exceptions import BancardAPIPaymentRejectecException
+
+RESPONSE_CODES = ("00", "05", "12", "15", "51", "99")
+
+
+def responses(count):
+	return [{"status": "success", "confirmation": {"response_code": RESPONSE_CODES[index % len(RESPONSE_CODES)], "amount": "1000.00",
+		"currency": "PYG", "authorization_number": "%06d" % index}} for index in range(count)]
+
+
+def reconcile_raising(bancard_api, bancard_responses):
+	approved = 0
+	for bancard_response in bancard_responses:
+		try:
+			already_payed, _, _ = bancard_api._handle_charge_status_response(Decimal(1000), "PYG", bancard_response)
+			approved += already_payed
+		except BancardAPIPaymentRejectecException:
+			pass
+	return approved
+
+
+def reconcile_outcomes(bancard_api, bancard_responses):
+	approved = 0
+	for bancard_response in bancard_responses:
+		approved += bancard_api._handle_charge_status_response(Decimal(1000), "PYG", bancard_response).approved
+	return approved
+
+
+def main(count=200000):
+	bancard_responses = responses(count)
+	variants = [
+		("raising", reconcile_raising, BancardAPI(public_key="public", private_key="private")),
+		("outcome_mode", reconcile_outcomes, BancardAPI(public_key="public", private_key="private", outcome_mode=True)),
+	]
+	reference = None
+	print("charges per variant: %d (%d%% declined)" % (count, 100 * (len(RESPONSE_CODES) - 1) // len(RESPONSE_CODES)))
+	for name, reconcile, bancard_api in variants:
+		started_at = time.perf_counter()
+		reconcile(bancard_api, bancard_responses)
+		elapsed = time.perf_counter() - started_at
+		reference = reference or elapsed
+		print("%-14s %10.0f charges/sec (%.2fx)" % (name, count / elapsed, reference / elapsed))
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,73 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Memory benchmark of holding many get_charge_status results: the default tuples with the full Bancard response
+	against the ChargeStatus objects of the result_objects option, with and without keep_bancard_response.
+
+	Usage: python benchmarks/bench_result_memory.py [number_of_results]
+"""
+
+import sys
+import tracemalloc
+from bancardconnectorpython.codec import get_codec
+from bancardconnectorpython.results import ChargeStatus
+
+CONFIRMATION = (b'{"status":"success","confirmation":{"token":"8a9e2a6c3d1f4b5e6a7b8c9d0e1f2a3b","shop_process_id":%d,"response":"S",'
+	b'"response_details":"Procesado Satisfactoriamente","amount":"1000.00","currency":"PYG","authorization_number":"%06d",'
+	b'"ticket_number":"123456789123456","response_code":"00","response_description":"Transaccion aprobada",'
+	b'"security_information":{"customer_ip":"123.123.123.123","card_source":"L","card_country":"PARAGUAY","version":"0.3","risk_index":"0"}}}')
+
+
+def retained_bytes(build_results, count):
+	tracemalloc.start()
+	results = build_results(count)
+	retained = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	del results
+	return retained
+
+
+def parse(count):
+	codec = get_codec(None)
+	for index in range(count):
+		bancard_response = codec.loads(CONFIRMATION % (index, index % 1000000))
+		yield True, bancard_response["confirmation"]["authorization_number"], bancard_response
+
+
+def main(count=100000):
+	variants = [
+		("tuples", lambda count: list(parse(count))),
+		("ChargeStatus + response", lambda count: [ChargeStatus.from_tuple(result, True) for result in parse(count)]),
+		("ChargeStatus", lambda count: [ChargeStatus.from_tuple(result) for result in parse(count)]),
+	]
+	reference = None
+	print("results per variant: %d" % count)
+	for name, build_results in variants:
+		retained = retained_bytes(build_results, count)
+		reference = reference or retained
+		print("%-24s %8.1f MiB %6.0f bytes/result (%.2fx)" % (name, retained / 1048576.0, retained / float(count), retained / float(reference)))
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,72 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+	Microbenchmark of the Bancard tokens per second: the previous per-call token building (private key concatenation,
+	python version check and a fresh MD5) against the BancardTokenSigner, one token at a time and with sign_batch.
+
+	Usage: python benchmarks/bench_token_signer.py [number_of_tokens]
+"""
+
+import sys
+import time
+import hashlib
+from bancardconnectorpython.util import is_python_version_greater_igual_than_3x
+from bancardconnectorpython.signer import BancardTokenSigner, SIGNER_OPERATION_CONFIRM
+
+PRIVATE_KEY = "bancard-private-key-0123456789abcdef01234"
+
+
+def legacy_confirm_token(private_key, marketplace_charge_id, amount_str, currency):
+	"""
+		The token building that every BancardAPI operation did before the BancardTokenSigner.
+	"""
+	bancard_token = "%s%s%s%s%s" % (private_key, marketplace_charge_id, "confirm", amount_str, currency)
+	if is_python_version_greater_igual_than_3x():
+		bancard_token = bytes(bancard_token, "UTF-8")
+	return hashlib.md5(bancard_token).hexdigest()
+
+
+def tokens_per_second(sign, tokens):
+	start = time.perf_counter()
+	sign()
+	return tokens / (time.perf_counter() - start)
+
+
+def main(tokens=500000):
+	signer = BancardTokenSigner(PRIVATE_KEY)
+	charge_ids = range(1000000, 1000000 + tokens)
+
+	legacy = tokens_per_second(lambda: [legacy_confirm_token(PRIVATE_KEY, charge_id, "1000.00", "PYG") for charge_id in charge_ids], tokens)
+	single = tokens_per_second(lambda: [signer.confirm(charge_id, "1000.00", "PYG") for charge_id in charge_ids], tokens)
+	operations = [(SIGNER_OPERATION_CONFIRM, charge_id, "1000.00", "PYG") for charge_id in charge_ids]
+	batch = tokens_per_second(lambda: signer.sign_batch(operations), tokens)
+
+	print("tokens per variant:       %d" % tokens)
+	print("per-call token building:  %10.0f tokens/sec" % legacy)
+	print("BancardTokenSigner:       %10.0f tokens/sec (%.2fx)" % (single, single / legacy))
+	print("BancardTokenSigner batch: %10.0f tokens/sec (%.2fx)" % (batch, batch / legacy))
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -19,6 +19,7 @@ setup(
 	long_description=readme(),
 	package_data={'bancardconnectorpython': []},
 	install_requires=['requests[security]>=2.18.4'],
+	extras_require={'async': ['aiohttp>=3.0'], 'fast': ['orjson>=3.0']},
 	classifiers=[
 		'Intended Audience :: Developers',
 		'Natural Language :: English',
@@ -0,0 +1,108 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import random
+import unittest
+from decimal import Decimal, Context, ROUND_HALF_EVEN
+import bancardconnectorpython
+from bancardconnectorpython import BancardAPIInvalidParameterException
+
+
+class TestBancardAmounts(unittest.TestCase):
+	"""
+		Property tests of the integer minor units amount engine, checked over many random amounts of every currency.
+	"""
+
+	SAMPLES = 2000
+
+	def setUp(self):
+		self.random = random.Random(20240101)
+
+	def random_amount(self, max_decimals):
+		digits = self.random.choice((3, 6, 9, 15, 18, 24, 30))
+		return Decimal(self.random.randrange(1, 10 ** digits)).scaleb(-self.random.randint(0, max_decimals))
+
+	def test_formatter_table(self):
+		self.assertEqual(bancardconnectorpython.CURRENCIES_DECIMALS["PYG"], 0)
+		self.assertEqual(bancardconnectorpython.CURRENCIES_DECIMALS["USD"], 2)
+		self.assertIs(bancardconnectorpython.get_currency_formatter("USD"), bancardconnectorpython.get_currency_formatter("USD"))
+		self.assertRaises(BancardAPIInvalidParameterException, bancardconnectorpython.get_currency_formatter, "XXX")
+		self.assertRaises(BancardAPIInvalidParameterException, bancardconnectorpython.CurrencyFormatter, "KWD", 3)
+
+	def test_examples(self):
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("PYG", Decimal(1000)), "1000.00")
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("PYG", Decimal("1000.5")), "1000.00")
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("PYG", Decimal("1001.5")), "1002.00")
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("USD", Decimal("10.5")), "10.50")
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("USD", Decimal("0.015")), "0.02")
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("USD", Decimal("-0.05")), "-0.05")
+		self.assertEqual(bancardconnectorpython.format_bancard_amount("PYG", Decimal("123456789012345678901234567")), "123456789012345678901234567.00")
+		self.assertEqual(bancardconnectorpython.currency_decimal_to_string("PYG", Decimal("1E+3")), "1000")
+		self.assertEqual(bancardconnectorpython.currency_decimal_to_string("USD", Decimal(7)), "7.00")
+		self.assertEqual(bancardconnectorpython.to_minor_units("USD", Decimal("12.34")), 1234)
+
+	def test_invalid_amounts(self):
+		for amount in (1000, 1000.0, "1000", None, Decimal("NaN"), Decimal("sNaN"), Decimal("Infinity")):
+			self.assertRaises(BancardAPIInvalidParameterException, bancardconnectorpython.format_bancard_amount, "PYG", amount)
+
+	def test_property_rounds_half_to_even_like_decimal(self):
+		context = Context(prec=100, rounding=ROUND_HALF_EVEN)
+		for currency, decimals in (("PYG", 0), ("USD", 2)):
+			formatter = bancardconnectorpython.get_currency_formatter(currency)
+			for index in range(self.SAMPLES):
+				amount = self.random_amount(6)
+				expected = amount.quantize(Decimal(1).scaleb(-decimals), context=context)
+				self.assertEqual(formatter.from_minor_units(formatter.to_minor_units(amount)), expected)
+				self.assertEqual(Decimal(formatter.bancard_amount(amount)), expected)
+				self.assertEqual(formatter.format(amount), str(expected))
+
+	def test_property_round_trip(self):
+		for currency, decimals in (("PYG", 0), ("USD", 2)):
+			formatter = bancardconnectorpython.get_currency_formatter(currency)
+			for index in range(self.SAMPLES):
+				amount = self.random_amount(decimals)
+				minor_units = formatter.to_minor_units(amount)
+				self.assertEqual(formatter.from_minor_units(minor_units), amount)
+				bancard_amount = formatter.bancard_amount(amount)
+				self.assertRegex(bancard_amount, r"^\d+\.\d\d$")
+				self.assertTrue(formatter.matches_bancard_amount(bancard_amount, minor_units))
+				self.assertFalse(formatter.matches_bancard_amount(bancard_amount, minor_units + 1))
+
+	def test_property_same_as_float_formatting_within_float_precision(self):
+		for index in range(self.SAMPLES):
+			amount = Decimal(self.random.randrange(1, 2 ** 53))
+			self.assertEqual(bancardconnectorpython.format_bancard_amount("PYG", amount), "%s.00" % ("%.0f" % amount))
+
+	def test_matches_bancard_amount(self):
+		formatter = bancardconnectorpython.get_currency_formatter("PYG")
+		self.assertTrue(formatter.matches_bancard_amount("1000.00", 1000))
+		self.assertTrue(formatter.matches_bancard_amount("1000", 1000))
+		self.assertTrue(formatter.matches_bancard_amount(1000.0, 1000))
+		self.assertFalse(formatter.matches_bancard_amount("1000.50", 1000))
+		self.assertFalse(formatter.matches_bancard_amount("abc", 1000))
+		self.assertFalse(formatter.matches_bancard_amount(None, 1000))
+		self.assertFalse(formatter.matches_bancard_amount("NaN", 1000))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,190 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import asyncio
+import threading
+import unittest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import bancardconnectorpython
+from bancardconnectorpython import aio
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class _BancardStubHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def do_POST(self):
+		operation = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))["operation"]
+		shop_process_id = int(operation["shop_process_id"])
+		if self.path.endswith("/confirmations"):
+			# even charge ids are payed, odd charge ids were rejected due to insufficient funds
+			response_code = "00" if shop_process_id % 2 == 0 else "51"
+			bancard_response = {"status": "success", "confirmation": {
+				"shop_process_id": shop_process_id, "response_code": response_code, "amount": "1000.00", "currency": "PYG", "authorization_number": "123456"}}
+		elif self.path.endswith("/rollback"):
+			bancard_response = {"status": "success"}
+		else:
+			bancard_response = {"status": "success", "process_id": "process-%s" % shop_process_id}
+
+		body = json.dumps(bancard_response).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+@unittest.skipIf(aio.aiohttp is None, "the AsyncBancardAPI requires the aiohttp library")
+class TestAsyncBancardAPI(unittest.TestCase):
+
+	def setUp(self):
+		self.server = _ThreadingHTTPServer(("127.0.0.1", 0), _BancardStubHandler)
+		threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+		self.base_url = "http://127.0.0.1:%s/vpos/api/0.3/single_buy" % self.server.server_address[1]
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def build_api(self, **options):
+		bancard_api = bancardconnectorpython.AsyncBancardAPI(public_key="public", private_key="private", **options)
+		bancard_api.urls = {
+			bancardconnectorpython.CHARGE_TOKEN_GENERATOR_KEY: self.base_url,
+			bancardconnectorpython.CONFIRMATIONS_KEY: "%s/confirmations" % self.base_url,
+			bancardconnectorpython.ROLLBACK_KEY: "%s/rollback" % self.base_url,
+			bancardconnectorpython.PAYMENT_WEB_URL_KEY: "http://localhost/payment/single_buy?process_id=",
+		}
+		return bancard_api
+
+	def test_generate_charge_token_and_rollback(self):
+		async def scenario():
+			async with self.build_api() as bancard_api:
+				charge_token = await bancard_api.generate_charge_token(1000, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+				rollback = await bancard_api.rollback_charge(1000)
+				return charge_token, rollback
+
+		(bancard_process_id, payment_url, bancard_response), (successfull_rollback, bancard_response) = asyncio.run(scenario())
+		self.assertEqual(bancard_process_id, "process-1000")
+		self.assertEqual(payment_url, "http://localhost/payment/single_buy?process_id=process-1000")
+		self.assertTrue(successfull_rollback)
+
+	def test_rollback_evicts_the_pending_charge(self):
+		async def scenario():
+			async with self.build_api() as bancard_api:
+				await bancard_api.generate_charge_token(1001, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+				self.assertIsNotNone(bancard_api.pending_index.get(1001))
+				await bancard_api.rollback_charge(1001)
+				self.assertIsNone(bancard_api.pending_index.get(1001))
+
+				# a late webhook of the rolled back charge is not verified anymore
+				webhook = json.dumps({"operation": {
+					"shop_process_id": 1001, "token": bancard_api._confirm_token(1001, Decimal(1000), "PYG"), "response_code": "00"}})
+				await bancard_api.verify_vpos_webhook(webhook)
+
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException, asyncio.run, scenario())
+
+	def test_stores_are_used_off_the_event_loop(self):
+		threads = list()
+
+		class _IdempotencyStore(bancardconnectorpython.MemoryIdempotencyStore):
+			def get(self, marketplace_charge_id):
+				threads.append(threading.current_thread())
+				return super(_IdempotencyStore, self).get(marketplace_charge_id)
+
+			def put(self, record):
+				threads.append(threading.current_thread())
+				super(_IdempotencyStore, self).put(record)
+
+		class _Ledger(object):
+			def record(self, event, marketplace_charge_id, bancard_response, amount=None, currency=None):
+				threads.append(threading.current_thread())
+
+		async def scenario():
+			async with self.build_api(idempotency_store=_IdempotencyStore(), ledger=_Ledger()) as bancard_api:
+				await bancard_api.generate_charge_token(1002, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+				await bancard_api.get_charge_status(1002, Decimal(1000))
+				await bancard_api.rollback_charge(1002)
+
+		asyncio.run(scenario())
+		self.assertEqual(len(threads), 5)
+		self.assertNotIn(threading.current_thread(), threads)
+
+	def test_cancelled_hedged_call_cancels_its_request(self):
+		cancelled = list()
+
+		class _HangingTransport(object):
+			async def post(self, url, data, headers, timeout=None):
+				try:
+					await asyncio.sleep(60)
+				except asyncio.CancelledError:
+					cancelled.append(url)
+					raise
+
+			async def close(self):
+				pass
+
+		async def scenario():
+			async with self.build_api(transport=_HangingTransport(), hedge_delay=60) as bancard_api:
+				call = asyncio.ensure_future(bancard_api.get_charge_status(1000, Decimal(1000)))
+				await asyncio.sleep(0.05)
+				call.cancel()
+				await asyncio.wait([call])
+				await asyncio.sleep(0)
+				# the request is cancelled with the call, not when the event loop is closed
+				self.assertEqual(len(cancelled), 1)
+
+		asyncio.run(scenario())
+
+	def test_concurrent_charge_status(self):
+		async def scenario():
+			async with self.build_api() as bancard_api:
+				calls = [bancard_api.get_charge_status(charge_id, Decimal(1000)) for charge_id in range(1000, 1200)]
+				return await asyncio.gather(*calls, return_exceptions=True)
+
+		results = asyncio.run(scenario())
+		for charge_id, result in zip(range(1000, 1200), results):
+			if charge_id % 2 == 0:
+				self.assertEqual(result[:2], (True, "123456"))
+			else:
+				self.assertIsInstance(result, bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException)
+
+	def test_invalid_parameters_are_rejected_before_any_call(self):
+		async def scenario():
+			async with self.build_api() as bancard_api:
+				await bancard_api.get_charge_status(1000, Decimal(-1))
+
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, asyncio.run, scenario())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,216 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import asyncio
+import unittest
+import threading
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _ConfirmationsTransport(object):
+	"""
+		Fake transport that answers the confirmations WebService: even charge ids are payed, odd charge ids were rejected.
+	"""
+
+	def __init__(self, delay=0.0):
+		self.delay = delay
+		self.in_flight = 0
+		self.max_in_flight = 0
+		self.lock = threading.Lock()
+
+	def post(self, url, data, headers, timeout=None):
+		with self.lock:
+			self.in_flight += 1
+			self.max_in_flight = max(self.max_in_flight, self.in_flight)
+		try:
+			shop_process_id = int(json.loads(data)["operation"]["shop_process_id"])
+			time.sleep(self.delay * (shop_process_id % 3))
+			response_code = "00" if shop_process_id % 2 == 0 else "51"
+			return json.dumps({"status": "success", "confirmation": {
+				"response_code": response_code, "amount": "1000.00", "currency": "PYG", "authorization_number": "123456"}}).encode("utf-8")
+		finally:
+			with self.lock:
+				self.in_flight -= 1
+
+
+class TestBancardBulkChargeStatus(unittest.TestCase):
+
+	def build_api(self, transport):
+		return bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport)
+
+	def test_results_in_input_order(self):
+		transport = _ConfirmationsTransport(delay=0.01)
+		charges = ((charge_id, Decimal(1000), "PYG") for charge_id in range(100, 140))
+		results = list(self.build_api(transport).get_charge_statuses(charges, max_workers=4))
+
+		self.assertEqual([bulk_result.index for bulk_result in results], list(range(40)))
+		for bulk_result in results:
+			if bulk_result.request[0] % 2 == 0:
+				self.assertTrue(bulk_result.ok)
+				self.assertEqual(bulk_result.result[:2], (True, "123456"))
+			else:
+				self.assertIsInstance(bulk_result.exception, bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException)
+		self.assertLessEqual(transport.max_in_flight, 4)
+
+	def test_results_in_completion_order(self):
+		charges = [(charge_id, Decimal(1000)) for charge_id in range(100, 130)]
+		results = list(self.build_api(_ConfirmationsTransport(delay=0.01)).get_charge_statuses(charges, max_workers=8, ordered=False))
+		self.assertEqual(sorted(bulk_result.index for bulk_result in results), list(range(30)))
+
+	def test_deadline_reports_unfinished_charges(self):
+		charges = [(charge_id, Decimal(1000)) for charge_id in range(100, 120)]
+		results = list(self.build_api(_ConfirmationsTransport(delay=0.2)).get_charge_statuses(charges, max_workers=2, deadline=0.1))
+
+		self.assertEqual(len(results), 20)
+		timed_out = [bulk_result for bulk_result in results if isinstance(bulk_result.exception, bancardconnectorpython.BancardAPITimeoutException)]
+		self.assertGreater(len(timed_out), 0)
+
+	def test_invalid_max_workers(self):
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, bancardconnectorpython.run_bulk, len, [], max_workers=0)
+
+	def test_invalid_charge_does_not_stop_the_batch(self):
+		charges = [(100, Decimal(1000)), ("not-an-id", Decimal(1000)), (102, Decimal(1000))]
+		results = list(self.build_api(_ConfirmationsTransport()).get_charge_statuses(charges))
+		self.assertEqual([bulk_result.ok for bulk_result in results], [True, False, True])
+		self.assertIsInstance(results[1].exception, bancardconnectorpython.BancardAPIInvalidParameterException)
+
+	def test_non_iterable_item_does_not_stop_the_batch(self):
+		charges = [(100, Decimal(1000)), 101, (102, Decimal(1000))]
+		results = list(self.build_api(_ConfirmationsTransport()).get_charge_statuses(charges))
+		self.assertEqual([bulk_result.ok for bulk_result in results], [True, False, True])
+		self.assertEqual(results[1].request, 101)
+		self.assertIsInstance(results[1].exception, bancardconnectorpython.BancardAPIInvalidParameterException)
+
+		async def get_status(charge_id):
+			return charge_id
+
+		async def scenario():
+			return [bulk_result async for bulk_result in bancardconnectorpython.aio.run_bulk_async(get_status, [(100,), None, (102,)])]
+
+		self.assertEqual([bulk_result.ok for bulk_result in asyncio.run(scenario())], [True, False, True])
+
+	def test_async_run_bulk(self):
+		async def get_status(charge_id):
+			await asyncio.sleep(0.001 * (charge_id % 5))
+			if charge_id % 2:
+				raise bancardconnectorpython.BancardAPIPaymentTransactionInvalidException("rejected")
+			return charge_id
+
+		async def scenario():
+			return [bulk_result async for bulk_result in bancardconnectorpython.aio.run_bulk_async(get_status, [(charge_id,) for charge_id in range(50)], max_workers=5)]
+
+		results = asyncio.run(scenario())
+		self.assertEqual([bulk_result.index for bulk_result in results], list(range(50)))
+		self.assertEqual([bulk_result.ok for bulk_result in results], [charge_id % 2 == 0 for charge_id in range(50)])
+
+
+class _RollbackTransport(object):
+	"""
+		Fake transport that answers the rollback WebService depending on the charge id: multiples of 3 are rolled back,
+		the next ones are not found and the rest were already couponned. The charge 1000 fails once with a connection error.
+	"""
+
+	def __init__(self):
+		self.calls = 0
+		self.lock = threading.Lock()
+		self.flaky_failures = 1
+
+	def post(self, url, data, headers, timeout=None):
+		shop_process_id = int(json.loads(data)["operation"]["shop_process_id"])
+		with self.lock:
+			self.calls += 1
+			if shop_process_id == 1000 and self.flaky_failures > 0:
+				self.flaky_failures -= 1
+				raise bancardconnectorpython.BancardAPIConnectionException("connection reset by peer")
+
+		if shop_process_id % 3 == 0 or shop_process_id == 1000:
+			bancard_response = {"status": "success"}
+		elif shop_process_id % 3 == 1:
+			bancard_response = {"status": "error", "messages": [{"key": "PaymentNotFoundError", "dsc": "Payment not found"}]}
+		else:
+			bancard_response = {"status": "error", "messages": [{"key": "AlreadyRollbackedError", "dsc": "Already couponned"}]}
+		return json.dumps(bancard_response).encode("utf-8")
+
+
+class TestBancardBulkRollback(unittest.TestCase):
+
+	def test_rollbacks_are_classified(self):
+		transport = _RollbackTransport()
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, max_retries=0)
+		summary = bancard_api.rollback_charges(list(range(300, 330)) + [1000, "invalid"], max_workers=4, backoff=0.01)
+
+		self.assertEqual(summary.total, 32)
+		self.assertEqual(sorted(summary.rolled_back), list(range(300, 330, 3)) + [1000])
+		self.assertEqual(sorted(summary.not_found), list(range(301, 330, 3)))
+		self.assertEqual(sorted(charge_id for charge_id, _ in summary.not_rolled_back), list(range(302, 330, 3)))
+		self.assertEqual([charge_id for charge_id, _ in summary.failed], ["invalid"])
+		self.assertIsInstance(summary.failed[0][1], bancardconnectorpython.BancardAPIInvalidParameterException)
+
+		# only the connection error of the charge 1000 was retried
+		self.assertEqual(transport.calls, 32)
+
+	def test_transient_errors_exhaust_the_retries(self):
+		transport = _RollbackTransport()
+		transport.flaky_failures = 5
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, max_retries=0)
+		summary = bancard_api.rollback_charges([1000], retries=2, backoff=0.01)
+
+		self.assertEqual(len(summary.failed), 1)
+		self.assertIsInstance(summary.failed[0][1], bancardconnectorpython.BancardAPIConnectionException)
+		self.assertEqual(transport.calls, 3)
+
+	def test_retry_policy_is_not_multiplied(self):
+		transport = _RollbackTransport()
+		transport.flaky_failures = 5
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, max_retries=2, backoff_base=0.01)
+		summary = bancard_api.rollback_charges([1000], retries=2, backoff=0.01)
+
+		# only the retry policy of the BancardAPI retried the rollback
+		self.assertEqual(len(summary.failed), 1)
+		self.assertEqual(transport.calls, 3)
+
+	def test_only_connection_errors_are_retried(self):
+		calls = []
+
+		def rollback_charge(marketplace_charge_id):
+			calls.append(marketplace_charge_id)
+			raise errors[marketplace_charge_id]
+
+		errors = {
+			1: bancardconnectorpython.BancardAPICircuitOpenException("circuit open"),
+			2: bancardconnectorpython.BancardAPIRateLimitedException("rate limited"),
+			3: bancardconnectorpython.BancardAPIInvalidWebhookTokenException("invalid token"),
+			4: KeyError("status"),
+			5: bancardconnectorpython.BancardAPIUnavailableException("unavailable"),
+		}
+		rollback_charge = bancardconnectorpython.with_retries(rollback_charge, 2, 0.001)
+		for marketplace_charge_id, error in sorted(errors.items()):
+			self.assertRaises(type(error), rollback_charge, marketplace_charge_id)
+		self.assertEqual(calls, [1, 2, 3, 4, 5, 5, 5])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,132 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _FakeClock(object):
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class _ConfirmationsTransport(object):
+	"""
+		Fake transport that answers the confirmations WebService with the response configured for every charge id.
+	"""
+
+	def __init__(self):
+		self.calls = list()
+		self.responses = dict()
+
+	def post(self, url, data, headers, timeout=None):
+		operation = json.loads(data)["operation"]
+		self.calls.append((url.rsplit("/", 1)[-1], str(operation["shop_process_id"])))
+		if url.endswith("/rollback"):
+			return json.dumps({"status": "success"}).encode("utf-8")
+		return json.dumps(self.responses[str(operation["shop_process_id"])]).encode("utf-8")
+
+
+PAYED_RESPONSE = {"status": "success", "confirmation": {"response_code": "00", "amount": "1000.00", "currency": "PYG", "authorization_number": "123456"}}
+REJECTED_RESPONSE = {"status": "success", "confirmation": {"response_code": "51", "amount": "1000.00", "currency": "PYG"}}
+PENDING_RESPONSE = {"status": "error", "messages": [{"key": "PaymentNotFoundError", "dsc": "Payment not found"}]}
+
+
+class TestTTLCache(unittest.TestCase):
+
+	def test_lru_eviction(self):
+		cache = bancardconnectorpython.TTLCache(2)
+		cache.set("a", 1)
+		cache.set("b", 2)
+		self.assertEqual(cache.get("a"), 1)  # "b" becomes the least recently used entry
+		cache.set("c", 3)
+		self.assertIsNone(cache.get("b"))
+		self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+		self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+	def test_ttl_expiration(self):
+		clock = _FakeClock()
+		cache = bancardconnectorpython.TTLCache(10, clock=clock)
+		cache.set("pending", 1, ttl=5)
+		cache.set("final", 2)
+		clock.now += 10
+		self.assertIsNone(cache.get("pending"))
+		self.assertEqual(cache.get("final"), 2)
+		self.assertEqual(len(cache), 1)
+
+
+class TestBancardChargeStatusCache(unittest.TestCase):
+
+	def setUp(self):
+		self.transport = _ConfirmationsTransport()
+		self.transport.responses = {"1": PAYED_RESPONSE, "2": REJECTED_RESPONSE, "3": PENDING_RESPONSE}
+		self.bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=self.transport, charge_status_cache_size=100)
+		self.clock = self.bancard_api.charge_status_cache.clock = _FakeClock()
+
+	def test_final_confirmations_are_cached(self):
+		for _ in range(3):
+			self.assertEqual(self.bancard_api.get_charge_status(1, Decimal(1000))[:2], (True, "123456"))
+			self.assertRaises(bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException, self.bancard_api.get_charge_status, 2, Decimal(1000))
+		self.clock.now += 3600
+
+		self.assertEqual(self.bancard_api.get_charge_status(1, Decimal(1000))[:2], (True, "123456"))
+		self.assertEqual(len(self.transport.calls), 2)
+		self.assertEqual((self.bancard_api.charge_status_cache.hits, self.bancard_api.charge_status_cache.misses), (5, 2))
+
+	def test_cached_confirmation_still_checks_the_amount(self):
+		self.bancard_api.get_charge_status(1, Decimal(1000))
+		self.assertRaises(bancardconnectorpython.BancardAPIChargeInconsistentValuesException, self.bancard_api.get_charge_status, 1, Decimal(2000))
+
+	def test_pending_confirmations_expire(self):
+		self.assertEqual(self.bancard_api.get_charge_status(3, Decimal(1000))[:2], (False, None))
+		self.bancard_api.get_charge_status(3, Decimal(1000))
+		self.assertEqual(len(self.transport.calls), 1)
+
+		self.clock.now += bancardconnectorpython.DEFAULT_CHARGE_STATUS_PENDING_TTL + 1
+		self.transport.responses["3"] = PAYED_RESPONSE
+		self.assertEqual(self.bancard_api.get_charge_status(3, Decimal(1000))[:2], (True, "123456"))
+		self.assertEqual(len(self.transport.calls), 2)
+
+	def test_rollback_invalidates_the_cached_confirmation(self):
+		self.bancard_api.get_charge_status(1, Decimal(1000))
+		self.bancard_api.rollback_charge(1)
+		self.transport.responses["1"] = PENDING_RESPONSE
+		self.assertEqual(self.bancard_api.get_charge_status(1, Decimal(1000))[:2], (False, None))
+		self.assertEqual([operation for operation, _ in self.transport.calls], ["confirmations", "rollback", "confirmations"])
+
+	def test_cache_is_disabled_by_default(self):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=self.transport)
+		self.assertIsNone(bancard_api.charge_status_cache)
+		bancard_api.get_charge_status(1, Decimal(1000))
+		bancard_api.get_charge_status(1, Decimal(1000))
+		self.assertEqual(len(self.transport.calls), 2)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,163 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import threading
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+from bancardconnectorpython import CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+
+PENDING_RESPONSE = json.dumps({"status": "error", "messages": [{"key": "PaymentNotFoundError", "dsc": "Payment not found"}]}).encode("utf-8")
+
+
+class _FakeClock(object):
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class _BrownoutTransport(object):
+	"""
+		Fake transport that times out while the brownout is on, and answers the confirmations WebService otherwise.
+	"""
+
+	def __init__(self):
+		self.brownout = True
+		self.calls = 0
+
+	def post(self, url, data, headers, timeout=None):
+		self.calls += 1
+		if self.brownout:
+			raise bancardconnectorpython.BancardAPITimeoutException("simulated brownout")
+		return PENDING_RESPONSE
+
+
+class _SlowFirstCallTransport(object):
+	"""
+		Fake transport whose first call is very slow and the next ones are fast.
+	"""
+
+	def __init__(self, first_call_delay):
+		self.first_call_delay = first_call_delay
+		self.calls = 0
+		self.lock = threading.Lock()
+
+	def post(self, url, data, headers, timeout=None):
+		with self.lock:
+			self.calls += 1
+			call = self.calls
+		if call == 1:
+			time.sleep(self.first_call_delay)
+		return PENDING_RESPONSE
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = _FakeClock()
+		self.circuit_breaker = bancardconnectorpython.CircuitBreaker(failure_rate=0.5, minimum_calls=4, window_size=10, open_duration=30, clock=self.clock)
+
+	def test_opens_when_the_failure_rate_is_exceeded(self):
+		for _ in range(3):
+			self.circuit_breaker.before_call()
+			self.circuit_breaker.record_success()
+		for _ in range(2):
+			self.circuit_breaker.before_call()
+			self.circuit_breaker.record_failure()
+		self.assertEqual(self.circuit_breaker.state, CIRCUIT_CLOSED)  # 2 failures out of 5 calls
+
+		self.circuit_breaker.before_call()
+		self.circuit_breaker.record_failure()
+		self.assertEqual(self.circuit_breaker.state, CIRCUIT_OPEN)  # 3 failures out of 6 calls
+		self.assertRaises(bancardconnectorpython.BancardAPICircuitOpenException, self.circuit_breaker.before_call)
+
+	def test_half_open_probe(self):
+		for _ in range(4):
+			self.circuit_breaker.record_failure()
+		self.clock.now += 31
+		self.assertEqual(self.circuit_breaker.state, CIRCUIT_HALF_OPEN)
+
+		# only one probe at a time, and a failed probe opens the circuit again
+		self.circuit_breaker.before_call()
+		self.assertRaises(bancardconnectorpython.BancardAPICircuitOpenException, self.circuit_breaker.before_call)
+		self.circuit_breaker.record_failure()
+		self.assertEqual(self.circuit_breaker.state, CIRCUIT_OPEN)
+
+		# a successful probe closes the circuit
+		self.clock.now += 31
+		self.circuit_breaker.before_call()
+		self.circuit_breaker.record_success()
+		self.assertEqual(self.circuit_breaker.state, CIRCUIT_CLOSED)
+		self.circuit_breaker.before_call()
+
+	def test_bancard_api_fails_fast_while_open(self):
+		transport = _BrownoutTransport()
+		bancard_api = bancardconnectorpython.BancardAPI(
+			public_key="public", private_key="private", transport=transport, max_retries=0, circuit_breaker=True, circuit_minimum_calls=5)
+		for _ in range(5):
+			self.assertRaises(bancardconnectorpython.BancardAPITimeoutException, bancard_api.get_charge_status, 1, Decimal(1000))
+		self.assertEqual(bancard_api.circuit_breakers[bancardconnectorpython.CONFIRMATIONS_KEY].state, CIRCUIT_OPEN)
+
+		self.assertRaises(bancardconnectorpython.BancardAPICircuitOpenException, bancard_api.get_charge_status, 1, Decimal(1000))
+		self.assertEqual(transport.calls, 5)
+
+		# every endpoint has its own circuit breaker
+		transport.brownout = False
+		self.assertTrue(bancard_api.rollback_charge(1)[0])
+
+
+class TestHedgedRequests(unittest.TestCase):
+
+	def test_hedged_request_wins_over_the_slow_one(self):
+		transport = _SlowFirstCallTransport(first_call_delay=1)
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, hedge_delay=0.05)
+		started_at = time.time()
+		self.assertEqual(bancard_api.get_charge_status(1, Decimal(1000))[:2], (False, None))
+		self.assertLess(time.time() - started_at, 0.5)
+		self.assertEqual(transport.calls, 2)
+		bancard_api.close()
+
+	def test_fast_requests_are_not_hedged(self):
+		transport = _SlowFirstCallTransport(first_call_delay=0)
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, hedge_delay=bancardconnectorpython.HEDGE_DELAY_P95)
+		for _ in range(5):
+			bancard_api.get_charge_status(1, Decimal(1000))
+		self.assertEqual(transport.calls, 5)
+		self.assertEqual(len(bancard_api.confirmations_latency), 5)
+		bancard_api.close()
+
+	def test_p95_hedge_delay(self):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", hedge_delay=bancardconnectorpython.HEDGE_DELAY_P95)
+		self.assertEqual(bancard_api._hedge_delay_seconds(), bancardconnectorpython.DEFAULT_HEDGE_DELAY)
+		for latency in range(1, 101):
+			bancard_api.confirmations_latency.observe(latency / 1000.0)
+		self.assertAlmostEqual(bancard_api._hedge_delay_seconds(), 0.096)
+
+
+if __name__ == '__main__':
+	unittest.main()
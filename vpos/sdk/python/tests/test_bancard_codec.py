@@ -0,0 +1,95 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+from bancardconnectorpython import codec
+
+
+class _RecordingTransport(object):
+
+	def __init__(self):
+		self.bodies = list()
+
+	def post(self, url, data, headers, timeout=None):
+		self.bodies.append(data)
+		return b'{"status":"error","messages":[{"key":"PaymentNotFoundError","level":"error","dsc":"Payment not found"}]}'
+
+
+class TestBancardCodec(unittest.TestCase):
+
+	def codecs(self):
+		codecs = [bancardconnectorpython.JSONCodec()]
+		if codec.orjson is not None:
+			codecs.append(bancardconnectorpython.OrjsonCodec())
+		return codecs
+
+	def webhook_data(self, bancard_api):
+		return json.dumps({"operation": {"token": bancard_api._confirm_token(1, Decimal(1000), "PYG"), "shop_process_id": 1,
+										"response_code": "00", "authorization_number": "123456"}}).encode("utf-8")
+
+	def test_codecs_parse_every_document_type(self):
+		document = {"status": "success", "confirmation": {"shop_process_id": 1, "amount": "1000.00", "description": "Ñandutí"}}
+		for json_codec in self.codecs():
+			encoded = json_codec.dumps(document)
+			self.assertIs(type(encoded), bytes)
+			for raw_document in (encoded, bytearray(encoded), memoryview(encoded), encoded.decode("utf-8")):
+				self.assertEqual(json_codec.loads(raw_document), document, "%s %s" % (json_codec.name, type(raw_document)))
+			self.assertRaises(ValueError, json_codec.loads, b"{not json")
+
+	def test_requests_are_sent_as_bytes(self):
+		for json_codec in self.codecs():
+			transport = _RecordingTransport()
+			bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, codec=json_codec)
+			self.assertEqual(bancard_api.get_charge_status(1, Decimal(1000))[:2], (False, None))
+			self.assertIs(type(transport.bodies[0]), bytes)
+			self.assertEqual(json.loads(transport.bodies[0].decode("utf-8"))["operation"]["shop_process_id"], 1)
+
+	def test_non_dict_bodies_are_rejected(self):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_RecordingTransport())
+		self.assertEqual(bancard_api._encode_bancard_request("{}"), b"{}")
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, bancard_api._encode_bancard_request, ["public_key"])
+
+	def test_webhooks_as_bytes_and_memoryview(self):
+		for json_codec in self.codecs():
+			bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_RecordingTransport(), codec=json_codec)
+			webhook_data = self.webhook_data(bancard_api)
+			for raw_webhook in (webhook_data, memoryview(webhook_data), bytearray(webhook_data)):
+				self.assertTrue(bancard_api.process_vpos_webhook(raw_webhook, 1, Decimal(1000))[0])
+				self.assertEqual(bancardconnectorpython.BancardAPI.get_marketplace_charge_id_from_bancard_webhook(raw_webhook), "1")
+			self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException,
+							bancardconnectorpython.BancardAPI.get_marketplace_charge_id_from_bancard_webhook, memoryview(b"{not json"))
+
+	def test_codec_option(self):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", codec=bancardconnectorpython.CODEC_JSON)
+		self.assertIsInstance(bancard_api.codec, bancardconnectorpython.JSONCodec)
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private")
+		self.assertIs(bancard_api.codec, bancardconnectorpython.DEFAULT_CODEC)
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, bancardconnectorpython.BancardAPI,
+						public_key="public", private_key="private", codec="yaml")
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,114 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import random
+import threading
+import unittest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import bancardconnectorpython
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class _BancardStubHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"  # keep the connections alive between requests
+	disable_nagle_algorithm = True
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get("Content-Length", 0)))
+		self.server.client_ports.add(self.client_address[1])
+		body = json.dumps({"status": "success", "process_id": "stub-process-id"}).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+class TestBancardConnectionPool(unittest.TestCase):
+
+	def setUp(self):
+		self.server = _ThreadingHTTPServer(("127.0.0.1", 0), _BancardStubHandler)
+		self.server.client_ports = set()
+		threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+		self.base_url = "http://127.0.0.1:%s" % self.server.server_address[1]
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+
+	def build_api(self, **options):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", **options)
+		bancard_api.urls = {
+			bancardconnectorpython.CHARGE_TOKEN_GENERATOR_KEY: "%s/vpos/api/0.3/single_buy" % self.base_url,
+			bancardconnectorpython.PAYMENT_WEB_URL_KEY: "%s/payment/single_buy?process_id=" % self.base_url,
+		}
+		return bancard_api
+
+	def generate_charge_token(self, bancard_api):
+		marketplace_charge_id = random.randrange(500000, 5000000)
+		return bancard_api.generate_charge_token(marketplace_charge_id, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+
+	def test_connections_are_reused(self):
+		with self.build_api() as bancard_api:
+			for _ in range(10):
+				bancard_process_id, payment_url, bancard_response = self.generate_charge_token(bancard_api)
+				self.assertEqual(bancard_process_id, "stub-process-id")
+
+		# all the sequential calls went through the same keep-alive connection
+		self.assertEqual(len(self.server.client_ports), 1)
+
+	def test_pool_maxsize_bounds_concurrent_connections(self):
+		bancard_api = self.build_api(pool_maxsize=2, pool_block=True)
+		threads = [threading.Thread(target=self.generate_charge_token, args=(bancard_api,)) for _ in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		bancard_api.close()
+
+		self.assertLessEqual(len(self.server.client_ports), 2)
+
+	def test_closed_api_can_not_be_used(self):
+		bancard_api = self.build_api()
+		bancard_api.close()
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, self.generate_charge_token, bancard_api)
+
+	def test_shared_transport_is_not_closed_by_api(self):
+		transport = bancardconnectorpython.BancardTransport()
+		with self.build_api(transport=transport) as bancard_api:
+			self.generate_charge_token(bancard_api)
+		self.assertFalse(transport.closed)
+		transport.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
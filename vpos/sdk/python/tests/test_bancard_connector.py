@@ -0,0 +1,136 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import time
+import random
+import asyncio
+import threading
+import unittest
+from unittest import mock
+import bancardconnectorpython
+from bancardconnectorpython import api
+
+
+class _SlowBancardAPI(api.BancardAPI):
+	"""
+		BancardAPI whose creation is slow, so the racy initializations of the global connector can be observed.
+	"""
+
+	created = 0
+	created_lock = threading.Lock()
+
+	def __init__(self, *args, **kwargs):
+		time.sleep(0.01)
+		with _SlowBancardAPI.created_lock:
+			_SlowBancardAPI.created += 1
+		super(_SlowBancardAPI, self).__init__(*args, **kwargs)
+
+
+class TestBancardConnector(unittest.TestCase):
+
+	def setUp(self):
+		self.previous_api = getattr(api, "__api__")
+		setattr(api, "__api__", None)
+		_SlowBancardAPI.created = 0
+
+	def tearDown(self):
+		setattr(api, "__api__", self.previous_api)
+
+	def run_threads(self, target, count):
+		errors = list()
+
+		def run():
+			try:
+				target()
+			except Exception as error:
+				errors.append(error)
+
+		threads = [threading.Thread(target=run) for _ in range(count)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(errors, list())
+
+	def test_global_connector_is_created_once(self):
+		bancard_apis = list()
+		environment = {"BANCARD_ENVIRONMENT": "sandbox", "BANCARD_PUBLIC_KEY": "public", "BANCARD_PRIVATE_KEY": "private"}
+		with mock.patch.dict(os.environ, environment), mock.patch.object(api, "BancardAPI", _SlowBancardAPI):
+			self.run_threads(lambda: bancard_apis.append(bancardconnectorpython.connector()), 32)
+		self.assertEqual(_SlowBancardAPI.created, 1)
+		self.assertEqual(len(set(id(bancard_api) for bancard_api in bancard_apis)), 1)
+
+	def test_scoped_connectors_in_threads(self):
+		bancardconnectorpython.set_config(public_key="global", private_key="global")
+
+		def use_own_api():
+			own_api = bancardconnectorpython.BancardAPI(public_key="public-%s" % threading.get_ident(), private_key="private")
+			with bancardconnectorpython.scoped_connector(own_api):
+				for _ in range(50):
+					assert bancardconnectorpython.connector() is own_api
+					time.sleep(random.random() / 10000)
+			assert bancardconnectorpython.connector().public_key.startswith("global")
+
+		def replace_global_api():
+			for index in range(50):
+				bancardconnectorpython.set_config(public_key="global-%d" % index, private_key="global")
+				time.sleep(random.random() / 10000)
+
+		threads = [threading.Thread(target=replace_global_api) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		self.run_threads(use_own_api, 32)
+		for thread in threads:
+			thread.join()
+
+	def test_scoped_connectors_in_asyncio_tasks(self):
+		bancardconnectorpython.set_config(public_key="global", private_key="global")
+
+		async def use_own_api(index):
+			own_api = bancardconnectorpython.BancardAPI(public_key="public-%d" % index, private_key="private")
+			with bancardconnectorpython.scoped_connector(own_api):
+				for _ in range(20):
+					await asyncio.sleep(random.random() / 1000)
+					if bancardconnectorpython.connector() is not own_api:
+						return False
+				# the tasks created within the block inherit its BancardAPI
+				return await asyncio.ensure_future(self.current_public_key()) == "public-%d" % index
+
+		async def use_all():
+			return await asyncio.gather(*[use_own_api(index) for index in range(200)])
+
+		self.assertTrue(all(asyncio.run(use_all())))
+		self.assertEqual(bancardconnectorpython.connector().public_key, "global")
+
+	async def current_public_key(self):
+		return bancardconnectorpython.connector().public_key
+
+	def test_missing_environment_variables(self):
+		with mock.patch.dict(os.environ, {}, clear=True):
+			self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, bancardconnectorpython.connector)
+		self.assertIsNone(getattr(api, "__api__"))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,109 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _CountingTransport(object):
+	"""
+		Fake transport that counts the requests and accepts every single_buy.
+	"""
+
+	def __init__(self):
+		self.calls = 0
+
+	def post(self, url, data, headers, timeout=None):
+		self.calls += 1
+		return b'{"status":"success","process_id":"process-%d"}' % self.calls
+
+	def close(self):
+		pass
+
+
+class TestBancardIdempotency(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.transport = _CountingTransport()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def build_api(self, idempotency_store):
+		return bancardconnectorpython.BancardAPI(
+			public_key="public", private_key="private", transport=self.transport, idempotency_store=idempotency_store)
+
+	def generate_charge_token(self, bancard_api, amount=Decimal(1000), description="Test charge"):
+		return bancard_api.generate_charge_token("1234", amount, description, "http://localhost/approved", "http://localhost/cancelled", "PYG")
+
+	def test_repeated_call_returns_cached_result(self):
+		bancard_api = self.build_api(bancardconnectorpython.MemoryIdempotencyStore())
+		charge_token = self.generate_charge_token(bancard_api)
+		self.assertEqual(charge_token[0], "process-1")
+		self.assertEqual(self.generate_charge_token(bancard_api), charge_token)
+		self.assertEqual(self.transport.calls, 1)
+
+	def test_different_parameters_fail_locally(self):
+		bancard_api = self.build_api(bancardconnectorpython.MemoryIdempotencyStore())
+		self.generate_charge_token(bancard_api)
+		self.assertRaises(bancardconnectorpython.BancardAPIIdempotencyMismatchException, self.generate_charge_token, bancard_api, Decimal(2000))
+		self.assertRaises(bancardconnectorpython.BancardAPIMarketplaceChargeIDAlreadyExistsException, self.generate_charge_token, bancard_api, description="Other charge")
+		self.assertEqual(self.transport.calls, 1)
+
+	def test_without_store_every_call_reaches_bancard(self):
+		bancard_api = self.build_api(None)
+		self.generate_charge_token(bancard_api)
+		self.generate_charge_token(bancard_api)
+		self.assertEqual(self.transport.calls, 2)
+
+	def test_sqlite_store_survives_restarts(self):
+		path = os.path.join(self.directory, "idempotency.db")
+		idempotency_store = bancardconnectorpython.SQLiteIdempotencyStore(path)
+		charge_token = self.generate_charge_token(self.build_api(idempotency_store))
+		idempotency_store.close()
+
+		idempotency_store = bancardconnectorpython.SQLiteIdempotencyStore(path)
+		self.assertEqual(len(idempotency_store), 1)
+		self.assertEqual(self.generate_charge_token(self.build_api(idempotency_store)), charge_token)
+		self.assertRaises(bancardconnectorpython.BancardAPIIdempotencyMismatchException, self.generate_charge_token, self.build_api(idempotency_store), Decimal(1))
+		idempotency_store.discard("1234")
+		self.assertIsNone(idempotency_store.get("1234"))
+		idempotency_store.close()
+		self.assertEqual(self.transport.calls, 1)
+
+	def test_memory_store_evicts_oldest_records(self):
+		idempotency_store = bancardconnectorpython.MemoryIdempotencyStore(maxsize=2)
+		for marketplace_charge_id in ("1", "2", "3"):
+			idempotency_store.put(bancardconnectorpython.IdempotencyRecord(marketplace_charge_id, {}, "process", "url", {}))
+		self.assertEqual(len(idempotency_store), 2)
+		self.assertIsNone(idempotency_store.get("1"))
+		self.assertIsNotNone(idempotency_store.get("3"))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,113 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import sys
+import json
+import inspect
+import unittest
+import importlib
+import subprocess
+import bancardconnectorpython
+
+# the budget of the cold import of the library, and of the verification of a webhook right after it
+IMPORT_TIME_BUDGET = 0.1  # seconds, a cold import takes a few milliseconds without the HTTP stack
+IMPORT_MODULES_BUDGET = 5
+WEBHOOK_MODULES_BUDGET = 35
+HEAVY_MODULES = ("requests", "urllib3", "aiohttp", "asyncio", "concurrent.futures", "http.client", "ssl", "email")
+
+_PROBE = """
+import sys, time, json
+from decimal import Decimal
+before = set(sys.modules)
+started_at = time.perf_counter()
+import bancardconnectorpython
+import_time = time.perf_counter() - started_at
+import_modules = sorted(set(sys.modules) - before)
+
+bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private")
+bancard_data = json.dumps({"operation": {"token": bancard_api._confirm_token(1, Decimal(1000), "PYG"), "shop_process_id": 1,
+								"response_code": "00", "authorization_number": "123456"}})
+assert bancard_api.process_vpos_webhook(bancard_data, 1, Decimal(1000))[0]
+webhook_modules = sorted(set(sys.modules) - before)
+print(json.dumps({"import_time": import_time, "import_modules": import_modules, "webhook_modules": webhook_modules}))
+"""
+
+_STAR_PROBE = """
+import sys, json
+from decimal import Decimal
+before = set(sys.modules)
+from bancardconnectorpython import *
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+
+class TestBancardImportBudget(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		library_path = os.path.dirname(os.path.dirname(os.path.abspath(bancardconnectorpython.__file__)))
+		env = dict(os.environ, PYTHONPATH=library_path)
+		# the best of a few runs, so a noisy machine does not make the time budget flaky
+		cls.probes = [json.loads(subprocess.check_output([sys.executable, "-c", _PROBE], env=env).decode("utf-8")) for _ in range(3)]
+		cls.star_modules = json.loads(subprocess.check_output([sys.executable, "-c", _STAR_PROBE], env=env).decode("utf-8"))
+
+	def test_import_time(self):
+		self.assertLess(min(probe["import_time"] for probe in self.probes), IMPORT_TIME_BUDGET)
+
+	def test_import_modules(self):
+		import_modules = self.probes[0]["import_modules"]
+		self.assertLessEqual(len(import_modules), IMPORT_MODULES_BUDGET, import_modules)
+
+	def test_webhook_modules(self):
+		webhook_modules = self.probes[0]["webhook_modules"]
+		self.assertLessEqual(len(webhook_modules), WEBHOOK_MODULES_BUDGET, webhook_modules)
+		for module_name in webhook_modules:
+			self.assertFalse(module_name.split(".")[0] in HEAVY_MODULES or module_name in HEAVY_MODULES, module_name)
+
+	def test_star_import_modules(self):
+		self.assertLessEqual(len(self.star_modules), WEBHOOK_MODULES_BUDGET, self.star_modules)
+		for module_name in self.star_modules:
+			self.assertFalse(module_name.split(".")[0] in HEAVY_MODULES or module_name in HEAVY_MODULES, module_name)
+		for module_name in ("aio", "ledger", "registry", "reconcile", "webhooks", "bulk"):
+			self.assertNotIn("bancardconnectorpython.%s" % module_name, self.star_modules)
+
+	def test_every_public_name_is_exported(self):
+		for module_name in set(bancardconnectorpython._LAZY_ATTRIBUTES.values()):
+			module = importlib.import_module(module_name)
+			source = inspect.getsource(module)
+			for name, value in vars(module).items():
+				if name.startswith("_") or inspect.ismodule(value):
+					continue
+				if inspect.isclass(value) or inspect.isfunction(value):
+					defined_here = value.__module__ == module_name
+				else:
+					defined_here = re.search(r"^%s = " % name, source, re.MULTILINE) is not None
+				if defined_here:
+					self.assertIn(name, dir(bancardconnectorpython), "%s.%s" % (module_name, name))
+					self.assertIs(getattr(bancardconnectorpython, name), value)
+
+
+if __name__ == '__main__':
+	unittest.main()
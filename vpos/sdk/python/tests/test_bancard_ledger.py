@@ -0,0 +1,215 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _FakeClock(object):
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class _BancardTransport(object):
+	"""
+		Fake transport that creates every charge, reports them as not payed yet and accepts every rollback.
+	"""
+
+	def __init__(self):
+		self.calls = 0
+
+	def post(self, url, data, headers, timeout=None):
+		self.calls += 1
+		if url.endswith(bancardconnectorpython.BANCARD_CONFIRMATIONS_PATH):
+			return b'{"status":"error","messages":[{"key":"PaymentNotFoundError","dsc":"Payment not found"}]}'
+		if url.endswith(bancardconnectorpython.BANCARD_ROLLBACK_PATH):
+			return b'{"status":"success","messages":[{"key":"RollbackSuccessful","dsc":"Rollback successful"}]}'
+		return b'{"status":"success","process_id":"process-%d"}' % self.calls
+
+	def close(self):
+		pass
+
+
+class TestBancardChargeLedger(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, "ledger.db")
+		self.clock = _FakeClock()
+		self.ledger = bancardconnectorpython.ChargeLedger(self.path, clock=self.clock)
+		self.transport = _BancardTransport()
+		self.bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=self.transport, ledger=self.ledger)
+
+	def tearDown(self):
+		self.ledger.close()
+		shutil.rmtree(self.directory)
+
+	def create_charge(self, marketplace_charge_id, amount=Decimal(1000)):
+		return self.bancard_api.generate_charge_token(marketplace_charge_id, amount, "Test charge", "http://localhost/approved", "http://localhost/cancelled")
+
+	def webhook(self, marketplace_charge_id, amount, response_code):
+		confirm_token = self.bancard_api._confirm_token(marketplace_charge_id, amount, "PYG")
+		return json.dumps({"operation": {
+			"shop_process_id": marketplace_charge_id, "token": confirm_token, "response_code": response_code, "amount": "%s.00" % amount,
+			"currency": "PYG", "authorization_number": "123456"}})
+
+	def test_charge_lifecycle(self):
+		self.create_charge("1")
+		self.clock.now += 60
+		self.assertFalse(self.bancard_api.get_charge_status("1", Decimal(1000))[0])
+		self.bancard_api.rollback_charge("1")
+
+		ledger_charge = self.ledger.get_charge("1")
+		self.assertEqual(ledger_charge.status, bancardconnectorpython.LEDGER_STATUS_ROLLED_BACK)
+		self.assertEqual(ledger_charge.amount, Decimal(1000))
+		self.assertEqual(ledger_charge.bancard_process_id, "process-1")
+		self.assertEqual((ledger_charge.created_at, ledger_charge.updated_at), (1000.0, 1060.0))
+		events = self.ledger.get_events("1")
+		self.assertEqual([event[0] for event in events], [
+			bancardconnectorpython.LEDGER_EVENT_CREATED, bancardconnectorpython.LEDGER_EVENT_CONFIRMATION, bancardconnectorpython.LEDGER_EVENT_ROLLBACK])
+		self.assertEqual(events[0][2]["process_id"], "process-1")
+
+	def test_webhooks(self):
+		self.create_charge("1")
+		self.create_charge("2")
+		self.bancard_api.process_vpos_webhook(self.webhook("1", Decimal(1000), "00"), "1", Decimal(1000))
+		self.assertRaises(bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException, self.bancard_api.verify_vpos_webhook, self.webhook("2", Decimal(1000), "51"))
+
+		self.assertEqual(self.ledger.get_charge("1").status, bancardconnectorpython.LEDGER_STATUS_PAYED)
+		self.assertEqual(self.ledger.get_charge("2").status, bancardconnectorpython.LEDGER_STATUS_REJECTED)
+		self.assertEqual(self.ledger.get_charge("2").response_code, "51")
+		self.assertEqual(self.ledger.count_by_status(), {bancardconnectorpython.LEDGER_STATUS_PAYED: 1, bancardconnectorpython.LEDGER_STATUS_REJECTED: 1})
+
+	def test_pending_sweep(self):
+		self.create_charge("1")
+		self.clock.now += 300
+		self.create_charge("2", Decimal(2000))
+		self.clock.now += 400
+		self.create_charge("3")
+		self.bancard_api.verify_vpos_webhook(self.webhook("3", Decimal(1000), "00"))
+
+		self.assertEqual(self.ledger.pending_sweep(older_than=600), [("1", Decimal(1000), "PYG")])
+		self.assertEqual(self.ledger.pending_sweep(older_than=300), [("1", Decimal(1000), "PYG"), ("2", Decimal(2000), "PYG")])
+		self.assertEqual([charge.marketplace_charge_id for charge in self.ledger.pending_charges(limit=1)], ["1"])
+
+		# a late confirmation does not make a rolled back charge pending again
+		self.bancard_api.rollback_charge("1")
+		self.bancard_api.get_charge_status("1", Decimal(1000))
+		self.assertEqual(self.ledger.pending_sweep(older_than=300), [("2", Decimal(2000), "PYG")])
+
+	def test_status_of(self):
+		status_of = bancardconnectorpython.ChargeLedger.status_of
+		not_found = {"status": "error", "messages": [{"key": "PaymentNotFoundError", "dsc": "Payment not found"}]}
+		couponned = {"status": "error", "messages": [{"key": "AlreadyCouponnedError", "dsc": "Already couponned"}]}
+		self.assertEqual(status_of(bancardconnectorpython.LEDGER_EVENT_ROLLBACK, not_found), bancardconnectorpython.LEDGER_STATUS_ROLLED_BACK)
+		self.assertIsNone(status_of(bancardconnectorpython.LEDGER_EVENT_ROLLBACK, couponned))
+		self.assertEqual(status_of(bancardconnectorpython.LEDGER_EVENT_CONFIRMATION, not_found), bancardconnectorpython.LEDGER_STATUS_PENDING)
+		self.assertIsNone(status_of(bancardconnectorpython.LEDGER_EVENT_CONFIRMATION, couponned))
+		self.assertEqual(status_of(bancardconnectorpython.LEDGER_EVENT_CONFIRMATION, {"status": "success", "confirmation": {"response_code": "12"}}),
+			bancardconnectorpython.LEDGER_STATUS_REJECTED)
+
+	def test_batched_writes(self):
+		self.ledger.close()
+		self.ledger = bancardconnectorpython.ChargeLedger(self.path, batch_size=3, flush_interval=10, clock=self.clock)
+		other_ledger = bancardconnectorpython.ChargeLedger(self.path)
+		try:
+			self.ledger.record(bancardconnectorpython.LEDGER_EVENT_CREATED, "1", {"status": "success", "process_id": "a"}, Decimal(1), "PYG")
+			self.ledger.record(bancardconnectorpython.LEDGER_EVENT_CREATED, "2", {"status": "success", "process_id": "b"}, Decimal(2), "PYG")
+			self.assertIsNone(other_ledger.get_charge("1"))
+			self.ledger.record(bancardconnectorpython.LEDGER_EVENT_CREATED, "3", {"status": "success", "process_id": "c"}, Decimal(3), "PYG")
+			self.assertEqual(len(other_ledger.pending_charges()), 3)
+
+			self.ledger.record(bancardconnectorpython.LEDGER_EVENT_CREATED, "4", {"status": "success", "process_id": "d"}, Decimal(4), "PYG")
+			self.clock.now += 10
+			self.ledger.record(bancardconnectorpython.LEDGER_EVENT_CREATED, "5", {"status": "success", "process_id": "e"}, Decimal(5), "PYG")
+			self.assertEqual(len(other_ledger.pending_charges()), 5)
+		finally:
+			other_ledger.close()
+
+	def test_timer_flush(self):
+		self.ledger.close()
+		self.ledger = bancardconnectorpython.ChargeLedger(self.path, batch_size=10, flush_interval=0.05, clock=self.clock)
+		other_ledger = bancardconnectorpython.ChargeLedger(self.path)
+		try:
+			self.ledger.record(bancardconnectorpython.LEDGER_EVENT_CREATED, "1", {"status": "success", "process_id": "a"}, Decimal(1), "PYG")
+			deadline = time.time() + 5
+			while other_ledger.get_charge("1") is None and time.time() < deadline:
+				time.sleep(0.01)
+			self.assertIsNotNone(other_ledger.get_charge("1"))
+		finally:
+			other_ledger.close()
+
+	def test_failed_write_keeps_the_events(self):
+		# the charges table is renamed away from another connection, so the write of the ledger fails
+		other_connection = sqlite3.connect(self.path, isolation_level=None)
+		other_connection.execute("ALTER TABLE bancard_charges RENAME TO bancard_charges_away")
+		try:
+			with self.assertLogs("bancardconnectorpython", level="ERROR"):
+				self.assertEqual(self.create_charge("1")[0], "process-1")
+			self.assertEqual(len(self.ledger._buffer), 1)
+		finally:
+			other_connection.execute("ALTER TABLE bancard_charges_away RENAME TO bancard_charges")
+			other_connection.close()
+
+		self.create_charge("2")
+		self.assertEqual(self.ledger._buffer, [])
+		self.assertEqual(self.ledger.get_charge("1").bancard_process_id, "process-1")
+		self.assertEqual(self.ledger.get_charge("2").bancard_process_id, "process-2")
+		self.assertEqual(len(self.ledger.get_events("1")), 1)
+
+	def test_buffer_is_bounded(self):
+		self.ledger.close()
+		self.ledger = bancardconnectorpython.ChargeLedger(self.path, clock=self.clock, max_buffered_events=2)
+		other_connection = sqlite3.connect(self.path, isolation_level=None)
+		other_connection.execute("ALTER TABLE bancard_charges RENAME TO bancard_charges_away")
+		try:
+			for marketplace_charge_id in ("1", "2", "3"):
+				self.assertRaises(sqlite3.OperationalError, self.ledger.record,
+					bancardconnectorpython.LEDGER_EVENT_CREATED, marketplace_charge_id, {"status": "success"}, Decimal(1), "PYG")
+		finally:
+			other_connection.execute("ALTER TABLE bancard_charges_away RENAME TO bancard_charges")
+			other_connection.close()
+
+		# the oldest event was dropped, the rest are written by the next flush
+		self.assertEqual(self.ledger.dropped_events, 1)
+		self.ledger.flush()
+		self.assertIsNone(self.ledger.get_charge("1"))
+		self.assertEqual([charge.marketplace_charge_id for charge in self.ledger.pending_charges()], ["2", "3"])
+
+	def test_wal_mode(self):
+		self.assertEqual(self.ledger._connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,115 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import asyncio
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+from bancardconnectorpython import aio
+from bancardconnectorpython.simulator import BancardSimulator
+
+
+class _FailingTransport(object):
+
+	def post(self, url, data, headers, timeout=None):
+		raise bancardconnectorpython.BancardAPITimeoutException("simulated timeout")
+
+
+class TestBancardMetrics(unittest.TestCase):
+
+	def setUp(self):
+		self.simulator = BancardSimulator("public", "private").start()
+		self.metrics = bancardconnectorpython.InMemoryMetricsSink()
+
+	def tearDown(self):
+		self.simulator.stop()
+		bancardconnectorpython.BANCARD_URLS.pop(bancardconnectorpython.ENVIRONMENT_SIMULATOR, None)
+
+	def build_api(self, **options):
+		return bancardconnectorpython.BancardAPI(
+			environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="private", metrics=self.metrics, **options)
+
+	def test_metrics_are_disabled_by_default(self):
+		bancard_api = bancardconnectorpython.BancardAPI(environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="private")
+		self.assertIsNone(bancard_api.metrics)
+		bancard_api.close()
+
+	def test_latency_sizes_and_response_codes(self):
+		with self.build_api() as bancard_api:
+			bancard_api.generate_charge_token(1, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+			bancard_api.get_charge_status(1, Decimal(1000))
+			self.simulator.set_response_code(1, "51")
+			self.assertRaises(bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException, bancard_api.get_charge_status, 1, Decimal(1000))
+			bancard_api.rollback_charge(1)
+
+		confirmations = bancardconnectorpython.CONFIRMATIONS_KEY
+		self.assertEqual(self.metrics.latency[confirmations].count, 2)
+		self.assertEqual(self.metrics.latency[bancardconnectorpython.CHARGE_TOKEN_GENERATOR_KEY].count, 1)
+		self.assertGreater(self.metrics.request_size[confirmations].sum, 0)
+		self.assertGreater(self.metrics.response_size[confirmations].sum, 0)
+		self.assertEqual(self.metrics.responses[(confirmations, "PaymentNotFoundError")], 1)
+		self.assertEqual(self.metrics.responses[(confirmations, "51")], 1)
+		self.assertEqual(self.metrics.responses[(bancardconnectorpython.ROLLBACK_KEY, "success")], 1)
+		self.assertEqual(set(self.metrics.in_flight.values()), set([0]))
+
+	def test_errors_by_exception_class(self):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_FailingTransport(),
+														metrics=self.metrics, max_retries=2, backoff_base=0.001)
+		self.assertRaises(bancardconnectorpython.BancardAPITimeoutException, bancard_api.get_charge_status, 1, Decimal(1000))
+		self.assertEqual(self.metrics.errors[(bancardconnectorpython.CONFIRMATIONS_KEY, "BancardAPITimeoutException")], 3)
+		self.assertEqual(self.metrics.response_size[bancardconnectorpython.CONFIRMATIONS_KEY].count, 0)
+		self.assertEqual(self.metrics.in_flight[bancardconnectorpython.CONFIRMATIONS_KEY], 0)
+
+	def test_prometheus_text(self):
+		with self.build_api() as bancard_api:
+			bancard_api.get_charge_status(1, Decimal(1000))
+
+		text = self.metrics.prometheus_text()
+		self.assertIn("# TYPE bancard_request_duration_seconds histogram", text)
+		self.assertIn('bancard_request_duration_seconds_bucket{endpoint="confirmations",le="+Inf"} 1', text)
+		self.assertIn('bancard_request_duration_seconds_count{endpoint="confirmations"} 1', text)
+		self.assertIn('bancard_responses_total{endpoint="confirmations",response_code="PaymentNotFoundError"} 1', text)
+		self.assertIn('bancard_requests_in_flight{endpoint="confirmations"} 0', text)
+		self.assertTrue(text.endswith("\n"))
+
+	def test_histogram_buckets(self):
+		histogram = bancardconnectorpython.Histogram((1, 2, 5))
+		for value in (0.5, 1, 1.5, 7):
+			histogram.observe(value)
+		self.assertEqual(histogram.cumulative_counts(), [(1, 2), (2, 3), (5, 3), (float("inf"), 4)])
+		self.assertEqual(histogram.sum, 10)
+
+	@unittest.skipIf(aio.aiohttp is None, "the AsyncBancardAPI requires the aiohttp library")
+	def test_async_metrics(self):
+		async def check_charge_status():
+			async with bancardconnectorpython.AsyncBancardAPI(
+					environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="private", metrics=self.metrics) as bancard_api:
+				return await bancard_api.get_charge_status(1, Decimal(1000))
+
+		asyncio.run(check_charge_status())
+		self.assertEqual(self.metrics.latency[bancardconnectorpython.CONFIRMATIONS_KEY].count, 1)
+		self.assertEqual(self.metrics.responses[(bancardconnectorpython.CONFIRMATIONS_KEY, "PaymentNotFoundError")], 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,143 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _BancardTransport(object):
+	"""
+		Fake transport that answers the confirmations with the response code of each charge ID, and the unknown ones as not found.
+	"""
+
+	RESPONSE_CODES = {"1": "00", "2": "05", "3": "12", "4": "51", "5": "99"}
+
+	def post(self, url, data, headers, timeout=None):
+		marketplace_charge_id = str(json.loads(data)["operation"]["shop_process_id"])
+		if marketplace_charge_id not in self.RESPONSE_CODES:
+			return b'{"status":"error","messages":[{"key":"PaymentNotFoundError","level":"error","dsc":"Payment not found"}]}'
+		return json.dumps({"status": "success", "confirmation": {
+			"response_code": self.RESPONSE_CODES[marketplace_charge_id], "amount": "1000.00", "currency": "PYG", "authorization_number": "123456"}}).encode("utf-8")
+
+	def close(self):
+		pass
+
+
+class TestBancardOutcomes(unittest.TestCase):
+
+	def build_api(self, **options):
+		return bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_BancardTransport(), **options)
+
+	def webhook(self, bancard_api, response_code, marketplace_charge_id="1", amount=Decimal(1000)):
+		return json.dumps({"operation": {
+			"shop_process_id": marketplace_charge_id, "token": bancard_api._confirm_token(marketplace_charge_id, amount, "PYG"),
+			"response_code": response_code, "authorization_number": "123456"}})
+
+	def test_charge_status_outcomes(self):
+		bancard_api = self.build_api(outcome_mode=True)
+
+		approved = bancard_api.get_charge_status("1", Decimal(1000))
+		self.assertIsInstance(approved, bancardconnectorpython.ChargeOutcome)
+		self.assertEqual((approved.status, approved.authorization_number), (bancardconnectorpython.OUTCOME_APPROVED, "123456"))
+		already_payed, authorization_number, _ = approved
+		self.assertTrue(already_payed)
+
+		expected_declines = {
+			"2": (bancardconnectorpython.DECLINE_PAYMENT_METHOD_NOT_ENABLED, bancardconnectorpython.BancardAPIPaymentMethodNotEnabledException),
+			"3": (bancardconnectorpython.DECLINE_TRANSACTION_INVALID, bancardconnectorpython.BancardAPIPaymentTransactionInvalidException),
+			"4": (bancardconnectorpython.DECLINE_NOT_ENOUGH_FUNDS, bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException),
+			"5": (bancardconnectorpython.DECLINE_UNKNOWN_REASON, bancardconnectorpython.BancardAPIPaymentRejectecUnknownReasonException),
+		}
+		for marketplace_charge_id, (decline_reason, exception_class) in expected_declines.items():
+			declined = bancard_api.get_charge_status(marketplace_charge_id, Decimal(1000))
+			self.assertTrue(declined.is_declined)
+			self.assertFalse(declined.approved)
+			self.assertEqual(declined.decline_reason, decline_reason)
+			self.assertIsInstance(declined.exception(), exception_class)
+			self.assertRaises(exception_class, declined.raise_for_decline)
+
+		pending = bancard_api.get_charge_status("6", Decimal(1000))
+		self.assertTrue(pending.pending)
+		self.assertIsNone(pending.exception())
+
+	def test_charge_status_raises_by_default(self):
+		bancard_api = self.build_api()
+
+		self.assertEqual(bancard_api.get_charge_status("1", Decimal(1000))[:2], (True, "123456"))
+		self.assertRaises(bancardconnectorpython.BancardAPIPaymentMethodNotEnabledException, bancard_api.get_charge_status, "2", Decimal(1000))
+		self.assertRaises(bancardconnectorpython.BancardAPIPaymentRejectecUnknownReasonException, bancard_api.get_charge_status, "5", Decimal(1000))
+		self.assertEqual(bancard_api.get_charge_status("6", Decimal(1000))[:2], (False, None))
+
+	def test_genuine_errors_still_raise(self):
+		bancard_api = self.build_api(outcome_mode=True)
+
+		# the approved charge has another amount in Bancard
+		self.assertRaises(bancardconnectorpython.BancardAPIChargeInconsistentValuesException, bancard_api.get_charge_status, "1", Decimal(2000))
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookTokenException,
+			bancard_api.process_vpos_webhook, self.webhook(bancard_api, "00", amount=Decimal(2000)), "1", Decimal(1000))
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException,
+			bancard_api.process_vpos_webhook, self.webhook(bancard_api, "00"), "2", Decimal(1000))
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException, bancard_api.process_vpos_webhook, "{not json", "1", Decimal(1000))
+
+	def test_webhook_outcomes(self):
+		bancard_api = self.build_api(outcome_mode=True, keep_bancard_response=True)
+
+		approved = bancard_api.process_vpos_webhook(self.webhook(bancard_api, "00"), "1", Decimal(1000))
+		self.assertTrue(approved.approved)
+		self.assertEqual(approved.bancard_response["operation"]["shop_process_id"], "1")
+
+		declined = bancard_api.process_vpos_webhook(self.webhook(bancard_api, "51"), "1", Decimal(1000))
+		self.assertEqual((declined.status, declined.response_code), (bancardconnectorpython.OUTCOME_DECLINED, "51"))
+
+	def test_webhook_declines_raise_by_default(self):
+		bancard_api = self.build_api()
+
+		# the specific decline is no longer hidden behind an invalid webhook data exception
+		self.assertRaises(bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException,
+			bancard_api.process_vpos_webhook, self.webhook(bancard_api, "51"), "1", Decimal(1000))
+		self.assertEqual(bancard_api.process_vpos_webhook(self.webhook(bancard_api, "00"), "1", Decimal(1000))[:2], (True, "123456"))
+
+	def test_webhook_receiver_outcomes(self):
+		bancard_api = self.build_api(outcome_mode=True)
+		receiver = bancardconnectorpython.WebhookReceiver(bancard_api, handler=lambda webhook_event: None, charge_loader=lambda marketplace_charge_id: (Decimal(1000), "PYG"), workers=1)
+		try:
+			webhook_event = receiver.verify(self.webhook(bancard_api, "05").encode("utf-8"))
+		finally:
+			receiver.close()
+
+		self.assertFalse(webhook_event.payment_approved)
+		self.assertIsInstance(webhook_event.error, bancardconnectorpython.BancardAPIPaymentMethodNotEnabledException)
+
+	def test_bulk_outcomes(self):
+		bancard_api = self.build_api(outcome_mode=True)
+
+		bulk_results = list(bancard_api.get_charge_statuses([(str(marketplace_charge_id), Decimal(1000)) for marketplace_charge_id in range(1, 7)]))
+
+		self.assertTrue(all(bulk_result.ok for bulk_result in bulk_results))
+		self.assertEqual([bulk_result.result.status for bulk_result in bulk_results], [bancardconnectorpython.OUTCOME_APPROVED] + [bancardconnectorpython.OUTCOME_DECLINED] * 4 + [bancardconnectorpython.OUTCOME_PENDING])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,122 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import hashlib
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _SingleBuyTransport(object):
+	"""
+		Fake transport that accepts every charge request and every rollback.
+	"""
+
+	def post(self, url, data, headers, timeout=None):
+		shop_process_id = json.loads(data)["operation"]["shop_process_id"]
+		return json.dumps({"status": "success", "process_id": "process-%s" % shop_process_id}).encode("utf-8")
+
+
+def build_webhook(marketplace_charge_id, amount_str, response_code="00", private_key="private", currency="PYG"):
+	token = hashlib.md5(("%s%s%s%s%s" % (private_key, marketplace_charge_id, "confirm", amount_str, currency)).encode("utf-8")).hexdigest()
+	return json.dumps({"operation": {
+		"token": token, "shop_process_id": marketplace_charge_id, "response_code": response_code,
+		"response_description": "", "amount": amount_str, "currency": currency, "authorization_number": "123456"}})
+
+
+class TestBancardPendingChargeIndex(unittest.TestCase):
+
+	def setUp(self):
+		self.bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_SingleBuyTransport())
+
+	def generate_charge_token(self, marketplace_charge_id, amount=Decimal(1000)):
+		return self.bancard_api.generate_charge_token(marketplace_charge_id, amount, "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+
+	def test_verify_approved_webhook(self):
+		self.generate_charge_token(1000)
+		self.assertEqual(len(self.bancard_api.pending_index), 1)
+
+		payment_approved, authorization_number, bancard_data = self.bancard_api.verify_vpos_webhook(build_webhook(1000, "1000.00"))
+		self.assertTrue(payment_approved)
+		self.assertEqual(authorization_number, "123456")
+
+		# the webhook completed the charge, so it is not pending anymore
+		self.assertEqual(len(self.bancard_api.pending_index), 0)
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException, self.bancard_api.verify_vpos_webhook, build_webhook(1000, "1000.00"))
+
+	def test_verify_rejected_webhook(self):
+		self.generate_charge_token(1001)
+		self.assertRaises(
+			bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException,
+			self.bancard_api.verify_vpos_webhook, build_webhook(1001, "1000.00", response_code="51"))
+
+	def test_forged_webhooks_are_rejected(self):
+		self.generate_charge_token(1002)
+		self.assertRaises(
+			bancardconnectorpython.BancardAPIInvalidWebhookTokenException,
+			self.bancard_api.verify_vpos_webhook, build_webhook(1002, "1.00"))
+		self.assertRaises(
+			bancardconnectorpython.BancardAPIInvalidWebhookTokenException,
+			self.bancard_api.verify_vpos_webhook, build_webhook(1002, "1000.00", private_key="guessed"))
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException, self.bancard_api.verify_vpos_webhook, "{not json")
+
+		# the forged webhooks did not evict the legit pending charge
+		self.assertTrue(self.bancard_api.verify_vpos_webhook(build_webhook(1002, "1000.00"))[0])
+
+	def test_rollback_evicts_the_pending_charge(self):
+		self.generate_charge_token(1003)
+		self.bancard_api.rollback_charge(1003)
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException, self.bancard_api.verify_vpos_webhook, build_webhook(1003, "1000.00"))
+
+	def test_index_is_bounded_by_size_and_age(self):
+		clock = [0.0]
+		index = bancardconnectorpython.PendingChargeIndex(2, 600, clock=lambda: clock[0])
+		index.add(1, "a", Decimal(1), "PYG")
+		index.add(2, "b", Decimal(1), "PYG")
+		index.add(3, "c", Decimal(1), "PYG")
+		self.assertIsNone(index.get(1))
+		self.assertEqual(index.get("2").confirm_token, "b")
+
+		clock[0] = 601
+		self.assertIsNone(index.get(3))
+
+	def test_process_vpos_webhook_validates_the_token(self):
+		payment_approved, authorization_number, bancard_data = self.bancard_api.process_vpos_webhook(build_webhook(1004, "1000.00"), 1004, Decimal(1000))
+		self.assertTrue(payment_approved)
+		self.assertRaises(
+			bancardconnectorpython.BancardAPIInvalidWebhookDataException,
+			self.bancard_api.process_vpos_webhook, build_webhook(1004, "1000.00"), 1004, Decimal(2000))
+
+
+	def test_process_vpos_webhook_evicts_the_pending_charge(self):
+		self.generate_charge_token(1005)
+		self.bancard_api.process_vpos_webhook(build_webhook(1005, "1000.00"), 1005, Decimal(1000))
+
+		# a replay of the same webhook is not verified by verify_vpos_webhook anymore
+		self.assertEqual(len(self.bancard_api.pending_index), 0)
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidWebhookDataException, self.bancard_api.verify_vpos_webhook, build_webhook(1005, "1000.00"))
+
+
+if __name__ == '__main__':
+	unittest.main()
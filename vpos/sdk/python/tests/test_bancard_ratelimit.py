@@ -0,0 +1,223 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import time
+import asyncio
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _FakeClock(object):
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.now += seconds
+
+
+class _BancardTransport(object):
+	"""
+		Fake transport that reports every charge as not payed yet.
+	"""
+
+	def __init__(self):
+		self.calls = 0
+
+	def post(self, url, data, headers, timeout=None):
+		self.calls += 1
+		return b'{"status":"error","messages":[{"key":"PaymentNotFoundError","level":"error","dsc":"Payment not found"}]}'
+
+	def close(self):
+		pass
+
+
+class _AsyncBancardTransport(_BancardTransport):
+	"""
+		asyncio version of the fake transport.
+	"""
+
+	async def post(self, url, data, headers, timeout=None):
+		return _BancardTransport.post(self, url, data, headers, timeout)
+
+	async def close(self):
+		pass
+
+
+class _RecordingRateLimiter(bancardconnectorpython.RateLimiter):
+	"""
+		RateLimiter that remembers the priority of every taken token.
+	"""
+
+	def __init__(self, rates):
+		bancardconnectorpython.RateLimiter.__init__(self, rates)
+		self.priorities = list()
+
+	def _take(self, endpoint, priority):
+		self.priorities.append(priority)
+		return bancardconnectorpython.RateLimiter._take(self, endpoint, priority)
+
+
+def _acquire_tokens(path, count, started_at):
+	rate_limiter = bancardconnectorpython.FileRateLimiter(path, {bancardconnectorpython.CONFIRMATIONS_KEY: (50, 5)}, max_wait=30)
+	while time.time() < started_at:
+		time.sleep(0.001)
+	for _ in range(count):
+		rate_limiter.acquire(bancardconnectorpython.CONFIRMATIONS_KEY)
+	rate_limiter.close()
+
+
+class TestBancardRateLimiter(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = _FakeClock()
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def build_rate_limiter(self, **options):
+		return bancardconnectorpython.RateLimiter(
+			{bancardconnectorpython.CONFIRMATIONS_KEY: (10, 10)}, clock=self.clock, sleep=self.clock.sleep, **options)
+
+	def test_token_bucket(self):
+		rate_limiter = self.build_rate_limiter()
+
+		for _ in range(10):
+			self.assertEqual(rate_limiter.acquire(bancardconnectorpython.CONFIRMATIONS_KEY), 0)
+		# the bucket is empty, so the next request waits for the refill of one token
+		self.assertAlmostEqual(rate_limiter.acquire(bancardconnectorpython.CONFIRMATIONS_KEY), 0.1)
+		self.assertAlmostEqual(rate_limiter.available(bancardconnectorpython.CONFIRMATIONS_KEY), 0)
+
+		# the endpoints without a rate are not limited
+		self.assertEqual(rate_limiter.acquire(bancardconnectorpython.ROLLBACK_KEY), 0)
+
+	def test_live_priority(self):
+		rate_limiter = self.build_rate_limiter(max_wait=0)
+
+		# the batch requests leave half of the burst for the live requests
+		with bancardconnectorpython.rate_limit_priority(bancardconnectorpython.RATE_LIMIT_PRIORITY_BATCH):
+			for _ in range(5):
+				self.assertEqual(rate_limiter.acquire(bancardconnectorpython.CONFIRMATIONS_KEY), 0)
+			self.assertAlmostEqual(rate_limiter.acquire(bancardconnectorpython.CONFIRMATIONS_KEY), 0.1)
+		for _ in range(5):
+			self.assertEqual(rate_limiter.acquire(bancardconnectorpython.CONFIRMATIONS_KEY), 0)
+
+		# a live request that would wait more than max_wait fails fast
+		self.assertRaises(bancardconnectorpython.BancardAPIRateLimitedException, rate_limiter.acquire, bancardconnectorpython.CONFIRMATIONS_KEY)
+		self.assertRaises(bancardconnectorpython.BancardAPIRateLimitedException, rate_limiter.acquire,
+			bancardconnectorpython.CONFIRMATIONS_KEY, bancardconnectorpython.RATE_LIMIT_PRIORITY_BATCH, self.clock() + 0.1)
+
+	def test_invalid_rates(self):
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, bancardconnectorpython.RateLimiter, {bancardconnectorpython.ROLLBACK_KEY: 0})
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, bancardconnectorpython.RateLimiter, {bancardconnectorpython.ROLLBACK_KEY: (1, 0.5)})
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, bancardconnectorpython.RateLimiter, dict(), live_reserve=1)
+
+	def test_file_rate_limiter_shares_the_buckets(self):
+		path = os.path.join(self.directory, "bancard.ratelimit")
+		rate_limiters = [bancardconnectorpython.FileRateLimiter(
+			path, {bancardconnectorpython.CONFIRMATIONS_KEY: (10, 10)}, max_wait=0, clock=self.clock, sleep=self.clock.sleep) for _ in range(2)]
+		try:
+			for index in range(10):
+				rate_limiters[index % 2].acquire(bancardconnectorpython.CONFIRMATIONS_KEY)
+			for rate_limiter in rate_limiters:
+				self.assertRaises(bancardconnectorpython.BancardAPIRateLimitedException, rate_limiter.acquire, bancardconnectorpython.CONFIRMATIONS_KEY)
+			self.clock.sleep(0.1)
+			self.assertAlmostEqual(rate_limiters[1].available(bancardconnectorpython.CONFIRMATIONS_KEY), 1)
+		finally:
+			for rate_limiter in rate_limiters:
+				rate_limiter.close()
+
+		# a corrupted state file means full buckets
+		with open(path, "w") as state_file:
+			state_file.write("{not json")
+		rate_limiter = bancardconnectorpython.FileRateLimiter(path, {bancardconnectorpython.CONFIRMATIONS_KEY: (10, 10)}, clock=self.clock)
+		self.assertEqual(rate_limiter.available(bancardconnectorpython.CONFIRMATIONS_KEY), 10)
+		rate_limiter.close()
+
+	def test_file_rate_limiter_across_processes(self):
+		path = os.path.join(self.directory, "bancard.ratelimit")
+		context = multiprocessing.get_context("fork")
+		started_at = time.time() + 0.2
+		processes = [context.Process(target=_acquire_tokens, args=(path, 15, started_at)) for _ in range(2)]
+		for process in processes:
+			process.start()
+		for process in processes:
+			process.join(30)
+			self.assertEqual(process.exitcode, 0)
+
+		# 30 requests with a burst of 5 and 50 requests per second take at least (30 - 5) / 50 seconds
+		self.assertGreaterEqual(time.time() - started_at, 0.45)
+		with open(path, "r") as state_file:
+			self.assertIn(bancardconnectorpython.CONFIRMATIONS_KEY, json.load(state_file))
+
+
+class TestBancardAPIRateLimit(unittest.TestCase):
+
+	def test_bulk_operations_are_batch_requests(self):
+		rate_limiter = _RecordingRateLimiter({bancardconnectorpython.CONFIRMATIONS_KEY: 1000, bancardconnectorpython.ROLLBACK_KEY: 1000})
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_BancardTransport(), rate_limiter=rate_limiter)
+
+		bancard_api.get_charge_status("1", Decimal(1000))
+		list(bancard_api.get_charge_statuses([("2", Decimal(1000)), ("3", Decimal(1000))]))
+
+		self.assertEqual(rate_limiter.priorities, [bancardconnectorpython.RATE_LIMIT_PRIORITY_LIVE] + [bancardconnectorpython.RATE_LIMIT_PRIORITY_BATCH] * 2)
+
+	def test_async_bulk_operations_are_batch_requests(self):
+		rate_limiter = _RecordingRateLimiter({bancardconnectorpython.CONFIRMATIONS_KEY: 1000})
+
+		async def check_charges():
+			async with bancardconnectorpython.AsyncBancardAPI(
+					public_key="public", private_key="private", transport=_AsyncBancardTransport(), rate_limiter=rate_limiter) as bancard_api:
+				await bancard_api.get_charge_status("1", Decimal(1000))
+				async for _ in bancard_api.get_charge_statuses([("2", Decimal(1000)), ("3", Decimal(1000))]):
+					pass
+				await bancard_api.get_charge_status("4", Decimal(1000))
+
+		asyncio.run(check_charges())
+
+		self.assertEqual(rate_limiter.priorities, [bancardconnectorpython.RATE_LIMIT_PRIORITY_LIVE] + [bancardconnectorpython.RATE_LIMIT_PRIORITY_BATCH] * 2 + [bancardconnectorpython.RATE_LIMIT_PRIORITY_LIVE])
+
+	def test_rate_limited_requests_are_not_retried(self):
+		transport = _BancardTransport()
+		rate_limiter = bancardconnectorpython.RateLimiter({bancardconnectorpython.CONFIRMATIONS_KEY: (1, 1)}, max_wait=0)
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, rate_limiter=rate_limiter, max_retries=3)
+
+		bancard_api.get_charge_status("1", Decimal(1000))
+		with self.assertRaises(bancardconnectorpython.BancardAPIRateLimitedException) as context:
+			bancard_api.get_charge_status("2", Decimal(1000))
+
+		self.assertEqual((context.exception.retries, transport.calls), (0, 1))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,178 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import threading
+from decimal import Decimal
+from unittest import mock
+import bancardconnectorpython
+from bancardconnectorpython.__main__ import main
+from bancardconnectorpython.simulator import BancardSimulator
+
+
+class _BancardTransport(object):
+	"""
+		Fake transport that approves the even charge IDs, declines the odd ones and remembers every checked charge ID.
+	"""
+
+	def __init__(self):
+		self.checked = list()
+		self.lock = threading.Lock()
+
+	def post(self, url, data, headers, timeout=None):
+		marketplace_charge_id = json.loads(data)["operation"]["shop_process_id"]
+		with self.lock:
+			self.checked.append(marketplace_charge_id)
+		response_code = "00" if int(marketplace_charge_id) % 2 == 0 else "51"
+		return json.dumps({"status": "success", "confirmation": {
+			"response_code": response_code, "amount": "1000.00", "currency": "PYG", "authorization_number": "123456"}}).encode("utf-8")
+
+	def close(self):
+		pass
+
+
+def _csv_lines(count):
+	yield "marketplace_charge_id,amount\n"
+	for marketplace_charge_id in range(count):
+		yield "%d,1000\n" % marketplace_charge_id
+
+
+def _crashing(charges, count):
+	for index, charge in enumerate(charges):
+		if index == count:
+			raise RuntimeError("crash")
+		yield charge
+
+
+class TestBancardReconcile(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.transport = _BancardTransport()
+		self.bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=self.transport, outcome_mode=True)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_read_charges(self):
+		csv_charges = list(bancardconnectorpython.read_charges(["currency,amount,marketplace_charge_id\n", "PYG,1000.50,1\n", ",abc,2\n"]))
+		self.assertEqual(csv_charges, [("1", Decimal("1000.50"), "PYG"), ("2", "abc", "PYG")])
+
+		ndjson_charges = list(bancardconnectorpython.read_charges(['{"marketplace_charge_id": 1, "amount": 1000.5}\n', "\n", '{"amount": 7}\n']))
+		self.assertEqual(ndjson_charges, [(1, Decimal("1000.5"), "PYG"), (None, Decimal(7), "PYG")])
+
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, list, bancardconnectorpython.read_charges(["id,total\n"]))
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, list, bancardconnectorpython.read_charges(["{not json\n"], "ndjson"))
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, bancardconnectorpython.read_charges, [], "xml")
+
+	def test_reconcile_charges(self):
+		output = io.BytesIO()
+		charges = list(bancardconnectorpython.read_charges(_csv_lines(10))) + [("10", "abc", "PYG")]
+
+		counts = bancardconnectorpython.reconcile_charges(self.bancard_api, iter(charges), output, max_workers=4)
+
+		records = [json.loads(line) for line in output.getvalue().decode("utf-8").splitlines()]
+		self.assertEqual(sorted(record["index"] for record in records), list(range(11)))
+		self.assertEqual(counts, {bancardconnectorpython.OUTCOME_APPROVED: 5, bancardconnectorpython.OUTCOME_DECLINED: 5, bancardconnectorpython.RECONCILE_STATUS_ERROR: 1})
+		declined = [record for record in records if record["marketplace_charge_id"] == "1"][0]
+		self.assertEqual((declined["response_code"], declined["decline_reason"]), ("51", bancardconnectorpython.DECLINE_NOT_ENOUGH_FUNDS))
+		invalid = [record for record in records if record["index"] == 10][0]
+		self.assertTrue(invalid["error"].startswith("BancardAPIInvalidParameterException"))
+
+	def test_resume_after_crash(self):
+		checkpoint_path = os.path.join(self.directory, "reconcile.checkpoint")
+		output_path = os.path.join(self.directory, "results.ndjson")
+
+		with open(output_path, "wb") as output:
+			checkpoint = bancardconnectorpython.ReconcileCheckpoint(checkpoint_path)
+			charges = _crashing(bancardconnectorpython.read_charges(_csv_lines(100)), 40)
+			self.assertRaises(RuntimeError, bancardconnectorpython.reconcile_charges, self.bancard_api, charges, output, checkpoint, max_workers=2, checkpoint_every=5)
+		checked_before_crash = len(self.transport.checked)
+
+		checkpoint = bancardconnectorpython.ReconcileCheckpoint(checkpoint_path)
+		self.assertGreater(checkpoint.finished, 0)
+		self.assertLessEqual(len(checkpoint.completed), 4)  # the size of the checkpoint does not grow with the input
+		finished_before_resume = checkpoint.finished
+		finished_ids = set(str(index) for index in range(100) if checkpoint.is_finished(index))
+		with open(output_path, "r+b") as output:
+			output.seek(checkpoint.output_offset)
+			output.truncate()
+			bancardconnectorpython.reconcile_charges(self.bancard_api, bancardconnectorpython.read_charges(_csv_lines(100)), output, checkpoint, max_workers=2)
+
+		# the finished charges have not been checked again and every charge is once in the output
+		checked_after_crash = self.transport.checked[checked_before_crash:]
+		self.assertEqual(len(checked_after_crash), 100 - finished_before_resume)
+		self.assertFalse(set(checked_after_crash) & finished_ids)
+		with open(output_path, "rb") as output:
+			indexes = [json.loads(line)["index"] for line in output]
+		self.assertEqual(sorted(indexes), list(range(100)))
+		self.assertEqual((checkpoint.watermark, checkpoint.completed), (100, set()))
+
+
+class TestBancardReconcileCommand(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.simulator = BancardSimulator("public", "private").start()
+		self.environment = mock.patch.dict(os.environ, {
+			"BANCARD_ENVIRONMENT": bancardconnectorpython.ENVIRONMENT_SIMULATOR, "BANCARD_PUBLIC_KEY": "public", "BANCARD_PRIVATE_KEY": "private"})
+		self.environment.start()
+
+	def tearDown(self):
+		self.environment.stop()
+		self.simulator.stop()
+		bancardconnectorpython.BANCARD_URLS.pop(bancardconnectorpython.ENVIRONMENT_SIMULATOR, None)
+		shutil.rmtree(self.directory)
+
+	def test_reconcile_command(self):
+		input_path = os.path.join(self.directory, "charges.ndjson")
+		output_path = os.path.join(self.directory, "results.ndjson")
+		checkpoint_path = os.path.join(self.directory, "reconcile.checkpoint")
+		with open(input_path, "w") as input_file:
+			for marketplace_charge_id in range(20):
+				input_file.write(json.dumps({"marketplace_charge_id": str(marketplace_charge_id), "amount": "1000"}) + "\n")
+
+		argv = ["reconcile", input_path, "--output", output_path, "--checkpoint", checkpoint_path, "--workers", "4"]
+		with mock.patch("sys.stderr", io.StringIO()):
+			self.assertEqual(main(argv), 0)
+			# a second run finds every charge in the checkpoint
+			self.assertEqual(main(argv), 0)
+
+		with open(output_path, "rb") as output:
+			records = [json.loads(line) for line in output]
+		self.assertEqual(len(records), 20)
+		self.assertTrue(all(record["status"] == bancardconnectorpython.OUTCOME_PENDING for record in records))
+
+	def test_missing_credentials(self):
+		with mock.patch.dict(os.environ, clear=True), mock.patch("sys.stderr", io.StringIO()) as stderr:
+			self.assertEqual(main(["reconcile", os.path.join(self.directory, "charges.csv")]), 2)
+		self.assertIn("BancardAPIConfigurationException", stderr.getvalue())
+
+
+if __name__ == '__main__':
+	unittest.main()
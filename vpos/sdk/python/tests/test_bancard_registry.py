@@ -0,0 +1,180 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import threading
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _RecordingTransport(object):
+	"""
+		Fake transport that records the public key of every request and answers them as not payed yet.
+	"""
+
+	def __init__(self):
+		self.public_keys = list()
+		self.closed = False
+
+	def post(self, url, data, headers, timeout=None):
+		self.public_keys.append(json.loads(data.decode("utf-8"))["public_key"])
+		return b'{"status":"error","messages":[{"key":"PaymentNotFoundError","dsc":"Payment not found"}]}'
+
+	def close(self):
+		self.closed = True
+
+
+class TestBancardAPIRegistry(unittest.TestCase):
+
+	def setUp(self):
+		self.loaded = list()
+		self.registry = bancardconnectorpython.BancardAPIRegistry(loader=self.load_merchant, read_timeout=10)
+
+	def tearDown(self):
+		self.registry.close()
+
+	def load_merchant(self, merchant_id):
+		self.loaded.append(merchant_id)
+		if merchant_id.startswith("unknown"):
+			return None
+		return {"public_key": "public-%s" % merchant_id, "private_key": "private-%s" % merchant_id}
+
+	def test_lazy_creation(self):
+		self.assertEqual(len(self.registry), 0)
+		bancard_api = self.registry.get("shop-1")
+		self.assertIs(self.registry["shop-1"], bancard_api)
+		self.assertEqual(self.loaded, ["shop-1"])
+		self.assertEqual(bancard_api.public_key, "public-shop-1")
+		self.assertEqual(bancard_api.read_timeout, 10)
+		self.assertIn("shop-1", self.registry)
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, self.registry.get, "unknown-shop")
+
+	def test_shared_transport_and_signers(self):
+		self.registry.register("shop-1", "public-1", "private")
+		self.registry.register("shop-2", "public-2", "private")
+		self.registry.register("shop-3", "public-3", "other-private")
+		self.registry.register("shop-4", "public-4", "private", environment=bancardconnectorpython.ENVIRONMENT_PRODUCTION)
+
+		shop_1, shop_2, shop_3, shop_4 = [self.registry.get("shop-%d" % index) for index in range(1, 5)]
+		self.assertIs(shop_1.transport, shop_2.transport)
+		self.assertIs(shop_1.transport, shop_3.transport)
+		self.assertIsNot(shop_1.transport, shop_4.transport)
+		self.assertIs(shop_1.signer, shop_2.signer)
+		self.assertIsNot(shop_1.signer, shop_3.signer)
+		self.assertIsNot(shop_1.signer, shop_4.signer)
+		self.assertFalse(shop_1.owns_transport)
+		self.assertEqual(shop_4.urls, bancardconnectorpython.BANCARD_PRODUCTION_URLS)
+
+	def test_hot_reload(self):
+		self.registry.register("shop-1", "public-1", "private-1")
+		previous_api = self.registry.get("shop-1")
+		previous_api.transport = transport = _RecordingTransport()
+		previous_api._index_pending_charge("10", Decimal(1000), "PYG")
+
+		self.registry.register("shop-1", "public-1b", "private-1b")
+		bancard_api = self.registry.get("shop-1")
+		self.assertIsNot(bancard_api, previous_api)
+		self.assertEqual(bancard_api.public_key, "public-1b")
+		# the pending charges are kept, and their webhooks are signed with the new private key, even the ones of
+		# the charges that the previous BancardAPI was still creating during the reload
+		previous_api._index_pending_charge("11", Decimal(1000), "PYG")
+		for marketplace_charge_id in ("10", "11"):
+			webhook = json.dumps({"operation": {"shop_process_id": marketplace_charge_id, "response_code": "00", "authorization_number": "123456",
+				"token": bancard_api._confirm_token(marketplace_charge_id, Decimal(1000), "PYG")}})
+			self.assertTrue(bancard_api.verify_vpos_webhook(webhook)[0])
+
+		# a call that was in progress with the previous BancardAPI keeps working with the previous credentials
+		bancard_api.transport = transport
+		previous_api.get_charge_status(1, Decimal(1000))
+		bancard_api.get_charge_status(1, Decimal(1000))
+		self.assertEqual(transport.public_keys, ["public-1", "public-1b"])
+		self.assertFalse(transport.closed)
+
+		self.registry.reload("shop-1")
+		self.assertEqual(self.registry.get("shop-1").public_key, "public-shop-1")
+
+	def test_environment_change_does_not_keep_the_charges(self):
+		self.registry.register("shop-1", "public-1", "private-1")
+		previous_api = self.registry.get("shop-1")
+		previous_api._index_pending_charge("10", Decimal(1000), "PYG")
+		self.registry.register("shop-1", "public-1", "private-1", environment=bancardconnectorpython.ENVIRONMENT_PRODUCTION)
+		bancard_api = self.registry.get("shop-1")
+		self.assertIsNot(bancard_api.pending_index, previous_api.pending_index)
+		self.assertIsNone(bancard_api.pending_index.get("10"))
+
+	def test_replaced_hedge_executor_shutdown(self):
+		started, release = threading.Event(), threading.Event()
+
+		class _SlowTransport(_RecordingTransport):
+			def post(self, url, data, headers, timeout=None):
+				started.set()
+				release.wait(5)
+				return super(_SlowTransport, self).post(url, data, headers, timeout)
+
+		self.registry.register("shop-1", "public-1", "private-1", hedge_delay=5)
+		previous_api = self.registry.get("shop-1")
+		previous_api.transport = _SlowTransport()
+		results = list()
+		thread = threading.Thread(target=lambda: results.append(previous_api.get_charge_status(1, Decimal(1000))))
+		thread.start()
+		started.wait(5)
+
+		# the hedged call in progress keeps the hedge executor of the replaced BancardAPI alive until it finishes
+		self.registry.register("shop-1", "public-1b", "private-1b")
+		self.assertIsNotNone(previous_api._hedge_executor)
+		release.set()
+		thread.join(5)
+		self.assertEqual(len(results), 1)
+		self.assertIsNone(previous_api._hedge_executor)
+
+	def test_stale_signers_are_pruned(self):
+		self.registry.register("shop-1", "public-1", "private-1")
+		self.registry.register("shop-2", "public-2", "private-2")
+		self.registry.get("shop-1")
+		self.registry.get("shop-2")
+		self.registry.register("shop-1", "public-1", "private-1b")
+		self.assertEqual(sorted(private_key for _, private_key in self.registry._signers), ["private-1b", "private-2"])
+		self.registry.unregister("shop-2")
+		self.assertEqual(sorted(private_key for _, private_key in self.registry._signers), ["private-1b"])
+
+	def test_concurrent_first_use(self):
+		bancard_apis = list()
+		threads = [threading.Thread(target=lambda: bancard_apis.append(self.registry.get("shop-1"))) for _ in range(16)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(set(id(bancard_api) for bancard_api in bancard_apis)), 1)
+
+	def test_unregister_and_close(self):
+		bancard_api = self.registry.get("shop-1")
+		self.registry.unregister("shop-1")
+		self.assertNotIn("shop-1", self.registry)
+		self.registry.close()
+		self.assertTrue(bancard_api.transport.closed)
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, self.registry.get, "shop-2")
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,111 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _BancardTransport(object):
+	"""
+		Fake transport that creates every charge, reports them as payed and accepts every rollback.
+	"""
+
+	def post(self, url, data, headers, timeout=None):
+		if url.endswith(bancardconnectorpython.BANCARD_CONFIRMATIONS_PATH):
+			return b'{"status":"success","confirmation":{"response_code":"00","amount":"1000.00","currency":"PYG","authorization_number":"123456"}}'
+		if url.endswith(bancardconnectorpython.BANCARD_ROLLBACK_PATH):
+			return b'{"status":"success","messages":[{"key":"RollbackSuccessful","dsc":"Rollback successful"}]}'
+		return b'{"status":"success","process_id":"process-1"}'
+
+	def close(self):
+		pass
+
+
+class TestBancardResults(unittest.TestCase):
+
+	def build_api(self, **options):
+		return bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_BancardTransport(), **options)
+
+	def call_all(self, bancard_api):
+		charge_token = bancard_api.generate_charge_token("1", Decimal(1000), "Test charge", "http://localhost/approved", "http://localhost/cancelled")
+		charge_status = bancard_api.get_charge_status("1", Decimal(1000))
+		webhook = json.dumps({"operation": {
+			"shop_process_id": "1", "token": bancard_api._confirm_token("1", Decimal(1000), "PYG"), "response_code": "00", "authorization_number": "123456"}})
+		webhook_result = bancard_api.verify_vpos_webhook(webhook)
+		rollback_result = bancard_api.rollback_charge("1")
+		return charge_token, charge_status, webhook_result, rollback_result
+
+	def test_tuples_by_default(self):
+		for result in self.call_all(self.build_api()):
+			self.assertIsInstance(result, tuple)
+
+	def test_result_objects(self):
+		charge_token, charge_status, webhook_result, rollback_result = self.call_all(self.build_api(result_objects=True))
+
+		self.assertIsInstance(charge_token, bancardconnectorpython.ChargeToken)
+		self.assertEqual(charge_token.bancard_process_id, "process-1")
+		self.assertTrue(charge_token.payment_url.endswith("process-1"))
+		self.assertIsInstance(charge_status, bancardconnectorpython.ChargeStatus)
+		self.assertEqual((charge_status.already_payed, charge_status.authorization_number), (True, "123456"))
+		self.assertIsInstance(webhook_result, bancardconnectorpython.WebhookResult)
+		self.assertTrue(webhook_result.payment_approved)
+		self.assertIsInstance(rollback_result, bancardconnectorpython.RollbackResult)
+		self.assertTrue(rollback_result.successfull_rollback)
+
+		# the raw payloads are not kept and there is no per-instance dict
+		for result in (charge_token, charge_status, webhook_result, rollback_result):
+			self.assertIsNone(result[-1])
+			self.assertFalse(hasattr(result, "__dict__"))
+
+	def test_keep_bancard_response(self):
+		charge_token, charge_status, webhook_result, rollback_result = self.call_all(self.build_api(result_objects=True, keep_bancard_response=True))
+		self.assertEqual(charge_token.bancard_response["process_id"], "process-1")
+		self.assertEqual(charge_status.bancard_response["confirmation"]["response_code"], "00")
+		self.assertIn("operation", webhook_result.bancard_data)
+		self.assertEqual(rollback_result.bancard_response["status"], "success")
+
+	def test_tuple_compatibility(self):
+		charge_status = bancardconnectorpython.ChargeStatus(True, "123456", {"status": "success"})
+		already_payed, authorization_number, bancard_response = charge_status
+		self.assertEqual((already_payed, authorization_number, bancard_response), (True, "123456", {"status": "success"}))
+		self.assertEqual(charge_status, (True, "123456", {"status": "success"}))
+		self.assertNotEqual(charge_status, (False, None, {"status": "success"}))
+		self.assertEqual(charge_status[0], True)
+		self.assertEqual(charge_status[:2], (True, "123456"))
+		self.assertEqual(len(charge_status), 3)
+		self.assertEqual(bancardconnectorpython.ChargeStatus.from_tuple((True, "123456", {})), bancardconnectorpython.ChargeStatus(True, "123456"))
+
+		not_found = {"status": "error", "messages": [{"key": "PaymentNotFoundError", "dsc": "Payment not found"}]}
+		rollback_result = bancardconnectorpython.RollbackResult.from_tuple((True, not_found))
+		self.assertTrue(rollback_result.payment_not_found)
+		self.assertEqual(tuple(rollback_result), (True, None))
+
+	def test_rollback_charges_summary(self):
+		summary = self.build_api(result_objects=True).rollback_charges(["1", "2"])
+		self.assertEqual(sorted(summary.rolled_back), ["1", "2"])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,141 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import time
+import threading
+import unittest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import bancardconnectorpython
+
+
+class _FlakyTransport(object):
+	"""
+		Fake transport that fails the first calls with the given exception, and then answers every WebService successfully.
+	"""
+
+	def __init__(self, failures, error=bancardconnectorpython.BancardAPITimeoutException):
+		self.failures = failures
+		self.error = error
+		self.calls = 0
+		self.timeouts = list()
+
+	def post(self, url, data, headers, timeout=None):
+		self.calls += 1
+		self.timeouts.append(timeout)
+		if self.calls <= self.failures:
+			raise self.error("simulated connection problem")
+		if url.endswith("/confirmations"):
+			return json.dumps({"status": "error", "messages": [{"key": "PaymentNotFoundError", "dsc": "Payment not found"}]}).encode("utf-8")
+		return json.dumps({"status": "success", "process_id": "process-id"}).encode("utf-8")
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class _SlowBancardHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get("Content-Length", 0)))
+		time.sleep(0.5)
+		body = json.dumps({"status": "success"}).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+class TestBancardRetries(unittest.TestCase):
+
+	def build_api(self, transport, **options):
+		return bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=transport, backoff_base=0.001, **options)
+
+	def test_idempotent_operations_are_retried(self):
+		transport = _FlakyTransport(failures=2)
+		bancard_api = self.build_api(transport)
+		self.assertEqual(bancard_api.get_charge_status(1, Decimal(1000))[:2], (False, None))
+		self.assertEqual(transport.calls, 3)
+		self.assertEqual(bancard_api.last_call_stats.retries, 2)
+		self.assertEqual(bancard_api.last_call_stats.endpoint, bancardconnectorpython.CONFIRMATIONS_KEY)
+		self.assertEqual(transport.timeouts[0], (bancardconnectorpython.DEFAULT_CONNECT_TIMEOUT, bancardconnectorpython.DEFAULT_READ_TIMEOUT))
+
+		transport = _FlakyTransport(failures=1, error=bancardconnectorpython.BancardAPIUnavailableException)
+		self.assertTrue(self.build_api(transport).rollback_charge(1)[0])
+		self.assertEqual(transport.calls, 2)
+
+	def test_charge_token_generation_is_never_retried(self):
+		transport = _FlakyTransport(failures=1)
+		bancard_api = self.build_api(transport)
+		with self.assertRaises(bancardconnectorpython.BancardAPITimeoutException) as context:
+			bancard_api.generate_charge_token(1, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+		self.assertEqual(transport.calls, 1)
+		self.assertEqual(context.exception.retries, 0)
+		self.assertIsNotNone(context.exception.elapsed)
+
+	def test_retries_are_exhausted(self):
+		transport = _FlakyTransport(failures=10)
+		with self.assertRaises(bancardconnectorpython.BancardAPITimeoutException) as context:
+			self.build_api(transport, max_retries=3).get_charge_status(1, Decimal(1000))
+		self.assertEqual(transport.calls, 4)
+		self.assertEqual(context.exception.retries, 3)
+
+	def test_deadline_stops_the_retries(self):
+		transport = _FlakyTransport(failures=10)
+		bancard_api = bancardconnectorpython.BancardAPI(
+			public_key="public", private_key="private", transport=transport, max_retries=100, backoff_base=0.05, deadline=0.3)
+		started_at = time.time()
+		self.assertRaises(bancardconnectorpython.BancardAPITimeoutException, bancard_api.get_charge_status, 1, Decimal(1000))
+		self.assertLess(time.time() - started_at, 0.5)
+		self.assertLess(transport.calls, 100)
+		for connect_timeout, read_timeout in transport.timeouts:
+			self.assertLessEqual(read_timeout, 0.3)
+
+	def test_backoff_is_bounded(self):
+		retry_policy = bancardconnectorpython.RetryPolicy(max_retries=10, backoff_base=0.1, backoff_max=1, jitter=False)
+		self.assertEqual([retry_policy.backoff(attempt) for attempt in range(5)], [0.1, 0.2, 0.4, 0.8, 1])
+		self.assertIsNone(retry_policy.next_retry_delay(10))
+		self.assertIsNone(retry_policy.next_retry_delay(0, deadline_at=time.time() + 0.05))
+
+	def test_read_timeout_of_the_transport(self):
+		server = _ThreadingHTTPServer(("127.0.0.1", 0), _SlowBancardHandler)
+		threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+		try:
+			transport = bancardconnectorpython.BancardTransport()
+			url = "http://127.0.0.1:%s/vpos/api/0.3/single_buy/confirmations" % server.server_address[1]
+			self.assertRaises(bancardconnectorpython.BancardAPITimeoutException, transport.post, url, "{}", {}, timeout=(1, 0.1))
+			transport.close()
+		finally:
+			server.shutdown()
+			server.server_close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,66 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import hashlib
+import unittest
+import bancardconnectorpython
+from bancardconnectorpython.signer import *
+
+
+def md5_hexdigest(value):
+	return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+class TestBancardTokenSigner(unittest.TestCase):
+
+	def setUp(self):
+		self.signer = bancardconnectorpython.BancardTokenSigner("private")
+
+	def test_tokens_match_the_bancard_specs(self):
+		self.assertEqual(self.signer.single_buy(123, "1000.00", "PYG"), md5_hexdigest("private1231000.00PYG"))
+		self.assertEqual(self.signer.get_confirmation(123), md5_hexdigest("private123get_confirmation"))
+		self.assertEqual(self.signer.rollback("123"), md5_hexdigest("private123rollback0.00"))
+		self.assertEqual(self.signer.confirm(123, "1000.00", "PYG"), md5_hexdigest("private123confirm1000.00PYG"))
+
+	def test_primed_state_is_not_modified(self):
+		self.assertEqual(self.signer.get_confirmation(1), self.signer.get_confirmation(1))
+
+	def test_sign_batch(self):
+		operations = [
+			(SIGNER_OPERATION_SINGLE_BUY, 1, "1000.00", "PYG"),
+			(SIGNER_OPERATION_GET_CONFIRMATION, 2),
+			(SIGNER_OPERATION_ROLLBACK, 3),
+			(SIGNER_OPERATION_CONFIRM, 4, "1000.00", "PYG"),
+		]
+		self.assertEqual(self.signer.sign_batch(operations), [
+			self.signer.single_buy(1, "1000.00", "PYG"), self.signer.get_confirmation(2), self.signer.rollback(3), self.signer.confirm(4, "1000.00", "PYG")])
+		self.assertRaises(KeyError, self.signer.sign_batch, [("unknown", 1)])
+
+	def test_bancard_api_uses_its_signer(self):
+		bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private")
+		bancard_body_request = bancard_api._build_rollback_request(123)
+		self.assertEqual(bancard_body_request["operation"]["token"], md5_hexdigest("private123rollback0.00"))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,136 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import json
+import socket
+import unittest
+import subprocess
+from decimal import Decimal
+import bancardconnectorpython
+from bancardconnectorpython.simulator import BancardSimulator, SIMULATOR_PAYMENT_NOT_FOUND, use_simulator
+
+
+class TestBancardSimulator(unittest.TestCase):
+
+	def setUp(self):
+		self.simulator = BancardSimulator("public", "private").start()
+		self.bancard_api = bancardconnectorpython.BancardAPI(environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="private")
+
+	def tearDown(self):
+		self.bancard_api.close()
+		self.simulator.stop()
+		bancardconnectorpython.BANCARD_URLS.pop(bancardconnectorpython.ENVIRONMENT_SIMULATOR, None)
+
+	def generate_charge_token(self, marketplace_charge_id, amount=Decimal(1000)):
+		return self.bancard_api.generate_charge_token(marketplace_charge_id, amount, "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+
+	def test_charge_lifecycle(self):
+		bancard_process_id, payment_url, bancard_response = self.generate_charge_token(1)
+		self.assertTrue(payment_url.startswith(self.simulator.base_url))
+		self.assertEqual(self.bancard_api.get_charge_status(1, Decimal(1000))[:2], (False, None))
+
+		webhook_data = self.simulator.pay(1)
+		payment_approved, authorization_number, bancard_data = self.bancard_api.verify_vpos_webhook(json.dumps(webhook_data))
+		self.assertTrue(payment_approved)
+		self.assertEqual(self.bancard_api.get_charge_status(1, Decimal(1000))[:2], (True, authorization_number))
+		self.assertRaises(bancardconnectorpython.BancardAPIChargeInconsistentValuesException, self.bancard_api.get_charge_status, 1, Decimal(2000))
+
+		self.assertTrue(self.bancard_api.rollback_charge(1)[0])
+		self.assertEqual(self.bancard_api.get_charge_status(1, Decimal(1000))[:2], (False, None))
+		self.assertRaises(bancardconnectorpython.BancardAPIMarketplaceChargeIDAlreadyExistsException, self.generate_charge_token, 1)
+
+	def test_response_codes(self):
+		expected_exceptions = {
+			"05": bancardconnectorpython.BancardAPIPaymentMethodNotEnabledException,
+			"12": bancardconnectorpython.BancardAPIPaymentTransactionInvalidException,
+			"15": bancardconnectorpython.BancardAPIPaymentMethodNotEnabledException,
+			"51": bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException,
+		}
+		for marketplace_charge_id, (response_code, expected_exception) in enumerate(sorted(expected_exceptions.items())):
+			self.simulator.set_response_code(marketplace_charge_id, response_code, amount="1000.00")
+			self.assertRaises(expected_exception, self.bancard_api.get_charge_status, marketplace_charge_id, Decimal(1000))
+
+		self.simulator.set_response_code(10, SIMULATOR_PAYMENT_NOT_FOUND, amount="1000.00")
+		self.assertEqual(self.bancard_api.get_charge_status(10, Decimal(1000))[:2], (False, None))
+
+	def test_default_response_code_and_couponned_charges(self):
+		self.simulator.default_response_code = "00"
+		self.generate_charge_token(1)
+		self.assertTrue(self.bancard_api.get_charge_status(1, Decimal(1000))[0])
+		self.simulator.set_couponned(1)
+		self.assertRaises(bancardconnectorpython.BancardAPINotRolledBackException, self.bancard_api.rollback_charge, 1)
+
+	def test_token_and_public_key_validation(self):
+		bancard_api = bancardconnectorpython.BancardAPI(environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="wrong")
+		self.assertRaises(bancardconnectorpython.BancardAPIChargeRejectedException, bancard_api.generate_charge_token,
+						1, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+		self.assertEqual(len(self.simulator.charges), 0)
+		bancard_api.close()
+
+		status_code, bancard_response = self.simulator.handle(bancardconnectorpython.BANCARD_CONFIRMATIONS_PATH, json.dumps({
+			"public_key": "wrong", "operation": {"token": "", "shop_process_id": 1}}).encode("utf-8"))
+		self.assertEqual(status_code, 401)
+		self.assertEqual(bancard_response["messages"][0]["key"], "InvalidPublicKeyError")
+
+	def test_error_injection_and_latency(self):
+		self.simulator.error_rate = 1
+		self.assertRaises(bancardconnectorpython.BancardAPIUnavailableException, self.generate_charge_token, 1)
+
+		self.simulator.error_rate = 0
+		self.simulator.latency = 0.2
+		bancard_api = bancardconnectorpython.BancardAPI(
+			environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="private", read_timeout=0.05, max_retries=0)
+		self.assertRaises(bancardconnectorpython.BancardAPITimeoutException, bancard_api.get_charge_status, 1, Decimal(1000))
+		bancard_api.close()
+
+	def test_sandbox_urls_can_not_be_replaced(self):
+		self.assertRaises(bancardconnectorpython.BancardAPIConfigurationException, use_simulator, "http://127.0.0.1:1", bancardconnectorpython.ENVIRONMENT_SANDBOX)
+
+
+class TestBancardSimulatorSubprocess(unittest.TestCase):
+
+	def test_subprocess(self):
+		with socket.socket() as sock:
+			sock.bind(("127.0.0.1", 0))
+			port = sock.getsockname()[1]
+
+		env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(bancardconnectorpython.__file__))))
+		process = subprocess.Popen([sys.executable, "-m", "bancardconnectorpython.simulator", "--port", str(port), "--default-response-code", "00"],
+								env=env, stdout=subprocess.PIPE)
+		try:
+			process.stdout.readline()  # wait until it listens
+			use_simulator("http://127.0.0.1:%s" % port)
+			bancard_api = bancardconnectorpython.BancardAPI(environment=bancardconnectorpython.ENVIRONMENT_SIMULATOR, public_key="public", private_key="private")
+			bancard_api.generate_charge_token(1, Decimal(1000), "Sample charge", "http://localhost/approved", "http://localhost/cancelled")
+			self.assertTrue(bancard_api.get_charge_status(1, Decimal(1000))[0])
+			bancard_api.close()
+		finally:
+			process.terminate()
+			process.wait()
+			bancardconnectorpython.BANCARD_URLS.pop(bancardconnectorpython.ENVIRONMENT_SIMULATOR, None)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,86 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+from bancardconnectorpython import BancardAPI
+
+
+class TestBancardChargeBatchValidation(unittest.TestCase):
+
+	def setUp(self):
+		self.columns = {
+			"marketplace_charge_id": ["1", 2, "x", None],
+			"amount": [Decimal(1000), Decimal(0), Decimal("NaN"), "1000"],
+			"description": ["Test charge", "x" * 21, "", "Test charge"],
+			"approved_url": ["http://localhost/approved"] * 3 + [""],
+			"cancelled_url": ["http://localhost/cancelled"] * 3 + ["x" * 256],
+			"currency": ["PYG", "PYG", "USD", "PYG"],
+		}
+
+	def test_every_violation_is_reported(self):
+		report = bancardconnectorpython.validate_charge_batch(self.columns)
+		self.assertFalse(report.is_valid)
+		self.assertEqual(report.rows, 4)
+		self.assertEqual(report.invalid_rows, [1, 2, 3])
+		self.assertEqual(report.valid_rows(), [0])
+		self.assertEqual(report.errors_by_row()[1], [
+			("amount", bancardconnectorpython.VALIDATION_MESSAGES["amount"]), ("description", bancardconnectorpython.VALIDATION_MESSAGES["description"])])
+		self.assertEqual([field for field, message in report.errors_by_row()[2]], ["marketplace_charge_id", "amount", "currency"])
+		self.assertEqual([field for field, message in report.errors_by_row()[3]], ["marketplace_charge_id", "amount", "approved_url", "cancelled_url"])
+		self.assertEqual(report.counts_by_field()["amount"], 3)
+
+	def test_same_rules_as_the_validators(self):
+		validators = {
+			"marketplace_charge_id": BancardAPI.validate_marketplace_charge_id, "amount": BancardAPI.validate_amount,
+			"description": BancardAPI.validate_description, "approved_url": BancardAPI.validate_approved_url,
+			"cancelled_url": BancardAPI.validate_cancelled_url, "currency": BancardAPI.validate_currency}
+		expected_violations = list()
+		for row in range(4):
+			for field in bancardconnectorpython.CHARGE_BATCH_FIELDS:
+				try:
+					validators[field](self.columns[field][row])
+				except bancardconnectorpython.BancardAPIInvalidParameterException as error:
+					expected_violations.append((row, field, str(error)))
+		self.assertEqual(bancardconnectorpython.validate_charge_batch(self.columns).violations, expected_violations)
+
+	def test_default_currency(self):
+		del self.columns["currency"]
+		columns = dict((field, values[:1]) for field, values in self.columns.items())
+		report = bancardconnectorpython.validate_charge_batch(columns)
+		self.assertTrue(report.is_valid)
+		self.assertEqual(report.valid_rows(), [0])
+
+	def test_invalid_batches(self):
+		del self.columns["amount"]
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, bancardconnectorpython.validate_charge_batch, self.columns)
+		self.columns["amount"] = [Decimal(1)]
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, bancardconnectorpython.validate_charge_batch, self.columns)
+		self.columns["amount"] = [Decimal(1)] * 4
+		self.columns["tip"] = [Decimal(1)] * 4
+		self.assertRaises(bancardconnectorpython.BancardAPIInvalidParameterException, bancardconnectorpython.validate_charge_batch, self.columns)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,229 @@
+# MIT License
+#
+# Copyright (c) [2018] [Victor Manuel Cajes Gonzalez - vcajes@gmail.com]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+import json
+import asyncio
+import threading
+import unittest
+from decimal import Decimal
+import bancardconnectorpython
+
+
+class _BancardTransport(object):
+	"""
+		Fake transport that creates every charge.
+	"""
+
+	def post(self, url, data, headers, timeout=None):
+		return b'{"status":"success","process_id":"process-1"}'
+
+	def close(self):
+		pass
+
+
+class TestBancardWebhookReceiver(unittest.TestCase):
+
+	def setUp(self):
+		self.bancard_api = bancardconnectorpython.BancardAPI(public_key="public", private_key="private", transport=_BancardTransport())
+		self.events = list()
+		self.handled = threading.Event()
+		self.receivers = list()
+
+	def tearDown(self):
+		for receiver in self.receivers:
+			receiver.close(timeout=5)
+
+	def handler(self, event):
+		self.events.append(event)
+		self.handled.set()
+
+	def build(self, receiver_class, **options):
+		receiver = receiver_class(self.bancard_api, **dict(dict(handler=self.handler), **options))
+		self.receivers.append(receiver)
+		return receiver
+
+	def create_charge(self, marketplace_charge_id):
+		self.bancard_api.generate_charge_token(marketplace_charge_id, Decimal(1000), "Test charge", "http://localhost/approved", "http://localhost/cancelled")
+
+	def webhook_body(self, marketplace_charge_id, response_code="00", token=None):
+		return json.dumps({"operation": {
+			"shop_process_id": marketplace_charge_id, "token": token or self.bancard_api._confirm_token(marketplace_charge_id, Decimal(1000), "PYG"),
+			"response_code": response_code, "amount": "1000.00", "currency": "PYG", "authorization_number": "123456"}}).encode("utf-8")
+
+	def call_wsgi(self, application, body, method="POST"):
+		response = dict()
+
+		def start_response(status, headers):
+			response["status"], response["headers"] = status, dict(headers)
+
+		environ = {"REQUEST_METHOD": method, "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body)}
+		response["body"] = b"".join(application(environ, start_response))
+		return response
+
+	def call_asgi(self, application, body, method="POST"):
+		messages = [{"type": "http.request", "body": body[:10], "more_body": True}, {"type": "http.request", "body": body[10:], "more_body": False}]
+		sent = list()
+
+		async def receive():
+			return messages.pop(0)
+
+		async def send(message):
+			sent.append(message)
+
+		asyncio.run(application({"type": "http", "method": method, "path": "/bancard/confirm"}, receive, send))
+		return {"status": sent[0]["status"], "headers": dict(sent[0]["headers"]), "body": sent[1]["body"]}
+
+	def test_wsgi_acknowledges_and_dispatches(self):
+		application = self.build(bancardconnectorpython.BancardWebhookWSGIApp)
+		self.create_charge("1")
+		response = self.call_wsgi(application, self.webhook_body("1"))
+		self.assertEqual(response["status"], "200 OK")
+		self.assertEqual(json.loads(response["body"].decode("utf-8")), {"status": "success"})
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertEqual(len(self.events), 1)
+		self.assertEqual((self.events[0].marketplace_charge_id, self.events[0].payment_approved, self.events[0].authorization_number), ("1", True, "123456"))
+
+		# the charge is not pending anymore, so a replayed webhook is rejected
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("1"))["status"], "400 Bad Request")
+
+	def test_asgi_acknowledges_and_dispatches(self):
+		application = self.build(bancardconnectorpython.BancardWebhookASGIApp)
+		self.create_charge("2")
+		response = self.call_asgi(application, self.webhook_body("2", response_code="51"))
+		self.assertEqual(response["status"], 200)
+		self.assertEqual(response["headers"][b"content-type"], b"application/json")
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertFalse(self.events[0].payment_approved)
+		self.assertEqual(self.events[0].response_code, "51")
+		self.assertIsInstance(self.events[0].error, bancardconnectorpython.BancardAPIPaymentMethodNotEnoughFundsException)
+
+	def test_invalid_requests(self):
+		application = self.build(bancardconnectorpython.BancardWebhookWSGIApp, max_body_size=1024)
+		self.create_charge("3")
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("3", token="0" * 32))["status"], "400 Bad Request")
+		self.assertEqual(self.call_wsgi(application, b"not json")["status"], "400 Bad Request")
+		self.assertEqual(self.call_wsgi(application, b"", method="GET")["status"], "405 Method Not Allowed")
+		self.assertEqual(self.call_wsgi(application, b"x" * 2048)["status"], "413 Payload Too Large")
+		asgi_application = bancardconnectorpython.BancardWebhookASGIApp(self.bancard_api, dispatcher=application.dispatcher, max_body_size=1024)
+		self.assertEqual(self.call_asgi(asgi_application, b"x" * 2048)["status"], 413)
+		self.assertEqual(application.dispatcher.stats()["accepted"], 0)
+
+	def test_charge_loader(self):
+		charges = {"4": (Decimal(1000), "PYG")}
+		application = self.build(bancardconnectorpython.BancardWebhookWSGIApp, charge_loader=charges.get)
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("4"))["status"], "200 OK")
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("5"))["status"], "400 Bad Request")
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertEqual([event.marketplace_charge_id for event in self.events], ["4"])
+
+	def test_invalid_loaded_charge(self):
+		charges = {"6": (Decimal(-1), "PYG"), "7": (Decimal(1000), "XXX")}
+		application = self.build(bancardconnectorpython.BancardWebhookWSGIApp, charge_loader=charges.get)
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("6"))["status"], "400 Bad Request")
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("7"))["status"], "400 Bad Request")
+		self.assertEqual(application.dispatcher.stats()["accepted"], 0)
+
+	def test_backpressure(self):
+		release = threading.Event()
+		started = threading.Event()
+
+		def slow_handler(event):
+			started.set()
+			release.wait(5)
+
+		application = self.build(bancardconnectorpython.BancardWebhookWSGIApp, handler=slow_handler, workers=1, queue_size=2)
+		for marketplace_charge_id in ("10", "11", "12", "13"):
+			self.create_charge(marketplace_charge_id)
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("10"))["status"], "200 OK")
+		started.wait(5)
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("11"))["status"], "200 OK")
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("12"))["status"], "200 OK")
+		response = self.call_wsgi(application, self.webhook_body("13"))
+		self.assertEqual(response["status"], "503 Service Unavailable")
+		self.assertEqual(response["headers"]["Retry-After"], "1")
+
+		stats = application.dispatcher.stats()
+		self.assertEqual((stats["queue_depth"], stats["in_flight"], stats["accepted"], stats["rejected"], stats["high_watermark"]), (2, 1, 3, 1, 2))
+		release.set()
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertEqual(application.dispatcher.stats()["processed"], 3)
+		prometheus_text = application.dispatcher.prometheus_text()
+		self.assertIn("bancard_webhook_rejected_total 1\n", prometheus_text)
+		self.assertIn('bancard_webhook_queue_wait_seconds_count{endpoint="webhook"} 3\n', prometheus_text)
+
+	def test_retry_after_a_full_queue(self):
+		release = threading.Event()
+		started = threading.Event()
+
+		def slow_handler(event):
+			started.set()
+			release.wait(5)
+			self.handler(event)
+
+		application = self.build(bancardconnectorpython.BancardWebhookWSGIApp, handler=slow_handler, workers=1, queue_size=1)
+		for marketplace_charge_id in ("20", "21", "22"):
+			self.create_charge(marketplace_charge_id)
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("20"))["status"], "200 OK")
+		started.wait(5)
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("21"))["status"], "200 OK")
+		response = self.call_wsgi(application, self.webhook_body("22"))
+		self.assertEqual(response["status"], "503 Service Unavailable")
+
+		# the webhook that could not be queued is still pending, so the retry of Bancard is accepted
+		release.set()
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("22"))["status"], "200 OK")
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertEqual(sorted(event.marketplace_charge_id for event in self.events), ["20", "21", "22"])
+		self.assertEqual(self.call_wsgi(application, self.webhook_body("22"))["status"], "400 Bad Request")
+
+	def test_asgi_charge_loader_runs_in_the_executor(self):
+		loader_threads = list()
+
+		def charge_loader(marketplace_charge_id):
+			loader_threads.append(threading.current_thread())
+			return (Decimal(1000), "PYG")
+
+		application = self.build(bancardconnectorpython.BancardWebhookASGIApp, charge_loader=charge_loader)
+		self.assertEqual(self.call_asgi(application, self.webhook_body("23"))["status"], 200)
+		self.assertEqual(len(loader_threads), 1)
+		self.assertIsNot(loader_threads[0], threading.current_thread())
+		self.assertTrue(application.dispatcher.join(timeout=5))
+		self.assertEqual(self.events[0].marketplace_charge_id, "23")
+
+	def test_failing_handler(self):
+		def failing_handler(event):
+			raise ValueError("DB is down")
+
+		dispatcher = bancardconnectorpython.WebhookDispatcher(failing_handler, workers=2)
+		dispatcher.submit(bancardconnectorpython.WebhookEvent("1", True, "123456", "00", {}))
+		self.assertTrue(dispatcher.join(timeout=5))
+		dispatcher.close()
+		self.assertEqual(dispatcher.stats()["failed"], 1)
+		self.assertIsInstance(dispatcher.last_error, ValueError)
+		self.assertFalse(dispatcher.submit(bancardconnectorpython.WebhookEvent("2", True, "123456", "00", {})))
+
+
+if __name__ == '__main__':
+	unittest.main()